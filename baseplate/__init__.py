@@ -361,6 +361,15 @@ class Baseplate:
         else:
             skipped.append("tracing")
 
+        if config.Optional(config.Boolean, default=False)(
+            self._app_config.get("request_memo.enabled", "")
+        ):
+            from baseplate.observers.memo import RequestMemoBaseplateObserver
+
+            self.register(RequestMemoBaseplateObserver())
+        else:
+            skipped.append("request_memo")
+
         if "sentry.dsn" in self._app_config or "SENTRY_DSN" in os.environ:
             from baseplate.observers.sentry import init_sentry_client_from_config
             from baseplate.observers.sentry import SentryBaseplateObserver
@@ -509,6 +518,33 @@ class Baseplate:
         with self.make_server_span(context, name):
             yield context
 
+    def prewarm_clients(self, connections: int = 1) -> None:
+        """Open connections for every configured client ahead of the first request.
+
+        Calls ``prewarm`` on each context factory that has one, e.g.
+        :py:meth:`baseplate.clients.ContextFactory.prewarm`. Call this after
+        :py:meth:`configure_context` while the application starts up, so that
+        a fresh instance doesn't pay connection costs on its first requests.
+        Failures are logged rather than raised since the clients will connect
+        on demand anyway.
+
+        :param connections: How many connections to open per client, at most.
+            Clients never open more than their pool allows.
+
+        """
+        specs: List[Tuple[Optional[str], Dict[str, Any]]] = [(None, self._context_config)]
+        while specs:
+            prefix, spec = specs.pop(0)
+            for name, value in spec.items():
+                full_name = f"{prefix}.{name}" if prefix else name
+                if isinstance(value, dict):
+                    specs.append((full_name, value))
+                elif hasattr(value, "prewarm"):
+                    try:
+                        value.prewarm(connections)
+                    except Exception:  # pylint: disable=broad-except
+                        logger.warning("Failed to prewarm %s", full_name, exc_info=True)
+
     def get_runtime_metric_reporters(self) -> Dict[str, Callable[[Any], None]]:
         specs: List[Tuple[Optional[str], Dict[str, Any]]] = [(None, self._context_config)]
         result = {}
@@ -31,6 +31,16 @@ class ContextFactory:
 
         """
 
+    def prewarm(self, connections: int) -> None:
+        """Open connections ahead of time so that early requests don't have to.
+
+        This is called at startup by :py:meth:`baseplate.Baseplate.prewarm_clients`.
+        Factories without connection pools don't need to do anything.
+
+        :param connections: How many connections to open, at most.
+
+        """
+
     def make_object_for_context(self, name: str, span: "baseplate.Span") -> Any:
         """Return an object that can be added to the context object.
 
@@ -1,10 +1,17 @@
+import collections
+import functools
 import logging
+import sys
+import threading
 import time
+import types
 
-from threading import Event
 from typing import Any
 from typing import Callable
+from typing import Deque
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Mapping
 from typing import NamedTuple
@@ -17,12 +24,21 @@ from typing import Union
 from cassandra.auth import PlainTextAuthProvider
 from cassandra.cluster import _NOT_SET  # pylint: disable=no-name-in-module
 from cassandra.cluster import Cluster  # pylint: disable=no-name-in-module
+from cassandra.cluster import EXEC_PROFILE_DEFAULT  # pylint: disable=no-name-in-module
 from cassandra.cluster import ExecutionProfile  # pylint: disable=no-name-in-module
 from cassandra.cluster import ResponseFuture  # pylint: disable=no-name-in-module
 from cassandra.cluster import Session  # pylint: disable=no-name-in-module
+from cassandra.concurrent import ExecutionResult  # pylint: disable=no-name-in-module
+from cassandra.policies import ConstantSpeculativeExecutionPolicy
+from cassandra.policies import DCAwareRoundRobinPolicy
+from cassandra.policies import HostDistance
+from cassandra.policies import LoadBalancingPolicy
+from cassandra.policies import RoundRobinPolicy
+from cassandra.policies import TokenAwarePolicy
 from cassandra.query import BoundStatement  # pylint: disable=no-name-in-module
 from cassandra.query import PreparedStatement  # pylint: disable=no-name-in-module
 from cassandra.query import SimpleStatement  # pylint: disable=no-name-in-module
+from gevent.event import AsyncResult
 from prometheus_client import Counter
 from prometheus_client import Gauge
 from prometheus_client import Histogram
@@ -30,6 +46,7 @@ from prometheus_client import Histogram
 from baseplate import Span
 from baseplate.clients import ContextFactory
 from baseplate.lib import config
+from baseplate.lib import metrics
 from baseplate.lib.prometheus_metrics import default_latency_buckets
 from baseplate.lib.secrets import SecretsStore
 
@@ -58,6 +75,141 @@ REQUEST_TOTAL = Counter(
     "Total number of cassandra queries",
     CassandraPrometheusLabels._fields + ("cassandra_success",),
 )
+HOST_REQUEST_TIME = Histogram(
+    "cassandra_client_host_latency_seconds",
+    "Time spent executing cassandra queries, by coordinator host",
+    ["cassandra_client_name", "cassandra_host"],
+    buckets=default_latency_buckets,
+)
+ADDITIONAL_ATTEMPTS_TOTAL = Counter(
+    "cassandra_client_additional_attempts_total",
+    "Number of extra hosts queries were sent to by speculative execution or retries",
+    ["cassandra_client_name"],
+)
+HOST_OPEN_CONNECTIONS = Gauge(
+    "cassandra_client_host_open_connections",
+    "Number of open connections to each host",
+    ["cassandra_client_name", "cassandra_host"],
+    multiprocess_mode="livesum",
+)
+HOST_IN_FLIGHT_REQUESTS = Gauge(
+    "cassandra_client_host_in_flight_requests",
+    "Number of requests in flight to each host",
+    ["cassandra_client_name", "cassandra_host"],
+    multiprocess_mode="livesum",
+)
+PREPARED_STATEMENT_CACHE_REQUESTS_TOTAL = Counter(
+    "cassandra_client_prepared_statement_cache_requests_total",
+    "Total number of lookups in the prepared statement cache",
+    ["cassandra_client_name", "cassandra_cache_result"],
+)
+PREPARED_STATEMENT_CACHE_EVICTIONS_TOTAL = Counter(
+    "cassandra_client_prepared_statement_cache_evictions_total",
+    "Total number of prepared statements evicted from the cache",
+    ["cassandra_client_name"],
+)
+PREPARED_STATEMENT_CACHE_SIZE = Gauge(
+    "cassandra_client_prepared_statement_cache_size",
+    "Number of prepared statements in the cache",
+    ["cassandra_client_name"],
+    multiprocess_mode="livesum",
+)
+
+
+class _PrometheusChildren(NamedTuple):
+    active: Gauge
+    latency_success: Histogram
+    latency_failure: Histogram
+    total_success: Counter
+    total_failure: Counter
+
+
+@functools.lru_cache(maxsize=None)
+def _prometheus_children(prom_labels: CassandraPrometheusLabels) -> _PrometheusChildren:
+    """Resolve the labelled metrics for a set of labels once, rather than per query.
+
+    Label values are bounded by the clients, keyspaces and query names used,
+    so the cache is too.
+
+    """
+    labels = prom_labels._asdict()
+    return _PrometheusChildren(
+        active=REQUEST_ACTIVE.labels(**labels),
+        latency_success=REQUEST_TIME.labels(**labels, cassandra_success="true"),
+        latency_failure=REQUEST_TIME.labels(**labels, cassandra_success="false"),
+        total_success=REQUEST_TOTAL.labels(**labels, cassandra_success="true"),
+        total_failure=REQUEST_TOTAL.labels(**labels, cassandra_success="false"),
+    )
+
+
+class PreparedStatementCache:
+    """A bounded LRU of prepared statements, keyed by the text of the query.
+
+    Concurrent misses for the same query are single-flighted: the first
+    caller prepares the statement and the others wait for its result rather
+    than each preparing it again.
+
+    :param max_size: The most prepared statements to keep. The least recently
+        used statement is evicted to make room for a new one.
+    :param client_name: The client name used in metrics.
+
+    """
+
+    def __init__(self, max_size: int = 1000, client_name: str = ""):
+        self.max_size = max_size
+        self.client_name = client_name
+        self.statements: "collections.OrderedDict[str, PreparedStatement]" = (
+            collections.OrderedDict()
+        )
+        self.preparing: Dict[str, AsyncResult] = {}
+
+        self.hits = PREPARED_STATEMENT_CACHE_REQUESTS_TOTAL.labels(client_name, "hit")
+        self.misses = PREPARED_STATEMENT_CACHE_REQUESTS_TOTAL.labels(client_name, "miss")
+        self.evictions = PREPARED_STATEMENT_CACHE_EVICTIONS_TOTAL.labels(client_name)
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def __contains__(self, query: str) -> bool:
+        return query in self.statements
+
+    def get(self, query: str, prepare: Callable[[str], PreparedStatement]) -> PreparedStatement:
+        """Return the prepared statement for ``query``, calling ``prepare`` on a miss."""
+        try:
+            statement = self.statements[query]
+        except KeyError:
+            pass
+        else:
+            self.statements.move_to_end(query)
+            self.hits.inc()
+            return statement
+
+        in_progress = self.preparing.get(query)
+        if in_progress is not None:
+            self.hits.inc()
+            return in_progress.get()
+
+        self.misses.inc()
+        result = AsyncResult()
+        self.preparing[query] = result
+        try:
+            statement = prepare(query)
+        except BaseException as exc:
+            result.set_exception(exc)
+            raise
+        else:
+            result.set(statement)
+            self.statements[query] = statement
+            while len(self.statements) > self.max_size:
+                self.statements.popitem(last=False)
+                self.evictions.inc()
+            return statement
+        finally:
+            del self.preparing[query]
+
+    def report_runtime_metrics(self) -> None:
+        PREPARED_STATEMENT_CACHE_SIZE.labels(self.client_name).set(len(self.statements))
+
 
 if TYPE_CHECKING:
     import cqlmapper.connection
@@ -90,6 +242,32 @@ def cluster_from_config(
     * ``port``: The server-side port to open connections to.
     * ``credentials_secret`` (optional): the key used to retrieve the database
         credentials from ``secrets`` as a :py:class:`~baseplate.lib.secrets.CredentialSecret`.
+    * ``load_balancing_policy`` (optional): how to pick the hosts a query is
+        sent to. ``round_robin`` uses every host in turn, ``dc_aware`` prefers
+        hosts in ``local_dc`` and ``token_aware`` (the driver's default)
+        prefers replicas of the query's partition in ``local_dc``.
+    * ``local_dc`` (optional): the datacenter considered local by the
+        ``dc_aware`` and ``token_aware`` policies. Defaults to the datacenter
+        of the first contact point.
+    * ``used_hosts_per_remote_dc`` (optional): how many hosts in each remote
+        datacenter the ``dc_aware`` and ``token_aware`` policies may fall back
+        to, by default ``0``.
+    * ``speculative_execution.delay`` (optional): how long (as
+        :py:func:`~baseplate.lib.config.Timespan`) to wait for a response
+        before also sending the query to the next host. Only statements marked
+        idempotent are executed speculatively.
+    * ``speculative_execution.max_attempts`` (optional): how many speculative
+        executions to start per query, by default ``1``.
+    * ``protocol_version`` (optional): the native protocol version to use.
+        Defaults to negotiating the highest version the cluster supports.
+    * ``connections_per_host`` (optional): how many connections to open to
+        each local host. Only protocol versions 1 and 2 support this; later
+        versions multiplex requests over a single connection per host.
+    * ``compression`` (optional): ``true`` (the default) to use lz4 or snappy
+        if available, ``lz4``, ``snappy`` or ``false``.
+
+    The load balancing and speculative execution policies are set on the
+    default execution profile unless ``execution_profiles`` already has one.
 
     :param execution_profiles: Configured execution profiles to provide to the
         rest of the application.
@@ -101,6 +279,23 @@ def cluster_from_config(
             "contact_points": config.TupleOf(config.String),
             "port": config.Optional(config.Integer, default=None),
             "credentials_secret": config.Optional(config.String),
+            "load_balancing_policy": config.Optional(
+                config.OneOf(
+                    round_robin="round_robin", dc_aware="dc_aware", token_aware="token_aware"
+                ),
+                default=None,
+            ),
+            "local_dc": config.Optional(config.String, default=""),
+            "used_hosts_per_remote_dc": config.Optional(config.Integer, default=0),
+            "speculative_execution": {
+                "delay": config.Optional(config.Timespan, default=None),
+                "max_attempts": config.Optional(config.Integer, default=1),
+            },
+            "protocol_version": config.Optional(config.Integer, default=None),
+            "connections_per_host": config.Optional(config.Integer, default=None),
+            "compression": config.Optional(
+                config.OneOf(true=True, false=False, lz4="lz4", snappy="snappy"), default=None
+            ),
         }
     )
     options = parser.parse(prefix[:-1], app_config)
@@ -108,6 +303,20 @@ def cluster_from_config(
     if options.port:
         kwargs.setdefault("port", options.port)
 
+    if options.protocol_version is not None:
+        kwargs.setdefault("protocol_version", options.protocol_version)
+
+    if options.compression is not None:
+        kwargs.setdefault("compression", options.compression)
+
+    if options.connections_per_host is not None:
+        protocol_version = kwargs.get("protocol_version")
+        if protocol_version is None or protocol_version >= 3:
+            raise config.ConfigurationError(
+                prefix + "connections_per_host",
+                "only supported with protocol_version 1 or 2",
+            )
+
     if options.credentials_secret:
         if not secrets:
             raise TypeError("'secrets' is required if 'credentials_secret' is set")
@@ -117,7 +326,40 @@ def cluster_from_config(
             PlainTextAuthProvider(username=credentials.username, password=credentials.password),
         )
 
-    return Cluster(options.contact_points, execution_profiles=execution_profiles, **kwargs)
+    profile_options: Dict[str, Any] = {}
+    if options.load_balancing_policy:
+        profile_options["load_balancing_policy"] = _make_load_balancing_policy(
+            options.load_balancing_policy, options.local_dc, options.used_hosts_per_remote_dc
+        )
+    if options.speculative_execution.delay is not None:
+        profile_options["speculative_execution_policy"] = ConstantSpeculativeExecutionPolicy(
+            delay=options.speculative_execution.delay.total_seconds(),
+            max_attempts=options.speculative_execution.max_attempts,
+        )
+    if profile_options:
+        execution_profiles = dict(execution_profiles or {})
+        execution_profiles.setdefault(EXEC_PROFILE_DEFAULT, ExecutionProfile(**profile_options))
+
+    cluster = Cluster(options.contact_points, execution_profiles=execution_profiles, **kwargs)
+
+    if options.connections_per_host is not None:
+        cluster.set_core_connections_per_host(HostDistance.LOCAL, options.connections_per_host)
+        cluster.set_max_connections_per_host(HostDistance.LOCAL, options.connections_per_host)
+
+    return cluster
+
+
+def _make_load_balancing_policy(
+    name: str, local_dc: str, used_hosts_per_remote_dc: int
+) -> LoadBalancingPolicy:
+    if name == "round_robin":
+        return RoundRobinPolicy()
+    dc_aware = DCAwareRoundRobinPolicy(
+        local_dc=local_dc, used_hosts_per_remote_dc=used_hosts_per_remote_dc
+    )
+    if name == "dc_aware":
+        return dc_aware
+    return TokenAwarePolicy(dc_aware)
 
 
 class CassandraClient(config.Parser):
@@ -131,22 +373,40 @@ class CassandraClient(config.Parser):
     :param keyspace: Which keyspace to set as the default for operations.
     :param client_name: the service-provided name for the client to identify the backends for
         cassandra host. MUST be user specified, MAY be blank if not specified.
+    :param prepared_statement_cache_size: The most prepared statements to
+        keep cached. See :py:class:`PreparedStatementCache`.
+    :param warm_up_statements: Queries to prepare while the client is being
+        configured, before the service takes traffic.
 
     """
 
-    def __init__(self, keyspace: str, client_name: str = "", **kwargs: Any):
+    def __init__(
+        self,
+        keyspace: str,
+        client_name: str = "",
+        prepared_statement_cache_size: int = 1000,
+        warm_up_statements: Sequence[str] = (),
+        **kwargs: Any,
+    ):
         self.keyspace = keyspace
         self.kwargs = kwargs
         self.client_name = client_name
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+        self.warm_up_statements = warm_up_statements
 
     def parse(self, key_path: str, raw_config: config.RawConfig) -> "CassandraContextFactory":
         cluster = cluster_from_config(raw_config, prefix=f"{key_path}.", **self.kwargs)
         session = cluster.connect(keyspace=self.keyspace)
 
         cluster_name = cluster.metadata.cluster_name if cluster.metadata is not None else ""
-        return CassandraContextFactory(
-            session, prometheus_client_name=self.client_name, prometheus_cluster_name=cluster_name
+        context_factory = CassandraContextFactory(
+            session,
+            prometheus_client_name=self.client_name,
+            prometheus_cluster_name=cluster_name,
+            prepared_statement_cache_size=self.prepared_statement_cache_size,
         )
+        context_factory.warm_up(self.warm_up_statements)
+        return context_factory
 
 
 class CassandraContextFactory(ContextFactory):
@@ -155,12 +415,15 @@ class CassandraContextFactory(ContextFactory):
     This factory will attach a proxy object which acts like a
     :py:class:`cassandra.cluster.Session` to an attribute on the
     :py:class:`~baseplate.RequestContext`. The :py:meth:`execute`,
-    :py:meth:`execute_async` and :py:meth:`prepare` methods will automatically
-    record diagnostic information.
+    :py:meth:`execute_async`, :py:meth:`execute_concurrent` and
+    :py:meth:`prepare` methods will automatically record diagnostic
+    information.
 
     :param cassandra.cluster.Session session: A configured session object.
     :param prometheus_client_name: the service-provided name for the client to identify the backends
         for cassandra host. MUST be user specified, MAY be blank if not specified.
+    :param prepared_statement_cache_size: The most prepared statements to
+        keep cached. See :py:class:`PreparedStatementCache`.
 
     """
 
@@ -169,12 +432,37 @@ class CassandraContextFactory(ContextFactory):
         session: Session,
         prometheus_client_name: Optional[str] = None,
         prometheus_cluster_name: Optional[str] = None,
+        prepared_statement_cache_size: int = 1000,
     ):
         self.session = session
-        self.prepared_statements: Dict[str, PreparedStatement] = {}
+        self.prepared_statements = PreparedStatementCache(
+            max_size=prepared_statement_cache_size, client_name=prometheus_client_name or ""
+        )
         self.prometheus_client_name = prometheus_client_name
         self.prometheus_cluster_name = prometheus_cluster_name
 
+    def warm_up(self, queries: Sequence[str]) -> None:
+        """Prepare and cache ``queries`` ahead of time.
+
+        Call this during application startup, so the first requests don't pay
+        to prepare statements. Queries already in the cache aren't prepared
+        again.
+
+        """
+        for query in queries:
+            self.prepared_statements.get(query, self.session.prepare)
+
+    def report_runtime_metrics(self, batch: metrics.Client) -> None:
+        self.prepared_statements.report_runtime_metrics()
+        batch.gauge("prepared_statements.size").replace(len(self.prepared_statements))
+
+        client_name = self.prometheus_client_name or ""
+        for host, state in self.session.get_pool_state().items():
+            HOST_OPEN_CONNECTIONS.labels(client_name, str(host.endpoint)).set(state["open_count"])
+            HOST_IN_FLIGHT_REQUESTS.labels(client_name, str(host.endpoint)).set(
+                sum(state["in_flights"])
+            )
+
     def make_object_for_context(self, name: str, span: Span) -> "CassandraSessionAdapter":
         return CassandraSessionAdapter(
             name,
@@ -239,83 +527,123 @@ def wrap_future(
     errback_fn: Callable[..., None],
     errback_args: Any,
 ) -> ResponseFuture:
-    """Patch ResponseFuture.result() to wait for callback or errback to complete.
-
-    The callback_fn and errback_fn are given special treatment: they must be
-    complete before a result will be returned from ResponseFuture.result().
-    They are not given precedence over other callbacks or errbacks, so if
-    another callback triggers the response from the service (and the server
-    span is closed) the special callback might not complete. The special
-    callback is added first and  callbacks are executed in order, so
-    generally the special callback should finish before any other callbacks.
+    """Make sure callback_fn or errback_fn has run before ResponseFuture.result() returns.
 
-    This fixes a race condition where the server span can complete before
-    the callback has closed out the child span.
+    The driver runs callbacks on its event loop thread after it has woken up
+    anything waiting on the result, so without help the server span could
+    finish before the callback has closed out the child span. Rather than
+    waiting for the event loop thread, ``result()`` runs the callback (or
+    errback) itself if it hasn't been started yet. Exactly one of them runs,
+    once, on whichever thread gets there first; later pages of a paged query
+    don't run them again. If the event loop thread got there first,
+    ``result()`` waits for it to finish.
 
     """
-    response_future._callback_event = Event()
-
-    response_future.add_callback(callback_fn, callback_args, response_future._callback_event)
-    response_future.add_errback(errback_fn, errback_args, response_future._callback_event)
-
-    def wait_for_callbacks_result(self: ResponseFuture) -> Any:
-        exc = None
-
-        try:
-            result = ResponseFuture.result(self)
-        except Exception as e:
-            exc = e
+    # a one-shot token, popped by whichever thread runs the callback first.
+    # list.pop() is atomic so this needs no lock.
+    pending = [None]
+    # set once the callback that popped the token has returned.
+    done = threading.Event()
+    response_future._baseplate_callbacks = (
+        pending,
+        done,
+        callback_fn,
+        callback_args,
+        errback_fn,
+        errback_args,
+    )
+    response_future.add_callbacks(
+        _run_once,
+        _run_once,
+        callback_args=(pending, done, callback_fn, callback_args),
+        errback_args=(pending, done, errback_fn, errback_args),
+    )
+    response_future.result = types.MethodType(_result_after_callbacks, response_future)
+    return response_future
 
-        # wait for either _on_execute_complete or _on_execute_failed to run
-        wait_result = self._callback_event.wait(timeout=0.01)
-        if not wait_result:
-            logger.warning("Cassandra metrics callback took too long. Some metrics may be lost.")
 
-        if exc:
-            raise exc  # pylint: disable=E0702
+def _run_once(
+    result_or_exc: Any,
+    pending: List[None],
+    done: threading.Event,
+    callback_fn: Callable[..., None],
+    callback_args: Any,
+) -> bool:
+    try:
+        pending.pop()
+    except IndexError:
+        return False
+    try:
+        callback_fn(result_or_exc, callback_args)
+    finally:
+        done.set()
+    return True
 
-        return result
 
-    # call __get__ to turn wait_for_callbacks_result into a bound method
-    bound_method = wait_for_callbacks_result.__get__(response_future, ResponseFuture)
-    # patch the ResponseFuture instance
-    response_future.result = bound_method
-    return response_future
+def _result_after_callbacks(self: ResponseFuture) -> Any:
+    pending, done, callback_fn, callback_args, errback_fn, errback_args = self._baseplate_callbacks
+    try:
+        result = ResponseFuture.result(self)
+    except Exception as exc:
+        if not _run_once(exc, pending, done, errback_fn, errback_args):
+            done.wait()
+        raise
+    if not _run_once(result, pending, done, callback_fn, callback_args):
+        done.wait()
+    return result
 
 
 class CassandraCallbackArgs(NamedTuple):
-    span: Span
+    span: Optional[Span]
     start_time: float
     prom_labels: CassandraPrometheusLabels
+    future: Optional[ResponseFuture] = None
+
+
+@functools.lru_cache(maxsize=None)
+def _host_latency(client_name: str, host: str) -> Histogram:
+    return HOST_REQUEST_TIME.labels(client_name, host)
 
 
-def _on_execute_complete(_result: Any, args: CassandraCallbackArgs, event: Event) -> None:
+def _record_host_metrics(args: CassandraCallbackArgs, elapsed: float) -> None:
+    future = args.future
+    if future is None:
+        return
+    client_name = args.prom_labels.cassandra_client_name
+    host = future.coordinator_host or future._current_host
+    if host is not None:
+        _host_latency(client_name, str(host.endpoint)).observe(elapsed)
+    if len(future.attempted_hosts) > 1:
+        ADDITIONAL_ATTEMPTS_TOTAL.labels(client_name).inc(len(future.attempted_hosts) - 1)
+
+
+def _on_execute_complete(_result: Any, args: CassandraCallbackArgs) -> None:
     # TODO: tag with anything from the result set?
     # TODO: tag with any returned warnings
     try:
-        args.span.finish()
+        if args.span is not None:
+            args.span.finish()
     finally:
-        prom_labels = args.prom_labels._asdict()
-        REQUEST_TIME.labels(**prom_labels, cassandra_success="true").observe(
-            time.perf_counter() - args.start_time
-        )
-        REQUEST_TOTAL.labels(**prom_labels, cassandra_success="true").inc()
-        REQUEST_ACTIVE.labels(**prom_labels).dec()
-        event.set()
+        elapsed = time.perf_counter() - args.start_time
+        children = _prometheus_children(args.prom_labels)
+        children.latency_success.observe(elapsed)
+        children.total_success.inc()
+        children.active.dec()
+        _record_host_metrics(args, elapsed)
 
 
-def _on_execute_failed(exc: BaseException, args: CassandraCallbackArgs, event: Event) -> None:
+def _on_execute_failed(exc: BaseException, args: CassandraCallbackArgs) -> None:
     try:
-        exc_info = (type(exc), exc, None)
-        args.span.finish(exc_info=exc_info)
+        if args.span is not None:
+            exc_info = (type(exc), exc, None)
+            args.span.finish(exc_info=exc_info)
     finally:
-        prom_labels = args.prom_labels._asdict()
-        REQUEST_TIME.labels(**prom_labels, cassandra_success="false").observe(
-            time.perf_counter() - args.start_time
-        )
-        REQUEST_TOTAL.labels(**prom_labels, cassandra_success="false").inc()
-        REQUEST_ACTIVE.labels(**prom_labels).dec()
-        event.set()
+        elapsed = time.perf_counter() - args.start_time
+        children = _prometheus_children(args.prom_labels)
+        children.latency_failure.observe(elapsed)
+        children.total_failure.inc()
+        children.active.dec()
+        _record_host_metrics(args, elapsed)
 
 
 RowFactory = Callable[[List[str], List[Tuple]], Any]
@@ -329,7 +657,7 @@ class CassandraSessionAdapter:
         context_name: str,
         server_span: Span,
         session: Session,
-        prepared_statements: Dict[str, PreparedStatement],
+        prepared_statements: Union[PreparedStatementCache, Dict[str, PreparedStatement]],
         prometheus_client_name: Optional[str] = None,
         prometheus_cluster_name: Optional[str] = None,
     ):
@@ -362,6 +690,104 @@ class CassandraSessionAdapter:
         timeout: Union[float, object] = _NOT_SET,
         query_name: Optional[str] = None,
         **kwargs: Any,
+    ) -> ResponseFuture:
+        return self._execute_async(
+            query, parameters, timeout, query_name, parent_span=self.server_span, **kwargs
+        )
+
+    def execute_concurrent(
+        self,
+        statements_and_params: Iterable[Tuple[Query, Optional[Parameters]]],
+        concurrency: int = 100,
+        raise_on_first_error: bool = True,
+        query_name: Optional[str] = None,
+        max_child_spans: int = 10,
+    ) -> Iterator[ExecutionResult]:
+        """Execute many statements with a bounded number in flight.
+
+        Results are yielded as :py:class:`~cassandra.concurrent.ExecutionResult`
+        tuples in the same order as ``statements_and_params``. Statements are
+        consumed lazily: no more than ``concurrency`` are sent ahead of the
+        result being yielded, so very large or unbounded iterables can be
+        streamed.
+
+        The whole run is recorded as one ``execute_concurrent`` span tagged with
+        the number of statements, errors and statements per second. Only the
+        first ``max_child_spans`` statements get their own child span; metrics
+        are recorded for every statement.
+
+        :param statements_and_params: Pairs of a query and its parameters.
+        :param concurrency: The most statements to have in flight at once.
+        :param raise_on_first_error: If True, the first failed statement's
+            error is raised (after the results before it have been yielded).
+            Otherwise failures are yielded with ``success`` set to False.
+        :param query_name: The name used in metrics for every statement.
+        :param max_child_spans: How many statements to make child spans for.
+
+        """
+        span = self.server_span.make_child(f"{self.context_name}.execute_concurrent")
+        span.set_tag("concurrency", concurrency)
+        span.start()
+
+        statements = iter(statements_and_params)
+        in_flight: Deque[ResponseFuture] = collections.deque()
+        exhausted = False
+        count = 0
+        errors = 0
+        start_time = time.perf_counter()
+        exc_info = None
+        try:
+            while True:
+                while not exhausted and len(in_flight) < concurrency:
+                    try:
+                        query, parameters = next(statements)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight.append(
+                        self._execute_async(
+                            query,
+                            parameters,
+                            query_name=query_name,
+                            parent_span=span if count < max_child_spans else None,
+                        )
+                    )
+                    count += 1
+
+                if not in_flight:
+                    break
+
+                future = in_flight.popleft()
+                try:
+                    result = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    errors += 1
+                    if raise_on_first_error:
+                        raise
+                    yield ExecutionResult(False, exc)
+                else:
+                    yield ExecutionResult(True, result)
+        except GeneratorExit:
+            raise
+        except BaseException:
+            exc_info = sys.exc_info()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            span.set_tag("statements", count)
+            span.set_tag("errors", errors)
+            if elapsed > 0:
+                span.set_tag("statements_per_second", count / elapsed)
+            span.finish(exc_info=exc_info)
+
+    def _execute_async(
+        self,
+        query: Query,
+        parameters: Optional[Parameters] = None,
+        timeout: Union[float, object] = _NOT_SET,
+        query_name: Optional[str] = None,
+        parent_span: Optional[Span] = None,
+        **kwargs: Any,
     ) -> ResponseFuture:
         prom_labels = CassandraPrometheusLabels(
             cassandra_client_name=self.prometheus_client_name
@@ -374,23 +800,26 @@ class CassandraSessionAdapter:
             else "",
         )
 
-        REQUEST_ACTIVE.labels(**prom_labels._asdict()).inc()
+        _prometheus_children(prom_labels).active.inc()
         start_time = time.perf_counter()
-        trace_name = f"{self.context_name}.execute"
-        span = self.server_span.make_child(trace_name)
-        span.start()
-        # TODO: include custom payload
-        if isinstance(query, str):
-            span.set_tag("statement", query)
-        elif isinstance(query, (SimpleStatement, PreparedStatement)):
-            span.set_tag("statement", query.query_string)
-        elif isinstance(query, BoundStatement):
-            span.set_tag("statement", query.prepared_statement.query_string)
+        span = None
+        if parent_span is not None:
+            trace_name = f"{self.context_name}.execute"
+            span = parent_span.make_child(trace_name)
+            span.start()
+            # TODO: include custom payload
+            if isinstance(query, str):
+                span.set_tag("statement", query)
+            elif isinstance(query, (SimpleStatement, PreparedStatement)):
+                span.set_tag("statement", query.query_string)
+            elif isinstance(query, BoundStatement):
+                span.set_tag("statement", query.prepared_statement.query_string)
         future = self.session.execute_async(query, parameters=parameters, timeout=timeout, **kwargs)
         callback_args = CassandraCallbackArgs(
             span=span,
             start_time=start_time,
             prom_labels=prom_labels,
+            future=future,
         )
         future = wrap_future(
             response_future=future,
@@ -408,19 +837,24 @@ class CassandraSessionAdapter:
         automatically cached and reused. The cache is keyed on the text of the
         statement. Set to False if you don't want your prepared statements
         cached, which might be advisable if you have a very high-cardinality
-        query set. Prepared statements are cached indefinitely, so be wary of
-        memory usage.
+        query set. The cache is a bounded LRU, see
+        :py:class:`PreparedStatementCache`.
         """
-        if cache:
-            try:
-                return self.prepared_statements[query]
-            except KeyError:
-                pass
+        if not cache:
+            return self._prepare(query)
+
+        if isinstance(self.prepared_statements, PreparedStatementCache):
+            return self.prepared_statements.get(query, self._prepare)
+
+        try:
+            return self.prepared_statements[query]
+        except KeyError:
+            prepared = self._prepare(query)
+            self.prepared_statements[query] = prepared
+            return prepared
 
+    def _prepare(self, query: str) -> PreparedStatement:
         trace_name = f"{self.context_name}.prepare"
         with self.server_span.make_child(trace_name) as span:
             span.set_tag("statement", query)
-            prepared = self.session.prepare(query)
-            if cache:
-                self.prepared_statements[query] = prepared
-            return prepared
+            return self.session.prepare(query)
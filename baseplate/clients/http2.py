@@ -0,0 +1,315 @@
+"""An HTTP/2 transport for the requests client.
+
+The requests client speaks HTTP/1.1 over urllib3, so every request in flight
+needs a connection of its own and fanning out to one upstream opens a socket
+per concurrent call. :py:class:`HTTP2Adapter` sends requests with `httpcore`_
+instead, which multiplexes concurrent requests as streams over a few HTTP/2
+connections. It is a transport adapter, so sessions made by
+:py:class:`~baseplate.clients.requests.RequestsContextFactory` keep the same
+API, spans, trace header propagation and Prometheus metrics.
+
+.. _`httpcore`: https://www.encode.io/httpcore/
+
+"""
+import io
+import ssl
+import threading
+
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import httpcore
+
+from advocate import AddrValidator
+from advocate.addrvalidator import determine_local_addresses
+from advocate.connection import advocate_getaddrinfo
+from advocate.exceptions import ProxyDisabledException
+from advocate.exceptions import UnacceptableAddressException
+from requests import exceptions
+from requests import PreparedRequest
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from requests.utils import select_proxy
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+
+from baseplate.clients.requests import _address_validator
+from baseplate.clients.requests import _FILTER_SPEC
+from baseplate.clients.requests import ExternalRequestsClient
+from baseplate.clients.requests import InternalRequestsClient
+from baseplate.lib import config
+
+
+class _ValidatingBackend(httpcore.SyncBackend):
+    # like advocate's validating_create_connection: only connect to resolved
+    # addresses the validator allows.
+    def __init__(self, validator: AddrValidator):
+        self.validator = validator
+
+    def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.NetworkStream:
+        need_canonname = bool(self.validator.hostname_blacklist)
+        if need_canonname and not self.validator.is_hostname_allowed(host):
+            raise UnacceptableAddressException(host)
+
+        try:
+            addrinfo = advocate_getaddrinfo(host, port, get_canonname=need_canonname)
+        except OSError as exc:
+            raise httpcore.ConnectError(exc) from exc
+
+        if self.validator.autodetect_local_addresses:
+            local_addresses = determine_local_addresses()
+        else:
+            local_addresses = []
+
+        error: Optional[Exception] = None
+        for record in addrinfo:
+            if not self.validator.is_addrinfo_allowed(record, _local_addresses=local_addresses):
+                continue
+            try:
+                return super().connect_tcp(
+                    record[4][0].exploded, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as exc:
+                error = exc
+        raise error or UnacceptableAddressException((host, port))
+
+
+def _timeouts(timeout: Union[None, float, Tuple[Optional[float], Optional[float]]]) -> dict:
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return {"connect": connect, "read": read, "write": read, "pool": connect}
+
+
+def _content(body: Any) -> Union[bytes, Iterator[bytes], None]:
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if hasattr(body, "read"):
+        return iter(lambda: body.read(io.DEFAULT_BUFFER_SIZE), b"")
+    return body
+
+
+class HTTP2Adapter(BaseAdapter):
+    """A transport adapter that multiplexes requests over HTTP/2 connections.
+
+    Requests to the same host share a connection, each as its own stream, so
+    many concurrent requests need only one socket. Connections are validated
+    with Advocate just like :py:class:`~advocate.ValidatingHTTPAdapter`.
+
+    Response bodies are read in full before :py:meth:`send` returns so the
+    stream is freed for other requests; ``stream=True`` still works but
+    doesn't save memory. Cookies set by responses aren't parsed into
+    :py:attr:`requests.Response.cookies`; read the ``Set-Cookie`` header
+    instead.
+
+    :param validator: The Advocate rules for which addresses may be connected
+        to. The default denies the local network.
+    :param max_connections: The most connections to keep open at once, across
+        every host.
+    :param max_concurrent_streams: The most requests in flight at once. The
+        server's own limit on streams per connection applies as well.
+    :param keepalive_timeout: How long, in seconds, an idle connection is kept
+        open. ``None`` keeps idle connections open until the server closes
+        them.
+    :param max_retries: How many times to retry connecting, but never sending
+        data.
+    :param allow_http1: Whether to fall back to HTTP/1.1 when the server
+        doesn't negotiate HTTP/2 over TLS. Without this, plain ``http://``
+        requests use HTTP/2 with prior knowledge (h2c). With it, they use
+        HTTP/1.1 and are not multiplexed.
+
+    """
+
+    def __init__(
+        self,
+        validator: Optional[AddrValidator] = None,
+        max_connections: int = 10,
+        max_concurrent_streams: int = 100,
+        keepalive_timeout: Optional[float] = None,
+        max_retries: int = 0,
+        allow_http1: bool = False,
+    ):
+        super().__init__()
+        self.validator = validator or AddrValidator()
+        self.max_concurrent_streams = max_concurrent_streams
+        self.streams = threading.BoundedSemaphore(max_concurrent_streams)
+        self.pool = httpcore.ConnectionPool(
+            ssl_context=ssl.create_default_context(),
+            max_connections=max_connections,
+            keepalive_expiry=keepalive_timeout,
+            http1=allow_http1,
+            http2=True,
+            retries=max_retries,
+            network_backend=_ValidatingBackend(self.validator),
+        )
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: Union[None, float, Tuple[Optional[float], Optional[float]]] = None,
+        verify: Union[bool, str] = True,
+        cert: Union[None, str, Tuple[str, str]] = None,
+        proxies: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Send a :py:class:`~requests.PreparedRequest` and return its response."""
+        if verify is not True or cert is not None:
+            raise ValueError("HTTP2Adapter does not support per-request verify or cert")
+        if select_proxy(request.url or "", proxies):
+            raise ProxyDisabledException("Proxies cannot be used with Advocate")
+
+        timeouts = _timeouts(timeout)
+        if not self.streams.acquire(timeout=timeouts["pool"]):  # pylint: disable=R1732
+            raise exceptions.ConnectionError("Timed out waiting for an HTTP/2 stream")
+        try:
+            response = self.pool.request(
+                request.method or "GET",
+                request.url or "",
+                headers=list(request.headers.items()),
+                content=_content(request.body),
+                extensions={"timeout": timeouts},
+            )
+        except httpcore.ConnectTimeout as exc:
+            raise exceptions.ConnectTimeout(exc, request=request) from exc
+        except httpcore.ReadTimeout as exc:
+            raise exceptions.ReadTimeout(exc, request=request) from exc
+        except httpcore.PoolTimeout as exc:
+            raise exceptions.ConnectionError(exc, request=request) from exc
+        except httpcore.TimeoutException as exc:
+            raise exceptions.Timeout(exc, request=request) from exc
+        except (httpcore.NetworkError, httpcore.ProtocolError) as exc:
+            raise exceptions.ConnectionError(exc, request=request) from exc
+        finally:
+            self.streams.release()
+
+        return self.build_response(request, response)
+
+    def build_response(self, request: PreparedRequest, response: httpcore.Response) -> Response:
+        """Make a :py:class:`requests.Response` from a buffered httpcore response."""
+        headers: List[Tuple[str, str]] = [
+            (name.decode("latin-1"), value.decode("latin-1")) for name, value in response.headers
+        ]
+        reason = response.extensions.get("reason_phrase", b"").decode("ascii")
+        # urllib3 decodes gzip and deflate content, as it would for HTTPAdapter
+        raw = HTTPResponse(
+            body=io.BytesIO(response.content),
+            headers=HTTPHeaderDict(headers),
+            status=response.status,
+            reason=reason,
+            preload_content=False,
+            decode_content=True,
+            request_method=request.method,
+            request_url=request.url,
+        )
+
+        result = Response()
+        result.status_code = response.status
+        result.headers = CaseInsensitiveDict(raw.headers)
+        result.encoding = get_encoding_from_headers(result.headers)
+        result.raw = raw
+        result.reason = reason
+        result.url = request.url or ""
+        result.request = request
+        result.connection = self  # type: ignore
+        return result
+
+    def close(self) -> None:
+        """Close every connection in the pool."""
+        self.pool.close()
+
+
+def http2_adapter_from_config(
+    app_config: config.RawConfig, prefix: str, **kwargs: Any
+) -> HTTP2Adapter:
+    """Make an HTTP2Adapter from a configuration dictionary.
+
+    The keys useful to :py:func:`http2_adapter_from_config` should be
+    prefixed, e.g. ``http.max_connections``, ``http.max_concurrent_streams``,
+    etc. The ``prefix`` argument specifies the prefix used. Each key is mapped
+    to a corresponding keyword argument on the :py:class:`HTTP2Adapter`
+    constructor.
+
+    Supported keys:
+
+    * ``max_connections``: The most connections to keep open at once
+      (default: 10).
+    * ``max_concurrent_streams``: The most requests in flight at once
+      (default: 100).
+    * ``keepalive_timeout``: How long an idle connection is kept open, e.g.
+      ``30 seconds`` (default: until the server closes it).
+    * ``max_retries``: How many times to retry connection attempts, but never
+      sending data (default: 0).
+    * ``allow_http1``: Whether to fall back to HTTP/1.1 when HTTP/2 isn't
+      negotiated (default: false).
+
+    The ``filter`` sub-keys configure Advocate's address filtering exactly as
+    in :py:func:`~baseplate.clients.requests.http_adapter_from_config`.
+
+    """
+    assert prefix.endswith(".")
+    parser = config.SpecParser(
+        {
+            "max_connections": config.Optional(config.Integer, default=10),
+            "max_concurrent_streams": config.Optional(config.Integer, default=100),
+            "keepalive_timeout": config.Optional(config.Timespan),
+            "max_retries": config.Optional(config.Integer, default=0),
+            "allow_http1": config.Optional(config.Boolean, default=False),
+            "filter": _FILTER_SPEC,
+        }
+    )
+    options = parser.parse(prefix[:-1], app_config)
+
+    kwargs.setdefault("max_connections", options.max_connections)
+    kwargs.setdefault("max_concurrent_streams", options.max_concurrent_streams)
+    if options.keepalive_timeout is not None:
+        kwargs.setdefault("keepalive_timeout", options.keepalive_timeout.total_seconds())
+    kwargs.setdefault("max_retries", options.max_retries)
+    kwargs.setdefault("allow_http1", options.allow_http1)
+    kwargs.setdefault("validator", _address_validator(options.filter))
+    return HTTP2Adapter(**kwargs)
+
+
+class InternalHTTP2RequestsClient(InternalRequestsClient):
+    """Configure an HTTP/2 Requests client for internal Baseplate HTTP services.
+
+    This is :py:class:`~baseplate.clients.requests.InternalRequestsClient`
+    sending requests with an :py:class:`HTTP2Adapter`. See
+    :py:func:`http2_adapter_from_config` for available configuration settings.
+
+    """
+
+    def adapter_from_config(
+        self, raw_config: config.RawConfig, prefix: str, **kwargs: Any
+    ) -> BaseAdapter:
+        return http2_adapter_from_config(raw_config, prefix, **kwargs)
+
+
+class ExternalHTTP2RequestsClient(ExternalRequestsClient):
+    """Configure an HTTP/2 Requests client for external HTTP services.
+
+    This is :py:class:`~baseplate.clients.requests.ExternalRequestsClient`
+    sending requests with an :py:class:`HTTP2Adapter`. See
+    :py:func:`http2_adapter_from_config` for available configuration settings.
+
+    """
+
+    def adapter_from_config(
+        self, raw_config: config.RawConfig, prefix: str, **kwargs: Any
+    ) -> BaseAdapter:
+        return http2_adapter_from_config(raw_config, prefix, **kwargs)
@@ -0,0 +1,312 @@
+import logging
+import threading
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import confluent_kafka
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+from baseplate import Span
+from baseplate.clients import ContextFactory
+from baseplate.lib import config
+from baseplate.lib import metrics
+from baseplate.lib.prometheus_metrics import default_latency_buckets
+
+
+logger = logging.getLogger(__name__)
+
+
+DeliveryCallback = Callable[[Optional[confluent_kafka.KafkaError], confluent_kafka.Message], None]
+Headers = Union[Dict[str, Union[str, bytes]], List[Tuple[str, Union[str, bytes]]]]
+
+
+class KafkaProducerPrometheusLabels(NamedTuple):
+    kafka_client_name: str
+    kafka_topic: str
+
+
+KAFKA_PRODUCE_LATENCY = Histogram(
+    "kafka_producer_message_delivery_seconds",
+    "latency histogram of how long it takes for a produced message to be acknowledged",
+    KafkaProducerPrometheusLabels._fields + ("kafka_success",),
+    buckets=default_latency_buckets,
+)
+
+KAFKA_PRODUCED_TOTAL = Counter(
+    "kafka_producer_messages_delivered_total",
+    "total count of messages delivered (or failed) by this host",
+    KafkaProducerPrometheusLabels._fields + ("kafka_success",),
+)
+
+KAFKA_QUEUED_MESSAGES = Gauge(
+    "kafka_producer_queued_messages",
+    "number of messages waiting to be delivered by the producer",
+    ["kafka_client_name"],
+    multiprocess_mode="livesum",
+)
+
+
+def producer_from_config(
+    app_config: config.RawConfig,
+    prefix: str,
+    kafka_config: Optional[Dict[str, Any]] = None,
+) -> confluent_kafka.Producer:
+    """Make a Producer from a configuration dictionary.
+
+    The keys useful to :py:func:`producer_from_config` should be prefixed,
+    e.g. ``kafka.bootstrap_servers`` etc. The ``prefix`` argument specifies the
+    prefix used to filter keys.
+
+    Supported keys:
+
+    * ``bootstrap_servers`` (required): a comma delimited list of brokers.
+    * ``client_id``: the client identifier reported to the brokers.
+    * ``linger``: how long to wait for more messages before sending a batch,
+      e.g. ``5 milliseconds`` (:py:func:`~baseplate.lib.config.Timespan`).
+    * ``batch_size``: the maximum size of a batch in bytes.
+    * ``compression_type``: one of ``none``, ``gzip``, ``snappy``, ``lz4`` or
+      ``zstd``.
+    * ``acks``: how many replicas must acknowledge a message, ``0``, ``1`` or
+      ``all``.
+
+    :param kafka_config: Extra `librdkafka configuration`_ applied on top of
+        the parsed settings.
+
+    .. _librdkafka configuration:
+        https://github.com/confluentinc/librdkafka/blob/master/CONFIGURATION.md
+
+    """
+    assert prefix.endswith(".")
+    parser = config.SpecParser(
+        {
+            "bootstrap_servers": config.String,
+            "client_id": config.Optional(config.String, default=None),
+            "linger": config.Optional(config.Timespan, default=None),
+            "batch_size": config.Optional(config.Integer, default=None),
+            "compression_type": config.Optional(
+                config.OneOf(none="none", gzip="gzip", snappy="snappy", lz4="lz4", zstd="zstd"),
+                default=None,
+            ),
+            "acks": config.Optional(
+                config.OneOf(**{"0": "0", "1": "1", "all": "all"}), default=None
+            ),
+        }
+    )
+    options = parser.parse(prefix[:-1], app_config)
+
+    producer_config: Dict[str, Any] = {
+        "bootstrap.servers": options.bootstrap_servers,
+        # batch messages together rather than sending each one as it's produced.
+        "linger.ms": 5,
+    }
+    if options.client_id is not None:
+        producer_config["client.id"] = options.client_id
+    if options.linger is not None:
+        producer_config["linger.ms"] = options.linger.total_seconds() * 1000
+    if options.batch_size is not None:
+        producer_config["batch.size"] = options.batch_size
+    if options.compression_type is not None:
+        producer_config["compression.type"] = options.compression_type
+    if options.acks is not None:
+        producer_config["acks"] = options.acks
+    if kafka_config:
+        producer_config.update(kafka_config)
+
+    return confluent_kafka.Producer(producer_config)
+
+
+class KafkaProducer(config.Parser):
+    """Configure a Kafka producer.
+
+    This is meant to be used with
+    :py:meth:`baseplate.Baseplate.configure_context`.
+
+    See :py:func:`producer_from_config` for available configuration settings.
+
+    :param poll_interval: How often, in seconds, to serve delivery reports.
+    :param kafka_config: Extra librdkafka configuration for the producer.
+
+    """
+
+    def __init__(self, poll_interval: float = 0.1, kafka_config: Optional[Dict[str, Any]] = None):
+        self.poll_interval = poll_interval
+        self.kafka_config = kafka_config
+
+    def parse(self, key_path: str, raw_config: config.RawConfig) -> "KafkaProducerContextFactory":
+        producer = producer_from_config(raw_config, f"{key_path}.", self.kafka_config)
+        return KafkaProducerContextFactory(
+            producer, name=key_path, poll_interval=self.poll_interval
+        )
+
+
+class KafkaProducerContextFactory(ContextFactory):
+    """Kafka producer context factory.
+
+    This factory will attach a :py:class:`KafkaProducerClient` to an attribute
+    on the :py:class:`~baseplate.RequestContext`. All requests share the one
+    long-lived :py:class:`confluent_kafka.Producer`, so messages produced by
+    concurrent requests are batched together by librdkafka.
+
+    Delivery reports are served by a background thread that calls
+    :py:meth:`~confluent_kafka.Producer.poll` without blocking and then
+    sleeps, so it cooperates with gevent rather than blocking the event loop
+    inside librdkafka.
+
+    :param producer: A configured producer.
+    :param name: The name used in metrics.
+    :param poll_interval: How often, in seconds, to serve delivery reports.
+
+    """
+
+    def __init__(
+        self, producer: confluent_kafka.Producer, name: str = "kafka", poll_interval: float = 0.1
+    ):
+        self.producer = producer
+        self.name = name
+        self.poll_interval = poll_interval
+
+        self._poller: Optional[threading.Thread] = None
+        self._poller_lock = threading.Lock()
+        self._stopped = False
+
+    def _poll_delivery_reports(self) -> None:
+        while not self._stopped:
+            # a non-zero timeout would block inside librdkafka where gevent
+            # can't yield, so we poll without waiting and let sleep yield.
+            self.producer.poll(0)
+            time.sleep(self.poll_interval)
+
+    def _ensure_poller(self) -> None:
+        if self._poller is not None:
+            return
+
+        with self._poller_lock:
+            if self._poller is None and not self._stopped:
+                poller = threading.Thread(target=self._poll_delivery_reports)
+                poller.name = f"{self.name} delivery reports"
+                poller.daemon = True
+                poller.start()
+                self._poller = poller
+
+    def report_runtime_metrics(self, batch: metrics.Client) -> None:
+        queued = len(self.producer)
+        KAFKA_QUEUED_MESSAGES.labels(self.name).set(queued)
+        batch.gauge("queued").replace(queued)
+
+    def make_object_for_context(self, name: str, span: Span) -> "KafkaProducerClient":
+        self._ensure_poller()
+        return KafkaProducerClient(name, span, self.producer, self.name)
+
+    def close(self, timeout: float = 10) -> int:
+        """Stop serving delivery reports and flush outstanding messages.
+
+        :param timeout: How long, in seconds, to wait for outstanding messages.
+        :returns: The number of messages that were still not delivered.
+
+        """
+        self._stopped = True
+        return _flush(self.producer, timeout, self.poll_interval)
+
+
+def _flush(producer: confluent_kafka.Producer, timeout: float, poll_interval: float) -> int:
+    # Producer.flush(timeout) blocks the event loop for the whole timeout, so
+    # poll without waiting and sleep between polls instead.
+    deadline = time.monotonic() + timeout
+    while True:
+        producer.poll(0)
+        remaining = len(producer)
+        if not remaining or time.monotonic() >= deadline:
+            return remaining
+        time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
+
+
+class KafkaProducerClient:
+    """Request-scoped producer attached to the context by :py:class:`KafkaProducerContextFactory`.
+
+    Messages are queued in the shared producer and sent in batches in the
+    background; :py:meth:`produce` does not wait for them to be delivered.
+
+    """
+
+    def __init__(self, name: str, span: Span, producer: confluent_kafka.Producer, client_name: str):
+        self.name = name
+        self.span = span
+        self.producer = producer
+        self.client_name = client_name
+
+    def produce(
+        self,
+        topic: str,
+        value: Optional[Union[str, bytes]] = None,
+        key: Optional[Union[str, bytes]] = None,
+        partition: Optional[int] = None,
+        headers: Optional[Headers] = None,
+        on_delivery: Optional[DeliveryCallback] = None,
+    ) -> None:
+        """Queue a message to be sent to ``topic``.
+
+        :param on_delivery: Called with ``(error, message)`` once the broker
+            acknowledges the message or delivery fails. It runs on the
+            background delivery report thread.
+        :raises: :py:exc:`BufferError` if the local queue is full.
+
+        """
+        labels = KafkaProducerPrometheusLabels(
+            kafka_client_name=self.client_name, kafka_topic=topic
+        )
+        start_time = time.perf_counter()
+
+        def delivery_report(
+            err: Optional[confluent_kafka.KafkaError], message: confluent_kafka.Message
+        ) -> None:
+            success = "true" if err is None else "false"
+            KAFKA_PRODUCE_LATENCY.labels(**labels._asdict(), kafka_success=success).observe(
+                time.perf_counter() - start_time
+            )
+            KAFKA_PRODUCED_TOTAL.labels(**labels._asdict(), kafka_success=success).inc()
+            if err is not None:
+                logger.warning("Failed to deliver message to %s: %s", topic, err)
+            if on_delivery is not None:
+                on_delivery(err, message)
+
+        kwargs: Dict[str, Any] = {"on_delivery": delivery_report}
+        if key is not None:
+            kwargs["key"] = key
+        if partition is not None:
+            kwargs["partition"] = partition
+        if headers is not None:
+            kwargs["headers"] = headers
+
+        child_span = self.span.make_child(f"{self.name}.produce")
+        child_span.set_tag("kind", "producer")
+        child_span.set_tag("message_bus.destination", topic)
+        with child_span:
+            try:
+                self.producer.produce(topic, value, **kwargs)
+            except Exception:
+                KAFKA_PRODUCED_TOTAL.labels(**labels._asdict(), kafka_success="false").inc()
+                raise
+
+    def flush(self, timeout: float = 10) -> int:
+        """Wait for all queued messages to be delivered.
+
+        This is rarely needed in request handlers: messages are delivered in
+        the background and flushing after each message defeats batching.
+
+        :param timeout: How long, in seconds, to wait.
+        :returns: The number of messages that were still not delivered.
+
+        """
+        with self.span.make_child(f"{self.name}.flush"):
+            return _flush(self.producer, timeout, poll_interval=0.01)
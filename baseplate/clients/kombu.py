@@ -1,16 +1,26 @@
 import abc
+import socket
 import time
 
+from contextlib import contextmanager
 from typing import Any
+from typing import Dict
 from typing import Generic
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
 from typing import Type
 from typing import TypeVar
 
 import kombu.serialization
+import kombu.transport.pyamqp
 
 from kombu import Connection
 from kombu import Exchange
+from kombu import Producer
 from kombu.pools import Producers
 from prometheus_client import Counter
 from prometheus_client import Histogram
@@ -47,6 +57,28 @@ AMQP_PROCESSED_TOTAL = Counter(
     "total messages produced by this host",
     amqp_producer_labels,
 )
+AMQP_BATCH_PROCESSING_TIME = Histogram(
+    "amqp_producer_batch_processing_seconds",
+    "latency histogram of how long it takes to queue and confirm a batch of messages",
+    amqp_producer_labels,
+    buckets=default_latency_buckets,
+)
+AMQP_BATCH_SIZE = Histogram(
+    "amqp_producer_batch_messages",
+    "histogram of how many messages are published per batch",
+    amqp_producer_labels,
+    buckets=[1, 5, 10, 50, 100, 500, 1000, 5000, 10000],
+)
+
+
+class UnconfirmedPublishError(Exception):
+    """Raised when the broker does not confirm every message in a batch.
+
+    The broker either negatively acknowledged at least one message or did not
+    confirm them all before the timeout. Some messages in the batch may still
+    have been queued.
+
+    """
 
 
 def connection_from_config(
@@ -310,3 +342,161 @@ class _KombuProducer:
                         ).observe(time.perf_counter() - start_time)
                         AMQP_PROCESSED_TOTAL.labels(**self.prom_labels, amqp_success="false").inc()
                     raise
+
+    @contextmanager
+    def batch(self, confirm_timeout: Optional[float] = None) -> Iterator["KombuPublishBatch"]:
+        """Collect messages and publish them together on exit.
+
+        All messages are published on a single channel with publisher confirms
+        enabled and the confirms are waited for once, after the last message
+        has been sent. Nothing is published if the block raises::
+
+            with context.amqp.batch() as batch:
+                for event in events:
+                    batch.publish(event, routing_key="events")
+
+        :param confirm_timeout: How long, in seconds, to wait for the broker to
+            confirm the batch. :py:data:`None` waits forever.
+        :raises: :py:exc:`UnconfirmedPublishError` if the broker rejects any
+            message or the timeout expires.
+
+        """
+        batch = KombuPublishBatch(self.serializer)
+        yield batch
+        self._publish_batch(batch.messages, confirm_timeout)
+
+    def publish_many(
+        self,
+        bodies: Iterable[Any],
+        routing_key: Optional[str] = None,
+        confirm_timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> int:
+        """Publish every message in ``bodies`` with the same routing key.
+
+        This is a shortcut for :py:meth:`batch`. Any extra keyword arguments
+        are passed to each :py:meth:`kombu.Producer.publish` call.
+
+        :returns: The number of messages published.
+
+        """
+        with self.batch(confirm_timeout=confirm_timeout) as batch:
+            for body in bodies:
+                batch.publish(body, routing_key=routing_key, **kwargs)
+        return len(batch)
+
+    def _publish_batch(
+        self, messages: List[Tuple[Any, Optional[str], Dict[str, Any]]], timeout: Optional[float]
+    ) -> None:
+        start_time = time.perf_counter()
+
+        trace_name = f"{self.name}.publish_many"
+        child_span = self.span.make_child(trace_name)
+
+        child_span.set_tag("kind", "producer")
+        child_span.set_tag("message_bus.message_count", len(messages))
+        routing_keys = {routing_key for _, routing_key, _ in messages}
+        if len(routing_keys) == 1 and None not in routing_keys:
+            child_span.set_tag("message_bus.destination", routing_keys.pop())
+
+        with child_span:
+            if not messages:
+                return
+
+            uses_confirms = isinstance(self.connection.transport, kombu.transport.pyamqp.Transport)
+            success = "false"
+            producer_pool = self.producers[self.connection]
+            try:
+                with producer_pool.acquire(block=True) as pooled_producer:
+                    # a dedicated channel keeps the confirm delivery tags ours alone
+                    channel = pooled_producer.connection.channel()
+                    try:
+                        confirms = _PublisherConfirms(channel) if uses_confirms else None
+                        producer = Producer(channel, exchange=self.exchange)
+                        for body, routing_key, kwargs in messages:
+                            producer.publish(body=body, routing_key=routing_key, **kwargs)
+                        if confirms:
+                            confirms.wait(len(messages), timeout)
+                    finally:
+                        channel.close()
+                success = "true"
+            finally:
+                AMQP_BATCH_PROCESSING_TIME.labels(**self.prom_labels, amqp_success=success).observe(
+                    time.perf_counter() - start_time
+                )
+                AMQP_BATCH_SIZE.labels(**self.prom_labels, amqp_success=success).observe(
+                    len(messages)
+                )
+                AMQP_PROCESSED_TOTAL.labels(**self.prom_labels, amqp_success=success).inc(
+                    len(messages)
+                )
+
+
+class KombuPublishBatch:
+    """Messages collected by :py:meth:`_KombuProducer.batch`."""
+
+    def __init__(self, serializer: Optional[KombuSerializer] = None):
+        self.serializer = serializer
+        self.messages: List[Tuple[Any, Optional[str], Dict[str, Any]]] = []
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def publish(self, body: Any, routing_key: Optional[str] = None, **kwargs: Any) -> None:
+        """Add a message to the batch.
+
+        Takes the same arguments as :py:meth:`kombu.Producer.publish`.
+
+        """
+        if self.serializer:
+            kwargs.setdefault("serializer", self.serializer.name)
+        self.messages.append((body, routing_key, kwargs))
+
+
+class _PublisherConfirms:
+    def __init__(self, channel: Any):
+        self.channel = channel
+        self.confirmed_through = 0
+        self.confirmed_tags: Set[int] = set()
+        self.nacked = False
+
+        channel.confirm_select()
+        channel.events["basic_ack"].add(self._on_ack)
+        channel.events["basic_nack"].add(self._on_nack)
+
+    @property
+    def confirmed(self) -> int:
+        return self.confirmed_through + len(self.confirmed_tags)
+
+    def _on_ack(self, delivery_tag: int, multiple: bool) -> None:
+        # the broker may confirm individual messages out of order, and a
+        # "multiple" confirm covers every delivery tag up to and including it.
+        if multiple:
+            self.confirmed_through = max(self.confirmed_through, delivery_tag)
+            self.confirmed_tags = {t for t in self.confirmed_tags if t > self.confirmed_through}
+        elif delivery_tag > self.confirmed_through:
+            self.confirmed_tags.add(delivery_tag)
+
+    def _on_nack(self, delivery_tag: int, multiple: bool) -> None:
+        self.nacked = True
+        self._on_ack(delivery_tag, multiple)
+
+    def wait(self, count: int, timeout: Optional[float]) -> None:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.confirmed < count and not self.nacked:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+            try:
+                self.channel.connection.drain_events(timeout=remaining)
+            except socket.timeout:
+                break
+
+        if self.nacked:
+            raise UnconfirmedPublishError("the broker rejected at least one message in the batch")
+        if self.confirmed < count:
+            raise UnconfirmedPublishError(
+                f"only {self.confirmed} of {count} messages were confirmed in time"
+            )
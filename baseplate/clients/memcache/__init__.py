@@ -1,9 +1,12 @@
+import contextlib
+
+from datetime import timedelta
 from time import perf_counter
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import Iterable
-from typing import List
+from typing import Iterator
 from typing import Optional
 from typing import Sequence
 from typing import Tuple
@@ -13,16 +16,23 @@ from prometheus_client import Counter
 from prometheus_client import Gauge
 from prometheus_client import Histogram
 from pymemcache.client.base import PooledClient
+from pymemcache.client.rendezvous import RendezvousHash
 
 from baseplate import Span
 from baseplate.clients import ContextFactory
+from baseplate.clients.memcache.sharding import KetamaHash
+from baseplate.clients.memcache.sharding import ShardedPooledClient
 from baseplate.lib import config
 from baseplate.lib import metrics
+from baseplate.lib.batching import GetBatcher
+from baseplate.lib.memo import get_request_memo
+from baseplate.lib.memo import RequestMemo
 from baseplate.lib.prometheus_metrics import default_latency_buckets
 
 
 Serializer = Callable[[str, Any], Tuple[bytes, int]]
 Deserializer = Callable[[str, bytes, int], Any]
+MemcachePool = Union[PooledClient, ShardedPooledClient]
 
 
 def pool_from_config(
@@ -30,7 +40,7 @@ def pool_from_config(
     prefix: str = "memcache.",
     serializer: Optional[Serializer] = None,
     deserializer: Optional[Deserializer] = None,
-) -> PooledClient:
+) -> MemcachePool:
     """Make a PooledClient from a configuration dictionary.
 
     The keys useful to :py:func:`pool_from_config` should be prefixed, e.g.
@@ -41,8 +51,19 @@ def pool_from_config(
 
     Supported keys:
 
-    * ``endpoint`` (required): a string representing a host and port to connect
+    * ``endpoint``: a string representing a host and port to connect
         to memcached service, e.g. ``localhost:11211`` or ``127.0.0.1:11211``.
+    * ``endpoints``: a comma-delimited list of endpoints to spread keys over
+        with consistent hashing, in place of ``endpoint``. A
+        :py:class:`~baseplate.clients.memcache.sharding.ShardedPooledClient` is
+        returned instead.
+    * ``hash``: how keys are assigned to ``endpoints``, ``ketama`` (the
+        default, compatible with libmemcached and twemproxy) or
+        ``rendezvous``.
+    * ``retry_attempts``: how many consecutive connection errors eject one of
+        the ``endpoints`` from the ring, by default ``2``.
+    * ``dead_timeout``: how long (as :py:func:`~baseplate.lib.config.Timespan`)
+        an ejected endpoint stays out of the ring, by default ``1 minute``.
     * ``max_pool_size``: an integer for the maximum pool size to use, by default
         this is ``2147483648``.
     * ``connect_timeout``: how long (as
@@ -61,13 +82,20 @@ def pool_from_config(
         memcached to arbitrary objects, must be compatible with ``serializer``.
         An example is :py:func:`~baseplate.clients.memcache.lib.decompress_and_load`.
 
-    :returns: :py:class:`pymemcache.client.base.PooledClient`
+    :returns: :py:class:`pymemcache.client.base.PooledClient` or
+        :py:class:`~baseplate.clients.memcache.sharding.ShardedPooledClient`
 
     """
     assert prefix.endswith(".")
     parser = config.SpecParser(
         {
-            "endpoint": config.Endpoint,
+            "endpoint": config.Optional(config.Endpoint, default=None),
+            "endpoints": config.Optional(config.TupleOf(config.Endpoint), default=[]),
+            "hash": config.Optional(
+                config.OneOf(ketama=KetamaHash, rendezvous=RendezvousHash), default=KetamaHash
+            ),
+            "retry_attempts": config.Optional(config.Integer, default=2),
+            "dead_timeout": config.Optional(config.Timespan, default=timedelta(minutes=1)),
             "max_pool_size": config.Optional(config.Integer, default=None),
             "connect_timeout": config.Optional(config.TimespanWithLegacyFallback, default=None),
             "timeout": config.Optional(config.TimespanWithLegacyFallback, default=None),
@@ -76,15 +104,32 @@ def pool_from_config(
     )
     options = parser.parse(prefix[:-1], app_config)
 
-    return PooledClient(
-        server=options.endpoint.address,
-        connect_timeout=options.connect_timeout and options.connect_timeout.total_seconds(),
-        timeout=options.timeout and options.timeout.total_seconds(),
-        serializer=serializer,
-        deserializer=deserializer,
-        no_delay=options.no_delay,
-        max_pool_size=options.max_pool_size,
-    )
+    if options.endpoint and options.endpoints:
+        raise config.ConfigurationError(
+            prefix + "endpoints", "only one of endpoint or endpoints may be set"
+        )
+    if not options.endpoint and not options.endpoints:
+        raise config.ConfigurationError(prefix + "endpoint", "no endpoint specified")
+
+    client_kwargs = {
+        "connect_timeout": options.connect_timeout and options.connect_timeout.total_seconds(),
+        "timeout": options.timeout and options.timeout.total_seconds(),
+        "serializer": serializer,
+        "deserializer": deserializer,
+        "no_delay": options.no_delay,
+        "max_pool_size": options.max_pool_size,
+    }
+
+    if options.endpoints:
+        return ShardedPooledClient(
+            [endpoint.address for endpoint in options.endpoints],
+            hasher=options.hash,
+            retry_attempts=options.retry_attempts,
+            dead_timeout=options.dead_timeout.total_seconds(),
+            **client_kwargs,
+        )
+
+    return PooledClient(server=options.endpoint.address, **client_kwargs)
 
 
 class MemcacheClient(config.Parser):
@@ -101,14 +146,24 @@ class MemcacheClient(config.Parser):
     :param deserializer: function to convert strings returned from
         memcached to arbitrary objects, must be compatible with ``serializer``.
         An example is :py:func:`~baseplate.clients.memcache.lib.decompress_and_load`.
+    :param batch_gets: Gather ``get`` calls issued by concurrent greenlets
+        into shared ``get_many`` calls. See :py:class:`MemcacheContextFactory`.
+    :param batch_gets_window: How long to wait for more keys before sending a
+        batched ``get_many``.
 
     """
 
     def __init__(
-        self, serializer: Optional[Serializer] = None, deserializer: Optional[Deserializer] = None
+        self,
+        serializer: Optional[Serializer] = None,
+        deserializer: Optional[Deserializer] = None,
+        batch_gets: bool = False,
+        batch_gets_window: timedelta = timedelta(0),
     ):
         self.serializer = serializer
         self.deserializer = deserializer
+        self.batch_gets = batch_gets
+        self.batch_gets_window = batch_gets_window
 
     def parse(self, key_path: str, raw_config: config.RawConfig) -> "MemcacheContextFactory":
         pool = pool_from_config(
@@ -117,7 +172,12 @@ class MemcacheClient(config.Parser):
             serializer=self.serializer,
             deserializer=self.deserializer,
         )
-        return MemcacheContextFactory(pool, key_path)
+        return MemcacheContextFactory(
+            pool,
+            key_path,
+            batch_gets=self.batch_gets,
+            batch_gets_window=self.batch_gets_window,
+        )
 
 
 class MemcacheContextFactory(ContextFactory):
@@ -130,7 +190,15 @@ class MemcacheContextFactory(ContextFactory):
     from the provided :py:class:`~pymemcache.client.base.PooledClient` and
     automatically record diagnostic information.
 
-    :param pooled_client: A pooled client.
+    :param pooled_client: A pooled client, or a sharded client whose pools
+        are reported together.
+    :param batch_gets: Gather ``get`` calls issued by concurrent greenlets
+        into shared ``get_many`` calls, one per server, rather than making a
+        round trip for each. Each ``get`` still gets its own span, tagged with
+        the batch it was sent in. See :py:class:`~baseplate.lib.batching.GetBatcher`.
+    :param batch_gets_window: How long to wait for more keys before sending a
+        batched ``get_many``. The default sends on the next turn of the event
+        loop.
 
     """
 
@@ -155,22 +223,68 @@ class MemcacheContextFactory(ContextFactory):
         PROM_LABELS,
     )
 
-    def __init__(self, pooled_client: PooledClient, name: str = "default"):
+    def __init__(
+        self,
+        pooled_client: MemcachePool,
+        name: str = "default",
+        batch_gets: bool = False,
+        batch_gets_window: timedelta = timedelta(0),
+    ):
         self.pooled_client = pooled_client
         self.name = name
 
-    def report_memcache_runtime_metrics(self, batch: metrics.Client) -> None:
-        pool = self.pooled_client.client_pool
-        self.pool_size_gauge.labels(self.name).set(pool.max_size)
-        self.free_connections_gauge.labels(self.name).set(len(pool.free))
-        self.used_connections_gauge.labels(self.name).set(len(pool.used))
+        self.get_batcher: Optional[GetBatcher] = None
+        if batch_gets:
+            self.get_batcher = GetBatcher(
+                pooled_client.get_many,
+                window=batch_gets_window,
+                batch_sizes=GET_BATCH_SIZE.labels(name),
+            )
 
-        batch.gauge("pool.in_use").replace(len(pool.used))
-        batch.gauge("pool.open_and_available").replace(len(pool.free))
-        batch.gauge("pool.size").replace(pool.max_size)
+    def report_memcache_runtime_metrics(self, batch: metrics.Client) -> None:
+        if isinstance(self.pooled_client, ShardedPooledClient):
+            pools = [client.client_pool for client in self.pooled_client.clients.values()]
+        else:
+            pools = [self.pooled_client.client_pool]
+        max_size = sum(pool.max_size for pool in pools)
+        free = sum(len(pool.free) for pool in pools)
+        used = sum(len(pool.used) for pool in pools)
+
+        self.pool_size_gauge.labels(self.name).set(max_size)
+        self.free_connections_gauge.labels(self.name).set(free)
+        self.used_connections_gauge.labels(self.name).set(used)
+
+        batch.gauge("pool.in_use").replace(used)
+        batch.gauge("pool.open_and_available").replace(free)
+        batch.gauge("pool.size").replace(max_size)
+
+    def prewarm(self, connections: int) -> None:
+        if isinstance(self.pooled_client, ShardedPooledClient):
+            pooled_clients = list(self.pooled_client.clients.values())
+        else:
+            pooled_clients = [self.pooled_client]
+
+        for pooled_client in pooled_clients:
+            pool = pooled_client.client_pool
+            clients = []
+            try:
+                for _ in range(min(connections, pool.max_size)):
+                    client = pool.get()
+                    clients.append(client)
+                    # clients connect lazily, on their first command
+                    client.version()
+            finally:
+                for client in clients:
+                    pool.release(client)
 
     def make_object_for_context(self, name: str, span: Span) -> "MonitoredMemcacheConnection":
-        return MonitoredMemcacheConnection(name, span, self.pooled_client)
+        return MonitoredMemcacheConnection(
+            name,
+            span,
+            self.pooled_client,
+            request_memo=get_request_memo(span),
+            get_batcher=self.get_batcher,
+        )
 
 
 Key = Union[str, bytes]
@@ -197,13 +311,19 @@ ACTIVE_REQUESTS = Gauge(
     LABELS_COMMON,
     multiprocess_mode="livesum",
 )
+GET_BATCH_SIZE = Histogram(
+    f"{PROM_NAMESPACE}_client_get_batch_size",
+    "Number of keys fetched by each batched get_many",
+    [f"{PROM_NAMESPACE}_pool"],
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+)
 
 
 def _prom_instrument(func: Any) -> Any:
     def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
         labels_common = {
             f"{PROM_NAMESPACE}_address": str(self.pooled_client.server),
-            f"{PROM_NAMESPACE}_command": func.__name__,
+            f"{PROM_NAMESPACE}_command": func.__name__.lstrip("_"),
         }
         success = "true"
         start_time = perf_counter()
@@ -232,17 +352,34 @@ class MonitoredMemcacheConnection:
     with monitoring. Please request assistance if any needed methods are not
     being monitored.
 
+    If the request has a :py:class:`~baseplate.lib.memo.RequestMemo`, the
+    results of ``get``, ``get_many`` and ``gets`` are memoized for the rest of
+    the request and writes through this connection invalidate the keys they
+    change. Only hits are memoized by ``get_many``.
+
+    If a :py:class:`~baseplate.lib.batching.GetBatcher` is given, ``get`` is
+    sent through it so that concurrent calls share one ``get_many``.
+
     """
 
-    def __init__(self, context_name: str, server_span: Span, pooled_client: PooledClient):
+    def __init__(
+        self,
+        context_name: str,
+        server_span: Span,
+        pooled_client: MemcachePool,
+        request_memo: Optional[RequestMemo] = None,
+        get_batcher: Optional[GetBatcher] = None,
+    ):
         self.context_name = context_name
         self.server_span = server_span
         self.pooled_client = pooled_client
+        self.request_memo = request_memo
+        self.get_batcher = get_batcher
 
     @_prom_instrument
     def close(self) -> None:
         with self._make_span("close"):
-            return self.pooled_client.close()
+            self.pooled_client.close()
 
     @_prom_instrument
     def set(self, key: Key, value: Any, expire: int = 0, noreply: Optional[bool] = None) -> bool:
@@ -250,18 +387,20 @@ class MonitoredMemcacheConnection:
             span.set_tag("key", key)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.set(key, value, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.set(key, value, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def set_many(
         self, values: Dict[Key, Any], expire: int = 0, noreply: Optional[bool] = None
-    ) -> List[str]:
+    ) -> bool:
         with self._make_span("set_many") as span:
             span.set_tag("key_count", len(values))
             span.set_tag("keys", make_keys_str(values.keys()))
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.set_many(values, expire=expire, noreply=noreply)
+            with self._invalidating(list(values)):
+                return self.pooled_client.set_many(values, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def replace(
@@ -271,7 +410,8 @@ class MonitoredMemcacheConnection:
             span.set_tag("key", key)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.replace(key, value, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.replace(key, value, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def append(self, key: Key, value: Any, expire: int = 0, noreply: Optional[bool] = None) -> bool:
@@ -279,7 +419,8 @@ class MonitoredMemcacheConnection:
             span.set_tag("key", key)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.append(key, value, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.append(key, value, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def prepend(
@@ -289,7 +430,8 @@ class MonitoredMemcacheConnection:
             span.set_tag("key", key)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.prepend(key, value, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.prepend(key, value, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def cas(
@@ -300,27 +442,75 @@ class MonitoredMemcacheConnection:
             span.set_tag("cas", cas)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.cas(key, value, cas, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.cas(key, value, cas, expire=expire, noreply=noreply)
 
-    @_prom_instrument
     def get(self, key: Key, default: Any = None) -> Any:
+        if self.request_memo is None:
+            return self._get(key, default)
+        return self.request_memo.call(
+            self.context_name, key, lambda: self._get(key, default), read=("get", default)
+        )
+
+    @_prom_instrument
+    def _get(self, key: Key, default: Any = None) -> Any:
         with self._make_span("get") as span:
             span.set_tag("key", key)
+            if self.get_batcher is not None:
+                read = self.get_batcher.get(key)
+                span.set_tag("batch_id", read.batch_id)
+                span.set_tag("batch_size", read.batch_size)
+                return read.value if read.found else default
             kwargs = {}
             if default is not None:
                 kwargs["default"] = default
             return self.pooled_client.get(key, **kwargs)
 
-    @_prom_instrument
     def get_many(self, keys: Sequence[Key]) -> Dict[Key, Any]:
+        if self.request_memo is None:
+            return self._get_many(keys)
+
+        memoized = {}
+        missing = []
+        for key in keys:
+            found, value = self.request_memo.get(self.context_name, key, read=("get", None))
+            if found and value is not None:
+                memoized[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            version = self.request_memo.version
+            values = self._get_many(missing)
+            for key, value in values.items():
+                self.request_memo.set(
+                    self.context_name, key, value, read=("get", None), version=version
+                )
+            memoized.update(values)
+        return memoized
+
+    @_prom_instrument
+    def _get_many(self, keys: Sequence[Key]) -> Dict[Key, Any]:
         with self._make_span("get_many") as span:
             span.set_tag("key_count", len(keys))
             span.set_tag("keys", make_keys_str(keys))
             return self.pooled_client.get_many(keys)
 
-    @_prom_instrument
     def gets(
         self, key: Key, default: Optional[Any] = None, cas_default: Optional[Any] = None
+    ) -> Tuple[Any, Any]:
+        if self.request_memo is None:
+            return self._gets(key, default, cas_default)
+        return self.request_memo.call(
+            self.context_name,
+            key,
+            lambda: self._gets(key, default, cas_default),
+            read=("gets", default, cas_default),
+        )
+
+    @_prom_instrument
+    def _gets(
+        self, key: Key, default: Optional[Any] = None, cas_default: Optional[Any] = None
     ) -> Tuple[Any, Any]:
         with self._make_span("gets") as span:
             span.set_tag("key", key)
@@ -338,7 +528,8 @@ class MonitoredMemcacheConnection:
         with self._make_span("delete") as span:
             span.set_tag("key", key)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.delete(key, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.delete(key, noreply=noreply)
 
     @_prom_instrument
     def delete_many(self, keys: Sequence[Key], noreply: Optional[bool] = None) -> bool:
@@ -346,7 +537,8 @@ class MonitoredMemcacheConnection:
             span.set_tag("key_count", len(keys))
             span.set_tag("noreply", noreply)
             span.set_tag("keys", make_keys_str(keys))
-            return self.pooled_client.delete_many(keys, noreply=noreply)
+            with self._invalidating(list(keys)):
+                return self.pooled_client.delete_many(keys, noreply=noreply)
 
     @_prom_instrument
     def add(self, key: Key, value: Any, expire: int = 0, noreply: Optional[bool] = None) -> bool:
@@ -354,21 +546,24 @@ class MonitoredMemcacheConnection:
             span.set_tag("key", key)
             span.set_tag("expire", expire)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.add(key, value, expire=expire, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.add(key, value, expire=expire, noreply=noreply)
 
     @_prom_instrument
     def incr(self, key: Key, value: int, noreply: Optional[bool] = False) -> Optional[int]:
         with self._make_span("incr") as span:
             span.set_tag("key", key)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.incr(key, value, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.incr(key, value, noreply=noreply)
 
     @_prom_instrument
     def decr(self, key: Key, value: int, noreply: Optional[bool] = False) -> Optional[int]:
         with self._make_span("decr") as span:
             span.set_tag("key", key)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.decr(key, value, noreply=noreply)
+            with self._invalidating([key]):
+                return self.pooled_client.decr(key, value, noreply=noreply)
 
     @_prom_instrument
     def touch(self, key: Key, expire: int = 0, noreply: Optional[bool] = None) -> bool:
@@ -388,12 +583,36 @@ class MonitoredMemcacheConnection:
         with self._make_span("flush_all") as span:
             span.set_tag("delay", delay)
             span.set_tag("noreply", noreply)
-            return self.pooled_client.flush_all(delay=delay, noreply=noreply)
+            with self._invalidating(None):
+                return self.pooled_client.flush_all(delay=delay, noreply=noreply)
 
     @_prom_instrument
     def quit(self) -> None:
         with self._make_span("quit"):
-            return self.pooled_client.quit()
+            self.pooled_client.quit()
+
+    @contextlib.contextmanager
+    def _invalidating(self, keys: Optional[Sequence[Key]]) -> Iterator[None]:
+        """Forget memoized reads of ``keys`` (or all keys if None) around a write.
+
+        Invalidating again once the write is done drops any read that was in
+        flight during the write and may have memoized the old value.
+
+        """
+        self._invalidate(keys)
+        try:
+            yield
+        finally:
+            self._invalidate(keys)
+
+    def _invalidate(self, keys: Optional[Sequence[Key]]) -> None:
+        if self.request_memo is None:
+            return
+        if keys is None:
+            self.request_memo.invalidate(self.context_name)
+        else:
+            for key in keys:
+                self.request_memo.invalidate(self.context_name, key)
 
     def _make_span(self, method_name: str) -> Span:
         """Get a child span of the current server span.
@@ -4,7 +4,9 @@ Memcached can only store strings, so to store arbitrary objects we need to
 serialize them to strings and be able to deserialize them back to their
 original form.
 
-New services should use dump_and_compress() and decompress_and_load().
+New services should use dump_and_compress() and decompress_and_load(). Both
+can be built with faster codecs (orjson or msgpack serialization, zstd or lz4
+compression) with make_dump_and_compress_fn() and make_decompress_and_load_fn().
 
 Services that need to read and write to the same memcache instances as r2
 should use pickle_and_compress() and decompress_and_unpickle().
@@ -17,7 +19,14 @@ import zlib
 
 from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
 from typing import Tuple
+from typing import Union
+
+import gevent.monkey
 
 
 class Flags:
@@ -34,71 +43,310 @@ class Flags:
     INTEGER = 1 << 1
     LONG = 1 << 2
     ZLIB = 1 << 3
+    MSGPACK = 1 << 4
+    ZSTD = 1 << 5
+    LZ4 = 1 << 6
 
+    COMPRESSION = ZLIB | ZSTD | LZ4
 
-def decompress_and_load(  # pylint: disable=unused-argument
-    key: str, serialized: bytes, flags: int
-) -> Any:
-    """Deserialize data.
+
+class Serializer(NamedTuple):
+    """A codec that turns Python objects into bytes.
+
+    ``flag`` is the :py:class:`Flags` bit stored with values written by this
+    serializer so readers know to use it.
+
+    """
+
+    flag: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+class Compressor(NamedTuple):
+    """A codec that compresses serialized values.
+
+    ``flag`` is the :py:class:`Flags` bit stored with values written by this
+    compressor so readers know to use it.
+
+    """
+
+    flag: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+Codec = Union[Serializer, Compressor]
+
+
+def json_serializer() -> Serializer:
+    """Serialize with the standard library's :py:mod:`json`."""
+    # json is looked up when called rather than here so that it can be
+    # patched after the serializer is made.
+    def loads(serialized: bytes) -> Any:
+        return json.loads(serialized)
+
+    return Serializer(
+        Flags.JSON,
+        dumps=lambda value: json.dumps(value).encode("utf8"),
+        loads=loads,
+    )
+
+
+def orjson_serializer() -> Serializer:
+    """Serialize with `orjson <https://github.com/ijl/orjson>`_.
+
+    Requires the ``orjson`` package. orjson is several times faster than
+    :py:mod:`json` and its output is plain JSON, so values are stored with
+    :py:attr:`Flags.JSON` and stay readable by clients that only have
+    :py:mod:`json`. Values it can't read, like the ``NaN`` that
+    :py:func:`json.dumps` allows, are handed to :py:mod:`json` instead.
+
+    """
+    import orjson
+
+    def loads(serialized: bytes) -> Any:
+        try:
+            return orjson.loads(serialized)
+        except orjson.JSONDecodeError:
+            return json.loads(serialized)
+
+    return Serializer(
+        Flags.JSON,
+        dumps=lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS),
+        loads=loads,
+    )
+
+
+def msgpack_serializer() -> Serializer:
+    """Serialize with `msgpack <https://msgpack.org/>`_.
+
+    Requires the ``msgpack`` package.
+
+    """
+    import msgpack
+
+    return Serializer(
+        Flags.MSGPACK,
+        dumps=msgpack.packb,
+        loads=lambda serialized: msgpack.unpackb(serialized, strict_map_key=False),
+    )
+
+
+def zlib_compressor(level: int = 1) -> Compressor:
+    """Compress with :py:mod:`zlib`.
+
+    :param level: zlib compression level, from 1 to 9.
+
+    """
+    assert 1 <= level <= 9
+
+    # zlib is looked up when called rather than here so that it can be
+    # patched after the compressor is made.
+    def decompress(data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+    return Compressor(
+        Flags.ZLIB,
+        compress=lambda data: zlib.compress(data, level),
+        decompress=decompress,
+    )
+
+
+def zstd_compressor(level: int = 3, dictionary: Optional[bytes] = None) -> Compressor:
+    """Compress with `Zstandard <https://facebook.github.io/zstd/>`_.
+
+    Requires the ``zstandard`` package.
+
+    Small values compress much better with a dictionary trained on
+    representative values, e.g. with :py:func:`zstandard.train_dictionary`.
+    Every reader of values written with a dictionary needs the same
+    dictionary, so pass the same ``dictionary`` to
+    :py:func:`make_decompress_and_load_fn`.
+
+    :param level: zstd compression level, from 1 to 22.
+    :param dictionary: The bytes of a trained zstd dictionary.
+
+    """
+    import zstandard
+
+    zstd_dict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+
+    # zstd (de)compressors aren't thread-safe but are worth reusing, so each
+    # OS thread gets its own. greenlets can share them because a call never
+    # yields to another greenlet partway through.
+    local = gevent.monkey.get_original("threading", "local")()
+
+    def compress(data: bytes) -> bytes:
+        try:
+            compressor = local.compressor
+        except AttributeError:
+            compressor = local.compressor = zstandard.ZstdCompressor(
+                level=level, dict_data=zstd_dict
+            )
+        return compressor.compress(data)
+
+    def decompress(data: bytes) -> bytes:
+        try:
+            decompressor = local.decompressor
+        except AttributeError:
+            decompressor = local.decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dict)
+        return decompressor.decompress(data)
+
+    return Compressor(Flags.ZSTD, compress=compress, decompress=decompress)
+
+
+def lz4_compressor(level: int = 0) -> Compressor:
+    """Compress with `LZ4 <https://lz4.org/>`_.
+
+    Requires the ``lz4`` package. LZ4 compresses less than zstd but is
+    faster still.
+
+    :param level: lz4 compression level, 0 is the fast default.
+
+    """
+    import lz4.frame
+
+    return Compressor(
+        Flags.LZ4,
+        compress=lambda data: lz4.frame.compress(data, compression_level=level),
+        decompress=lz4.frame.decompress,
+    )
+
+
+def _available_codecs() -> List[Codec]:
+    codecs: List[Codec] = [json_serializer(), zlib_compressor()]
+    for make_codec in (msgpack_serializer, zstd_compressor, lz4_compressor):
+        try:
+            codecs.append(make_codec())
+        except ImportError:
+            pass
+    return codecs
+
+
+def make_decompress_and_load_fn(*codecs: Codec) -> Callable[[str, bytes, int], Any]:
+    """Make a deserializer.
 
     This should be paired with
     :py:func:`~baseplate.clients.memcache.lib.make_dump_and_compress_fn`.
 
-    :param key: the memcached key.
-    :param serialized: the serialized object returned from memcached.
-    :param flags: value stored and returned from memcached for the client
-        to use to indicate how the value was serialized.
-    :returns: The deserialized value.
+    The resulting method reads values written by any of the codecs that are
+    installed, including the ``Flags.JSON | Flags.ZLIB`` values written by
+    older versions of baseplate. ``codecs`` are used in place of the
+    defaults for the same flag, e.g. :py:func:`orjson_serializer` to read
+    JSON faster or a :py:func:`zstd_compressor` with a dictionary.
+
+    :param codecs: Serializers and compressors to use.
+    :returns: The deserializer.
 
     """
-    if flags & Flags.ZLIB:
-        serialized = zlib.decompress(serialized)
-        flags ^= Flags.ZLIB
+    serializers: Dict[int, Serializer] = {}
+    compressors: Dict[int, Compressor] = {}
+    for codec in [*_available_codecs(), *codecs]:
+        if isinstance(codec, Serializer):
+            serializers[codec.flag] = codec
+        else:
+            compressors[codec.flag] = codec
 
-    if flags == 0:
+    def _decompress_and_load(  # pylint: disable=unused-argument
+        key: str, serialized: bytes, flags: int
+    ) -> Any:
+        """Deserialize data.
+
+        :param key: the memcached key.
+        :param serialized: the serialized object returned from memcached.
+        :param flags: value stored and returned from memcached for the client
+            to use to indicate how the value was serialized.
+        :returns: The deserialized value.
+
+        """
+        compression = flags & Flags.COMPRESSION
+        if compression:
+            compressor = compressors.get(compression)
+            if compressor is None:
+                logging.info("no codec for compression flags %d", compression)
+                return None
+            serialized = compressor.decompress(serialized)
+            flags ^= compression
+
+        if flags == 0:
+            return serialized
+
+        if flags in (Flags.INTEGER, Flags.LONG):
+            # python3 doesn't have a long integer type, so all integers are
+            # written with Flags.INTEGER. This means that a value written by a
+            # python3 client can exceed the maximum integer value (sys.maxint).
+            # This appears to be ok--python2 will automatically convert to long
+            # if the value is too large.
+            return int(serialized)
+
+        serializer = serializers.get(flags)
+        if serializer is not None:
+            try:
+                return serializer.loads(serialized)
+            except ValueError:
+                logging.info("deserialization error", exc_info=True)
+                return None
+
+        logging.info("unrecognized flags")
         return serialized
 
-    if flags in (Flags.INTEGER, Flags.LONG):
-        # python3 doesn't have a long integer type, so all integers are written
-        # with Flags.INTEGER. This means that a value written by a python3
-        # client can exceed the maximum integer value (sys.maxint). This
-        # appears to be ok--python2 will automatically convert to long if the
-        # value is too large.
-        return int(serialized)
+    return _decompress_and_load
 
-    if flags == Flags.JSON:
-        try:
-            return json.loads(serialized)
-        except ValueError:
-            logging.info("json error", exc_info=True)
-            return None
 
-    logging.info("unrecognized flags")
-    return serialized
+decompress_and_load = make_decompress_and_load_fn()
+decompress_and_load.__doc__ = """Deserialize data.
+
+This should be paired with
+:py:func:`~baseplate.clients.memcache.lib.make_dump_and_compress_fn`. It reads
+values written with any of the codecs that are installed; use
+:py:func:`make_decompress_and_load_fn` if you need to configure a codec.
+
+:param key: the memcached key.
+:param serialized: the serialized object returned from memcached.
+:param flags: value stored and returned from memcached for the client
+    to use to indicate how the value was serialized.
+:returns: The deserialized value.
+
+"""
 
 
 def make_dump_and_compress_fn(
-    min_compress_length: int = 0, compress_level: int = 1
+    min_compress_length: int = 0,
+    compress_level: int = 1,
+    serializer: Optional[Serializer] = None,
+    compressor: Optional[Compressor] = None,
 ) -> Callable[[str, Any], Tuple[bytes, int]]:
     """Make a serializer.
 
     This should be paired with
     :py:func:`~baseplate.clients.memcache.lib.decompress_and_load`.
 
-    The resulting method is a chain of :py:func:`json.loads` and ``zlib``
-    compression. Values that are not JSON serializable will result in a
-    :py:exc:`TypeError`.
+    The resulting method is a chain of JSON serialization and ``zlib``
+    compression by default. Values that are not JSON serializable will result
+    in a :py:exc:`TypeError`.
 
     :param min_compress_length: the minimum serialized string length to
-        enable zlib compression. 0 disables compression.
+        enable compression. 0 disables compression.
     :param compress_level: zlib compression level. 0 disables compression
-        and 9 is the maximum value.
+        and 9 is the maximum value. Ignored if ``compressor`` is given.
+    :param serializer: The codec for values that aren't strings, bytes or
+        integers, :py:func:`json_serializer` by default.
+    :param compressor: The compression codec, :py:func:`zlib_compressor` by
+        default.
     :returns: The serializer.
 
     """
     assert min_compress_length >= 0
     assert 0 <= compress_level <= 9
 
+    if serializer is None:
+        serializer = json_serializer()
+    if compressor is None and compress_level:
+        compressor = zlib_compressor(compress_level)
+    dumps = serializer.dumps
+    serializer_flag = serializer.flag
+
     def dump_and_compress(  # pylint: disable=unused-argument
         key: str, value: Any
     ) -> Tuple[bytes, int]:
@@ -107,7 +355,7 @@ def make_dump_and_compress_fn(
         :param key: the memcached key.
         :param value: python object to be serialized and set to memcached.
         :returns: value serialized as str, flags int.
-        :raises ValueError: if `value` is not JSON serializable
+        :raises TypeError: if `value` is not serializable
 
         """
         if isinstance(value, str):
@@ -120,13 +368,12 @@ def make_dump_and_compress_fn(
             serialized = f"{value:d}".encode()
             flags = Flags.INTEGER
         else:
-            # NOTE: json.dumps raises ValueError if `value` is not serializable
-            serialized = json.dumps(value).encode("utf8")
-            flags = Flags.JSON
+            serialized = dumps(value)
+            flags = serializer_flag
 
-        if compress_level and min_compress_length and len(serialized) > min_compress_length:
-            serialized = zlib.compress(serialized, compress_level)
-            flags |= Flags.ZLIB
+        if compressor and min_compress_length and len(serialized) > min_compress_length:
+            serialized = compressor.compress(serialized)
+            flags |= compressor.flag
 
         return serialized, flags
 
@@ -0,0 +1,302 @@
+"""Spread keys over a fleet of memcached servers with consistent hashing."""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TypeVar
+from typing import Union
+
+import gevent
+
+from pymemcache.client.base import PooledClient
+from pymemcache.exceptions import MemcacheUnexpectedCloseError
+
+
+logger = logging.getLogger(__name__)
+
+
+Key = Union[str, bytes]
+T = TypeVar("T")
+
+# errors that mean the server itself is unreachable rather than that the
+# command was bad, these count towards ejecting the node.
+NODE_ERRORS = (OSError, MemcacheUnexpectedCloseError)
+
+
+class KetamaHash:
+    """A consistent hash ring compatible with libmemcached's ketama distribution.
+
+    Each node is placed on the ring 160 times using MD5, the same way as
+    libmemcached (with ``MEMCACHED_BEHAVIOR_KETAMA_WEIGHTED``), twemproxy and
+    spymemcached, so all of them agree on which server holds a key. Nodes are
+    named ``host:port``; as in libmemcached, the port is left out of the point
+    names for servers on the default port.
+
+    The interface matches :py:class:`pymemcache.client.rendezvous.RendezvousHash`.
+
+    """
+
+    POINTS_PER_NODE = 160
+    DEFAULT_PORT = "11211"
+
+    def __init__(self, nodes: Optional[Iterable[str]] = None):
+        self.nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes or ():
+            self.add_node(node)
+
+    def _node_points(self, node: str) -> Iterable[int]:
+        host, sep, port = node.rpartition(":")
+        name = host if sep and port == self.DEFAULT_PORT else node
+        for i in range(self.POINTS_PER_NODE // 4):
+            digest = hashlib.md5(f"{name}-{i}".encode()).digest()
+            for alignment in range(4):
+                yield int.from_bytes(digest[alignment * 4 : alignment * 4 + 4], "little")
+
+    def _rebuild(self) -> None:
+        ring = sorted((point, node) for node in self.nodes for point in self._node_points(node))
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def add_node(self, node: str) -> None:
+        if node not in self.nodes:
+            self.nodes.append(node)
+            self._rebuild()
+
+    def remove_node(self, node: str) -> None:
+        if node not in self.nodes:
+            raise ValueError(f"No such node {node} to remove")
+        self.nodes.remove(node)
+        self._rebuild()
+
+    def get_node(self, key: Key) -> Optional[str]:
+        if not self._points:
+            return None
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        point = int.from_bytes(hashlib.md5(key).digest()[:4], "little")
+        i = bisect.bisect_left(self._points, point)
+        return self._owners[i % len(self._owners)]
+
+
+class ShardedPooledClient:
+    """A :py:class:`~pymemcache.client.base.PooledClient` spread over many servers.
+
+    Every server gets its own connection pool and each key is sent to the
+    server chosen by ``hasher``. Multi-key commands are split by server and
+    the servers are called concurrently.
+
+    A server that fails ``retry_attempts`` times in a row with a connection
+    error is ejected: its keys are redistributed over the remaining servers.
+    After ``dead_timeout`` seconds it is put back in the ring and given
+    another chance. Errors are always raised to the caller. If every server
+    has been ejected, keys are routed as though none were.
+
+    :param servers: The ``(host, port)`` addresses of the servers.
+    :param hasher: A class with ``add_node``, ``remove_node`` and
+        ``get_node`` methods, e.g. :py:class:`KetamaHash` or
+        :py:class:`~pymemcache.client.rendezvous.RendezvousHash`.
+    :param retry_attempts: How many consecutive connection errors eject a
+        server.
+    :param dead_timeout: How long, in seconds, a server stays ejected.
+    :param client_kwargs: Passed to each server's
+        :py:class:`~pymemcache.client.base.PooledClient`.
+
+    """
+
+    def __init__(
+        self,
+        servers: Sequence[Tuple[str, int]],
+        hasher: Callable[[], Any] = KetamaHash,
+        retry_attempts: int = 2,
+        dead_timeout: float = 60,
+        **client_kwargs: Any,
+    ):
+        self.retry_attempts = retry_attempts
+        self.dead_timeout = dead_timeout
+
+        self.clients: Dict[str, PooledClient] = {}
+        self.hasher = hasher()
+        self._all_nodes = hasher()
+        for host, port in servers:
+            node = f"{host}:{port}"
+            self.clients[node] = PooledClient((host, port), **client_kwargs)
+            self.hasher.add_node(node)
+            self._all_nodes.add_node(node)
+
+        # used in metric labels in place of a single server address
+        self.server = ",".join(self.clients)
+
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._dead_until: Dict[str, float] = {}
+
+    def _revive_nodes(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for node, dead_until in list(self._dead_until.items()):
+                if now >= dead_until:
+                    logger.info("Putting memcached server %s back in rotation", node)
+                    del self._dead_until[node]
+                    self.hasher.add_node(node)
+
+    def _mark_failed(self, node: str) -> None:
+        with self._lock:
+            failures = self._failures.get(node, 0) + 1
+            self._failures[node] = failures
+            if failures >= self.retry_attempts and node not in self._dead_until:
+                logger.warning("Ejecting memcached server %s after %d errors", node, failures)
+                self._dead_until[node] = time.monotonic() + self.dead_timeout
+                self.hasher.remove_node(node)
+
+    def _mark_alive(self, node: str) -> None:
+        if node in self._failures:
+            with self._lock:
+                self._failures.pop(node, None)
+
+    def node_for_key(self, key: Key) -> str:
+        """Return the name of the server that ``key`` is currently routed to."""
+        if self._dead_until:
+            self._revive_nodes()
+        node = self.hasher.get_node(key)
+        if node is None:
+            node = self._all_nodes.get_node(key)
+        return node
+
+    def _call(self, node: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            result = getattr(self.clients[node], method)(*args, **kwargs)
+        except NODE_ERRORS:
+            self._mark_failed(node)
+            raise
+        self._mark_alive(node)
+        return result
+
+    def _run_cmd(self, method: str, key: Key, *args: Any, **kwargs: Any) -> Any:
+        return self._call(self.node_for_key(key), method, key, *args, **kwargs)
+
+    def _group_keys(self, keys: Iterable[T], key: Callable[[T], Key]) -> Dict[str, List[T]]:
+        batches: Dict[str, List[T]] = {}
+        for item in keys:
+            batches.setdefault(self.node_for_key(key(item)), []).append(item)
+        return batches
+
+    def _fan_out(
+        self, method: str, batches: Dict[str, Any], *args: Any, **kwargs: Any
+    ) -> List[Any]:
+        if len(batches) == 1:
+            ((node, batch),) = batches.items()
+            return [self._call(node, method, batch, *args, **kwargs)]
+
+        greenlets = [
+            gevent.spawn(self._call, node, method, batch, *args, **kwargs)
+            for node, batch in batches.items()
+        ]
+        gevent.joinall(greenlets, raise_error=True)
+        return [greenlet.value for greenlet in greenlets]
+
+    def _broadcast(self, method: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        nodes = list(self.clients)
+        greenlets = [gevent.spawn(self._call, node, method, *args, **kwargs) for node in nodes]
+        gevent.joinall(greenlets, raise_error=True)
+        return {node: greenlet.value for node, greenlet in zip(nodes, greenlets)}
+
+    def set(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("set", key, *args, **kwargs)
+
+    def set_many(self, values: Dict[Key, Any], *args: Any, **kwargs: Any) -> bool:
+        if not values:
+            return True
+        batches = self._group_keys(values.items(), key=lambda item: item[0])
+        return all(
+            self._fan_out(
+                "set_many", {node: dict(items) for node, items in batches.items()}, *args, **kwargs
+            )
+        )
+
+    set_multi = set_many
+
+    def replace(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("replace", key, *args, **kwargs)
+
+    def append(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("append", key, *args, **kwargs)
+
+    def prepend(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("prepend", key, *args, **kwargs)
+
+    def cas(self, key: Key, *args: Any, **kwargs: Any) -> Optional[bool]:
+        return self._run_cmd("cas", key, *args, **kwargs)
+
+    def get(self, key: Key, *args: Any, **kwargs: Any) -> Any:
+        return self._run_cmd("get", key, *args, **kwargs)
+
+    def get_many(self, keys: Sequence[Key]) -> Dict[Key, Any]:
+        values: Dict[Key, Any] = {}
+        if not keys:
+            return values
+        for result in self._fan_out("get_many", self._group_keys(keys, key=lambda k: k)):
+            values.update(result)
+        return values
+
+    get_multi = get_many
+
+    def gets(self, key: Key, *args: Any, **kwargs: Any) -> Tuple[Any, Any]:
+        return self._run_cmd("gets", key, *args, **kwargs)
+
+    def gets_many(self, keys: Sequence[Key]) -> Dict[Key, Tuple[Any, Any]]:
+        values: Dict[Key, Tuple[Any, Any]] = {}
+        if not keys:
+            return values
+        for result in self._fan_out("gets_many", self._group_keys(keys, key=lambda k: k)):
+            values.update(result)
+        return values
+
+    def delete(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("delete", key, *args, **kwargs)
+
+    def delete_many(self, keys: Sequence[Key], *args: Any, **kwargs: Any) -> bool:
+        if not keys:
+            return True
+        batches = self._group_keys(keys, key=lambda k: k)
+        return all(self._fan_out("delete_many", batches, *args, **kwargs))
+
+    delete_multi = delete_many
+
+    def add(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("add", key, *args, **kwargs)
+
+    def incr(self, key: Key, *args: Any, **kwargs: Any) -> Optional[int]:
+        return self._run_cmd("incr", key, *args, **kwargs)
+
+    def decr(self, key: Key, *args: Any, **kwargs: Any) -> Optional[int]:
+        return self._run_cmd("decr", key, *args, **kwargs)
+
+    def touch(self, key: Key, *args: Any, **kwargs: Any) -> bool:
+        return self._run_cmd("touch", key, *args, **kwargs)
+
+    def stats(self, *args: str) -> Dict[str, Any]:
+        """Return the stats of every server, keyed by server name."""
+        return self._broadcast("stats", *args)
+
+    def flush_all(self, *args: Any, **kwargs: Any) -> bool:
+        return all(self._broadcast("flush_all", *args, **kwargs).values())
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.close()
+
+    def quit(self) -> None:
+        for client in self.clients.values():
+            client.quit()
@@ -1,11 +1,25 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+from datetime import timedelta
 from math import ceil
 from time import perf_counter
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
+import gevent
 import redis
 
+from gevent.event import AsyncResult
+
 # redis.client.StrictPipeline was renamed to redis.client.Pipeline in version 3.0
 try:
     from redis.client import StrictPipeline as Pipeline  # type: ignore
@@ -21,9 +35,14 @@ from baseplate.clients import ContextFactory
 from baseplate.lib import config
 from baseplate.lib import message_queue
 from baseplate.lib import metrics
-
+from baseplate.lib.batching import GetBatcher
+from baseplate.lib.memo import get_request_memo
+from baseplate.lib.memo import RequestMemo
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 from baseplate.lib.prometheus_metrics import default_latency_buckets
 
+logger = logging.getLogger(__name__)
+
 PROM_PREFIX = "redis_client"
 PROM_LABELS_PREFIX = "redis"
 
@@ -75,6 +94,544 @@ OPEN_CONNECTIONS = Gauge(
     multiprocess_mode="livesum",
 )
 
+GET_BATCH_SIZE = Histogram(
+    f"{PROM_PREFIX}_get_batch_size",
+    "Number of keys fetched by each batched MGET",
+    ["redis_client_name"],
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+)
+
+CLIENT_SIDE_CACHE_REQUESTS_TOTAL = Counter(
+    f"{PROM_PREFIX}_side_cache_requests_total",
+    "Total number of keys looked up in the client-side cache",
+    ["redis_client_name", "redis_cache_result"],
+)
+CLIENT_SIDE_CACHE_INVALIDATIONS_TOTAL = Counter(
+    f"{PROM_PREFIX}_side_cache_invalidations_total",
+    "Total number of invalidation messages received by the client-side cache",
+    ["redis_client_name"],
+)
+CLIENT_SIDE_CACHE_SIZE = Gauge(
+    f"{PROM_PREFIX}_side_cache_size",
+    "Number of entries in the client-side cache",
+    ["redis_client_name"],
+    multiprocess_mode="livesum",
+)
+
+# Commands that operate on a single key and never block, which are safe to
+# gather into a pipeline with other callers' commands, even on a cluster.
+AUTO_PIPELINE_COMMANDS = frozenset(
+    [
+        "APPEND",
+        "DECR",
+        "DECRBY",
+        "EXISTS",
+        "EXPIRE",
+        "EXPIREAT",
+        "GET",
+        "GETBIT",
+        "GETRANGE",
+        "GETSET",
+        "HDEL",
+        "HEXISTS",
+        "HGET",
+        "HGETALL",
+        "HINCRBY",
+        "HINCRBYFLOAT",
+        "HKEYS",
+        "HLEN",
+        "HMGET",
+        "HMSET",
+        "HSET",
+        "HSETNX",
+        "HSTRLEN",
+        "HVALS",
+        "INCR",
+        "INCRBY",
+        "INCRBYFLOAT",
+        "LINDEX",
+        "LLEN",
+        "LPOP",
+        "LPUSH",
+        "LRANGE",
+        "LREM",
+        "LSET",
+        "LTRIM",
+        "PERSIST",
+        "PEXPIRE",
+        "PEXPIREAT",
+        "PSETEX",
+        "PTTL",
+        "RPOP",
+        "RPUSH",
+        "SADD",
+        "SCARD",
+        "SET",
+        "SETBIT",
+        "SETEX",
+        "SETNX",
+        "SETRANGE",
+        "SISMEMBER",
+        "SMEMBERS",
+        "SPOP",
+        "SRANDMEMBER",
+        "SREM",
+        "STRLEN",
+        "TTL",
+        "TYPE",
+        "ZADD",
+        "ZCARD",
+        "ZCOUNT",
+        "ZINCRBY",
+        "ZRANGE",
+        "ZRANGEBYSCORE",
+        "ZRANK",
+        "ZREM",
+        "ZREVRANGE",
+        "ZREVRANGEBYSCORE",
+        "ZREVRANK",
+        "ZSCORE",
+    ]
+)
+
+
+# Commands in AUTO_PIPELINE_COMMANDS that take any number of keys, and can
+# only be pipelined when they're given a single one.
+VARIADIC_KEY_COMMANDS = frozenset(["EXISTS"])
+
+
+def can_auto_pipeline(args: Sequence[Any]) -> bool:
+    """Return if the command in ``args`` can be sent through an :py:class:`AutoPipeliner`."""
+    command = args[0].upper()
+    if command not in AUTO_PIPELINE_COMMANDS:
+        return False
+    return command not in VARIADIC_KEY_COMMANDS or len(args) == 2
+
+
+# read-only commands whose results can be memoized for the rest of a request.
+# anything else is assumed to write and invalidates the request's memo.
+MEMOIZED_COMMANDS = frozenset(
+    [
+        "EXISTS",
+        "GET",
+        "GETBIT",
+        "GETRANGE",
+        "HEXISTS",
+        "HGET",
+        "HGETALL",
+        "HKEYS",
+        "HLEN",
+        "HMGET",
+        "HSTRLEN",
+        "HVALS",
+        "LINDEX",
+        "LLEN",
+        "LRANGE",
+        "MGET",
+        "SCARD",
+        "SISMEMBER",
+        "SMEMBERS",
+        "STRLEN",
+        "TYPE",
+        "ZCARD",
+        "ZCOUNT",
+        "ZRANGE",
+        "ZRANGEBYSCORE",
+        "ZRANK",
+        "ZREVRANGE",
+        "ZREVRANGEBYSCORE",
+        "ZREVRANK",
+        "ZSCORE",
+    ]
+)
+
+
+class AutoPipeliner:
+    """Gather commands from concurrent greenlets into shared pipelines.
+
+    Commands passed to :py:meth:`execute_command` are queued and the calling
+    greenlet waits while others run. Once the event loop comes around again (or
+    ``window`` has passed) every queued command is sent in one non-transactional
+    pipeline and each caller gets its own result or error back. On a cluster,
+    the pipeline groups the commands by node.
+
+    Only commands for which :py:func:`can_auto_pipeline` is true should be
+    sent through the pipeliner; blocking or multi-key commands must be
+    executed directly.
+    This relies on gevent to run other greenlets while callers wait.
+
+    :param redis_client: An uninstrumented client whose pipelines will be used.
+    :param window: How long to wait for more commands before sending a
+        pipeline. The default sends on the next turn of the event loop.
+    :param max_batch_size: The largest number of commands to put in one
+        pipeline.
+
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.StrictRedis,
+        window: timedelta = timedelta(0),
+        max_batch_size: int = 1000,
+    ):
+        self.redis_client = redis_client
+        self.window = window.total_seconds()
+        self.max_batch_size = max_batch_size
+
+        self.pending: List[Tuple[Tuple[Any, ...], Dict[str, Any], AsyncResult]] = []
+        self.flush_scheduled = False
+
+    def execute_command(self, *args: Any, **kwargs: Any) -> Any:
+        result = AsyncResult()
+        self.pending.append((args, kwargs, result))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            if self.window:
+                gevent.spawn_later(self.window, self.flush)
+            else:
+                gevent.spawn(self.flush)
+        return result.get()
+
+    def flush(self) -> None:
+        """Send every queued command."""
+        pending, self.pending = self.pending, []
+        self.flush_scheduled = False
+
+        for i in range(0, len(pending), self.max_batch_size):
+            self._execute_batch(pending[i : i + self.max_batch_size])
+
+    def _execute_batch(
+        self, batch: List[Tuple[Tuple[Any, ...], Dict[str, Any], AsyncResult]]
+    ) -> None:
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for args, kwargs, _ in batch:
+                pipe.execute_command(*args, **kwargs)
+            responses = pipe.execute(raise_on_error=False)
+        except Exception as exc:  # pylint: disable=broad-except
+            for _, _, result in batch:
+                result.set_exception(exc)
+            return
+
+        for (_, _, result), response in zip(batch, responses):
+            if isinstance(response, Exception):
+                result.set_exception(response)
+            else:
+                result.set(response)
+
+
+def make_get_batcher(
+    redis_client: redis.StrictRedis,
+    window: timedelta = timedelta(0),
+    max_batch_size: int = 1000,
+    redis_client_name: str = "",
+) -> GetBatcher:
+    """Make a :py:class:`~baseplate.lib.batching.GetBatcher` that fetches keys with ``MGET``.
+
+    :param redis_client: An uninstrumented client to send ``MGET`` through.
+    :param window: How long to wait for more keys before sending an ``MGET``.
+    :param max_batch_size: The largest number of keys to put in one ``MGET``.
+    :param redis_client_name: The client name used in metrics.
+
+    """
+
+    def get_many(keys: List[Any]) -> Dict[Any, Any]:
+        values = redis_client.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    return GetBatcher(
+        get_many,
+        window=window,
+        max_batch_size=max_batch_size,
+        batch_sizes=GET_BATCH_SIZE.labels(redis_client_name),
+    )
+
+
+class ClientSideCache:
+    """Keep recently read Redis values in process, invalidated by the server.
+
+    Results of ``GET``, ``HGETALL`` and ``MGET`` are kept in a bounded LRU
+    with a TTL. To stay coherent, a background thread opens two dedicated
+    connections: one subscribed to ``__redis__:invalidate`` and one that turns
+    on ``CLIENT TRACKING`` in broadcast mode for ``prefixes``, redirecting
+    invalidations to the first. Whenever a key matching one of the prefixes is
+    modified, Redis tells us and the cached value is dropped.
+
+    Values are only cached and served while the invalidation connections are
+    up; if they drop, the cache is cleared and bypassed until they reconnect.
+    While no invalidations arrive, both connections are checked with ``PING``
+    every ``health_check_interval`` so that one closed by the server, e.g. by
+    its idle ``timeout``, is noticed.
+    A value read while an invalidation arrives is not cached, so a concurrent
+    write can't leave a stale value behind.
+
+    This requires Redis 6 or newer. Because broadcast mode sends an
+    invalidation for every write to a matching key, use prefixes that cover
+    only the keys you want cached on write-heavy databases.
+
+    :param connection_pool: The pool whose connection settings to use.
+    :param max_size: The maximum number of cached values.
+    :param ttl: The longest time to keep a value.
+    :param prefixes: Only keys starting with these prefixes are cached.
+    :param redis_client_name: The client name used in metrics.
+    :param health_check_interval: How long the invalidation connections may
+        be idle before they're checked.
+
+    """
+
+    COMMANDS = frozenset(["GET", "HGETALL", "MGET"])
+
+    def __init__(
+        self,
+        connection_pool: redis.ConnectionPool,
+        max_size: int = 10000,
+        ttl: timedelta = timedelta(minutes=1),
+        prefixes: Sequence[str] = ("",),
+        redis_client_name: str = "",
+        health_check_interval: timedelta = timedelta(seconds=30),
+    ):
+        self.connection_pool = connection_pool
+        self.encoder = connection_pool.get_encoder()
+        self.max_size = max_size
+        self.ttl = ttl.total_seconds()
+        self.prefixes = [self.encoder.encode(prefix) for prefix in prefixes]
+        self.redis_client_name = redis_client_name
+        self.health_check_interval = health_check_interval.total_seconds()
+
+        self.entries: "collections.OrderedDict[Tuple[str, bytes], Tuple[float, Any]]"
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.epoch = 0
+        self.connected = False
+        self.listener: Optional[threading.Thread] = None
+
+    def _ensure_listener(self) -> None:
+        if self.listener is not None:
+            return
+
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self._listen_forever)
+                self.listener.name = "redis client-side cache invalidations"
+                self.listener.daemon = True
+                self.listener.start()
+
+    def _listen_forever(self) -> None:
+        while True:
+            try:
+                self._listen()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Client-side cache lost its invalidation connection.")
+            self.clear()
+            time.sleep(1)
+
+    def _make_connection(self, **kwargs: Any) -> redis.Connection:
+        # these connections are long-lived and must not count against the pool
+        return self.connection_pool.connection_class(
+            **{**self.connection_pool.connection_kwargs, **kwargs}
+        )
+
+    def _listen(self) -> None:
+        interval = self.health_check_interval
+        listener = self._make_connection(socket_timeout=interval)
+        tracker = self._make_connection()
+        try:
+            listener.send_command("CLIENT", "ID")
+            listener_id = listener.read_response()
+            listener.send_command("SUBSCRIBE", "__redis__:invalidate")
+            listener.read_response()
+
+            tracking_args: List[Any] = ["on", "REDIRECT", listener_id, "BCAST"]
+            for prefix in self.prefixes:
+                tracking_args.extend(["PREFIX", prefix])
+            tracker.send_command("CLIENT", "TRACKING", *tracking_args)
+            tracker.read_response()
+
+            with self.lock:
+                self.connected = True
+
+            awaiting_pong = False
+            while True:
+                if not listener.can_read(timeout=interval):
+                    # a connection the server has closed would otherwise
+                    # just look like a quiet one.
+                    if awaiting_pong:
+                        raise redis.ConnectionError("invalidation connection stopped responding")
+                    tracker.send_command("PING")
+                    tracker.read_response()
+                    listener.send_command("PING")
+                    awaiting_pong = True
+                    continue
+
+                message = listener.read_response()
+                if message[0] in ("message", b"message"):
+                    self.invalidate(message[2])
+                elif message[0] in ("pong", b"pong"):
+                    awaiting_pong = False
+        finally:
+            with self.lock:
+                self.connected = False
+            listener.disconnect()
+            tracker.disconnect()
+
+    def invalidate(self, keys: Optional[Sequence[Any]]) -> None:
+        """Drop cached values for ``keys``, or everything if :py:data:`None`."""
+        CLIENT_SIDE_CACHE_INVALIDATIONS_TOTAL.labels(self.redis_client_name).inc()
+        with self.lock:
+            self.epoch += 1
+            if keys is None:
+                self.entries.clear()
+                return
+            for key in keys:
+                key = self.encoder.encode(key)
+                for command in ("GET", "HGETALL"):
+                    self.entries.pop((command, key), None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+
+    def _cacheable(self, key: bytes) -> bool:
+        return any(key.startswith(prefix) for prefix in self.prefixes)
+
+    def _get(self, command: str, key: bytes) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get((command, key))
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[(command, key)]
+                return False, None
+            self.entries.move_to_end((command, key))
+            return True, value
+
+    def _set(self, command: str, key: bytes, value: Any, epoch: int) -> None:
+        with self.lock:
+            if not self.connected or epoch != self.epoch:
+                return
+            self.entries[(command, key)] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end((command, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def _record(self, hits: int, misses: int) -> None:
+        if hits:
+            CLIENT_SIDE_CACHE_REQUESTS_TOTAL.labels(self.redis_client_name, "hit").inc(hits)
+        if misses:
+            CLIENT_SIDE_CACHE_REQUESTS_TOTAL.labels(self.redis_client_name, "miss").inc(misses)
+
+    def execute_command(self, execute: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Serve a cacheable command, calling ``execute`` for anything not cached."""
+        self._ensure_listener()
+        if not self.connected:
+            return execute(*args, **kwargs)
+
+        command = args[0].upper()
+        if command == "MGET":
+            return self._mget(execute, args, kwargs)
+
+        key = self.encoder.encode(args[1])
+        if not self._cacheable(key):
+            return execute(*args, **kwargs)
+
+        hit, value = self._get(command, key)
+        if hit:
+            self._record(hits=1, misses=0)
+            return dict(value) if isinstance(value, dict) else value
+
+        self._record(hits=0, misses=1)
+        epoch = self.epoch
+        value = execute(*args, **kwargs)
+        self._set(command, key, dict(value) if isinstance(value, dict) else value, epoch)
+        return value
+
+    def _mget(
+        self, execute: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]
+    ) -> Any:
+        keys = [self.encoder.encode(key) for key in args[1:]]
+        values: List[Any] = [None] * len(keys)
+        missing: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(keys):
+            hit, value = self._get("GET", key) if self._cacheable(key) else (False, None)
+            if hit:
+                values[i] = value
+            else:
+                missing.setdefault(key, []).append(i)
+
+        self._record(hits=len(keys) - sum(map(len, missing.values())), misses=len(missing))
+        if not missing:
+            return values
+
+        epoch = self.epoch
+        missing_keys = list(missing)
+        fetched = execute("MGET", *missing_keys, **kwargs)
+        for key, value in zip(missing_keys, fetched):
+            for i in missing[key]:
+                values[i] = value
+            if self._cacheable(key):
+                self._set("GET", key, value, epoch)
+        return values
+
+    def report_runtime_metrics(self) -> None:
+        CLIENT_SIDE_CACHE_SIZE.labels(self.redis_client_name).set(len(self.entries))
+
+
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """A :py:class:`redis.BlockingConnectionPool` that records checkout waits and connects.
+
+    Once :py:attr:`instrumentation` is set, which
+    :py:class:`RedisContextFactory` does, the pool reports how long checkouts
+    wait for a connection, checkouts that time out, and how long connecting
+    takes. See :py:mod:`baseplate.lib.pool_instrumentation`.
+
+    """
+
+    instrumentation: Optional[PoolInstrumentation] = None
+
+    def get_connection(self, command_name: str, *keys: Any, **options: Any) -> redis.Connection:
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return super().get_connection(command_name, *keys, **options)
+
+        # this mirrors BlockingConnectionPool.get_connection with timing added
+        self._checkpid()
+
+        start = perf_counter()
+        try:
+            connection = self.pool.get(block=True, timeout=self.timeout)
+        except queue.Empty:
+            instrumentation.checkout_timed_out(perf_counter() - start)
+            raise redis.ConnectionError("No connection available.")
+        instrumentation.checkout_waited(perf_counter() - start)
+
+        if connection is None:
+            connection = self.make_connection()
+
+        try:
+            self._connect(connection, instrumentation)
+            try:
+                if connection.can_read():
+                    raise redis.ConnectionError("Connection has data")
+            except redis.ConnectionError:
+                connection.disconnect()
+                instrumentation.connection_closed()
+                self._connect(connection, instrumentation)
+                if connection.can_read():
+                    raise redis.ConnectionError("Connection not ready")
+        except BaseException:
+            self.release(connection)
+            raise
+
+        return connection
+
+    def _connect(self, connection: redis.Connection, instrumentation: PoolInstrumentation) -> None:
+        if connection._sock:
+            return
+        with instrumentation.connecting():
+            connection.connect()
+
 
 def pool_from_config(
     app_config: config.RawConfig, prefix: str = "redis.", **kwargs: Any
@@ -115,7 +672,7 @@ def pool_from_config(
     if options.socket_timeout is not None:
         kwargs.setdefault("socket_timeout", options.socket_timeout.total_seconds())
 
-    return redis.BlockingConnectionPool.from_url(options.url, **kwargs)
+    return InstrumentedBlockingConnectionPool.from_url(options.url, **kwargs)
 
 
 class RedisClient(config.Parser):
@@ -128,11 +685,36 @@ class RedisClient(config.Parser):
     keyword argument to the `pool_from_config` function. Use this if your using a Redis
     host or proxy that doesn't support the `CLIENT SETNAME` function.
 
+    :param auto_pipeline: Gather single-key commands issued by concurrent
+        greenlets into shared pipelines. See :py:class:`AutoPipeliner`.
+    :param auto_pipeline_window: How long to wait for more commands before
+        sending an automatic pipeline.
+    :param batch_gets: Gather ``GET`` commands issued by concurrent greenlets
+        into shared ``MGET`` commands. See :py:class:`RedisContextFactory`.
+    :param batch_gets_window: How long to wait for more keys before sending a
+        batched ``MGET``.
+    :param client_side_cache_size: If greater than zero, keep up to this many
+        ``GET``/``HGETALL``/``MGET`` results in process. See
+        :py:class:`ClientSideCache`.
+    :param client_side_cache_ttl: The longest time to keep a cached value.
+    :param client_side_cache_prefixes: Only cache keys with these prefixes.
+
     See :py:func:`pool_from_config` for available configuration settings.
 
     """
 
-    def __init__(self, redis_client_name: str = "", **kwargs: Any):
+    def __init__(
+        self,
+        redis_client_name: str = "",
+        auto_pipeline: bool = False,
+        auto_pipeline_window: timedelta = timedelta(0),
+        batch_gets: bool = False,
+        batch_gets_window: timedelta = timedelta(0),
+        client_side_cache_size: int = 0,
+        client_side_cache_ttl: timedelta = timedelta(minutes=1),
+        client_side_cache_prefixes: Sequence[str] = ("",),
+        **kwargs: Any,
+    ):
         # This is for backwards compatibility. Originally we asked clients to
         # set the `client_name` attribute to get the `redis_client_name`
         # tag to appear on Prometheus metrics. Unfortunately this broke clients
@@ -144,13 +726,34 @@ class RedisClient(config.Parser):
 
         self.kwargs = kwargs
         self.redis_client_name = client_name
+        self.auto_pipeline = auto_pipeline
+        self.auto_pipeline_window = auto_pipeline_window
+        self.batch_gets = batch_gets
+        self.batch_gets_window = batch_gets_window
+        self.client_side_cache_size = client_side_cache_size
+        self.client_side_cache_ttl = client_side_cache_ttl
+        self.client_side_cache_prefixes = client_side_cache_prefixes
 
     def parse(self, key_path: str, raw_config: config.RawConfig) -> "RedisContextFactory":
         connection_pool = pool_from_config(raw_config, f"{key_path}.", **self.kwargs)
+        client_side_cache = None
+        if self.client_side_cache_size > 0:
+            client_side_cache = ClientSideCache(
+                connection_pool,
+                max_size=self.client_side_cache_size,
+                ttl=self.client_side_cache_ttl,
+                prefixes=self.client_side_cache_prefixes,
+                redis_client_name=self.redis_client_name,
+            )
         return RedisContextFactory(
             connection_pool=connection_pool,
             name=key_path,
             redis_client_name=self.redis_client_name,
+            auto_pipeline=self.auto_pipeline,
+            auto_pipeline_window=self.auto_pipeline_window,
+            batch_gets=self.batch_gets,
+            batch_gets_window=self.batch_gets_window,
+            client_side_cache=client_side_cache,
         )
 
 
@@ -165,6 +768,18 @@ class RedisContextFactory(ContextFactory):
     diagnostic information.
 
     :param connection_pool: A connection pool.
+    :param auto_pipeline: Gather single-key commands issued by concurrent
+        greenlets into shared pipelines. Spans and metrics are still recorded
+        for each command.
+    :param auto_pipeline_window: How long to wait for more commands before
+        sending an automatic pipeline.
+    :param batch_gets: Gather ``GET`` commands issued by concurrent greenlets
+        into shared ``MGET`` commands rather than making a round trip for each.
+        Each ``GET`` still gets its own span, tagged with the batch it was sent
+        in. See :py:class:`~baseplate.lib.batching.GetBatcher`.
+    :param batch_gets_window: How long to wait for more keys before sending a
+        batched ``MGET``.
+    :param client_side_cache: An optional in-process cache for reads.
 
     """
 
@@ -173,12 +788,40 @@ class RedisContextFactory(ContextFactory):
         connection_pool: redis.ConnectionPool,
         name: str = "redis",
         redis_client_name: str = "",
+        auto_pipeline: bool = False,
+        auto_pipeline_window: timedelta = timedelta(0),
+        client_side_cache: Optional[ClientSideCache] = None,
+        batch_gets: bool = False,
+        batch_gets_window: timedelta = timedelta(0),
     ):
         self.connection_pool = connection_pool
         self.name = name
         self.redis_client_name = redis_client_name
+        self.client_side_cache = client_side_cache
+        if (
+            isinstance(connection_pool, InstrumentedBlockingConnectionPool)
+            and connection_pool.instrumentation is None
+        ):
+            connection_pool.instrumentation = PoolInstrumentation("redis", name)
+
+        self.auto_pipeliner: Optional[AutoPipeliner] = None
+        if auto_pipeline:
+            self.auto_pipeliner = AutoPipeliner(
+                redis.StrictRedis(connection_pool=connection_pool), window=auto_pipeline_window
+            )
+
+        self.get_batcher: Optional[GetBatcher] = None
+        if batch_gets:
+            self.get_batcher = make_get_batcher(
+                redis.StrictRedis(connection_pool=connection_pool),
+                window=batch_gets_window,
+                redis_client_name=redis_client_name,
+            )
 
     def report_runtime_metrics(self, batch: metrics.Client) -> None:
+        if self.client_side_cache:
+            self.client_side_cache.report_runtime_metrics()
+
         if not isinstance(self.connection_pool, redis.BlockingConnectionPool):
             return
 
@@ -195,12 +838,30 @@ class RedisContextFactory(ContextFactory):
         batch.gauge("pool.in_use").replace(in_use)
         batch.gauge("pool.open_and_available").replace(open_connections_num - in_use)
 
+    def prewarm(self, connections: int) -> None:
+        pool = self.connection_pool
+        if not isinstance(pool, redis.BlockingConnectionPool):
+            return
+
+        # only take free slots so that warming never waits on the pool
+        taken = []
+        try:
+            for _ in range(min(connections, pool.pool.qsize())):
+                taken.append(pool.get_connection("PING"))
+        finally:
+            for connection in taken:
+                pool.release(connection)
+
     def make_object_for_context(self, name: str, span: Span) -> "MonitoredRedisConnection":
         return MonitoredRedisConnection(
             context_name=name,
             server_span=span,
             connection_pool=self.connection_pool,
             redis_client_name=self.redis_client_name,
+            auto_pipeliner=self.auto_pipeliner,
+            client_side_cache=self.client_side_cache,
+            request_memo=get_request_memo(span),
+            get_batcher=self.get_batcher,
         )
 
 
@@ -215,6 +876,14 @@ class MonitoredRedisConnection(redis.StrictRedis):
     :py:meth:`~baseplate.clients.redis.MonitoredRedisConnection.pipeline`
     method.
 
+    If the request has a :py:class:`~baseplate.lib.memo.RequestMemo`, the
+    results of read-only single-key commands like ``GET`` and ``HGETALL`` are
+    memoized for the rest of the request. Any other command, including
+    pipelines, invalidates everything memoized for this connection.
+
+    If a :py:class:`~baseplate.lib.batching.GetBatcher` is given, ``GET`` is
+    sent through it so that concurrent calls share one ``MGET``.
+
     """
 
     def __init__(
@@ -223,14 +892,47 @@ class MonitoredRedisConnection(redis.StrictRedis):
         server_span: Span,
         connection_pool: redis.ConnectionPool,
         redis_client_name: str = "",
+        auto_pipeliner: Optional[AutoPipeliner] = None,
+        client_side_cache: Optional[ClientSideCache] = None,
+        request_memo: Optional[RequestMemo] = None,
+        get_batcher: Optional[GetBatcher] = None,
     ):
         self.context_name = context_name
         self.server_span = server_span
         self.redis_client_name = redis_client_name
+        self.auto_pipeliner = auto_pipeliner
+        self.client_side_cache = client_side_cache
+        self.request_memo = request_memo
+        self.get_batcher = get_batcher
 
         super().__init__(connection_pool=connection_pool)
 
     def execute_command(self, *args: Any, **kwargs: Any) -> Any:
+        if self.request_memo is None:
+            return self._read_through_cache(*args, **kwargs)
+
+        if args[0].upper() in MEMOIZED_COMMANDS and len(args) > 1:
+            return self.request_memo.call(
+                self.context_name,
+                args[1],
+                lambda: self._read_through_cache(*args, **kwargs),
+                read=(args, tuple(sorted(kwargs.items()))),
+            )
+
+        # invalidate again once the write is done so that reads which were in
+        # flight while it happened don't stay memoized with the old value.
+        self.request_memo.invalidate(self.context_name)
+        try:
+            return self._read_through_cache(*args, **kwargs)
+        finally:
+            self.request_memo.invalidate(self.context_name)
+
+    def _read_through_cache(self, *args: Any, **kwargs: Any) -> Any:
+        if self.client_side_cache and args[0].upper() in ClientSideCache.COMMANDS:
+            return self.client_side_cache.execute_command(self._execute_command, *args, **kwargs)
+        return self._execute_command(*args, **kwargs)
+
+    def _execute_command(self, *args: Any, **kwargs: Any) -> Any:
         command = args[0]
         trace_name = f"{self.context_name}.{command}"
 
@@ -240,14 +942,22 @@ class MonitoredRedisConnection(redis.StrictRedis):
             f"{PROM_LABELS_PREFIX}_database": self.connection_pool.connection_kwargs.get("db", ""),
             f"{PROM_LABELS_PREFIX}_type": "standalone",
         }
-        with self.server_span.make_child(trace_name), ACTIVE_REQUESTS.labels(
+        with self.server_span.make_child(trace_name) as span, ACTIVE_REQUESTS.labels(
             **labels
         ).track_inprogress():
             start_time = perf_counter()
             success = "true"
 
             try:
-                res = super().execute_command(command, *args[1:], **kwargs)
+                if self.get_batcher and command.upper() == "GET" and len(args) == 2 and not kwargs:
+                    read = self.get_batcher.get(args[1])
+                    span.set_tag("batch_id", read.batch_id)
+                    span.set_tag("batch_size", read.batch_size)
+                    return read.value
+                if self.auto_pipeliner and can_auto_pipeline(args):
+                    res = self.auto_pipeliner.execute_command(command, *args[1:], **kwargs)
+                else:
+                    res = super().execute_command(command, *args[1:], **kwargs)
                 if isinstance(res, redis.RedisError):
                     success = "false"
                 return res
@@ -282,6 +992,8 @@ class MonitoredRedisConnection(redis.StrictRedis):
             transaction=transaction,
             shard_hint=shard_hint,
             redis_client_name=self.redis_client_name,
+            request_memo=self.request_memo,
+            memo_namespace=self.context_name,
         )
 
     # these commands are not yet implemented, but probably not unimplementable
@@ -298,15 +1010,22 @@ class MonitoredRedisPipeline(Pipeline):
         connection_pool: redis.ConnectionPool,
         response_callbacks: Dict,
         redis_client_name: str = "",
+        request_memo: Optional[RequestMemo] = None,
+        memo_namespace: str = "",
         **kwargs: Any,
     ):
         self.trace_name = trace_name
         self.server_span = server_span
         self.redis_client_name = redis_client_name
+        self.request_memo = request_memo
+        self.memo_namespace = memo_namespace
         super().__init__(connection_pool, response_callbacks, **kwargs)
 
     # pylint: disable=arguments-differ
     def execute(self, **kwargs: Any) -> Any:
+        if self.request_memo is not None:
+            self.request_memo.invalidate(self.memo_namespace)
+
         with self.server_span.make_child(self.trace_name):
             success = "true"
             start_time = perf_counter()
@@ -327,6 +1046,8 @@ class MonitoredRedisPipeline(Pipeline):
                 success = "false"
                 raise
             finally:
+                if self.request_memo is not None:
+                    self.request_memo.invalidate(self.memo_namespace)
                 ACTIVE_REQUESTS.labels(**labels).dec()
                 result_labels = {
                     **labels,
@@ -1,25 +1,38 @@
+import heapq
 import logging
 import random
+import threading
 
 from datetime import timedelta
 from time import perf_counter
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
+import gevent
 import rediscluster
 
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
 from redis import RedisError
 from rediscluster.pipeline import ClusterPipeline
 
 from baseplate import Span
 from baseplate.clients import ContextFactory
 from baseplate.clients.redis import ACTIVE_REQUESTS
+from baseplate.clients.redis import AutoPipeliner
+from baseplate.clients.redis import can_auto_pipeline
 from baseplate.clients.redis import LATENCY_SECONDS
 from baseplate.clients.redis import MAX_CONNECTIONS
 from baseplate.clients.redis import OPEN_CONNECTIONS
 from baseplate.clients.redis import PROM_LABELS_PREFIX
+from baseplate.clients.redis import PROM_PREFIX
 from baseplate.clients.redis import REQUESTS_TOTAL
 from baseplate.lib import config
 from baseplate.lib import metrics
@@ -111,29 +124,119 @@ MULTI_KEY_WRITE_COMMANDS = frozenset(["DEL"])
 MULTI_KEY_BATCH_WRITE_COMMANDS = frozenset(["MSET", "MSETNX"])
 
 
+HOT_KEY_SAMPLES_TOTAL = Counter(
+    "redis_client_hot_key_samples_total",
+    "Total number of keys sampled by the hot key tracker",
+    ["redis_hot_key_set"],
+)
+HOT_KEY_FLUSHES_TOTAL = Counter(
+    "redis_client_hot_key_flushes_total",
+    "Total number of times the hot key tracker wrote its counts to Redis",
+    ["redis_success"],
+)
+HOT_KEY_TRACKED_KEYS = Gauge(
+    "redis_client_hot_key_tracked_keys",
+    "Number of keys currently counted in memory by the hot key tracker",
+    ["redis_hot_key_set"],
+    multiprocess_mode="livesum",
+)
+
+KEYS_PER_NODE = Histogram(
+    f"{PROM_PREFIX}_cluster_keys_per_node",
+    "Number of keys sent to each node by multi-key fan-out commands",
+    [f"{PROM_LABELS_PREFIX}_command", f"{PROM_LABELS_PREFIX}_client_name"],
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500, 1000],
+)
+
+
+class SpaceSavingCounter:
+    """Approximate top-K counter using the Space-Saving algorithm.
+
+    At most ``capacity`` keys are counted. When a new key arrives and the
+    counter is full, the key with the smallest count is evicted and the new key
+    inherits its count, so counts may be overestimated by at most the count of
+    the evicted key but a key that is really hot can't be missed.
+
+    The coldest key is found with a min-heap of ``(count, key)`` entries.
+    Entries aren't updated in place: a new one is pushed whenever a count
+    changes and outdated ones are skipped when popped, so each addition takes
+    ``O(log capacity)`` time.
+
+    """
+
+    def __init__(self, capacity: int):
+        assert capacity > 0
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: str, count: int = 1) -> None:
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            self.counts[key] = self._pop_coldest() + count
+        self._push(key)
+
+    def _push(self, key: str) -> None:
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 2 * self.capacity:
+            # drop the outdated entries. this happens at most once every
+            # `capacity` additions, so its cost is amortized.
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_coldest(self) -> int:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                del self.counts[key]
+                return count
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        return heapq.nlargest(
+            n if n is not None else len(self.counts), self.counts.items(), key=lambda kv: kv[1]
+        )
+
+
 class HotKeyTracker:
     """
     HotKeyTracker can be used to help identify hot keys within Redis.
 
     Helper class that can be used to track our key usage and identify hot keys within
     Redis. Whenever we send a read command to Redis we have a (very low but configurable)
-    chance to increase a counter associated with that key in Redis. Over time this should
-    allow us to find keys that are disproportionaly represented by querying the sorted
-    set "baseplate-hot-key-tracker-reads" in Redis. A same sorted set by the name of
-    "baseplate-hot-key-tracker-writes" will be used to track write frequency.
+    chance to count that key. Sampled keys are counted in memory with a
+    :py:class:`SpaceSavingCounter` and a background thread periodically adds the
+    hottest keys to the sorted set "baseplate-hot-key-tracker-reads" in Redis in a
+    single pipeline, so tracking doesn't add round trips to requests. Over time this
+    should allow us to find keys that are disproportionaly represented by querying that
+    sorted set. A same sorted set by the name of "baseplate-hot-key-tracker-writes" will
+    be used to track write frequency.
 
     Both read and writes tracking have different configurable percentages, which means
     we can enable tracking for reads without enabling it for writes or have different
     percentages for them, which is useful when the number of reads is much higher than
     the number of writes to a cluster.
 
-    This feature can be turned off by setting the tracking percentage to zero, and should
-    probably only be enabled if we're actively debugging an issue or looking for a regression.
+    This feature can be turned off by setting the tracking percentage to zero. Because
+    counts are aggregated locally, the write load on Redis is bounded by ``max_keys``
+    per ``flush_interval`` regardless of the sample rate.
 
     The "baseplate-hot-key-tracker-reads" will have a TTL of 24 hours to ensure that
     older key counts don't interfere with new debugging sessions. This means that the
     sorted set and its contents will disappear in 24 hours after this feature is disabled
     and we stopped writing to it.
+
+    The tracker flushes outside of any request, so ``redis_client`` should be a plain
+    client rather than a monitored one, and a single tracker should be shared by every
+    request.
+
+    :param max_keys: How many distinct keys to count in memory per sorted set.
+    :param flush_interval: How often to write the counts to Redis.
     """
 
     def __init__(
@@ -141,54 +244,136 @@ class HotKeyTracker:
         redis_client: rediscluster.RedisCluster,
         track_reads_sample_rate: float,
         track_writes_sample_rate: float,
+        max_keys: int = 1000,
+        flush_interval: timedelta = timedelta(seconds=10),
     ):
         self.redis_client = redis_client
         self.track_reads_sample_rate = track_reads_sample_rate
         self.track_writes_sample_rate = track_writes_sample_rate
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
 
         self.reads_sorted_set_name = "baseplate-hot-key-tracker-reads"
         self.writes_sorted_set_name = "baseplate-hot-key-tracker-writes"
 
+        self.counters: Dict[str, SpaceSavingCounter] = {
+            self.reads_sorted_set_name: SpaceSavingCounter(max_keys),
+            self.writes_sorted_set_name: SpaceSavingCounter(max_keys),
+        }
+        self.lock = threading.Lock()
+        self.flusher: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
     def should_track_key_reads(self) -> bool:
         return randomizer.random() < self.track_reads_sample_rate
 
     def should_track_key_writes(self) -> bool:
         return randomizer.random() < self.track_writes_sample_rate
 
+    # ignore_errors is kept for compatibility: counting in memory can't fail
+    # and errors writing to Redis are handled by flush().
+    # pylint: disable=unused-argument
     def increment_keys_read_counter(self, key_list: List[str], ignore_errors: bool = True) -> None:
-        self._increment_hot_key_counter(key_list, self.reads_sorted_set_name, ignore_errors)
+        self._increment_hot_key_counter(key_list, self.reads_sorted_set_name)
 
+    # pylint: disable=unused-argument
     def increment_keys_written_counter(
         self, key_list: List[str], ignore_errors: bool = True
     ) -> None:
-        self._increment_hot_key_counter(key_list, self.writes_sorted_set_name, ignore_errors)
+        self._increment_hot_key_counter(key_list, self.writes_sorted_set_name)
 
-    def _increment_hot_key_counter(
-        self, key_list: List[str], set_name: str, ignore_errors: bool = True
-    ) -> None:
+    def _increment_hot_key_counter(self, key_list: List[str], set_name: str) -> None:
         if len(key_list) == 0:
             return
 
+        counter = self.counters[set_name]
+        with self.lock:
+            for key in key_list:
+                counter.add(key)
+        HOT_KEY_SAMPLES_TOTAL.labels(set_name).inc(len(key_list))
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self.flusher is not None or self.stopped.is_set():
+            return
+
+        with self.lock:
+            if self.flusher is None and not self.stopped.is_set():
+                self.flusher = threading.Thread(target=self._flush_periodically)
+                self.flusher.name = "hot key tracker"
+                self.flusher.daemon = True
+                self.flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while not self.stopped.wait(self.flush_interval.total_seconds()):
+            self.flush()
+        # don't lose what was counted since the last interval
+        self.flush()
+
+    def stop(self) -> None:
+        """Stop the background flusher and write out the remaining counts.
+
+        Keys counted after this are kept in memory until :py:meth:`flush` is
+        called.
+
+        """
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+
+    def top_keys(self, set_name: str, n: int = 10) -> List[Tuple[str, int]]:
+        """Return the hottest keys counted in memory since the last flush.
+
+        :param set_name: Either :py:attr:`reads_sorted_set_name` or
+            :py:attr:`writes_sorted_set_name`.
+        :param n: How many keys to return.
+
+        """
+        with self.lock:
+            return self.counters[set_name].most_common(n)
+
+    def flush(self, ignore_errors: bool = True) -> None:
+        """Add the in-memory counts to the sorted sets in Redis and reset them.
+
+        All counts are written in a single pipeline.
+
+        """
+        with self.lock:
+            pending = {}
+            for set_name, counter in self.counters.items():
+                if len(counter):
+                    pending[set_name] = counter.most_common()
+                self.counters[set_name] = SpaceSavingCounter(self.max_keys)
+                HOT_KEY_TRACKED_KEYS.labels(set_name).set(0)
+
+        if not pending:
+            return
+
         try:
-            with self.redis_client.pipeline(set_name) as pipe:
-                for key in key_list:
-                    pipe.zincrby(set_name, 1, key)
-                # Reset the TTL for the sorted set
-                pipe.expire(set_name, timedelta(hours=24))
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for set_name, counts in pending.items():
+                    for key, count in counts:
+                        pipe.zincrby(set_name, count, key)
+                    # Reset the TTL for the sorted set
+                    pipe.expire(set_name, timedelta(hours=24))
                 pipe.execute()
         except Exception as e:
-            # We don't want to disrupt this request even if key tracking fails, so just
+            HOT_KEY_FLUSHES_TOTAL.labels("false").inc()
+            # We don't want to kill the flusher even if key tracking fails, so just
             # log it.
             logger.exception(e)
             if not ignore_errors:
                 raise
+        else:
+            HOT_KEY_FLUSHES_TOTAL.labels("true").inc()
 
     def maybe_track_key_usage(self, args: List[str]) -> None:
         """Probabilistically track usage of the keys in this command.
 
         If we have enabled key usage tracing *and* this command is withing the
-        percentage of commands we want to track, then write it to a sorted set
-        so we can keep track of the most accessed keys.
+        percentage of commands we want to track, then count it so we can keep track
+        of the most accessed keys.
         """
         if len(args) == 0:
             return
@@ -210,6 +395,17 @@ class HotKeyTracker:
                 # These commands follow key value [key value...] format
                 self.increment_keys_written_counter(args[1::2])
 
+    def report_runtime_metrics(self) -> None:
+        with self.lock:
+            for set_name, counter in self.counters.items():
+                HOT_KEY_TRACKED_KEYS.labels(set_name).set(len(counter))
+
+
+# connections made directly rather than by ClusterRedisContextFactory share one
+# tracker, and so one flusher thread, per client name and connection pool.
+_shared_hot_key_trackers: Dict[Tuple[Any, ...], HotKeyTracker] = {}
+_shared_hot_key_trackers_lock = threading.Lock()
+
 
 # We want to be able to combine blocking behaviour with the ability to read from replicas
 # Unfortunately this is not provide as-is so we combine two connection pool classes to provide
@@ -337,12 +533,24 @@ class ClusterRedisClient(config.Parser):
     keyword argument to the `pool_from_config` function. Use this if your using a Redis
     host or proxy that doesn't support the `CLIENT SETNAME` function.
 
+    :param auto_pipeline: Gather single-key commands issued by concurrent
+        greenlets into shared pipelines. See
+        :py:class:`~baseplate.clients.redis.AutoPipeliner`.
+    :param auto_pipeline_window: How long to wait for more commands before
+        sending an automatic pipeline.
+
     This is meant to be used with
     :py:meth:`baseplate.Baseplate.configure_context`.
     See :py:func:`cluster_pool_from_config` for available configuration settings.
     """
 
-    def __init__(self, redis_client_name: str = "", **kwargs: Any):
+    def __init__(
+        self,
+        redis_client_name: str = "",
+        auto_pipeline: bool = False,
+        auto_pipeline_window: timedelta = timedelta(0),
+        **kwargs: Any,
+    ):
         # This is for backwards compatibility. Originally we asked clients to
         # set the `client_name` attribute to get the `redis_client_name`
         # tag to appear on Prometheus metrics. Unfortunately this broke clients
@@ -354,11 +562,17 @@ class ClusterRedisClient(config.Parser):
 
         self.kwargs = kwargs
         self.redis_client_name = client_name
+        self.auto_pipeline = auto_pipeline
+        self.auto_pipeline_window = auto_pipeline_window
 
     def parse(self, key_path: str, raw_config: config.RawConfig) -> "ClusterRedisContextFactory":
         connection_pool = cluster_pool_from_config(raw_config, f"{key_path}.", **self.kwargs)
         return ClusterRedisContextFactory(
-            connection_pool, key_path, redis_client_name=self.redis_client_name
+            connection_pool,
+            key_path,
+            redis_client_name=self.redis_client_name,
+            auto_pipeline=self.auto_pipeline,
+            auto_pipeline_window=self.auto_pipeline_window,
         )
 
 
@@ -372,6 +586,11 @@ class ClusterRedisContextFactory(ContextFactory):
     provided :py:class:`rediscluster.ClusterConnectionPool` and automatically record
     diagnostic information.
     :param connection_pool: A connection pool.
+    :param auto_pipeline: Gather single-key commands issued by concurrent
+        greenlets into shared pipelines, grouped by node. Spans and metrics are
+        still recorded for each command.
+    :param auto_pipeline_window: How long to wait for more commands before
+        sending an automatic pipeline.
     """
 
     def __init__(
@@ -379,12 +598,33 @@ class ClusterRedisContextFactory(ContextFactory):
         connection_pool: rediscluster.ClusterConnectionPool,
         name: str = "redis",
         redis_client_name: str = "",
+        auto_pipeline: bool = False,
+        auto_pipeline_window: timedelta = timedelta(0),
     ):
         self.connection_pool = connection_pool
         self.name = name
         self.redis_client_name = redis_client_name
 
+        # building a RedisCluster client is relatively expensive (it copies the
+        # response callback tables among other things) so we do it once here and
+        # give each request a lightweight view of it.
+        self.redis_client = rediscluster.RedisCluster(
+            connection_pool=connection_pool,
+            read_from_replicas=getattr(connection_pool, "read_from_replicas", False),
+            skip_full_coverage_check=getattr(connection_pool, "skip_full_coverage_check", False),
+        )
+        self.hot_key_tracker = HotKeyTracker(
+            self.redis_client,
+            getattr(connection_pool, "track_key_reads_sample_rate", 0),
+            getattr(connection_pool, "track_key_writes_sample_rate", 0),
+        )
+        self.auto_pipeliner: Optional[AutoPipeliner] = None
+        if auto_pipeline:
+            self.auto_pipeliner = AutoPipeliner(self.redis_client, window=auto_pipeline_window)
+
     def report_runtime_metrics(self, batch: metrics.Client) -> None:
+        self.hot_key_tracker.report_runtime_metrics()
+
         if not isinstance(self.connection_pool, rediscluster.ClusterBlockingConnectionPool):
             return
 
@@ -397,13 +637,13 @@ class ClusterRedisContextFactory(ContextFactory):
         batch.gauge("pool.open_connections").replace(open_connections_num)
 
     def make_object_for_context(self, name: str, span: Span) -> "MonitoredRedisClusterConnection":
-        return MonitoredRedisClusterConnection(
+        return MonitoredRedisClusterConnection.for_context(
+            self.redis_client,
             name,
             span,
-            self.connection_pool,
-            getattr(self.connection_pool, "track_key_reads_sample_rate", 0),
-            getattr(self.connection_pool, "track_key_writes_sample_rate", 0),
+            self.hot_key_tracker,
             self.redis_client_name,
+            auto_pipeliner=self.auto_pipeliner,
         )
 
 
@@ -425,14 +665,14 @@ class MonitoredRedisClusterConnection(rediscluster.RedisCluster):
         track_key_reads_sample_rate: float = 0,
         track_key_writes_sample_rate: float = 0,
         redis_client_name: str = "",
+        auto_pipeliner: Optional[AutoPipeliner] = None,
+        hot_key_tracker: Optional[HotKeyTracker] = None,
     ):
         self.context_name = context_name
         self.server_span = server_span
+        self.auto_pipeliner = auto_pipeliner
         self.track_key_reads_sample_rate = track_key_reads_sample_rate
         self.track_key_writes_sample_rate = track_key_writes_sample_rate
-        self.hot_key_tracker = HotKeyTracker(
-            self, self.track_key_reads_sample_rate, self.track_key_writes_sample_rate
-        )
         self.redis_client_name = redis_client_name
 
         super().__init__(
@@ -441,6 +681,61 @@ class MonitoredRedisClusterConnection(rediscluster.RedisCluster):
             skip_full_coverage_check=connection_pool.skip_full_coverage_check,
         )
 
+        if hot_key_tracker is not None:
+            self.hot_key_tracker = hot_key_tracker
+            return
+
+        key = (
+            context_name,
+            connection_pool,
+            self.track_key_reads_sample_rate,
+            self.track_key_writes_sample_rate,
+        )
+        with _shared_hot_key_trackers_lock:
+            tracker = _shared_hot_key_trackers.get(key)
+            if tracker is None:
+                # the tracker flushes in the background, outside of any request's span
+                unmonitored_client = rediscluster.client.RedisCluster.__new__(
+                    rediscluster.client.RedisCluster
+                )
+                unmonitored_client.__dict__.update(self.__dict__)
+                tracker = HotKeyTracker(
+                    unmonitored_client,
+                    self.track_key_reads_sample_rate,
+                    self.track_key_writes_sample_rate,
+                )
+                _shared_hot_key_trackers[key] = tracker
+        self.hot_key_tracker = tracker
+
+    @classmethod
+    def for_context(
+        cls,
+        redis_client: rediscluster.RedisCluster,
+        context_name: str,
+        server_span: Span,
+        hot_key_tracker: HotKeyTracker,
+        redis_client_name: str = "",
+        auto_pipeliner: Optional[AutoPipeliner] = None,
+    ) -> "MonitoredRedisClusterConnection":
+        """Make a connection for one request on top of a long-lived client.
+
+        The returned connection shares the connection pool, slot map, response
+        callbacks and hot key tracker of ``redis_client`` and only binds the
+        context name and span, which is much cheaper than constructing a new
+        connection for every request.
+
+        """
+        connection = cls.__new__(cls)
+        connection.__dict__.update(redis_client.__dict__)
+        connection.context_name = context_name
+        connection.server_span = server_span
+        connection.track_key_reads_sample_rate = hot_key_tracker.track_reads_sample_rate
+        connection.track_key_writes_sample_rate = hot_key_tracker.track_writes_sample_rate
+        connection.hot_key_tracker = hot_key_tracker
+        connection.redis_client_name = redis_client_name
+        connection.auto_pipeliner = auto_pipeliner
+        return connection
+
     def execute_command(self, *args: Any, **kwargs: Any) -> Any:
         command = args[0]
         trace_name = f"{self.context_name}.{command}"
@@ -459,7 +754,10 @@ class MonitoredRedisClusterConnection(rediscluster.RedisCluster):
 
             try:
                 with ACTIVE_REQUESTS.labels(**labels).track_inprogress():
-                    res = super().execute_command(command, *args[1:], **kwargs)
+                    if self.auto_pipeliner and can_auto_pipeline(args):
+                        res = self.auto_pipeliner.execute_command(command, *args[1:], **kwargs)
+                    else:
+                        res = super().execute_command(command, *args[1:], **kwargs)
                 if isinstance(res, RedisError):
                     success = "false"
             except:  # noqa: E722
@@ -474,6 +772,149 @@ class MonitoredRedisClusterConnection(rediscluster.RedisCluster):
 
         return res
 
+    def _group_by_node(self, keys: Sequence[Any]) -> Dict[str, Dict[int, List[int]]]:
+        # node name -> slot -> positions of the keys in that slot
+        groups: Dict[str, Dict[int, List[int]]] = {}
+        for i, key in enumerate(keys):
+            slot = self.connection_pool.nodes.keyslot(key)
+            node = self.connection_pool.get_master_node_by_slot(slot)
+            groups.setdefault(node["name"], {}).setdefault(slot, []).append(i)
+        return groups
+
+    def _execute_on_node(
+        self,
+        command: str,
+        node_name: str,
+        key_count: int,
+        commands: List[Tuple[Any, ...]],
+        read_from_replicas: bool,
+    ) -> List[Any]:
+        KEYS_PER_NODE.labels(command, self.redis_client_name).observe(key_count)
+        labels = {
+            f"{PROM_LABELS_PREFIX}_command": command,
+            f"{PROM_LABELS_PREFIX}_client_name": self.redis_client_name,
+            f"{PROM_LABELS_PREFIX}_database": self.connection_pool.connection_kwargs.get("db", ""),
+            f"{PROM_LABELS_PREFIX}_type": "cluster",
+        }
+
+        with self.server_span.make_child(f"{self.context_name}.{command}") as span:
+            span.set_tag("redis.node", node_name)
+            span.set_tag("redis.key_count", key_count)
+            start_time = perf_counter()
+            success = "true"
+            try:
+                with ACTIVE_REQUESTS.labels(**labels).track_inprogress():
+                    # the underlying cluster pipeline follows MOVED/ASK redirects
+                    pipe = super().pipeline(read_from_replicas=read_from_replicas)
+                    for args in commands:
+                        pipe.execute_command(*args)
+                    return pipe.execute()
+            except:  # noqa: E722
+                success = "false"
+                raise
+            finally:
+                result_labels = {**labels, f"{PROM_LABELS_PREFIX}_success": success}
+                REQUESTS_TOTAL.labels(**result_labels).inc()
+                LATENCY_SECONDS.labels(**result_labels).observe(perf_counter() - start_time)
+
+    def _fan_out(
+        self,
+        command: str,
+        keys: Sequence[Any],
+        make_command: Callable[[List[int]], Tuple[Any, ...]],
+        read_from_replicas: bool = False,
+    ) -> List[Tuple[List[List[int]], List[Any]]]:
+        calls = []
+        for node_name, slots in self._group_by_node(keys).items():
+            positions = list(slots.values())
+            commands = [make_command(slot_positions) for slot_positions in positions]
+            key_count = sum(len(slot_positions) for slot_positions in positions)
+            calls.append(
+                (
+                    positions,
+                    (command, node_name, key_count, commands, read_from_replicas),
+                )
+            )
+
+        if len(calls) == 1:
+            positions, args = calls[0]
+            return [(positions, self._execute_on_node(*args))]
+
+        greenlets = [gevent.spawn(self._execute_on_node, *args) for _, args in calls]
+        gevent.joinall(greenlets, raise_error=True)
+        return [(positions, g.value) for (positions, _), g in zip(calls, greenlets)]
+
+    def mget_many(self, keys: Sequence[Any]) -> List[Any]:
+        """Get the values of many keys, wherever they live in the cluster.
+
+        Keys are grouped by hash slot and each node gets one pipeline with an
+        ``MGET`` per slot. The nodes are queried concurrently, each in its own
+        span, and the values are returned in the same order as ``keys``.
+
+        """
+        keys = list(keys)
+        values: List[Any] = [None] * len(keys)
+        if not keys:
+            return values
+
+        results = self._fan_out(
+            "mget_many",
+            keys,
+            lambda positions: ("MGET", *(keys[i] for i in positions)),
+            read_from_replicas=self.read_from_replicas,
+        )
+        for positions, responses in results:
+            for slot_positions, response in zip(positions, responses):
+                for i, value in zip(slot_positions, response):
+                    values[i] = value
+
+        self.hot_key_tracker.maybe_track_key_usage(["MGET", *keys])
+        return values
+
+    def mset_many(self, mapping: Mapping[Any, Any]) -> bool:
+        """Set many keys, wherever they live in the cluster.
+
+        Keys are grouped by hash slot and each node gets one pipeline with an
+        ``MSET`` per slot. The nodes are written concurrently, each in its own
+        span. This is not atomic across slots.
+
+        """
+        items = list(mapping.items())
+        if not items:
+            return True
+
+        keys = [key for key, _ in items]
+
+        def make_command(positions: List[int]) -> Tuple[Any, ...]:
+            args: List[Any] = ["MSET"]
+            for i in positions:
+                args.extend(items[i])
+            return tuple(args)
+
+        self._fan_out("mset_many", keys, make_command)
+        self.hot_key_tracker.maybe_track_key_usage(["MSET", *(x for item in items for x in item)])
+        return True
+
+    def delete_many(self, keys: Sequence[Any]) -> int:
+        """Delete many keys, wherever they live in the cluster.
+
+        Keys are grouped by hash slot and each node gets one pipeline with a
+        ``DEL`` per slot. The nodes are called concurrently, each in its own
+        span.
+
+        :returns: The number of keys that were deleted.
+
+        """
+        keys = list(keys)
+        if not keys:
+            return 0
+
+        results = self._fan_out(
+            "delete_many", keys, lambda positions: ("DEL", *(keys[i] for i in positions))
+        )
+        self.hot_key_tracker.maybe_track_key_usage(["DEL", *keys])
+        return sum(sum(responses) for _, responses in results)
+
     # pylint: disable=arguments-differ
     def pipeline(self, name: str) -> "MonitoredClusterRedisPipeline":
         """Create a pipeline.
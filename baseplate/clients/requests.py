@@ -3,6 +3,7 @@ import ipaddress
 import sys
 import time
 
+from http.cookiejar import Cookie
 from typing import Any
 from typing import Optional
 from typing import Type
@@ -10,6 +11,9 @@ from typing import Union
 
 from advocate import AddrValidator
 from advocate import ValidatingHTTPAdapter
+from advocate.connectionpool import ValidatingHTTPConnectionPool
+from advocate.connectionpool import ValidatingHTTPSConnectionPool
+from advocate.poolmanager import ValidatingPoolManager
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
 from prometheus_client import Counter
 from prometheus_client import Gauge
@@ -18,7 +22,10 @@ from requests import PreparedRequest
 from requests import Request
 from requests import Response
 from requests import Session
-from requests.adapters import HTTPAdapter
+from requests.adapters import BaseAdapter
+from requests.adapters import DEFAULT_POOLBLOCK
+from requests.cookies import RequestsCookieJar
+from urllib3.util.retry import Retry
 
 from baseplate import Span
 from baseplate.clients import ContextFactory
@@ -29,9 +36,113 @@ from baseplate.lib.prometheus_metrics import getHTTPSuccessLabel
 RequestsInstrumentor().instrument()
 
 
+class _IdleTimeoutPoolMixin:
+    # set by the pool manager after the pool is created. the connections and
+    # their queue belong to urllib3's HTTPConnectionPool.
+    idle_timeout: Optional[float] = None
+
+    def _get_conn(self, timeout: Optional[float] = None) -> Any:
+        conn = super()._get_conn(timeout)  # type: ignore
+        idle_since = getattr(conn, "idle_since", None)
+        if (
+            self.idle_timeout is not None
+            and idle_since is not None
+            and conn.sock is not None
+            and time.monotonic() - idle_since > self.idle_timeout
+        ):
+            # the connection reopens itself the next time it's used
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn: Any) -> None:
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+        super()._put_conn(conn)  # type: ignore
+
+
+class _IdleTimeoutHTTPConnectionPool(_IdleTimeoutPoolMixin, ValidatingHTTPConnectionPool):
+    pass
+
+
+class _IdleTimeoutHTTPSConnectionPool(_IdleTimeoutPoolMixin, ValidatingHTTPSConnectionPool):
+    pass
+
+
+class _IdleTimeoutPoolManager(ValidatingPoolManager):
+    def __init__(self, *args: Any, idle_timeout: Optional[float] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.idle_timeout = idle_timeout
+        self.pool_classes_by_scheme = {
+            "http": _IdleTimeoutHTTPConnectionPool,
+            "https": _IdleTimeoutHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, *args: Any, **kwargs: Any) -> Any:
+        pool = super()._new_pool(*args, **kwargs)
+        pool.idle_timeout = self.idle_timeout
+        return pool
+
+
+class KeepAliveHTTPAdapter(ValidatingHTTPAdapter):
+    """A :py:class:`~advocate.ValidatingHTTPAdapter` that retires idle connections.
+
+    Servers close keep-alive connections that sit idle for too long. Reusing
+    one that the server is about to close or has just closed fails the
+    request, so pooled connections that have been idle for longer than
+    ``keepalive_timeout`` are reconnected before they're used instead.
+
+    :param keepalive_timeout: How long, in seconds, a pooled connection may sit
+        idle and still be reused. ``None`` reuses connections regardless.
+
+    """
+
+    __attrs__ = ValidatingHTTPAdapter.__attrs__ + ["keepalive_timeout"]
+
+    def __init__(self, *args: Any, keepalive_timeout: Optional[float] = None, **kwargs: Any):
+        # HTTPAdapter.__init__ builds the pool manager, which needs this
+        self.keepalive_timeout = keepalive_timeout
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(
+        self, connections: int, maxsize: int, block: bool = DEFAULT_POOLBLOCK, **pool_kwargs: Any
+    ) -> None:
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _IdleTimeoutPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            validator=self._validator,
+            idle_timeout=self.keepalive_timeout,
+            **pool_kwargs,
+        )
+
+
+_FILTER_SPEC = {
+    "ip_allowlist": config.Optional(config.TupleOf(ipaddress.ip_network)),
+    "ip_denylist": config.Optional(config.TupleOf(ipaddress.ip_network)),
+    "port_allowlist": config.Optional(config.TupleOf(int)),
+    "port_denylist": config.Optional(config.TupleOf(int)),
+    "hostname_denylist": config.Optional(config.TupleOf(config.String)),
+    "allow_ipv6": config.Optional(config.Boolean, default=False),
+}
+
+
+def _address_validator(options: config.ConfigNamespace) -> AddrValidator:
+    return AddrValidator(
+        ip_whitelist=options.ip_allowlist,
+        ip_blacklist=options.ip_denylist,
+        port_whitelist=options.port_allowlist,
+        port_blacklist=options.port_denylist,
+        hostname_blacklist=options.hostname_denylist,
+        allow_ipv6=options.allow_ipv6,
+    )
+
+
 def http_adapter_from_config(
     app_config: config.RawConfig, prefix: str, **kwargs: Any
-) -> HTTPAdapter:
+) -> KeepAliveHTTPAdapter:
     """Make an HTTPAdapter from a configuration dictionary.
 
     The keys useful to :py:func:`http_adapter_from_config` should be prefixed,
@@ -47,8 +158,17 @@ def http_adapter_from_config(
       (default: 10).
     * ``max_retries``: How many times to retry DNS lookups or connection
       attempts, but never sending data (default: 0).
+    * ``retry_statuses``: A comma-delimited list of HTTP status codes that
+      should also be retried, up to ``max_retries`` times. Only idempotent
+      methods are retried for a status (default: none).
+    * ``retry_backoff``: The base of the exponential backoff between retries,
+      e.g. ``100 milliseconds`` (default: no backoff).
     * ``pool_block``: Whether the connection pool will block when trying to get
       a connection (default: false).
+    * ``keepalive_timeout``: How long a pooled connection may sit idle and
+      still be reused, e.g. ``30 seconds``. Set this shorter than the server's
+      keep-alive timeout so connections the server is closing aren't reused
+      (default: reuse idle connections regardless).
 
     Additionally, the rules for Advocate's address filtering can be configured
     with the ``filter`` sub-keys:
@@ -75,15 +195,11 @@ def http_adapter_from_config(
             "pool_connections": config.Optional(config.Integer, default=10),
             "pool_maxsize": config.Optional(config.Integer, default=10),
             "max_retries": config.Optional(config.Integer, default=0),
+            "retry_statuses": config.Optional(config.TupleOf(config.Integer), default=()),
+            "retry_backoff": config.Optional(config.Timespan),
             "pool_block": config.Optional(config.Boolean, default=False),
-            "filter": {
-                "ip_allowlist": config.Optional(config.TupleOf(ipaddress.ip_network)),
-                "ip_denylist": config.Optional(config.TupleOf(ipaddress.ip_network)),
-                "port_allowlist": config.Optional(config.TupleOf(int)),
-                "port_denylist": config.Optional(config.TupleOf(int)),
-                "hostname_denylist": config.Optional(config.TupleOf(config.String)),
-                "allow_ipv6": config.Optional(config.Boolean, default=False),
-            },
+            "keepalive_timeout": config.Optional(config.Timespan),
+            "filter": _FILTER_SPEC,
         }
     )
     options = parser.parse(prefix[:-1], app_config)
@@ -92,23 +208,28 @@ def http_adapter_from_config(
         kwargs.setdefault("pool_connections", options.pool_connections)
     if options.pool_maxsize is not None:
         kwargs.setdefault("pool_maxsize", options.pool_maxsize)
+    if options.retry_statuses or options.retry_backoff:
+        kwargs.setdefault(
+            "max_retries",
+            Retry(
+                total=options.max_retries,
+                read=False,
+                status_forcelist=options.retry_statuses,
+                backoff_factor=(
+                    options.retry_backoff.total_seconds() if options.retry_backoff else 0
+                ),
+                raise_on_status=False,
+            ),
+        )
     if options.max_retries is not None:
         kwargs.setdefault("max_retries", options.max_retries)
     if options.pool_block is not None:
         kwargs.setdefault("pool_block", options.pool_block)
+    if options.keepalive_timeout is not None:
+        kwargs.setdefault("keepalive_timeout", options.keepalive_timeout.total_seconds())
 
-    kwargs.setdefault(
-        "validator",
-        AddrValidator(
-            ip_whitelist=options.filter.ip_allowlist,
-            ip_blacklist=options.filter.ip_denylist,
-            port_whitelist=options.filter.port_allowlist,
-            port_blacklist=options.filter.port_denylist,
-            hostname_blacklist=options.filter.hostname_denylist,
-            allow_ipv6=options.filter.allow_ipv6,
-        ),
-    )
-    return ValidatingHTTPAdapter(**kwargs)
+    kwargs.setdefault("validator", _address_validator(options.filter))
+    return KeepAliveHTTPAdapter(**kwargs)
 
 
 PROM_NAMESPACE = "http_client"
@@ -141,20 +262,52 @@ ACTIVE_REQUESTS = Gauge(
 )
 
 
+class _DiscardingCookieJar(RequestsCookieJar):
+    def set_cookie(self, cookie: Cookie, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class _IsolatedSession(Session):
+    """A :py:class:`requests.Session` that can be shared between requests.
+
+    Sessions persist cookies from their responses and send them with later
+    requests, which would muddle cookies between unrelated requests. This one
+    discards them instead, so a single session can send every request made
+    with an adapter. Cookies set during a chain of redirects are still
+    followed since requests tracks those on the request itself.
+
+    """
+
+    def __init__(self, adapter: BaseAdapter):
+        super().__init__()
+        self.cookies = _DiscardingCookieJar()
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+
 class BaseplateSession:
     """A proxy for :py:class:`requests.Session`.
 
     Requests sent with this client will be instrumented automatically.
 
+    :param session: The session to send requests with. It must not persist
+        cookies between requests. By default, one is made for ``adapter``.
+
     """
 
     def __init__(
-        self, adapter: HTTPAdapter, name: str, span: Span, client_name: Optional[str] = None
+        self,
+        adapter: BaseAdapter,
+        name: str,
+        span: Span,
+        client_name: Optional[str] = None,
+        session: Optional[Session] = None,
     ) -> None:
         self.adapter = adapter
         self.name = name
         self.span = span
         self.client_name = client_name
+        self.session = session if session is not None else _IsolatedSession(adapter)
 
     def delete(self, url: str, **kwargs: Any) -> Response:
         """Send a DELETE request.
@@ -261,15 +414,9 @@ class BaseplateSession:
             ) as span, ACTIVE_REQUESTS.labels(**active_request_label_values).track_inprogress():
                 self._add_span_context(span, request)
 
-                # we cannot re-use the same session every time because sessions re-use the same
-                # CookieJar and so we'd muddle cookies cross-request. if the application wants
-                # to keep track of cookies, it should do so itself.
-                #
-                # note: we're still getting connection pooling because we're re-using the adapter.
-                session = Session()
-                session.mount("http://", self.adapter)
-                session.mount("https://", self.adapter)
-                response = session.send(request, **kwargs)
+                # the session discards cookies so they aren't muddled cross-request. if the
+                # application wants to keep track of cookies, it should do so itself.
+                response = self.session.send(request, **kwargs)
 
                 http_status_code = response.status_code
                 span.set_tag("http.status_code", http_status_code)
@@ -325,10 +472,10 @@ class RequestsContextFactory(ContextFactory):
     :py:class:`~requests.adapters.HTTPAdapter` connection pools and
     automatically record diagnostic information.
 
-    Note that though the connection pool is shared across calls, a new
-    :py:class:`~requests.Session` is created for each request so that cookies
-    and other state are not accidentally shared between requests. If you do
-    want to persist state, you will need to do it in your application.
+    Note that though the connection pool and a :py:class:`~requests.Session`
+    are shared across calls, the session discards cookies so that they are not
+    accidentally shared between requests. If you do want to persist state, you
+    will need to do it in your application.
 
     :param adapter: A transport adapter for making HTTP requests. See
         :py:func:`http_adapter_from_config`.
@@ -341,16 +488,19 @@ class RequestsContextFactory(ContextFactory):
 
     def __init__(
         self,
-        adapter: HTTPAdapter,
+        adapter: BaseAdapter,
         session_cls: Type[BaseplateSession],
         client_name: Optional[str] = None,
     ) -> None:
         self.adapter = adapter
         self.session_cls = session_cls
         self.client_name = client_name
+        self.session = _IsolatedSession(adapter)
 
     def make_object_for_context(self, name: str, span: Span) -> BaseplateSession:
-        return self.session_cls(self.adapter, name, span, client_name=self.client_name)
+        return self.session_cls(
+            self.adapter, name, span, client_name=self.client_name, session=self.session
+        )
 
 
 class InternalRequestsClient(config.Parser):
@@ -385,6 +535,12 @@ class InternalRequestsClient(config.Parser):
         if "validator" in kwargs:
             raise ValueError("validator is hard-coded for internal clients")
 
+    def adapter_from_config(
+        self, raw_config: config.RawConfig, prefix: str, **kwargs: Any
+    ) -> BaseAdapter:
+        """Make the transport adapter requests will be sent with."""
+        return http_adapter_from_config(raw_config, prefix, **kwargs)
+
     def parse(self, key_path: str, raw_config: config.RawConfig) -> RequestsContextFactory:
         # use advocate to ensure this client only ever gets used
         # with internal services over the internal network.
@@ -403,7 +559,7 @@ class InternalRequestsClient(config.Parser):
             allow_ipv6=False,
         )
 
-        adapter = http_adapter_from_config(
+        adapter = self.adapter_from_config(
             raw_config, prefix=f"{key_path}.", validator=validator, **self.kwargs
         )
         return RequestsContextFactory(
@@ -432,8 +588,14 @@ class ExternalRequestsClient(config.Parser):
         self.client_name = client_name
         self.kwargs = kwargs
 
+    def adapter_from_config(
+        self, raw_config: config.RawConfig, prefix: str, **kwargs: Any
+    ) -> BaseAdapter:
+        """Make the transport adapter requests will be sent with."""
+        return http_adapter_from_config(raw_config, prefix, **kwargs)
+
     def parse(self, key_path: str, raw_config: config.RawConfig) -> RequestsContextFactory:
-        adapter = http_adapter_from_config(raw_config, f"{key_path}.", **self.kwargs)
+        adapter = self.adapter_from_config(raw_config, f"{key_path}.", **self.kwargs)
         return RequestsContextFactory(
             adapter, session_cls=BaseplateSession, client_name=self.client_name
         )
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import contextlib
+import functools
+import hashlib
+import itertools
+import logging
 import re
 import typing
 
+from datetime import timedelta
 from time import perf_counter
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
 from typing import Optional
 from typing import Sequence
 from typing import Tuple
@@ -16,6 +26,11 @@ from prometheus_client import Gauge
 from prometheus_client import Histogram
 from sqlalchemy import create_engine
 from sqlalchemy import event
+from sqlalchemy import insert
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.engine import Connection
 from sqlalchemy.engine import Engine
 from sqlalchemy.engine import ExceptionContext
@@ -23,6 +38,10 @@ from sqlalchemy.engine.interfaces import ExecutionContext
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import Session
 from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Delete
+from sqlalchemy.sql import Insert
+from sqlalchemy.sql import Update
+from sqlalchemy.util import queue as sqla_queue
 
 from baseplate import _ExcInfo
 from baseplate import Span
@@ -30,10 +49,14 @@ from baseplate import SpanObserver
 from baseplate.clients import ContextFactory
 from baseplate.lib import config
 from baseplate.lib import metrics
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 from baseplate.lib.prometheus_metrics import default_latency_buckets
 from baseplate.lib.secrets import SecretsStore
 
 
+logger = logging.getLogger(__name__)
+
+
 def engine_from_config(
     app_config: config.RawConfig,
     secrets: Optional[SecretsStore] = None,
@@ -67,21 +90,65 @@ def engine_from_config(
         simultaneously.  Requires SQLAlchemy 1.3.
     * ``pool_size`` (optional) : The number of connections that can be saved in the pool.
     * ``max_overflow`` (optional) : Max connections that can be opened beyond the pool size.
+    * ``query_cache_size`` (optional) : How many compiled statements to cache,
+        so that statements run repeatedly skip compilation. Set to 0 to disable
+        the cache. SQLAlchemy's default is 500.
+
+    Databases that would use a :py:class:`~sqlalchemy.pool.QueuePool` get an
+    :py:class:`InstrumentedQueuePool` instead, unless ``poolclass`` is passed.
+
+    """
+    options = _parse_engine_options(app_config, prefix)
+    return _create_engine(options.url, options, secrets, kwargs)
+
+
+def replica_engines_from_config(
+    app_config: config.RawConfig,
+    secrets: Optional[SecretsStore] = None,
+    prefix: str = "database.",
+    **kwargs: Any,
+) -> List[Engine]:
+    """Make an :py:class:`~sqlalchemy.engine.Engine` for each read replica in a config.
+
+    This reads the same keys as :py:func:`engine_from_config` plus:
+
+    * ``replica_urls`` (optional): a comma-delimited list of connection URLs
+        for read replicas of the database at ``url``. The credentials and
+        pool settings are shared with the primary.
+
+    :returns: An engine per replica, which is an empty list if no replicas are
+        configured.
 
     """
+    options = _parse_engine_options(app_config, prefix)
+    return [_create_engine(url, options, secrets, kwargs) for url in options.replica_urls]
+
+
+def _parse_engine_options(app_config: config.RawConfig, prefix: str) -> config.ConfigNamespace:
     assert prefix.endswith(".")
     parser = config.SpecParser(
         {
             "url": config.String,
+            "replica_urls": config.Optional(config.TupleOf(config.String), default=[]),
             "credentials_secret": config.Optional(config.String),
             "pool_recycle": config.Optional(config.Integer),
             "pool_pre_ping": config.Optional(config.Boolean),
             "pool_size": config.Optional(config.Integer),
             "max_overflow": config.Optional(config.Integer),
+            "query_cache_size": config.Optional(config.Integer),
         }
     )
-    options = parser.parse(prefix[:-1], app_config)
-    url = make_url(options.url)
+    return parser.parse(prefix[:-1], app_config)
+
+
+def _create_engine(
+    url_text: str,
+    options: config.ConfigNamespace,
+    secrets: Optional[SecretsStore],
+    kwargs: Dict[str, Any],
+) -> Engine:
+    url = make_url(url_text)
+    kwargs = dict(kwargs)
 
     if options.pool_recycle is not None:
         kwargs.setdefault("pool_recycle", options.pool_recycle)
@@ -95,6 +162,12 @@ def engine_from_config(
     if options.max_overflow is not None:
         kwargs.setdefault("max_overflow", options.max_overflow)
 
+    if options.query_cache_size is not None:
+        kwargs.setdefault("query_cache_size", options.query_cache_size)
+
+    if url.get_dialect().get_pool_class(url) is QueuePool:
+        kwargs.setdefault("poolclass", InstrumentedQueuePool)
+
     if options.credentials_secret:
         if not secrets:
             raise TypeError("'secrets' is required if 'credentials_secret' is set")
@@ -111,6 +184,76 @@ def engine_from_config(
     return create_engine(url, **kwargs)
 
 
+class _InstrumentedQueue(sqla_queue.Queue):
+    instrumentation: Optional[PoolInstrumentation] = None
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        start = perf_counter()
+        try:
+            item = super().get(block, timeout)
+        except sqla_queue.Empty:
+            # QueuePool only blocks once it can't open overflow connections,
+            # so coming up empty then means the checkout times out. otherwise
+            # the pool goes on to open a new connection without waiting.
+            if self.instrumentation and block:
+                self.instrumentation.checkout_timed_out(perf_counter() - start)
+            elif self.instrumentation:
+                self.instrumentation.checkout_waited(perf_counter() - start)
+            raise
+        if self.instrumentation:
+            self.instrumentation.checkout_waited(perf_counter() - start)
+        return item
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A :py:class:`~sqlalchemy.pool.QueuePool` that records checkout waits and churn.
+
+    Once :py:attr:`instrumentation` is set, which the context factories in
+    this module do, the pool reports how long checkouts wait for a connection,
+    checkouts that time out, how long connecting takes and how many
+    connections are opened and closed. See
+    :py:mod:`baseplate.lib.pool_instrumentation`.
+
+    """
+
+    _instrumentation: Optional[PoolInstrumentation] = None
+
+    def __init__(self, creator: Any, *args: Any, **kwargs: Any):
+        super().__init__(creator, *args, **kwargs)
+        queue: sqla_queue.Queue = self._pool
+        self._pool: _InstrumentedQueue = _InstrumentedQueue(queue.maxsize, use_lifo=queue.use_lifo)
+
+    @property
+    def instrumentation(self) -> Optional[PoolInstrumentation]:
+        return self._instrumentation
+
+    @instrumentation.setter
+    def instrumentation(self, instrumentation: Optional[PoolInstrumentation]) -> None:
+        self._instrumentation = instrumentation
+        self._pool.instrumentation = instrumentation
+
+    def _should_wrap_creator(self, creator: Any) -> Any:
+        invoke_creator = super()._should_wrap_creator(creator)
+
+        def instrumented_creator(connection_record: Any) -> Any:
+            if self._instrumentation is None:
+                return invoke_creator(connection_record)
+            with self._instrumentation.connecting():
+                return invoke_creator(connection_record)
+
+        return instrumented_creator
+
+    def _close_connection(self, connection: Any, terminate: bool = False) -> None:
+        super()._close_connection(connection, terminate)
+        if self._instrumentation:
+            self._instrumentation.connection_closed()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.instrumentation = self._instrumentation
+        return pool
+
+
 class SQLAlchemySession(config.Parser):
     """Configure a SQLAlchemy Session.
 
@@ -119,12 +262,29 @@ class SQLAlchemySession(config.Parser):
 
     See :py:func:`engine_from_config` for available configuration settings.
 
+    If ``replica_urls`` is configured (see
+    :py:func:`replica_engines_from_config`), the session routes read-only work
+    to the replicas with a :py:class:`ReplicaRouter`. It also reads:
+
+    * ``max_replica_lag`` (optional): how far (as
+        :py:func:`~baseplate.lib.config.Timespan`) a replica may fall behind
+        before reads stop being routed to it, by default 10 seconds. Only used
+        if ``lag_probe`` is given.
+
     :param secrets: Required if configured to use credentials to talk to the database.
+    :param lag_probe: A function that measures how far a replica engine is
+        behind the primary in seconds, e.g. :py:func:`postgres_replica_lag`.
 
     """
 
-    def __init__(self, secrets: Optional[SecretsStore] = None, **kwargs: Any):
+    def __init__(
+        self,
+        secrets: Optional[SecretsStore] = None,
+        lag_probe: Optional[Callable[[Engine], float]] = None,
+        **kwargs: Any,
+    ):
         self.secrets = secrets
+        self.lag_probe = lag_probe
         self.kwargs = kwargs
 
     def parse(
@@ -133,7 +293,165 @@ class SQLAlchemySession(config.Parser):
         engine = engine_from_config(
             raw_config, secrets=self.secrets, prefix=f"{key_path}.", **self.kwargs
         )
-        return SQLAlchemySessionContextFactory(engine, key_path)
+        replicas = replica_engines_from_config(
+            raw_config, secrets=self.secrets, prefix=f"{key_path}.", **self.kwargs
+        )
+        router = None
+        if replicas:
+            parser = config.SpecParser(
+                {"max_replica_lag": config.Optional(config.Timespan, default=timedelta(seconds=10))}
+            )
+            options = parser.parse(key_path, raw_config)
+            router = ReplicaRouter(
+                replicas, lag_probe=self.lag_probe, max_lag=options.max_replica_lag
+            )
+        return SQLAlchemySessionContextFactory(engine, key_path, router=router)
+
+
+def postgres_replica_lag(engine: Engine) -> float:
+    """Measure how far a PostgreSQL streaming replica is behind, in seconds.
+
+    This is a lag probe for :py:class:`ReplicaRouter`. It reports the time
+    since the last replayed transaction, which overestimates lag while the
+    primary is idle.
+
+    """
+    with engine.connect() as conn:
+        lag = conn.execute(
+            text("SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())")
+        ).scalar()
+    return float(lag or 0.0)
+
+
+class ReplicaRouter:
+    """Choose which read replica to send reads to.
+
+    The replica with the fewest connections checked out of its pool is
+    chosen, with ties broken in turn. If a ``lag_probe`` is given, replicas
+    more than ``max_lag`` behind the primary (or whose probe fails) are
+    skipped. Lag is measured at most once per ``lag_check_interval`` per
+    replica, while choosing.
+
+    :param engines: An engine for each replica.
+    :param lag_probe: A function that returns how far a replica is behind the
+        primary in seconds.
+    :param max_lag: The most a replica may lag and still be used.
+    :param lag_check_interval: How long lag measurements are trusted for.
+
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[Engine],
+        lag_probe: Optional[Callable[[Engine], float]] = None,
+        max_lag: timedelta = timedelta(seconds=10),
+        lag_check_interval: timedelta = timedelta(seconds=5),
+    ):
+        self.engines = list(engines)
+        self.lag_probe = lag_probe
+        self.max_lag = max_lag.total_seconds()
+        self.lag_check_interval = lag_check_interval.total_seconds()
+
+        self.lags: List[Optional[float]] = [None] * len(self.engines)
+        self.lags_checked_at = [float("-inf")] * len(self.engines)
+        self.turns = itertools.count()
+
+    def lag(self, index: int) -> Optional[float]:
+        """Return the lag of a replica, probing it if the last measurement is stale.
+
+        :returns: The lag in seconds, ``inf`` if the probe failed, or None if
+            lag isn't being measured.
+
+        """
+        if self.lag_probe is None:
+            return None
+
+        now = perf_counter()
+        if now - self.lags_checked_at[index] >= self.lag_check_interval:
+            # mark the measurement fresh first so concurrent callers don't probe too
+            self.lags_checked_at[index] = now
+            try:
+                self.lags[index] = self.lag_probe(self.engines[index])
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("Failed to measure lag of replica %d", index, exc_info=True)
+                self.lags[index] = float("inf")
+        return self.lags[index]
+
+    def choose(self) -> Optional[int]:
+        """Return the index of the replica to use, or None to use the primary."""
+        count = len(self.engines)
+        turn = next(self.turns)
+        best = None
+        best_rank = None
+        for index in range(count):
+            lag = self.lag(index)
+            if lag is not None and lag > self.max_lag:
+                continue
+
+            pool = self.engines[index].pool
+            in_use = pool.checkedout() if isinstance(pool, QueuePool) else 0
+            rank = (in_use, (index - turn) % count)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = index, rank
+        return best
+
+
+class RoutingSession(Session):
+    """A session that sends reads to replicas when asked to.
+
+    Statements go to a replica chosen by ``router`` when the session is in
+    :py:meth:`read_only` mode or the statement has the ``use_replica``
+    execution option set, e.g.
+    ``session.query(Model).execution_options(use_replica=True)``. Everything
+    else, including every flush, goes to the primary the session is bound to.
+    The session sticks to the first replica it picks until it is closed.
+
+    :param replicas: An engine for each replica, in the same order as the
+        router's.
+    :param router: Chooses between the replicas.
+
+    """
+
+    def __init__(self, replicas: Sequence[Engine], router: ReplicaRouter, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.replicas = replicas
+        self.router = router
+        self.use_replicas = False
+        self.replica: Optional[Engine] = None
+
+    @contextlib.contextmanager
+    def read_only(self) -> Iterator["RoutingSession"]:
+        """Send everything but flushes and writes to a replica inside the block."""
+        previous, self.use_replicas = self.use_replicas, True
+        try:
+            yield self
+        finally:
+            self.use_replicas = previous
+
+    def get_bind(  # pylint: disable=arguments-differ
+        self, mapper: Any = None, clause: Any = None, **kwargs: Any
+    ) -> Any:
+        use_replica = kwargs.pop("use_replica", False)
+        if self._wants_replica(clause, use_replica):
+            if self.replica is None:
+                index = self.router.choose()
+                if index is not None:
+                    self.replica = self.replicas[index]
+            if self.replica is not None:
+                return self.replica
+        return super().get_bind(mapper, clause, **kwargs)
+
+    def _wants_replica(self, clause: Any, use_replica: bool) -> bool:
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return False
+        if self.use_replicas or use_replica:
+            return True
+        options = getattr(clause, "_execution_options", None) or {}
+        return bool(options.get("use_replica", False))
+
+    def close(self) -> None:
+        super().close()
+        self.replica = None
 
 
 Parameters = Optional[Union[Dict[str, Any], Sequence[Any]]]
@@ -142,6 +460,192 @@ Parameters = Optional[Union[Dict[str, Any], Sequence[Any]]]
 SAFE_TRACE_ID = re.compile("^[A-Za-z0-9_-]+$")
 
 
+_FINGERPRINT_PATTERNS = [
+    # string literals, including doubled quotes inside them
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    # numeric literals that aren't part of an identifier
+    (re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b"), "?"),
+    # bind parameters in each of the DB-API paramstyles
+    (re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?"), "?"),
+    # lists of values, e.g. IN (?, ?, ?) and VALUES (?, ?), (?, ?)
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?"),
+    (re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_statement(statement: str) -> str:
+    """Replace the literals and parameters in a SQL statement with placeholders.
+
+    Statements that differ only by the values they use normalize to the same
+    text, e.g. ``SELECT * FROM t WHERE id IN (1, 2)`` and ``SELECT * FROM t
+    WHERE id IN (%(id_1)s)`` both become ``SELECT * FROM t WHERE id IN (?)``.
+
+    """
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint_statement(statement: str) -> str:
+    """Return a short, stable identifier for the shape of a SQL statement.
+
+    The fingerprint is a hash of :py:func:`normalize_statement`. Results are
+    cached since applications tend to issue the same few statements over and
+    over again.
+
+    """
+    normalized = normalize_statement(statement)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]  # nosec: not used for security
+
+
+class _PrometheusChildren(NamedTuple):
+    active: Gauge
+    latency_success: Histogram
+    latency_failure: Histogram
+    total_success: Counter
+    total_failure: Counter
+
+
+def _instrument_pool(engine: Engine, name: str) -> None:
+    if isinstance(engine.pool, InstrumentedQueuePool) and engine.pool.instrumentation is None:
+        engine.pool.instrumentation = PoolInstrumentation("sqlalchemy", name)
+
+
+def _prewarm_pool(engine: Engine, connections: int) -> None:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+
+    # check connections out all at once so the pool has to open that many
+    opened = []
+    try:
+        for _ in range(min(connections, pool.size())):
+            opened.append(engine.raw_connection())
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+BulkTarget = Union[Session, Engine, Connection]
+
+
+def bulk_insert(
+    target: BulkTarget,
+    table: Any,
+    rows: Sequence[Dict[str, Any]],
+    batch_size: int = 1000,
+) -> int:
+    """Insert many rows with as few round trips as possible.
+
+    The rows are sent in batches of ``batch_size`` with ``executemany``, which
+    drivers such as psycopg2 turn into multi-row ``INSERT`` statements. When
+    ``target`` came from one of this module's context factories the batches
+    run under a single ``<context name>.bulk_insert`` span tagged with the
+    number of rows and batches.
+
+    :param target: A session, engine or connection to insert with. Sessions
+        insert on their current transaction and are not committed.
+    :param table: The :py:class:`~sqlalchemy.schema.Table` or mapped class to
+        insert into.
+    :param rows: The rows to insert, as dicts of column name to value.
+    :param batch_size: The most rows to send in one statement.
+    :returns: The number of rows inserted.
+
+    """
+    return _bulk_execute(target, "bulk_insert", insert(table), rows, batch_size)
+
+
+def bulk_upsert(
+    target: BulkTarget,
+    table: Any,
+    rows: Sequence[Dict[str, Any]],
+    index_elements: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    batch_size: int = 1000,
+) -> int:
+    """Insert many rows, updating the ones that already exist.
+
+    This works like :py:func:`bulk_insert` but uses ``INSERT ... ON
+    CONFLICT DO UPDATE`` (or ``ON DUPLICATE KEY UPDATE`` on MySQL) so rows
+    that conflict with an existing one update it instead. PostgreSQL, SQLite
+    and MySQL are supported.
+
+    :param target: A session, engine or connection to upsert with.
+    :param table: The :py:class:`~sqlalchemy.schema.Table` or mapped class to
+        upsert into.
+    :param rows: The rows to upsert, as dicts of column name to value.
+    :param index_elements: The columns of the unique index that identifies
+        existing rows. MySQL uses every unique index instead.
+    :param update_columns: The columns to update on existing rows. Defaults
+        to every column in the first row that isn't in ``index_elements``.
+    :param batch_size: The most rows to send in one statement.
+    :returns: The number of rows sent.
+
+    """
+    if not rows:
+        return 0
+
+    if update_columns is None:
+        update_columns = [name for name in rows[0] if name not in index_elements]
+
+    dialect = _bind_for(target).dialect.name
+    statement: Any
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        statement = module.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={name: statement.excluded[name] for name in update_columns},
+        )
+    elif dialect == "mysql":
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(
+            {name: statement.inserted[name] for name in update_columns}
+        )
+    else:
+        raise ValueError(f"bulk_upsert does not support the {dialect!r} dialect")
+
+    return _bulk_execute(target, "bulk_upsert", statement, rows, batch_size)
+
+
+def _bind_for(target: BulkTarget) -> Union[Engine, Connection]:
+    if isinstance(target, Session):
+        return target.get_bind()
+    return target
+
+
+def _bulk_execute(
+    target: BulkTarget,
+    operation: str,
+    statement: Any,
+    rows: Sequence[Dict[str, Any]],
+    batch_size: int,
+) -> int:
+    if not rows:
+        return 0
+
+    batches = [rows[i : i + batch_size] for i in range(0, len(rows), batch_size)]
+    options = _bind_for(target).get_execution_options()
+    if "server_span" not in options:
+        for batch in batches:
+            target.execute(statement, batch)
+        return len(rows)
+
+    context_name = options["context_name"]
+    span = options["server_span"].make_child(
+        f"{context_name}.{operation}", local=True, component_name=context_name
+    )
+    span.set_tag("rows", len(rows))
+    span.set_tag("batches", len(batches))
+    with span:
+        statement = statement.execution_options(parent_span=span)
+        for batch in batches:
+            target.execute(statement, batch)
+    return len(rows)
+
+
 class SQLAlchemyEngineContextFactory(ContextFactory):
     """SQLAlchemy core engine context factory.
 
@@ -159,7 +663,15 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
         :py:class:`~baseplate.clients.sqlalchemy.SQLAlchemySessionContextFactory`
         instead.
 
+    Each statement is also fingerprinted (see :py:func:`fingerprint_statement`)
+    and tagged on its span as ``sql_query``. Latency is recorded per
+    fingerprint for the first ``max_fingerprints`` fingerprints seen, while
+    later ones are grouped under ``other`` to keep cardinality bounded.
+
     :param engine: A configured SQLAlchemy engine.
+    :param name: The name of the client, used in metrics.
+    :param max_fingerprints: The number of distinct statement fingerprints to
+        record latency for. Set to 0 to disable the per-fingerprint histogram.
 
     """
 
@@ -187,6 +699,13 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
         multiprocess_mode="livesum",
     )
 
+    compiled_cache_gauge = Gauge(
+        f"{PROM_PREFIX}_compiled_cache_size",
+        "Number of compiled statements cached by this engine",
+        PROM_POOL_LABELS,
+        multiprocess_mode="livesum",
+    )
+
     PROM_LABELS = [
         "sql_client_name",
         "sql_address",
@@ -213,27 +732,105 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
         PROM_LABELS + ["sql_success"],
     )
 
-    def __init__(self, engine: Engine, name: str = "sqlalchemy"):
+    query_latency_seconds = Histogram(
+        f"{PROM_PREFIX}_query_latency_seconds",
+        "Latency histogram of calls to database by statement fingerprint",
+        ["sql_client_name", "sql_query"],
+        buckets=default_latency_buckets,
+    )
+
+    def __init__(self, engine: Engine, name: str = "sqlalchemy", max_fingerprints: int = 100):
         self.engine = engine.execution_options()
         self.name = name
+        self.max_fingerprints = max_fingerprints
+        self._prometheus_children: Dict[Any, _PrometheusChildren] = {}
+        self._query_latency: Dict[str, Histogram] = {}
+        _instrument_pool(self.engine, name)
         event.listen(self.engine, "before_cursor_execute", self.on_before_execute, retval=True)
         event.listen(self.engine, "after_cursor_execute", self.on_after_execute)
         event.listen(self.engine, "handle_error", self.on_error)
-        self.time_started = 0.0
+
+    def _children_for(self, engine: Engine) -> _PrometheusChildren:
+        # resolve the labelled metrics once per engine url rather than per query
+        try:
+            return self._prometheus_children[engine.url]
+        except KeyError:
+            labels = {
+                "sql_client_name": self.name,
+                "sql_address": engine.url.host,
+                "sql_database": engine.url.database,
+            }
+            children = _PrometheusChildren(
+                active=self.active_requests.labels(**labels),
+                latency_success=self.latency_seconds.labels(**labels, sql_success="true"),
+                latency_failure=self.latency_seconds.labels(**labels, sql_success="false"),
+                total_success=self.requests_total.labels(**labels, sql_success="true"),
+                total_failure=self.requests_total.labels(**labels, sql_success="false"),
+            )
+            self._prometheus_children[engine.url] = children
+            return children
+
+    def _query_latency_for(self, fingerprint: str) -> Optional[Histogram]:
+        try:
+            return self._query_latency[fingerprint]
+        except KeyError:
+            if not self.max_fingerprints:
+                return None
+            if len(self._query_latency) >= self.max_fingerprints:
+                fingerprint = "other"
+            histogram = self.query_latency_seconds.labels(self.name, fingerprint)
+            if fingerprint != "other":
+                self._query_latency[fingerprint] = histogram
+            return histogram
+
+    def _finish(self, conn: Connection, success: bool) -> None:
+        # timing state lives on the connection, which only one greenlet uses at a time
+        started = conn.info.pop("started", None)
+        fingerprint = conn.info.pop("sql_query", None)
+        if started is None:
+            return
+
+        elapsed = perf_counter() - started
+        children = self._children_for(conn.engine)
+        children.active.dec()
+        if success:
+            children.total_success.inc()
+            children.latency_success.observe(elapsed)
+        else:
+            children.total_failure.inc()
+            children.latency_failure.observe(elapsed)
+
+        if fingerprint is not None:
+            query_latency = self._query_latency_for(fingerprint)
+            if query_latency is not None:
+                query_latency.observe(elapsed)
 
     def report_runtime_metrics(self, batch: metrics.Client) -> None:
-        pool = self.engine.pool
+        self._report_pool_metrics(batch, self.engine, self.name, "pool")
+
+        compiled_cache = self.engine._compiled_cache
+        if compiled_cache is not None:
+            self.compiled_cache_gauge.labels(self.name).set(len(compiled_cache))
+            batch.gauge("compiled_cache.size").replace(len(compiled_cache))
+
+    def prewarm(self, connections: int) -> None:
+        _prewarm_pool(self.engine, connections)
+
+    def _report_pool_metrics(
+        self, batch: metrics.Client, engine: Engine, client_name: str, prefix: str
+    ) -> None:
+        pool = engine.pool
         if not isinstance(pool, QueuePool):
             return
 
-        self.max_connections_gauge.labels(self.name).set(pool.size())
-        self.checked_out_connections_gauge.labels(self.name).set(pool.checkedout())
-        self.checked_in_connections_gauge.labels(self.name).set(pool.checkedin())
+        self.max_connections_gauge.labels(client_name).set(pool.size())
+        self.checked_out_connections_gauge.labels(client_name).set(pool.checkedout())
+        self.checked_in_connections_gauge.labels(client_name).set(pool.checkedin())
 
-        batch.gauge("pool.size").replace(pool.size())
-        batch.gauge("pool.open_and_available").replace(pool.checkedin())
-        batch.gauge("pool.in_use").replace(pool.checkedout())
-        batch.gauge("pool.overflow").replace(max(pool.overflow(), 0))
+        batch.gauge(f"{prefix}.size").replace(pool.size())
+        batch.gauge(f"{prefix}.open_and_available").replace(pool.checkedin())
+        batch.gauge(f"{prefix}.in_use").replace(pool.checkedout())
+        batch.gauge(f"{prefix}.overflow").replace(max(pool.overflow(), 0))
 
     def make_object_for_context(self, name: str, span: Span) -> Engine | Session:
         engine = self.engine.execution_options(context_name=name, server_span=span)
@@ -250,30 +847,30 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
         executemany: bool,
     ) -> Tuple[str, Parameters]:
         """Handle the engine's before_cursor_execute event."""
-        labels = {
-            "sql_client_name": self.name,
-            "sql_address": conn.engine.url.host,
-            "sql_database": conn.engine.url.database,
-        }
-        self.active_requests.labels(**labels).inc()
-        self.time_started = perf_counter()
+        self._children_for(conn.engine).active.inc()
 
         context_name = conn._execution_options["context_name"]
         server_span = conn._execution_options["server_span"]
+        if context is not None:
+            # statements can nest their spans under another, e.g. a bulk operation
+            server_span = context.execution_options.get("parent_span", server_span)
 
-        trace_name = f"{context_name}.execute"
-        span = server_span.make_child(trace_name)
+        fingerprint = fingerprint_statement(statement)
+        span = server_span.make_child(context_name + ".execute")
         span.set_tag("statement", statement[:1021] + "..." if len(statement) > 1024 else statement)
+        span.set_tag("sql_query", fingerprint)
         span.start()
 
         conn.info["span"] = span
+        conn.info["sql_query"] = fingerprint
+        conn.info["started"] = perf_counter()
 
         # add a comment to the sql statement with the trace and span ids
         # this is useful for slow query logs and active query views
         if SAFE_TRACE_ID.match(span.trace_id) and SAFE_TRACE_ID.match(span.id):
-            annotated_statement = f"{statement} -- trace:{span.trace_id},span:{span.id}"
+            annotated_statement = statement + " -- trace:" + span.trace_id + ",span:" + span.id
         else:
-            annotated_statement = f"{statement} -- invalid trace id"
+            annotated_statement = statement + " -- invalid trace id"
 
         return annotated_statement, parameters
 
@@ -290,18 +887,7 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
         """Handle the event which happens after successful cursor execution."""
         conn.info["span"].finish()
         conn.info["span"] = None
-
-        labels = {
-            "sql_client_name": self.name,
-            "sql_address": conn.engine.url.host,
-            "sql_database": conn.engine.url.database,
-        }
-
-        self.active_requests.labels(**labels).dec()
-        self.requests_total.labels(**labels, sql_success="true").inc()
-        self.latency_seconds.labels(**labels, sql_success="true").observe(
-            perf_counter() - self.time_started
-        )
+        self._finish(conn, success=True)
 
     def on_error(self, context: ExceptionContext) -> None:
         """Handle the event which happens on exceptions during execution."""
@@ -310,18 +896,7 @@ class SQLAlchemyEngineContextFactory(ContextFactory):
             exc_info = (type(context.original_exception), context.original_exception, None)
             context.connection.info["span"].finish(exc_info=exc_info)
             context.connection.info["span"] = None
-
-        labels = {
-            "sql_client_name": self.name,
-            "sql_address": context.connection.engine.url.host,
-            "sql_database": context.connection.engine.url.database,
-        }
-
-        self.active_requests.labels(**labels).dec()
-        self.requests_total.labels(**labels, sql_success="false").inc()
-        self.latency_seconds.labels(**labels, sql_success="false").observe(
-            perf_counter() - self.time_started
-        )
+        self._finish(context.connection, success=False)
 
 
 class SQLAlchemySessionContextFactory(SQLAlchemyEngineContextFactory):
@@ -342,13 +917,74 @@ class SQLAlchemySessionContextFactory(SQLAlchemyEngineContextFactory):
         :py:class:`~baseplate.clients.sqlalchemy.SQLAlchemyEngineContextFactory`
         instead.
 
+    If a ``router`` is given, the session is a :py:class:`RoutingSession`
+    that can send reads to the router's replicas. Queries on the replicas are
+    instrumented like those on the primary, and each replica's pool is
+    reported in runtime metrics as ``replica_<index>.pool.*`` and under the
+    client name ``<name>.replica_<index>``.
+
     :param engine: A configured SQLAlchemy engine.
+    :param name: The name of the client, used in metrics.
+    :param router: Chooses between read replicas of ``engine``.
 
     """
 
+    replica_lag_gauge = Gauge(
+        f"{SQLAlchemyEngineContextFactory.PROM_PREFIX}_replica_lag_seconds",
+        "Last measured replication lag of a read replica",
+        ["sql_client_name", "sql_address"],
+        multiprocess_mode="livemax",
+    )
+
+    def __init__(
+        self,
+        engine: Engine,
+        name: str = "sqlalchemy",
+        max_fingerprints: int = 100,
+        router: Optional[ReplicaRouter] = None,
+    ):
+        super().__init__(engine, name, max_fingerprints)
+        self.router = router
+        self.replica_engines: List[Engine] = []
+        if router is not None:
+            for index, replica in enumerate(router.engines):
+                _instrument_pool(replica, f"{name}.replica_{index}")
+                replica = replica.execution_options()
+                event.listen(replica, "before_cursor_execute", self.on_before_execute, retval=True)
+                event.listen(replica, "after_cursor_execute", self.on_after_execute)
+                event.listen(replica, "handle_error", self.on_error)
+                self.replica_engines.append(replica)
+
+    def prewarm(self, connections: int) -> None:
+        super().prewarm(connections)
+        for replica in self.replica_engines:
+            _prewarm_pool(replica, connections)
+
+    def report_runtime_metrics(self, batch: metrics.Client) -> None:
+        super().report_runtime_metrics(batch)
+        if self.router is None:
+            return
+
+        for index, replica in enumerate(self.replica_engines):
+            prefix = f"replica_{index}"
+            self._report_pool_metrics(batch, replica, f"{self.name}.{prefix}", f"{prefix}.pool")
+
+            lag = self.router.lags[index]
+            if lag is not None:
+                self.replica_lag_gauge.labels(self.name, replica.url.host).set(lag)
+                batch.gauge(f"{prefix}.lag").replace(lag)
+
     def make_object_for_context(self, name: str, span: Span) -> Session:
         engine = typing.cast(Engine, super().make_object_for_context(name, span))
-        session = Session(bind=engine)
+        session: Session
+        if self.router is not None:
+            replicas = [
+                replica.execution_options(context_name=name, server_span=span)
+                for replica in self.replica_engines
+            ]
+            session = RoutingSession(replicas, self.router, bind=engine)
+        else:
+            session = Session(bind=engine)
         span.register(SQLAlchemySessionSpanObserver(session))
         return session
 
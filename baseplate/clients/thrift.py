@@ -11,6 +11,7 @@ from typing import Any
 from typing import Callable
 from typing import Iterator
 from typing import Optional
+from typing import Sequence
 
 from opentelemetry import trace
 from opentelemetry.propagators.composite import CompositePropagator
@@ -30,6 +31,9 @@ from baseplate import Span
 from baseplate.clients import ContextFactory
 from baseplate.lib import config
 from baseplate.lib import metrics
+from baseplate.lib.memo import get_request_memo
+from baseplate.lib.memo import RequestMemo
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 from baseplate.lib.prometheus_metrics import default_latency_buckets
 from baseplate.lib.propagator_redditb3_thrift import RedditB3ThriftFormat
 from baseplate.lib.retry import RetryPolicy
@@ -91,16 +95,22 @@ class ThriftClient(config.Parser):
 
     :param client_cls: The class object of a Thrift-generated client class,
         e.g. ``YourService.Client``.
+    :param memoized_methods: Names of read-only service methods whose results
+        should be memoized for the rest of the request, see
+        :py:class:`ThriftContextFactory`.
 
     """
 
-    def __init__(self, client_cls: Any, **kwargs: Any):
+    def __init__(self, client_cls: Any, memoized_methods: Sequence[str] = (), **kwargs: Any):
         self.client_cls = client_cls
+        self.memoized_methods = memoized_methods
         self.kwargs = kwargs
 
     def parse(self, key_path: str, raw_config: config.RawConfig) -> ContextFactory:
         pool = thrift_pool_from_config(raw_config, prefix=f"{key_path}.", **self.kwargs)
-        return ThriftContextFactory(pool, self.client_cls)
+        return ThriftContextFactory(
+            pool, self.client_cls, memoized_methods=self.memoized_methods, name=key_path
+        )
 
 
 class ThriftContextFactory(ContextFactory):
@@ -115,6 +125,15 @@ class ThriftContextFactory(ContextFactory):
     :param pool: The connection pool.
     :param client_cls: The class object of a Thrift-generated client class,
         e.g. ``YourService.Client``.
+    :param memoized_methods: Names of read-only service methods whose results
+        should be memoized for the rest of the request.
+    :param name: The name the pool's checkout metrics are labelled with.
+        Defaults to the client class's name.
+
+    If the request has a :py:class:`~baseplate.lib.memo.RequestMemo`, calls to
+    ``memoized_methods`` with the same (hashable) arguments are only sent once
+    per request. Calling any other method is assumed to write and invalidates
+    everything memoized for this client.
 
     The proxy object has a ``retrying`` method which takes the same parameters
     as :py:meth:`RetryPolicy.new <baseplate.lib.retry.RetryPolicy.new>` and acts as
@@ -142,18 +161,36 @@ class ThriftContextFactory(ContextFactory):
         POOL_LABELS,
     )
 
-    def __init__(self, pool: ThriftConnectionPool, client_cls: Any):
+    def __init__(
+        self,
+        pool: ThriftConnectionPool,
+        client_cls: Any,
+        memoized_methods: Sequence[str] = (),
+        name: Optional[str] = None,
+    ):
         self.pool = pool
         self.client_cls = client_cls
-        self.proxy_cls = type(
-            "PooledClientProxy",
-            (_PooledClientProxy,),
-            {
-                fn_name: _build_thrift_proxy_method(fn_name)
-                for fn_name in _enumerate_service_methods(client_cls)
-                if not (fn_name.startswith("__") and fn_name.endswith("__"))
-            },
-        )
+        if pool.instrumentation is None:
+            pool.instrumentation = PoolInstrumentation("thrift", name or client_cls.__qualname__)
+
+        fn_names = [
+            fn_name
+            for fn_name in _enumerate_service_methods(client_cls)
+            if not (fn_name.startswith("__") and fn_name.endswith("__"))
+        ]
+        unknown_methods = set(memoized_methods) - set(fn_names)
+        if unknown_methods:
+            raise ValueError(f"unknown service methods to memoize: {sorted(unknown_methods)}")
+
+        proxy_methods = {}
+        for fn_name in fn_names:
+            proxy_method = _build_thrift_proxy_method(fn_name)
+            if memoized_methods:
+                proxy_method = _build_memoized_thrift_proxy_method(
+                    fn_name, proxy_method, memoized=fn_name in memoized_methods
+                )
+            proxy_methods[fn_name] = proxy_method
+        self.proxy_cls = type("PooledClientProxy", (_PooledClientProxy,), proxy_methods)
 
     def report_runtime_metrics(self, batch: metrics.Client) -> None:
         pool_name = self.client_cls.__qualname__
@@ -165,8 +202,13 @@ class ThriftContextFactory(ContextFactory):
         # distinguish easily between available connection slots that aren't
         # instantiated and ones that have actual open connections.
 
+    def prewarm(self, connections: int) -> None:
+        self.pool.prewarm(connections)
+
     def make_object_for_context(self, name: str, span: Span) -> "_PooledClientProxy":
-        return self.proxy_cls(self.client_cls, self.pool, span, name)
+        return self.proxy_cls(
+            self.client_cls, self.pool, span, name, request_memo=get_request_memo(span)
+        )
 
 
 def _enumerate_service_methods(client: Any) -> Iterator[str]:
@@ -199,12 +241,14 @@ class _PooledClientProxy:
         server_span: Span,
         namespace: str,
         retry_policy: Optional[RetryPolicy] = None,
+        request_memo: Optional[RequestMemo] = None,
     ):
         self.client_cls = client_cls
         self.pool = pool
         self.server_span = server_span
         self.namespace = namespace
         self.retry_policy = retry_policy or RetryPolicy.new(attempts=1)
+        self.request_memo = request_memo
         self.tracer = trace.get_tracer(__name__)
 
         self.otel_peer_name = None
@@ -223,9 +267,42 @@ class _PooledClientProxy:
             self.server_span,
             self.namespace,
             retry_policy=RetryPolicy.new(**policy),
+            request_memo=self.request_memo,
         )
 
 
+def _build_memoized_thrift_proxy_method(
+    name: str, call_thrift_method: Callable[..., Any], memoized: bool
+) -> Callable[..., Any]:
+    if memoized:
+
+        def _call_memoized_thrift_method(self: Any, *args: Any, **kwargs: Any) -> Any:
+            if self.request_memo is None:
+                return call_thrift_method(self, *args, **kwargs)
+            return self.request_memo.call(
+                self.namespace,
+                name,
+                lambda: call_thrift_method(self, *args, **kwargs),
+                read=(args, tuple(sorted(kwargs.items()))),
+            )
+
+        return _call_memoized_thrift_method
+
+    def _call_invalidating_thrift_method(self: Any, *args: Any, **kwargs: Any) -> Any:
+        if self.request_memo is None:
+            return call_thrift_method(self, *args, **kwargs)
+
+        # invalidate again once the call is done so that reads which were in
+        # flight while it happened don't stay memoized with the old value.
+        self.request_memo.invalidate(self.namespace)
+        try:
+            return call_thrift_method(self, *args, **kwargs)
+        finally:
+            self.request_memo.invalidate(self.namespace)
+
+    return _call_invalidating_thrift_method
+
+
 def _build_thrift_proxy_method(name: str) -> Callable[..., Any]:
     def _call_thrift_method(self: Any, *args: Any, **kwargs: Any) -> Any:
         last_error = None
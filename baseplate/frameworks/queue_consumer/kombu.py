@@ -1,15 +1,21 @@
+import collections
+import datetime
 import logging
 import queue
 import socket
+import threading
 import time
 
 from enum import Enum
 from typing import Any
 from typing import Callable
+from typing import Deque
 from typing import Dict
 from typing import NamedTuple
 from typing import Optional
 from typing import Sequence
+from typing import Set
+from typing import Tuple
 from typing import TYPE_CHECKING
 
 import kombu
@@ -59,6 +65,12 @@ AMQP_REPUBLISHED_TOTAL = Counter(
     AmqpConsumerPrometheusLabels._fields,
 )
 
+AMQP_DELAYED_TOTAL = Counter(
+    "amqp_consumer_messages_delayed_total",
+    "total count of messages republished to a delay queue by this host",
+    AmqpConsumerPrometheusLabels._fields + ("amqp_retry_delay_seconds",),
+)
+
 AMQP_REJECTED_REASON_TTL = "ttl"
 AMQP_REJECTED_REASON_RETRIES = "retries"
 AMQP_REJECTED_TOTAL = Counter(
@@ -117,10 +129,89 @@ class RetryMode(Enum):
 
     REPUBLISH - message is acknowledged. New message is created, having identical content,
     but incremented retry counter. It is published into the tail of a queue.
+
+    DELAYED_REPUBLISH - like REPUBLISH, but the new message is first published to a delay
+    queue. The delay doubles with each retry and, once it has passed, the broker dead-letters
+    the message back to the original exchange and routing key.
     """
 
     REQUEUE = (1,)
     REPUBLISH = (2,)
+    DELAYED_REPUBLISH = (3,)
+
+
+class _AckBatcher:
+    """Acknowledge messages in batches with ``multiple=True``.
+
+    Handlers finish messages out of order, so a multiple ack can only cover
+    the longest run of delivery tags, starting from the oldest message still
+    outstanding, whose messages have all been handled.  Messages that were
+    rejected, requeued or acknowledged individually are no longer outstanding
+    as far as the broker is concerned, so they count as handled but are never
+    used as the tag for a multiple ack.
+
+    The pump tracks every message as it is delivered and flushes on an
+    interval, handlers flush whenever `batch_size` messages are waiting.
+    """
+
+    def __init__(self, batch_size: int, interval: datetime.timedelta):
+        self.batch_size = batch_size
+        self.interval = interval.total_seconds()
+        self.lock = threading.Lock()
+        self.channel: Optional[Channel] = None
+        self.delivered: Deque[int] = collections.deque()
+        # delivery tag -> the message if it should be acked, or None if it
+        # has already been settled individually.
+        self.done: Dict[int, Optional[kombu.Message]] = {}
+        self.waiting = 0
+        self.last_flush = time.monotonic()
+
+    def track(self, message: kombu.Message) -> None:
+        with self.lock:
+            if message.channel is not self.channel:
+                # delivery tags are scoped to a channel, if the pump reconnected
+                # anything we were holding on to will be redelivered anyway.
+                self.channel = message.channel
+                self.delivered.clear()
+                self.done.clear()
+                self.waiting = 0
+            self.delivered.append(message.delivery_tag)
+
+    def ack(self, message: kombu.Message) -> None:
+        with self.lock:
+            if message.channel is not self.channel:
+                return
+            self.done[message.delivery_tag] = message
+            self.waiting += 1
+            if self.waiting >= self.batch_size:
+                self._flush()
+
+    def settle(self, message: kombu.Message) -> None:
+        with self.lock:
+            if message.channel is not self.channel:
+                return
+            self.done.setdefault(message.delivery_tag, None)
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def flush_if_due(self) -> None:
+        with self.lock:
+            if self.waiting and time.monotonic() - self.last_flush >= self.interval:
+                self._flush()
+
+    def _flush(self) -> None:
+        self.last_flush = time.monotonic()
+        last_message = None
+        while self.delivered and self.delivered[0] in self.done:
+            message = self.done.pop(self.delivered.popleft())
+            if message is not None:
+                last_message = message
+                self.waiting -= 1
+
+        if last_message is not None:
+            last_message.ack(multiple=True)
 
 
 class KombuConsumerWorker(ConsumerMixin, PumpWorker):
@@ -136,23 +227,43 @@ class KombuConsumerWorker(ConsumerMixin, PumpWorker):
         queues: Sequence[kombu.Queue],
         work_queue: WorkQueue,
         serializer: Optional[KombuSerializer] = None,
+        prefetch_count: Optional[int] = None,
+        prefetch_size: Optional[int] = None,
+        ack_batcher: Optional[_AckBatcher] = None,
         **kwargs: Any,
     ):
         self.connection = connection
         self.queues = queues
         self.work_queue = work_queue
         self.serializer = serializer
+        self.prefetch_count = prefetch_count
+        self.prefetch_size = prefetch_size
+        self.ack_batcher = ack_batcher
         self.kwargs = kwargs
 
+    def _on_message(self, message: kombu.Message) -> None:
+        if self.ack_batcher:
+            self.ack_batcher.track(message)
+        self.work_queue.put(message)
+
     def get_consumers(self, Consumer: kombu.Consumer, channel: Channel) -> Sequence[kombu.Consumer]:
         args = {
             "queues": self.queues,
-            "on_message": self.work_queue.put,
+            "on_message": self._on_message,
             **self.kwargs,
         }
         if self.serializer:
             args["accept"] = [self.serializer.name]
-        return [Consumer(**args)]
+        consumer = Consumer(**args)
+        if self.prefetch_count is not None or self.prefetch_size is not None:
+            consumer.qos(
+                prefetch_size=self.prefetch_size or 0, prefetch_count=self.prefetch_count or 0
+            )
+        return [consumer]
+
+    def on_iteration(self) -> None:
+        if self.ack_batcher:
+            self.ack_batcher.flush_if_due()
 
     def stop(self) -> None:
         logger.debug("Closing KombuConsumerWorker.")
@@ -169,6 +280,9 @@ class KombuMessageHandler(MessageHandler):
         error_handler_fn: Optional[ErrorHandler] = None,
         retry_mode: RetryMode = RetryMode.REQUEUE,
         retry_limit: Optional[int] = None,
+        ack_batcher: Optional[_AckBatcher] = None,
+        retry_delay: datetime.timedelta = datetime.timedelta(seconds=1),
+        retry_max_delay: datetime.timedelta = datetime.timedelta(minutes=10),
     ):
         self.baseplate = baseplate
         self.name = name
@@ -176,6 +290,44 @@ class KombuMessageHandler(MessageHandler):
         self.error_handler_fn = error_handler_fn
         self.retry_mode = retry_mode
         self.retry_limit = retry_limit
+        self.ack_batcher = ack_batcher
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self._delay_channel: Optional[Channel] = None
+        self._declared_delay_queues: Set[str] = set()
+
+    def _get_delay_exchange(
+        self, channel: Channel, exchange_name: str, retry_count: int
+    ) -> Tuple[str, int]:
+        """Return the delay exchange for this retry and its delay in milliseconds.
+
+        Each delay level gets a fanout exchange bound to a queue whose messages
+        expire after the delay and are then dead-lettered back to the original
+        exchange. Routing keys are kept so the message ends up where it started.
+        """
+        # cap the exponent, we'll have hit retry_max_delay long before this.
+        delay = self.retry_delay * (2 ** min(retry_count, 32))
+        delay_ms = int(min(delay, self.retry_max_delay).total_seconds() * 1000)
+        name = f"{exchange_name}.delay.{delay_ms}"
+
+        if channel is not self._delay_channel:
+            self._delay_channel = channel
+            self._declared_delay_queues.clear()
+
+        if name not in self._declared_delay_queues:
+            delay_queue = kombu.Queue(
+                name=name,
+                exchange=kombu.Exchange(name, type="fanout"),
+                queue_arguments={
+                    "x-message-ttl": delay_ms,
+                    "x-dead-letter-exchange": exchange_name,
+                },
+            )
+            delay_queue.maybe_bind(channel)
+            delay_queue.declare()
+            self._declared_delay_queues.add(name)
+
+        return name, delay_ms
 
     def _is_error_recoverable(self, exc: Exception) -> bool:
         if isinstance(exc, KnownException):
@@ -242,7 +394,16 @@ class KombuMessageHandler(MessageHandler):
             headers=headers,
         )
 
-        message.channel.basic_publish(new_message, message_exchange, message_routing_key)
+        if self.retry_mode == RetryMode.DELAYED_REPUBLISH:
+            delay_exchange, delay_ms = self._get_delay_exchange(
+                message.channel, message_exchange, retry_count
+            )
+            message.channel.basic_publish(new_message, delay_exchange, message_routing_key)
+            AMQP_DELAYED_TOTAL.labels(
+                **prometheus_labels._asdict(), amqp_retry_delay_seconds=str(delay_ms / 1000)
+            ).inc()
+        else:
+            message.channel.basic_publish(new_message, message_exchange, message_routing_key)
         AMQP_REPUBLISHED_TOTAL.labels(**prometheus_labels._asdict()).inc()
         logger.exception(
             "Unhandled error while trying to process a message. "
@@ -266,6 +427,8 @@ class KombuMessageHandler(MessageHandler):
 
         if self._is_ttl_over(message):
             message.reject()
+            if self.ack_batcher:
+                self.ack_batcher.settle(message)
             AMQP_REJECTED_TOTAL.labels(
                 **prometheus_labels._asdict(), reason_code=AMQP_REJECTED_REASON_TTL
             ).inc()
@@ -302,11 +465,21 @@ class KombuMessageHandler(MessageHandler):
             else:
                 self._handle_error(message, prometheus_labels, exc)
 
+            if self.ack_batcher:
+                # whichever way the error was handled, the message has been
+                # settled individually and must not be covered by a batch ack.
+                self.ack_batcher.settle(message)
+
             if isinstance(exc, FatalMessageHandlerError):
                 logger.info("Received a fatal error, terminating the server.")
+                if self.ack_batcher:
+                    self.ack_batcher.flush()
                 raise
         else:
-            message.ack()
+            if self.ack_batcher:
+                self.ack_batcher.ack(message)
+            else:
+                message.ack()
         finally:
             AMQP_PROCESSING_TIME.labels(
                 **prometheus_labels._asdict(), amqp_success=prometheus_success
@@ -339,6 +512,12 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
         worker_kwargs: Optional[Dict[str, Any]] = None,
         retry_mode: RetryMode = RetryMode.REQUEUE,
         retry_limit: Optional[int] = None,
+        prefetch_count: Optional[int] = None,
+        prefetch_size: Optional[int] = None,
+        ack_batch_size: Optional[int] = None,
+        ack_batch_interval: datetime.timedelta = datetime.timedelta(seconds=1),
+        retry_delay: datetime.timedelta = datetime.timedelta(seconds=1),
+        retry_max_delay: datetime.timedelta = datetime.timedelta(minutes=10),
     ):
         """`KombuQueueConsumerFactory` constructor.
 
@@ -361,10 +540,27 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
         :param worker_kwargs: A dictionary of keyword arguments used to create queue consumers.
         :param retry_mode: Either RetryMode.REQUEUE (default): return message into the head of a
             queue, like old versions did. Or RetryMode.REPUBLISH: acknowledge the message and
-            publish a new one, with the same content, but incremented retry counter.
+            publish a new one, with the same content, but incremented retry counter. Or
+            RetryMode.DELAYED_REPUBLISH: like RetryMode.REPUBLISH, but the new message only
+            comes back to the queue after an exponentially increasing delay.
         :param retry_limit: An number of retry attempts for the message. When the limit is reached,
             the message is discarded. Retry limit for specific message could also be specified in
             message's own header.
+        :param prefetch_count: The maximum number of unacknowledged messages the
+            broker will deliver to this consumer. Uses the broker's default if not set.
+        :param prefetch_size: The maximum total size, in bytes, of unacknowledged
+            messages the broker will deliver to this consumer.
+        :param ack_batch_size: If set, successfully handled messages are acknowledged
+            in batches using ``multiple=True`` rather than one at a time. A batch is
+            sent as soon as this many messages are waiting to be acknowledged. An
+            ``error_handler_fn`` must still ack, reject or requeue every message it is
+            given, a message it leaves unsettled may be acknowledged by a later batch.
+        :param ack_batch_interval: When batching acknowledgements, the longest time
+            a handled message waits to be acknowledged.
+        :param retry_delay: With RetryMode.DELAYED_REPUBLISH, the delay before the first
+            retry. It doubles for each following retry.
+        :param retry_max_delay: With RetryMode.DELAYED_REPUBLISH, the longest delay
+            before a retry.
         """
         self.baseplate = baseplate
         self.connection = connection
@@ -377,6 +573,13 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
         self.worker_kwargs = worker_kwargs
         self.retry_mode = retry_mode
         self.retry_limit = retry_limit
+        self.prefetch_count = prefetch_count
+        self.prefetch_size = prefetch_size
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.ack_batcher: Optional[_AckBatcher] = None
+        if ack_batch_size:
+            self.ack_batcher = _AckBatcher(ack_batch_size, ack_batch_interval)
 
     @classmethod
     def new(
@@ -393,6 +596,12 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
         worker_kwargs: Optional[Dict[str, Any]] = None,
         retry_mode: RetryMode = RetryMode.REQUEUE,
         retry_limit: Optional[int] = None,
+        prefetch_count: Optional[int] = None,
+        prefetch_size: Optional[int] = None,
+        ack_batch_size: Optional[int] = None,
+        ack_batch_interval: datetime.timedelta = datetime.timedelta(seconds=1),
+        retry_delay: datetime.timedelta = datetime.timedelta(seconds=1),
+        retry_max_delay: datetime.timedelta = datetime.timedelta(minutes=10),
     ) -> "KombuQueueConsumerFactory":
         """Return a new `KombuQueueConsumerFactory`.
 
@@ -420,9 +629,26 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
             queue consumer.
         :param retry_mode: Either RetryMode.REQUEUE (default): return message into the head of a
             queue, like old versions did. Or RetryMode.REPUBLISH: acknowledge the message and
-            publish a new one, with the same content, but incremented retry counter.
+            publish a new one, with the same content, but incremented retry counter. Or
+            RetryMode.DELAYED_REPUBLISH: like RetryMode.REPUBLISH, but the new message only
+            comes back to the queue after an exponentially increasing delay.
         :param retry_limit: An number of retry attempts for the message. When the limit is reached,
             the message is discarded.
+        :param prefetch_count: The maximum number of unacknowledged messages the
+            broker will deliver to this consumer. Uses the broker's default if not set.
+        :param prefetch_size: The maximum total size, in bytes, of unacknowledged
+            messages the broker will deliver to this consumer.
+        :param ack_batch_size: If set, successfully handled messages are acknowledged
+            in batches using ``multiple=True`` rather than one at a time. A batch is
+            sent as soon as this many messages are waiting to be acknowledged. An
+            ``error_handler_fn`` must still ack, reject or requeue every message it is
+            given, a message it leaves unsettled may be acknowledged by a later batch.
+        :param ack_batch_interval: When batching acknowledgements, the longest time
+            a handled message waits to be acknowledged.
+        :param retry_delay: With RetryMode.DELAYED_REPUBLISH, the delay before the first
+            retry. It doubles for each following retry.
+        :param retry_max_delay: With RetryMode.DELAYED_REPUBLISH, the longest delay
+            before a retry.
         """
         queues = []
         for routing_key in routing_keys:
@@ -439,6 +665,12 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
             worker_kwargs=worker_kwargs,
             retry_mode=retry_mode,
             retry_limit=retry_limit,
+            prefetch_count=prefetch_count,
+            prefetch_size=prefetch_size,
+            ack_batch_size=ack_batch_size,
+            ack_batch_interval=ack_batch_interval,
+            retry_delay=retry_delay,
+            retry_max_delay=retry_max_delay,
         )
 
     def build_pump_worker(self, work_queue: WorkQueue) -> KombuConsumerWorker:
@@ -448,6 +680,9 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
             queues=self.queues,
             work_queue=work_queue,
             serializer=self.serializer,
+            prefetch_count=self.prefetch_count,
+            prefetch_size=self.prefetch_size,
+            ack_batcher=self.ack_batcher,
             **kwargs,
         )
 
@@ -459,6 +694,9 @@ class KombuQueueConsumerFactory(QueueConsumerFactory):
             self.error_handler_fn,
             self.retry_mode,
             self.retry_limit,
+            self.ack_batcher,
+            self.retry_delay,
+            self.retry_max_delay,
         )
 
     def build_health_checker(self, listener: socket.socket) -> StreamServer:
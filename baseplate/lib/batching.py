@@ -0,0 +1,120 @@
+"""Coalescing of single-key reads from concurrent greenlets.
+
+When a request fans out across greenlets that each read one key, every read
+costs a round trip. A :py:class:`GetBatcher` queues those reads instead and,
+once the event loop comes around again, fetches every queued key with one
+multi-key read, handing each caller its own result. This is the "dataloader"
+pattern.
+
+"""
+import itertools
+
+from datetime import timedelta
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+import gevent
+
+from gevent.event import AsyncResult
+from prometheus_client import Histogram
+
+
+class BatchedRead(NamedTuple):
+    """The result of a read made through a :py:class:`GetBatcher`."""
+
+    #: Whether or not the key was found.
+    found: bool
+
+    #: The value read, or None if the key wasn't found.
+    value: Any
+
+    #: Identifies the batch the read was sent in, for correlating spans.
+    batch_id: int
+
+    #: The number of distinct keys in the batch the read was sent in.
+    batch_size: int
+
+
+class GetBatcher:
+    """Gather single-key reads from concurrent greenlets into multi-key reads.
+
+    Keys passed to :py:meth:`get` are queued and the calling greenlet waits
+    while others run. Once the event loop comes around again (or ``window``
+    has passed) every queued key is fetched with ``get_many`` and each caller
+    gets its own result or error back. Callers reading the same key share one
+    fetch.
+
+    This relies on gevent to run other greenlets while callers wait.
+
+    :param get_many: Fetches a sequence of keys, returning a dict of the ones
+        that were found.
+    :param window: How long to wait for more keys before fetching. The
+        default fetches on the next turn of the event loop.
+    :param max_batch_size: The largest number of keys to fetch at once.
+    :param batch_sizes: An optional histogram to observe the size of each
+        batch in.
+
+    """
+
+    def __init__(
+        self,
+        get_many: Callable[[List[Any]], Dict[Any, Any]],
+        window: timedelta = timedelta(0),
+        max_batch_size: int = 1000,
+        batch_sizes: Optional[Histogram] = None,
+    ):
+        self.get_many = get_many
+        self.window = window.total_seconds()
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = batch_sizes
+
+        self.pending: Dict[Hashable, List[AsyncResult]] = {}
+        self.flush_scheduled = False
+        self.batch_ids = itertools.count()
+
+    def get(self, key: Hashable) -> BatchedRead:
+        """Read ``key`` in the next batch."""
+        result = AsyncResult()
+        self.pending.setdefault(key, []).append(result)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            if self.window:
+                gevent.spawn_later(self.window, self.flush)
+            else:
+                gevent.spawn(self.flush)
+        return result.get()
+
+    def flush(self) -> None:
+        """Fetch every queued key."""
+        pending, self.pending = self.pending, {}
+        self.flush_scheduled = False
+
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            batch = keys[i : i + self.max_batch_size]
+            self._fetch_batch(batch, [pending[key] for key in batch])
+
+    def _fetch_batch(self, keys: Sequence[Hashable], waiters: List[List[AsyncResult]]) -> None:
+        batch_id = next(self.batch_ids)
+        if self.batch_sizes is not None:
+            self.batch_sizes.observe(len(keys))
+
+        try:
+            values = self.get_many(list(keys))
+        except Exception as exc:  # pylint: disable=broad-except
+            for results in waiters:
+                for result in results:
+                    result.set_exception(exc)
+            return
+
+        for key, results in zip(keys, waiters):
+            found = key in values
+            read = BatchedRead(found, values.get(key), batch_id, len(keys))
+            for result in results:
+                result.set(read)
@@ -0,0 +1,5 @@
+from baseplate.lib.cache.cache import Cache
+from baseplate.lib.cache.cache import CacheContextFactory
+
+
+__all__ = ["Cache", "CacheContextFactory"]
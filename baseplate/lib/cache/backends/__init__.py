@@ -0,0 +1,61 @@
+from typing import Dict
+from typing import Sequence
+
+from baseplate import Span
+from baseplate.clients import ContextFactory
+
+
+class CacheBackend:
+    """An interface for read-through cache backends to implement.
+
+    Values are opaque bytes; :py:class:`~baseplate.lib.cache.Cache` takes
+    care of serialization.
+
+    """
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        """Return the values of the ``keys`` that exist."""
+        raise NotImplementedError
+
+    def set_many(self, values: Dict[str, bytes], ttl: int) -> None:
+        """Store ``values``, expiring after ``ttl`` seconds."""
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        """Store ``value`` only if ``key`` doesn't exist.
+
+        :returns: Whether the value was stored.
+
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove ``key``."""
+        raise NotImplementedError
+
+    def delete_if_equal(self, key: str, value: bytes) -> None:
+        """Remove ``key`` only if its value is ``value``.
+
+        Backends should do this atomically if they can. This default reads
+        the value and then deletes it, which can race with another client
+        changing it in between.
+
+        """
+        if self.get_many([key]).get(key) == value:
+            self.delete(key)
+
+
+class CacheBackendContextFactory(ContextFactory):
+    """An interface for context factories of cache backends to implement."""
+
+    def make_object_for_context(self, name: str, span: Span) -> CacheBackend:
+        raise NotImplementedError
+
+    def make_background_backend(self) -> CacheBackend:
+        """Return a backend that isn't bound to a request.
+
+        :py:class:`~baseplate.lib.cache.Cache` uses it for recomputes that run
+        in the background and may outlive the request that started them.
+
+        """
+        raise NotImplementedError
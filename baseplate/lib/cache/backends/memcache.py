@@ -0,0 +1,73 @@
+from typing import Any
+from typing import Dict
+from typing import Sequence
+from typing import Union
+
+from baseplate import Span
+from baseplate.clients.memcache import MemcacheContextFactory
+from baseplate.clients.memcache import MemcachePool
+from baseplate.clients.memcache import MonitoredMemcacheConnection
+from baseplate.lib.cache.backends import CacheBackend
+from baseplate.lib.cache.backends import CacheBackendContextFactory
+
+
+class MemcacheCacheBackendContextFactory(CacheBackendContextFactory):
+    """MemcacheCacheBackend context factory.
+
+    :param memcache_pool: The memcache pool to store cached values in.
+    :param prefix: A prefix to add to cache keys.
+
+    """
+
+    def __init__(self, memcache_pool: MemcachePool, prefix: str = "cache:"):
+        self.memcache_pool = memcache_pool
+        self.memcache_context_factory = MemcacheContextFactory(memcache_pool)
+        self.prefix = prefix
+
+    def make_object_for_context(self, name: str, span: Span) -> "MemcacheCacheBackend":
+        memcache = self.memcache_context_factory.make_object_for_context(name, span)
+        # the cache polls for values other requests are computing, which
+        # mustn't be answered from this request's memo.
+        memcache.request_memo = None
+        return MemcacheCacheBackend(memcache, prefix=self.prefix)
+
+    def make_background_backend(self) -> "MemcacheCacheBackend":
+        return MemcacheCacheBackend(self.memcache_pool, prefix=self.prefix)
+
+
+class MemcacheCacheBackend(CacheBackend):
+    """A Memcache backend for read-through caching.
+
+    The pool should not have a serializer that changes ``bytes`` values,
+    which is true of the serializers in :py:mod:`baseplate.clients.memcache.lib`.
+
+    :param memcache: A memcached connection, or a pool for use outside of
+        requests.
+    :param prefix: A prefix to add to cache keys.
+
+    """
+
+    def __init__(
+        self,
+        memcache: Union[MonitoredMemcacheConnection, MemcachePool],
+        prefix: str = "cache:",
+    ):
+        self.memcache = memcache
+        self.prefix = prefix
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        prefixed = {self.prefix + key: key for key in keys}
+        # pymemcache returns the keys as we gave them, so they're strings.
+        values: Dict[Any, bytes] = self.memcache.get_many(list(prefixed))
+        return {prefixed[key]: value for key, value in values.items()}
+
+    def set_many(self, values: Dict[str, bytes], ttl: int) -> None:
+        self.memcache.set_many(
+            {self.prefix + key: value for key, value in values.items()}, expire=ttl
+        )
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return self.memcache.add(self.prefix + key, value, expire=ttl, noreply=False)
+
+    def delete(self, key: str) -> None:
+        self.memcache.delete(self.prefix + key)
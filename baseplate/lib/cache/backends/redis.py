@@ -0,0 +1,85 @@
+from typing import Any
+from typing import Dict
+from typing import Sequence
+from typing import Union
+
+from redis import ConnectionPool
+from redis import StrictRedis
+
+from baseplate import Span
+from baseplate.clients.redis import MonitoredRedisConnection
+from baseplate.clients.redis import RedisContextFactory
+from baseplate.lib.cache.backends import CacheBackend
+from baseplate.lib.cache.backends import CacheBackendContextFactory
+
+
+# deletes a key only if it still holds the given value, atomically.
+DELETE_IF_EQUAL_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisCacheBackendContextFactory(CacheBackendContextFactory):
+    """RedisCacheBackend context factory.
+
+    :param redis_pool: The redis pool to store cached values in.
+    :param prefix: A prefix to add to cache keys.
+
+    """
+
+    def __init__(self, redis_pool: ConnectionPool, prefix: str = "cache:"):
+        self.redis_pool = redis_pool
+        self.redis_context_factory = RedisContextFactory(redis_pool)
+        self.prefix = prefix
+
+    def make_object_for_context(self, name: str, span: Span) -> "RedisCacheBackend":
+        redis = self.redis_context_factory.make_object_for_context(name, span)
+        # the cache polls for values other requests are computing, which
+        # mustn't be answered from this request's memo.
+        redis.request_memo = None
+        return RedisCacheBackend(redis, prefix=self.prefix)
+
+    def make_background_backend(self) -> "RedisCacheBackend":
+        return RedisCacheBackend(StrictRedis(connection_pool=self.redis_pool), prefix=self.prefix)
+
+
+class RedisCacheBackend(CacheBackend):
+    """A Redis backend for read-through caching.
+
+    :param redis: An instance of
+        :py:class:`baseplate.clients.redis.MonitoredRedisConnection`, or a
+        plain :py:class:`redis.StrictRedis` for use outside of requests.
+    :param prefix: A prefix to add to cache keys.
+
+    """
+
+    def __init__(self, redis: Union[MonitoredRedisConnection, StrictRedis], prefix: str = "cache:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        values = self.redis.mget([self.prefix + key for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, values: Dict[str, bytes], ttl: int) -> None:
+        with self._pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(self.prefix + key, value, ex=ttl)
+            pipe.execute()
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return bool(self.redis.set(self.prefix + key, value, ex=ttl, nx=True))
+
+    def delete(self, key: str) -> None:
+        self.redis.delete(self.prefix + key)
+
+    def delete_if_equal(self, key: str, value: bytes) -> None:
+        self.redis.eval(DELETE_IF_EQUAL_SCRIPT, 1, self.prefix + key, value)
+
+    def _pipeline(self) -> Any:
+        if isinstance(self.redis, MonitoredRedisConnection):
+            return self.redis.pipeline("cache")
+        return self.redis.pipeline(transaction=False)
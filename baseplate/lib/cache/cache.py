@@ -0,0 +1,370 @@
+import json
+import logging
+import math
+import os
+import random
+import struct
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import gevent
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from baseplate import Span
+from baseplate.clients import ContextFactory
+from baseplate.lib.cache.backends import CacheBackend
+from baseplate.lib.cache.backends import CacheBackendContextFactory
+from baseplate.lib.prometheus_metrics import default_latency_buckets
+
+
+logger = logging.getLogger(__name__)
+
+
+ComputeMany = Callable[[List[str]], Dict[str, Any]]
+
+CACHE_REQUESTS_TOTAL = Counter(
+    "cache_requests_total",
+    "Total number of keys looked up in read-through caches",
+    ["cache_name", "cache_result"],
+)
+CACHE_RECOMPUTES_TOTAL = Counter(
+    "cache_recomputes_total",
+    "Total number of times read-through caches recomputed values",
+    ["cache_name", "cache_mode", "cache_success"],
+)
+CACHE_RECOMPUTE_SECONDS = Histogram(
+    "cache_recompute_seconds",
+    "Latency histogram of recomputing values for read-through caches",
+    ["cache_name", "cache_mode"],
+    buckets=default_latency_buckets,
+)
+
+# stored values are prefixed with when they expire and how long they took
+# to compute, both as doubles.
+_HEADER = struct.Struct("!dd")
+_LOCK_SUFFIX = ":lock"
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    delta: float
+
+
+class CacheContextFactory(ContextFactory):
+    """Cache context factory.
+
+    This factory will attach a :py:class:`Cache` to an attribute on the
+    :py:class:`~baseplate.RequestContext`.
+
+    :param backend_factory: An instance of
+        :py:class:`baseplate.clients.ContextFactory`. The context factory must
+        return an instance of
+        :py:class:`baseplate.lib.cache.backends.CacheBackend`. If it's a
+        :py:class:`~baseplate.lib.cache.backends.CacheBackendContextFactory`,
+        background recomputes store their results through a backend that
+        isn't bound to the request that started them.
+    :param ttl: How long, in seconds, values are fresh for.
+    :param stale_ttl: How long, in seconds, values may be served stale while
+        they're recomputed in the background. 0 disables serving stale values.
+    :param beta: How eagerly to recompute values before they expire. 0
+        disables early recomputation and larger values recompute earlier.
+    :param lock_ttl: How long, in seconds, a recompute may hold the lock on a
+        key.
+    :param lock_timeout: How long, in seconds, to wait for another recompute
+        of a missing key before computing it anyway.
+    :param serializer: Function to turn values into bytes, JSON by default.
+    :param deserializer: Function to turn bytes back into values, must be
+        compatible with ``serializer``.
+
+    """
+
+    def __init__(
+        self,
+        backend_factory: ContextFactory,
+        ttl: float,
+        stale_ttl: float = 0,
+        beta: float = 1.0,
+        lock_ttl: float = 10,
+        lock_timeout: float = 1,
+        serializer: Optional[Callable[[Any], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Any]] = None,
+    ):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if not isinstance(backend_factory, ContextFactory):
+            raise TypeError("backend_factory must be an instance of ContextFactory")
+
+        self.backend_factory = backend_factory
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+        self.serializer = serializer
+        self.deserializer = deserializer
+
+        self.background_backend: Optional[CacheBackend] = None
+        if isinstance(backend_factory, CacheBackendContextFactory):
+            self.background_backend = backend_factory.make_background_backend()
+
+    def make_object_for_context(self, name: str, span: Span) -> "Cache":
+        backend = self.backend_factory.make_object_for_context(name, span)
+        return Cache(
+            backend,
+            self.ttl,
+            name=name,
+            stale_ttl=self.stale_ttl,
+            beta=self.beta,
+            lock_ttl=self.lock_ttl,
+            lock_timeout=self.lock_timeout,
+            serializer=self.serializer,
+            deserializer=self.deserializer,
+            background_backend=self.background_backend,
+        )
+
+
+class Cache:
+    """A read-through cache that protects its source from stampedes.
+
+    Values are looked up in the backend and computed on a miss. Only one
+    caller computes a missing key at a time: the others wait for its result
+    for up to ``lock_timeout`` seconds. Values are recomputed in a background
+    greenlet a little before they expire, with the probability rising as
+    expiry nears and for values that are slow to compute (the XFetch
+    algorithm), and stale values are served for ``stale_ttl`` seconds after
+    they expire while they're recomputed in the background. Either way only
+    the caller that takes the key's lock recomputes it.
+
+    Background recomputes may outlive the request that started them, so the
+    compute function shouldn't rely on request-scoped state, and their
+    results are stored through ``background_backend`` if one is given.
+
+    Each lock holds a random token and is only released by the caller that
+    holds it, so a recompute that outlives ``lock_ttl`` can't release a lock
+    someone else took since.
+
+    See :py:class:`CacheContextFactory` for the other parameters.
+
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: float,
+        name: str = "cache",
+        stale_ttl: float = 0,
+        beta: float = 1.0,
+        lock_ttl: float = 10,
+        lock_timeout: float = 1,
+        serializer: Optional[Callable[[Any], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Any]] = None,
+        background_backend: Optional[CacheBackend] = None,
+    ):
+        if not isinstance(backend, CacheBackend):
+            raise TypeError("backend must be an instance of CacheBackend")
+
+        self.backend = backend
+        self.background_backend = background_backend or backend
+        self.ttl = ttl
+        self.name = name
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+        self.serializer = serializer or (lambda value: json.dumps(value).encode("utf8"))
+        self.deserializer = deserializer or json.loads
+        self.poll_interval = 0.05
+
+    def get(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the value of ``key``, computing it with ``compute`` if needed.
+
+        :param key: The cache key.
+        :param compute: Called with no arguments to compute the value.
+        :param ttl: How long, in seconds, the value is fresh for, overriding
+            the default.
+
+        """
+        return self.get_many([key], lambda keys: {key: compute()}, ttl=ttl)[key]
+
+    def get_many(
+        self, keys: Iterable[str], compute_many: ComputeMany, ttl: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Return the values of ``keys``, computing the missing ones in one batch.
+
+        :param keys: The cache keys.
+        :param compute_many: Called with a list of keys to compute and returns
+            a dictionary of their values. Keys it leaves out are not cached.
+        :param ttl: How long, in seconds, the values are fresh for, overriding
+            the default.
+
+        """
+        keys = list(dict.fromkeys(keys))
+        ttl = ttl or self.ttl
+        if not keys:
+            return {}
+
+        try:
+            entries = self._load(keys)
+        except Exception:
+            logger.warning("Failed to read cache %s, computing values", self.name, exc_info=True)
+            return self._compute(keys, compute_many, ttl, mode="uncached", store=False)
+
+        now = time.time()
+        results: Dict[str, Any] = {}
+        missing: List[str] = []
+        refresh: List[str] = []
+        for key in keys:
+            entry = entries.get(key)
+            if entry is None:
+                missing.append(key)
+                continue
+
+            results[key] = entry.value
+            if entry.expires_at <= now:
+                refresh.append(key)
+                CACHE_REQUESTS_TOTAL.labels(self.name, "stale").inc()
+            else:
+                if self._should_refresh_early(entry, now):
+                    refresh.append(key)
+                CACHE_REQUESTS_TOTAL.labels(self.name, "hit").inc()
+
+        if missing:
+            CACHE_REQUESTS_TOTAL.labels(self.name, "miss").inc(len(missing))
+
+        refresh, token = self._lock(refresh)
+        if refresh:
+            gevent.spawn(
+                self._compute, refresh, compute_many, ttl, mode="background", lock_token=token
+            )
+
+        if missing:
+            locked, token = self._lock(missing)
+            if locked:
+                results.update(
+                    self._compute(locked, compute_many, ttl, mode="sync", lock_token=token)
+                )
+
+            locked_keys = set(locked)
+            waiting = [key for key in missing if key not in locked_keys]
+            if waiting:
+                results.update(self._wait_for(waiting))
+                leftover = [key for key in waiting if key not in results]
+                if leftover:
+                    results.update(self._compute(leftover, compute_many, ttl, mode="sync"))
+
+        return results
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` from the cache so it's recomputed on next use."""
+        self.backend.delete(key)
+
+    def _should_refresh_early(self, entry: _Entry, now: float) -> bool:
+        if not self.beta:
+            return False
+        # XFetch: the log of a uniform (0, 1] sample is an exponentially
+        # distributed negative number, so values are refreshed a random time
+        # before expiry that scales with how long they take to compute.
+        gap = -entry.delta * self.beta * math.log(1.0 - random.random())
+        return now + gap >= entry.expires_at
+
+    def _load(self, keys: Sequence[str]) -> Dict[str, _Entry]:
+        entries = {}
+        for key, data in self.backend.get_many(keys).items():
+            try:
+                expires_at, delta = _HEADER.unpack_from(data)
+                value = self.deserializer(data[_HEADER.size :])
+            except Exception:
+                logger.warning("Discarding unreadable cached value for %s", key, exc_info=True)
+                continue
+            entries[key] = _Entry(value, expires_at, delta)
+        return entries
+
+    def _lock(self, keys: Sequence[str]) -> Tuple[List[str], bytes]:
+        lock_ttl = math.ceil(self.lock_ttl)
+        token = os.urandom(16)
+        locked = []
+        for key in keys:
+            try:
+                if self.backend.add(key + _LOCK_SUFFIX, token, lock_ttl):
+                    locked.append(key)
+            except Exception:
+                logger.warning("Failed to lock %s in cache %s", key, self.name, exc_info=True)
+        return locked, token
+
+    def _wait_for(self, keys: List[str]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        deadline = time.monotonic() + self.lock_timeout
+        while keys and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                entries = self._load(keys)
+            except Exception:
+                logger.warning("Failed to read cache %s", self.name, exc_info=True)
+                break
+            for key, entry in entries.items():
+                results[key] = entry.value
+            keys = [key for key in keys if key not in results]
+        return results
+
+    def _compute(
+        self,
+        keys: List[str],
+        compute_many: ComputeMany,
+        ttl: float,
+        mode: str,
+        store: bool = True,
+        lock_token: Optional[bytes] = None,
+    ) -> Dict[str, Any]:
+        # background recomputes outlive the request, so they mustn't use its
+        # backend.
+        backend = self.background_backend if mode == "background" else self.backend
+        try:
+            success = "true"
+            start_time = time.perf_counter()
+            try:
+                values = compute_many(keys)
+            except Exception:
+                success = "false"
+                if mode == "background":
+                    logger.exception("Failed to recompute values for cache %s", self.name)
+                    return {}
+                raise
+            finally:
+                delta = time.perf_counter() - start_time
+                CACHE_RECOMPUTES_TOTAL.labels(self.name, mode, success).inc()
+                CACHE_RECOMPUTE_SECONDS.labels(self.name, mode).observe(delta)
+
+            if store and values:
+                header = _HEADER.pack(time.time() + ttl, delta)
+                try:
+                    backend.set_many(
+                        {key: header + self.serializer(value) for key, value in values.items()},
+                        ttl=math.ceil(ttl + self.stale_ttl),
+                    )
+                except Exception:
+                    logger.warning("Failed to store values in cache %s", self.name, exc_info=True)
+            return values
+        finally:
+            # the values are stored before the lock is released so that
+            # waiting callers find them.
+            if lock_token is not None:
+                self._unlock(backend, keys, lock_token)
+
+    def _unlock(self, backend: CacheBackend, keys: List[str], token: bytes) -> None:
+        for key in keys:
+            try:
+                backend.delete_if_equal(key + _LOCK_SUFFIX, token)
+            except Exception:
+                logger.warning("Failed to unlock %s in cache %s", key, self.name, exc_info=True)
@@ -0,0 +1,169 @@
+"""Request-scoped memoization of reads.
+
+A :py:class:`RequestMemo` remembers the results of reads for the lifetime of
+a single request so that reading the same thing again, from anywhere in the
+request, doesn't cost another round trip. See
+:py:class:`~baseplate.observers.memo.RequestMemoBaseplateObserver` for how to
+enable it.
+
+"""
+import copy
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from gevent.event import AsyncResult
+
+from baseplate import Span
+
+
+T = TypeVar("T")
+
+
+class RequestMemo:
+    """A per-request memo of read results.
+
+    Entries are grouped by ``namespace`` (usually the name of a client on the
+    context) and by ``key`` (the cache key or Redis key read) so that a write
+    can invalidate everything read from a key, or everything read through a
+    client. Concurrent identical reads share the first one's result rather
+    than each making a request.
+
+    Writers should invalidate both before and after they write: reads that
+    are in flight when entries are invalidated aren't memoized, so the second
+    invalidation drops reads that might have seen the old value.
+
+    :param server_span: The span of the request. Hits are counted on it with
+        :py:meth:`~baseplate.Span.incr_tag`.
+
+    """
+
+    def __init__(self, server_span: Optional[Span] = None):
+        self.server_span = server_span
+        self.hits = 0
+        self.misses = 0
+        self.closed = False
+        # incremented by every invalidation so that reads done outside of
+        # call() can tell if they raced with a write.
+        self.version = 0
+        self._entries: Dict[str, Dict[Hashable, Dict[Hashable, AsyncResult]]] = {}
+
+    def _hit(self) -> None:
+        self.hits += 1
+        if self.server_span is not None:
+            self.server_span.incr_tag("request_memo.hits")
+
+    def call(
+        self, namespace: str, key: Hashable, func: Callable[[], T], read: Hashable = None
+    ) -> T:
+        """Return the result of ``func``, calling it only once per request.
+
+        :param namespace: The group the read belongs to.
+        :param key: What is being read, e.g. a cache key.
+        :param func: Does the read.
+        :param read: Distinguishes different reads of the same ``key``,
+            e.g. the command and its arguments.
+
+        """
+        if self.closed:
+            return func()
+
+        try:
+            hash((key, read))
+        except TypeError:
+            # e.g. arguments that are Thrift structs, which aren't hashable
+            return func()
+
+        reads = self._entries.setdefault(namespace, {}).setdefault(key, {})
+        result = reads.get(read)
+        if result is not None:
+            self._hit()
+            return _copy(result.get())
+
+        result = AsyncResult()
+        reads[read] = result
+        self.misses += 1
+        try:
+            value = func()
+        except BaseException as exc:
+            if reads.get(read) is result:
+                del reads[read]
+            result.set_exception(exc)
+            raise
+        result.set(value)
+        return _copy(value)
+
+    def get(self, namespace: str, key: Hashable, read: Hashable = None) -> Tuple[bool, Any]:
+        """Return whether a completed read is memoized and, if so, its result.
+
+        Reads that are still in flight or failed are not returned.
+
+        """
+        if self.closed:
+            return False, None
+        result = self._entries.get(namespace, {}).get(key, {}).get(read)
+        if result is None or not result.successful():
+            return False, None
+        self._hit()
+        return True, _copy(result.value)
+
+    def set(
+        self,
+        namespace: str,
+        key: Hashable,
+        value: Any,
+        read: Hashable = None,
+        version: Optional[int] = None,
+    ) -> None:
+        """Memoize the result of a read that was done elsewhere.
+
+        :param version: The memo's :py:attr:`version` when the read started.
+            If anything was invalidated since, the value is not memoized.
+
+        """
+        if self.closed or (version is not None and version != self.version):
+            return
+        result = AsyncResult()
+        result.set(value)
+        self._entries.setdefault(namespace, {}).setdefault(key, {})[read] = result
+        self.misses += 1
+
+    def invalidate(self, namespace: str, key: Hashable = None) -> None:
+        """Forget reads of ``key``, or of everything in ``namespace`` if no key is given."""
+        self.version += 1
+        if key is None:
+            self._entries.pop(namespace, None)
+        else:
+            self._entries.get(namespace, {}).pop(key, None)
+
+    def close(self) -> None:
+        """Forget everything and stop memoizing."""
+        self.closed = True
+        self._entries.clear()
+
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+def _copy(value: T) -> T:
+    # callers may modify what they read, including nested containers and
+    # Thrift structs, which mustn't change what the next reader gets.
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    return copy.deepcopy(value)
+
+
+def get_request_memo(span: Optional[Span]) -> Optional[RequestMemo]:
+    """Return the memo of the request ``span`` belongs to, if memoization is enabled."""
+    context = getattr(span, "context", None)
+    if context is None:
+        return None
+    memo = getattr(context, "request_memo", None)
+    if not isinstance(memo, RequestMemo):
+        return None
+    return memo
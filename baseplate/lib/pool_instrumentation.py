@@ -0,0 +1,113 @@
+"""Instrumentation shared by the clients' connection pools.
+
+Runtime metrics report how full each pool is every few seconds, which misses
+the moments a pool runs dry. A :py:class:`PoolInstrumentation` records what
+happens on each checkout instead: how long the caller waited for a slot,
+whether it gave up waiting, how long new connections took to establish and
+how often connections are opened and closed.
+
+All clients report into the same metrics, labelled with the type of client
+and the name it was configured with:
+
+``client_pool_checkout_wait_seconds``
+    How long each checkout waited for a connection slot.
+``client_pool_checkout_timeouts_total``
+    How many checkouts gave up waiting for a connection slot.
+``client_pool_connect_latency_seconds``
+    How long it took to establish new connections, by success.
+``client_pool_connections_opened_total`` / ``client_pool_connections_closed_total``
+    Connection churn.
+
+"""
+import contextlib
+
+from time import perf_counter
+from typing import Iterator
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from baseplate.lib.prometheus_metrics import default_latency_buckets
+
+
+PROM_PREFIX = "client_pool"
+PROM_LABELS = [f"{PROM_PREFIX}_type", f"{PROM_PREFIX}_name"]
+
+CHECKOUT_WAIT_TIME = Histogram(
+    f"{PROM_PREFIX}_checkout_wait_seconds",
+    "Time spent waiting for a connection slot in a client pool",
+    PROM_LABELS,
+    buckets=default_latency_buckets,
+)
+CHECKOUT_TIMEOUTS_TOTAL = Counter(
+    f"{PROM_PREFIX}_checkout_timeouts_total",
+    "Total number of checkouts that timed out waiting for a connection slot",
+    PROM_LABELS,
+)
+CONNECT_TIME = Histogram(
+    f"{PROM_PREFIX}_connect_latency_seconds",
+    "Time spent establishing new connections for a client pool",
+    PROM_LABELS + [f"{PROM_PREFIX}_success"],
+    buckets=default_latency_buckets,
+)
+CONNECTIONS_OPENED_TOTAL = Counter(
+    f"{PROM_PREFIX}_connections_opened_total",
+    "Total number of connections opened by a client pool",
+    PROM_LABELS,
+)
+CONNECTIONS_CLOSED_TOTAL = Counter(
+    f"{PROM_PREFIX}_connections_closed_total",
+    "Total number of connections closed by a client pool",
+    PROM_LABELS,
+)
+
+
+class PoolInstrumentation:
+    """Record checkout and connection metrics for one client's pool.
+
+    The labelled metrics are resolved once, so recording is cheap enough to do
+    on every checkout.
+
+    :param client_type: The kind of client, e.g. ``thrift`` or ``redis``.
+    :param client_name: The name the client was configured with.
+
+    """
+
+    def __init__(self, client_type: str, client_name: str):
+        self.client_type = client_type
+        self.client_name = client_name
+        self.wait_time = CHECKOUT_WAIT_TIME.labels(client_type, client_name)
+        self.timeouts = CHECKOUT_TIMEOUTS_TOTAL.labels(client_type, client_name)
+        self.connect_success = CONNECT_TIME.labels(client_type, client_name, "true")
+        self.connect_failure = CONNECT_TIME.labels(client_type, client_name, "false")
+        self.opened = CONNECTIONS_OPENED_TOTAL.labels(client_type, client_name)
+        self.closed = CONNECTIONS_CLOSED_TOTAL.labels(client_type, client_name)
+
+    def checkout_waited(self, seconds: float) -> None:
+        """Record how long a checkout waited for a slot."""
+        self.wait_time.observe(seconds)
+
+    def checkout_timed_out(self, seconds: float) -> None:
+        """Record a checkout that gave up after waiting ``seconds``."""
+        self.wait_time.observe(seconds)
+        self.timeouts.inc()
+
+    @contextlib.contextmanager
+    def connecting(self) -> Iterator[None]:
+        """Time establishing a new connection inside the block.
+
+        The connection counts as opened if the block doesn't raise.
+
+        """
+        start = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.connect_failure.observe(perf_counter() - start)
+            raise
+        self.connect_success.observe(perf_counter() - start)
+        self.opened.inc()
+
+    def connection_closed(self) -> None:
+        """Record that the pool closed a connection."""
+        self.closed.inc()
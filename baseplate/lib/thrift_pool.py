@@ -20,6 +20,7 @@ import queue
 import socket
 import time
 
+from time import perf_counter
 from typing import Any
 from typing import Generator
 from typing import Optional
@@ -36,6 +37,7 @@ from thrift.transport.TSocket import TSocket
 from thrift.transport.TTransport import TTransportException
 
 from baseplate.lib import config
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 from baseplate.lib.retry import RetryPolicy
 
 
@@ -143,6 +145,9 @@ class ThriftConnectionPool:
         transports. This is useful for talking to services that don't support
         THeaderProtocol.
     :param queue_cls: A stdlib compatible queue class.
+    :param instrumentation: Records checkout waits and connection churn.
+        :py:class:`~baseplate.clients.thrift.ThriftContextFactory` provides
+        one if this is not set.
 
     All exceptions raised by this class derive from
     :py:exc:`~thrift.transport.TTransport.TTransportException`.
@@ -162,6 +167,7 @@ class ThriftConnectionPool:
         max_connection_attempts: int = 3,
         protocol_factory: TProtocolFactory = _DEFAULT_PROTOCOL_FACTORY,
         queue_cls: ProtocolPool = queue.LifoQueue,
+        instrumentation: Optional[PoolInstrumentation] = None,
     ):
         self.endpoint = endpoint
         self.max_age = max_age
@@ -170,18 +176,37 @@ class ThriftConnectionPool:
         self.protocol_factory = protocol_factory
 
         self.size = size
+        self.instrumentation = instrumentation
 
         self.pool = queue_cls()
         for _ in range(size):
             self.pool.put(None)
 
     def _get_from_pool(self) -> Optional[TProtocolBase]:
+        start = perf_counter()
         try:
-            return self.pool.get(block=True, timeout=self.timeout)
+            prot = self.pool.get(block=True, timeout=self.timeout)
         except queue.Empty:
+            if self.instrumentation:
+                self.instrumentation.checkout_timed_out(perf_counter() - start)
             raise TTransportException(
                 type=TTransportException.NOT_OPEN, message="timed out waiting for a connection slot"
             )
+        if self.instrumentation:
+            self.instrumentation.checkout_waited(perf_counter() - start)
+        return prot
+
+    def _open(self, prot: TProtocolBase) -> None:
+        if self.instrumentation:
+            with self.instrumentation.connecting():
+                prot.trans.open()
+        else:
+            prot.trans.open()
+
+    def _close(self, prot: TProtocolBase) -> None:
+        prot.trans.close()
+        if self.instrumentation:
+            self.instrumentation.connection_closed()
 
     def _create_connection(self) -> TProtocolBase:
         for _ in self.retry_policy:
@@ -190,7 +215,7 @@ class ThriftConnectionPool:
             prot = self.protocol_factory.getProtocol(trans)
 
             try:
-                prot.trans.open()
+                self._open(prot)
             except TTransportException as exc:
                 logger.info("Failed to connect to %r: %s", self.endpoint, exc)
                 continue
@@ -206,7 +231,7 @@ class ThriftConnectionPool:
 
     def _is_stale(self, prot: TProtocolBase) -> bool:
         if not prot.trans.isOpen() or time.time() - prot.baseplate_birthdate > self.max_age:
-            prot.trans.close()
+            self._close(prot)
             return True
         return False
 
@@ -251,7 +276,7 @@ class ThriftConnectionPool:
             # so it's safest to just close this connection because we don't
             # know what state it's in.
             if prot:
-                prot.trans.close()
+                self._close(prot)
             raise
         except TException:
             # the only other TException-derived errors are application level
@@ -263,11 +288,39 @@ class ThriftConnectionPool:
             # or something nastier. we'll just play it safe and close the
             # connection.
             if prot:
-                prot.trans.close()
+                self._close(prot)
             raise
         finally:
             self._release(prot)
 
+    def prewarm(self, count: int) -> int:
+        """Open up to ``count`` connections ahead of time.
+
+        This is meant to be called at startup so that the first requests
+        don't pay the cost of connecting. Slots that are in use are skipped
+        and the pool never grows beyond its size.
+
+        :returns: The number of open connections in the slots that were warmed.
+
+        """
+        slots = []
+        try:
+            for _ in range(min(count, self.size)):
+                try:
+                    slots.append(self.pool.get_nowait())
+                except queue.Empty:
+                    break
+
+            for i, prot in enumerate(slots):
+                if not prot or self._is_stale(prot):
+                    slots[i] = self._create_connection()
+        except TTransportException as exc:
+            logger.warning("Failed to prewarm connections to %r: %s", self.endpoint, exc)
+        finally:
+            for prot in slots:
+                self._release(prot)
+        return sum(1 for prot in slots if prot and prot.trans.isOpen())
+
     @property
     def checkedout(self) -> int:
         return self.size - self.pool.qsize()
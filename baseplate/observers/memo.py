@@ -0,0 +1,31 @@
+from typing import Optional
+
+from baseplate import _ExcInfo
+from baseplate import BaseplateObserver
+from baseplate import RequestContext
+from baseplate import ServerSpan
+from baseplate import SpanObserver
+from baseplate.lib.memo import RequestMemo
+
+
+class RequestMemoBaseplateObserver(BaseplateObserver):
+    """Memoize reads for the duration of each request.
+
+    This attaches a :py:class:`~baseplate.lib.memo.RequestMemo` to the context
+    as ``request_memo`` when each request starts and drops it when the
+    request's server span finishes.
+
+    """
+
+    def on_server_span_created(self, context: RequestContext, server_span: ServerSpan) -> None:
+        memo = RequestMemo(server_span)
+        context.request_memo = memo
+        server_span.register(RequestMemoServerSpanObserver(memo))
+
+
+class RequestMemoServerSpanObserver(SpanObserver):
+    def __init__(self, memo: RequestMemo):
+        self.memo = memo
+
+    def on_finish(self, exc_info: Optional[_ExcInfo]) -> None:
+        self.memo.close()
@@ -3,8 +3,10 @@ from __future__ import annotations
 import abc
 import datetime
 import logging
+import multiprocessing
 import os
 import queue
+import random
 import signal
 import socket
 import uuid
@@ -18,12 +20,16 @@ from typing import Optional
 from typing import Sequence
 from typing import TYPE_CHECKING
 
+import gevent
+import gevent.monkey
+
 from gevent.pywsgi import LoggingLogAdapter
 from gevent.pywsgi import WSGIServer
 from gevent.server import StreamServer
 
 import baseplate.lib.config
 
+from baseplate import TraceInfo
 from baseplate.lib.retry import RetryPolicy
 from baseplate.observers.timeout import ServerTimeout
 from baseplate.server import runtime_monitor
@@ -35,6 +41,10 @@ logger = logging.getLogger(__name__)
 if TYPE_CHECKING:
     # TODO: Replace with wsgiref.types once on 3.11+
     from _typeshed.wsgi import StartResponse
+    from multiprocessing.connection import Connection
+
+    from baseplate import Baseplate
+    from baseplate import RequestContext
 
 WSGIEnvironment = Dict[str, Any]
 HealthcheckCallback = Callable[[WSGIEnvironment], bool]
@@ -188,6 +198,233 @@ class QueueConsumer:
         logger.debug("Consumer <%s> stopping.", self.id)
 
 
+ProcessHandler = Callable[["RequestContext", Any], Any]
+
+
+class ProcessPoolWorkerError(Exception):
+    """A worker process died or returned an error that could not be transferred."""
+
+
+def _process_worker_main(
+    requests: Connection,
+    responses: Connection,
+    baseplate: Baseplate,  # pylint: disable=redefined-outer-name
+    name: str,
+    handler_fn: ProcessHandler,
+) -> None:
+    """Serve handler calls read from `requests` until the parent hangs up."""
+    while True:
+        try:
+            request = requests.recv()
+        except EOFError:
+            break
+
+        if request is None:
+            break
+
+        trace_info, data = request
+        context = baseplate.make_context_object()
+        try:
+            with baseplate.make_server_span(context, name, trace_info=trace_info):
+                result = handler_fn(context, data)
+        except Exception as exc:  # pylint: disable=broad-except
+            try:
+                responses.send((False, exc))
+            except Exception:  # pylint: disable=broad-except
+                # the exception (or something it references) isn't picklable,
+                # hand back a description of it instead.
+                responses.send((False, ProcessPoolWorkerError(f"{type(exc).__name__}: {exc}")))
+        else:
+            responses.send((True, result))
+
+
+class _ProcessWorker:
+    def __init__(
+        self,
+        baseplate: Baseplate,  # pylint: disable=redefined-outer-name
+        name: str,
+        handler_fn: ProcessHandler,
+        start_method: str = "fork",
+    ):
+        mp_context = multiprocessing.get_context(start_method)
+        # we use a pair of simplex pipes rather than a duplex one because
+        # duplex pipes are socketpairs, which gevent wraps when monkeypatched.
+        child_requests, self.requests = mp_context.Pipe(duplex=False)
+        self.responses, child_responses = mp_context.Pipe(duplex=False)
+        self.process = mp_context.Process(
+            target=_process_worker_main,
+            args=(child_requests, child_responses, baseplate, name, handler_fn),
+            daemon=True,
+        )
+        self.process.start()
+        child_requests.close()
+        child_responses.close()
+        if gevent.monkey.is_module_patched("os"):
+            # gevent defers closing file descriptors until the hub runs. let it
+            # run now so the next worker we fork doesn't inherit this worker's
+            # end of the pipes, which would stop us from noticing it exiting.
+            gevent.idle()
+        self.usable = True
+
+    def is_usable(self) -> bool:
+        return self.usable and self.process.is_alive()
+
+    def call(self, trace_info: TraceInfo, data: Any) -> Any:
+        # until the response is read, the worker may still be busy with this
+        # call (e.g. if we're interrupted by a timeout) and its response would
+        # be read by the next caller, so the worker can't be reused.
+        self.usable = False
+        try:
+            self.requests.send((trace_info, data))
+            # poll() waits on the pipe with select so, when monkeypatched,
+            # other greenlets (the pump, the healthcheck) keep running while
+            # the worker process is busy.
+            self.responses.poll(None)
+            ok, result = self.responses.recv()
+        except (EOFError, OSError) as exc:
+            raise ProcessPoolWorkerError(
+                f"worker process {self.process.pid} exited unexpectedly"
+            ) from exc
+        self.usable = True
+
+        if not ok:
+            raise result
+        return result
+
+    def stop(self) -> None:
+        try:
+            self.requests.send(None)
+        except OSError:
+            pass
+        self.requests.close()
+        self.responses.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.requests.close()
+        self.responses.close()
+        self.process.join()
+
+
+class ProcessPoolHandler:
+    """Run a CPU-bound handler function in a pool of worker processes.
+
+    Handler threads in a :py:class:`QueueConsumerServer` share a single GIL
+    (and, usually, a single gevent hub) with the pump and the healthcheck
+    server, so a CPU-bound handler can never use more than one core.  Wrap
+    the expensive part of your handler in a :py:class:`ProcessPoolHandler`
+    and pass it as the ``handler_fn`` of your
+    :py:class:`QueueConsumerFactory` to run it in separate processes instead.
+    The pump, acknowledgement/offset handling and the healthcheck stay in the
+    parent process.
+
+    Each call sends the message body and the current trace context to an idle
+    worker process over a pipe. The worker creates a new
+    :py:class:`~baseplate.RequestContext` and server span (a child of the
+    calling span) and runs ``handler_fn(context, data)`` in it. The return
+    value is sent back to the caller and exceptions are re-raised in the
+    parent, so the framework's normal error handling still applies.
+
+    A worker that dies, or whose call is interrupted (e.g. by a
+    :py:class:`~baseplate.observers.timeout.ServerTimeout`) before it
+    responds, is killed and replaced by a new worker process. Replacements
+    are started with the ``forkserver`` start method rather than forked from
+    a handler thread, so ``baseplate`` and ``handler_fn`` must be picklable
+    for workers to be replaced.
+
+    The message body and return value must be picklable. The framework's
+    message object (e.g. :py:class:`kombu.Message`) is not sent to the
+    worker, so ``handler_fn`` only takes ``(context, data)``.
+
+    Worker processes are forked when the pool is created, so create it in
+    your consumer factory function before the server is started::
+
+        def make_consumer_factory(app_config):
+            baseplate = Baseplate(app_config)
+            pool = ProcessPoolHandler(baseplate, "extract_metadata", extract_metadata, processes=4)
+            return KombuQueueConsumerFactory.new(
+                ...,
+                handler_fn=pool,
+                health_check_fn=pool.health_check,
+            )
+
+    Set ``max_concurrency`` to at least ``processes`` so that every worker
+    process has a handler thread feeding it.
+
+    :param baseplate: The Baseplate used to create spans in the workers.
+    :param name: The name of the server span created for each message.
+    :param handler_fn: The function to run in the worker processes.
+    :param processes: The number of worker processes, defaults to the number
+        of CPUs.
+
+    """
+
+    def __init__(
+        self,
+        baseplate: Baseplate,  # pylint: disable=redefined-outer-name
+        name: str,
+        handler_fn: ProcessHandler,
+        processes: Optional[int] = None,
+    ):
+        self.baseplate = baseplate
+        self.name = name
+        self.handler_fn = handler_fn
+        self.processes = processes or os.cpu_count() or 1
+        self.workers = [self._spawn_worker() for _ in range(self.processes)]
+        self.idle_workers: queue.Queue = queue.Queue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    def _spawn_worker(self, start_method: str = "fork") -> _ProcessWorker:
+        return _ProcessWorker(self.baseplate, self.name, self.handler_fn, start_method)
+
+    def _replace_worker(self, worker: _ProcessWorker) -> _ProcessWorker:
+        logger.warning("Replacing process pool worker %d", worker.process.pid)
+        worker.kill()
+        # we're on a handler thread, and a process forked while other threads
+        # hold locks may never be able to take them, so start the replacement
+        # from the single-threaded forkserver instead.
+        replacement = self._spawn_worker("forkserver")
+        self.workers[self.workers.index(worker)] = replacement
+        return replacement
+
+    def __call__(self, context: RequestContext, data: Any, message: Any = None) -> Any:
+        """Run the handler function in a worker process and return its result."""
+        span = context.span
+        trace_info = TraceInfo(
+            trace_id=span.trace_id,
+            parent_id=span.id,
+            span_id=str(random.getrandbits(64)),
+            sampled=span.sampled,
+            flags=span.flags,
+        )
+
+        worker = self.idle_workers.get()
+        try:
+            if not worker.is_usable():
+                worker = self._replace_worker(worker)
+            return worker.call(trace_info, data)
+        finally:
+            if not worker.is_usable():
+                worker = self._replace_worker(worker)
+            self.idle_workers.put(worker)
+
+    # pylint: disable=unused-argument
+    def health_check(self, environ: Optional[WSGIEnvironment] = None) -> bool:
+        """Return if all worker processes are alive.
+
+        This can be used as the healthcheck callback of a
+        :py:class:`QueueConsumerFactory`.
+
+        """
+        return all(worker.process.is_alive() for worker in self.workers)
+
+    def stop(self) -> None:
+        """Ask the worker processes to exit once they finish their current message."""
+        for worker in self.workers:
+            worker.stop()
+
+
 class QueueConsumerServer:
     """Server for running long-lived queue consumers."""
 
@@ -320,7 +557,8 @@ def make_server(
 
     If you require that you process messages in-order, your handler is heavily CPU
     bound, or you don't do any IO when handling a message you should restrict
-    max_concurrency to 1.
+    max_concurrency to 1.  CPU bound handlers that don't need in-order processing
+    can use a :py:class:`ProcessPoolHandler` to spread the work across cores.
     """
     cfg = baseplate.lib.config.parse_config(
         server_config,
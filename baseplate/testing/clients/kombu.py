@@ -0,0 +1,140 @@
+import collections
+import copy
+import threading
+import time
+
+from queue import Empty
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from kombu.transport import memory
+from kombu.transport import virtual
+
+
+Messages = Deque[Tuple[Optional[float], Dict[str, Any]]]
+
+
+# pylint: disable=abstract-method
+class InMemoryChannel(memory.Channel):
+    """Channel for :py:class:`InMemoryTransport`.
+
+    Queues are kept on the transport, so they're shared by the channels of a
+    connection but not between connections.
+
+    """
+
+    @property
+    def broker_queues(self) -> Dict[str, Tuple[Dict[str, Any], Messages]]:
+        return self.connection.broker_queues
+
+    @property
+    def lock(self) -> threading.Lock:
+        return self.connection.lock
+
+    def _has_queue(self, queue: str, **kwargs: Any) -> bool:
+        return queue in self.broker_queues
+
+    def _new_queue(self, queue: str, **kwargs: Any) -> None:
+        with self.lock:
+            if queue not in self.broker_queues:
+                self.broker_queues[queue] = (kwargs.get("arguments") or {}, collections.deque())
+
+    def _messages(self, queue: str) -> Messages:
+        self._new_queue(queue)
+        return self.broker_queues[queue][1]
+
+    def _put(self, queue: str, message: Dict[str, Any], **kwargs: Any) -> None:
+        self._new_queue(queue)
+        arguments, messages = self.broker_queues[queue]
+        ttl = arguments.get("x-message-ttl")
+        expires_at = time.monotonic() + ttl / 1000 if ttl is not None else None
+        messages.append((expires_at, message))
+
+    def _put_fanout(
+        self,
+        exchange: str,
+        message: Dict[str, Any],
+        routing_key: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        for queue in self._lookup(exchange, routing_key):
+            self._put(queue, message)
+
+    def _get(self, queue: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        self.expire_messages()
+        try:
+            _, message = self._messages(queue).popleft()
+        except IndexError:
+            raise Empty()
+        return message
+
+    def _size(self, queue: str) -> int:
+        return len(self._messages(queue))
+
+    def _purge(self, queue: str) -> int:
+        messages = self._messages(queue)
+        size = len(messages)
+        messages.clear()
+        return size
+
+    def _delete(self, queue: str, *args: Any, **kwargs: Any) -> None:
+        with self.lock:
+            self.broker_queues.pop(queue, None)
+
+    def expire_messages(self) -> None:
+        """Dead-letter or drop every message whose queue TTL has passed."""
+        now = time.monotonic()
+        for arguments, messages in list(self.broker_queues.values()):
+            while True:
+                with self.lock:
+                    if not messages or messages[0][0] is None or messages[0][0] > now:
+                        break
+                    _, message = messages.popleft()
+                self._dead_letter(arguments, message)
+
+    def _dead_letter(self, arguments: Dict[str, Any], message: Dict[str, Any]) -> None:
+        exchange = arguments.get("x-dead-letter-exchange")
+        if exchange is None:
+            return
+
+        # a fanout may have put the same message in several queues.
+        message = copy.deepcopy(message)
+        delivery_info = message["properties"]["delivery_info"]
+        routing_key = arguments.get("x-dead-letter-routing-key", delivery_info["routing_key"])
+        delivery_info.update(exchange=exchange, routing_key=routing_key)
+        if exchange:
+            self.typeof(exchange).deliver(message, exchange, routing_key)
+        else:
+            self._put(routing_key, message)
+
+
+# pylint: disable=abstract-method
+class InMemoryTransport(memory.Transport):
+    """In-memory Kombu transport that understands per-queue TTLs and dead-lettering.
+
+    Kombu's own ``memory://`` transport ignores queue arguments. This
+    transport honours ``x-message-ttl``, ``x-dead-letter-exchange`` and
+    ``x-dead-letter-routing-key`` the way RabbitMQ does, which is enough to
+    exercise delayed retries without a broker::
+
+        connection = kombu.Connection(transport=InMemoryTransport)
+
+    Expired messages are moved whenever a message is fetched from any queue,
+    or by calling :py:meth:`InMemoryChannel.expire_messages`.
+
+    Unlike ``memory://``, exchanges, bindings and messages belong to the
+    transport, so each :py:class:`kombu.Connection` starts out empty.
+
+    """
+
+    Channel = InMemoryChannel
+
+    def __init__(self, client: Any, **kwargs: Any):
+        super().__init__(client, **kwargs)
+        self.state = virtual.BrokerState()
+        # queue name -> (the arguments it was declared with, messages).
+        self.broker_queues: Dict[str, Tuple[Dict[str, Any], Messages]] = {}
+        self.lock = threading.Lock()
@@ -0,0 +1,63 @@
+"""Microbenchmark for the instrumentation overhead of Cassandra queries.
+
+Compares ``execute`` on a stubbed session, whose futures complete immediately,
+with ``execute`` through :py:class:`CassandraSessionAdapter`, which adds a
+span, Prometheus metrics and the callback handoff in
+:py:func:`~baseplate.clients.cassandra.wrap_future`. The difference is the
+per-query cost of the instrumentation. No Cassandra server is needed.
+
+Run it with::
+
+    python -m tests.benchmarks.cassandra_execute
+
+"""
+import threading
+import timeit
+
+from cassandra.cluster import ResponseFuture  # pylint: disable=no-name-in-module
+
+from baseplate import RequestContext
+from baseplate import ServerSpan
+from baseplate.clients.cassandra import CassandraSessionAdapter
+
+
+class StubSession:
+    keyspace = "bench"
+
+    def execute_async(self, query, parameters=None, timeout=None, **kwargs):
+        future = ResponseFuture.__new__(ResponseFuture)
+        future._callback_lock = threading.Lock()
+        future._event = threading.Event()
+        future._callbacks = []
+        future._errbacks = []
+        future._metrics = None
+        future.attempted_hosts = []
+        future._set_final_result([])
+        return future
+
+    def execute(self, query, parameters=None, timeout=None, **kwargs):
+        return self.execute_async(query, parameters, timeout, **kwargs).result()
+
+
+def main(number: int = 20000) -> None:
+    session = StubSession()
+    # a real span without observers, so its cost is part of the measurement
+    span = ServerSpan("trace", None, "span", True, 0, "bench", RequestContext({}))
+    adapter = CassandraSessionAdapter("cassandra", span, session, {})
+
+    cases = [
+        ("session.execute (uninstrumented)", lambda: session.execute("SELECT 1")),
+        ("adapter.execute", lambda: adapter.execute("SELECT 1")),
+        ("adapter.execute with query_name", lambda: adapter.execute("SELECT 1", query_name="q")),
+    ]
+    baseline = None
+    for description, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        if baseline is None:
+            baseline = best
+        overhead = (best - baseline) * 1e6
+        print(f"{description:36s} {best * 1e6:8.2f} us/op {overhead:+8.2f} us overhead")
+
+
+if __name__ == "__main__":
+    main()
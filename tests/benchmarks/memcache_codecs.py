@@ -0,0 +1,98 @@
+"""Microbenchmark for memcache serialization codecs.
+
+Measures CPU time per set (serialize and compress) and per get (decompress and
+deserialize) for each available combination of serializer and compressor over
+payloads of a few representative sizes, along with the stored size. Codecs
+whose packages aren't installed are skipped.
+
+Run it with::
+
+    python -m tests.benchmarks.memcache_codecs
+
+"""
+import time
+
+from baseplate.clients.memcache import lib
+
+
+def make_payload(items: int) -> dict:
+    return {
+        "kind": "Listing",
+        "after": "t3_abcdef",
+        "children": [
+            {
+                "id": f"t3_{i:06x}",
+                "title": f"A reasonably typical post title number {i}",
+                "author": f"user{i % 97}",
+                "score": i * 7 % 1000,
+                "upvote_ratio": 0.93,
+                "over_18": False,
+                "created_utc": 1700000000 + i,
+                "flair": None,
+                "tags": ["news", "discussion"][: i % 3],
+            }
+            for i in range(items)
+        ],
+    }
+
+
+PAYLOADS = {"small": make_payload(1), "medium": make_payload(20), "large": make_payload(500)}
+
+
+def available(make_codec, *args):
+    try:
+        return make_codec(*args)
+    except ImportError:
+        return None
+
+
+def codecs():
+    serializers = {
+        "json": lib.json_serializer(),
+        "orjson": available(lib.orjson_serializer),
+        "msgpack": available(lib.msgpack_serializer),
+    }
+    compressors = {
+        "zlib": lib.zlib_compressor(1),
+        "zstd": available(lib.zstd_compressor),
+        "lz4": available(lib.lz4_compressor),
+    }
+    for serializer_name, serializer in serializers.items():
+        for compressor_name, compressor in compressors.items():
+            if serializer and compressor:
+                yield f"{serializer_name}+{compressor_name}", serializer, compressor
+
+
+def per_call(func, *args):
+    number = 10
+    while True:
+        start = time.process_time()
+        for _ in range(number):
+            func(*args)
+        elapsed = time.process_time() - start
+        if elapsed > 0.2:
+            return elapsed / number
+        number *= 10
+
+
+def main():
+    print(f"{'payload':8} {'codec':16} {'set (us)':>10} {'get (us)':>10} {'bytes':>8}")
+    for payload_name, payload in PAYLOADS.items():
+        for name, serializer, compressor in codecs():
+            dump = lib.make_dump_and_compress_fn(
+                min_compress_length=1, serializer=serializer, compressor=compressor
+            )
+            load = lib.make_decompress_and_load_fn(serializer, compressor)
+            serialized, flags = dump("key", payload)
+            assert load("key", serialized, flags) == payload
+
+            set_time = per_call(dump, "key", payload)
+            get_time = per_call(load, "key", serialized, flags)
+            print(
+                f"{payload_name:8} {name:16} {set_time * 1e6:10.1f} "
+                f"{get_time * 1e6:10.1f} {len(serialized):8d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Microbenchmark for per-request Redis Cluster client construction.
+
+Compares building a new :py:class:`MonitoredRedisClusterConnection` for every
+request against binding a request to the factory's shared client, both for
+construction alone and for construction plus a single GET. No Redis server is
+needed; connections return a canned response.
+
+Run it with::
+
+    python -m tests.benchmarks.redis_cluster_context
+
+"""
+import os
+import timeit
+
+from unittest import mock
+
+from baseplate.clients.redis_cluster import cluster_pool_from_config
+from baseplate.clients.redis_cluster import ClusterRedisContextFactory
+from baseplate.clients.redis_cluster import MonitoredRedisClusterConnection
+
+
+NODE = {"host": "127.0.0.1", "port": 7000, "name": "127.0.0.1:7000", "server_type": "master"}
+
+
+class CannedConnection:
+    description_format = "CannedConnection<>"
+
+    def __init__(self, host="localhost", port=7000, **kwargs):
+        self.pid = os.getpid()
+        self.host = host
+        self.port = port
+
+    def connect(self):
+        pass
+
+    def can_read(self):
+        return False
+
+    def send_command(self, *args, **kwargs):
+        pass
+
+    def read_response(self):
+        return "bar"
+
+    def disconnect(self):
+        pass
+
+
+def make_factory():
+    connection_pool = cluster_pool_from_config(
+        {"redis.url": "redis://127.0.0.1:7000/0"},
+        prefix="redis.",
+        init_slot_cache=False,
+        startup_nodes=[NODE],
+        connection_class=CannedConnection,
+    )
+    # the URL's host and port are startup nodes, not connection arguments
+    connection_pool.connection_kwargs.pop("host", None)
+    connection_pool.connection_kwargs.pop("port", None)
+    connection_pool.nodes.nodes = {NODE["name"]: NODE}
+    connection_pool.nodes.slots = {slot: [NODE] for slot in range(16384)}
+    return ClusterRedisContextFactory(connection_pool, redis_client_name="bench")
+
+
+def main(number: int = 2000) -> None:
+    factory = make_factory()
+    span = mock.MagicMock()
+
+    def construct_per_request():
+        return MonitoredRedisClusterConnection(
+            "redis", span, factory.connection_pool, redis_client_name="bench"
+        )
+
+    def construct_shared():
+        return factory.make_object_for_context("redis", span)
+
+    cases = [
+        ("construct (per-request client)", construct_per_request),
+        ("construct (shared client)", construct_shared),
+        ("construct + GET (per-request client)", lambda: construct_per_request().get("foo")),
+        ("construct + GET (shared client)", lambda: construct_shared().get("foo")),
+    ]
+    for description, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{description:40s} {best / number * 1e6:8.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
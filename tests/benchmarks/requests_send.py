@@ -0,0 +1,91 @@
+"""Microbenchmark for the per-call overhead of the requests client.
+
+Sends GET requests to a local HTTP/1.1 server over a keep-alive connection:
+straight through the adapter, through a fresh :py:class:`requests.Session`
+per call (how :py:class:`~baseplate.clients.requests.BaseplateSession` used
+to send), through the one cookie-isolated session it now reuses, and through
+:py:class:`~baseplate.clients.requests.BaseplateSession` itself, which adds
+a span and metrics. The last runs inside a real server span so the
+instrumentation is measured too.
+
+Run it with::
+
+    python -m tests.benchmarks.requests_send
+
+"""
+import ipaddress
+import threading
+import timeit
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from advocate import AddrValidator
+from requests import Request
+from requests import Session
+
+from baseplate import RequestContext
+from baseplate import ServerSpan
+from baseplate.clients.requests import _IsolatedSession
+from baseplate.clients.requests import BaseplateSession
+from baseplate.clients.requests import KeepAliveHTTPAdapter
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def main(number: int = 2000) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    url = f"http://127.0.0.1:{port}/"
+
+    adapter = KeepAliveHTTPAdapter(
+        validator=AddrValidator(
+            ip_whitelist={ipaddress.ip_network("127.0.0.0/8")}, port_whitelist={port}
+        )
+    )
+    span = ServerSpan("trace", None, "span", True, 0, "bench", RequestContext({}))
+    isolated = _IsolatedSession(adapter)
+    session = BaseplateSession(adapter, "bench", span, session=isolated)
+
+    def adapter_send():
+        adapter.send(Request("GET", url).prepare()).close()
+
+    def session_per_call():
+        fresh = Session()
+        fresh.mount("http://", adapter)
+        fresh.mount("https://", adapter)
+        fresh.send(Request("GET", url).prepare()).close()
+
+    def shared_session():
+        isolated.send(Request("GET", url).prepare()).close()
+
+    def baseplate_send():
+        session.send(Request("GET", url).prepare()).close()
+
+    cases = [
+        ("adapter.send", adapter_send),
+        ("Session() per call", session_per_call),
+        ("shared isolated session", shared_session),
+        ("BaseplateSession.send", baseplate_send),
+    ]
+    try:
+        with span:
+            for description, fn in cases:
+                best = min(timeit.repeat(fn, number=number, repeat=3)) / number
+                print(f"{description:24s} {best * 1e6:8.2f} us/op")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Microbenchmark for bulk inserts through the SQLAlchemy session client.
+
+Compares adding and flushing ORM objects one row at a time, adding them all
+before a single flush, and :py:func:`~baseplate.clients.sqlalchemy.bulk_insert`,
+each through an instrumented session on an in-memory SQLite database. Every
+run happens inside a real server span so the instrumentation is measured too.
+
+Run it with::
+
+    python -m tests.benchmarks.sqlalchemy_bulk
+
+"""
+import timeit
+
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy.orm import declarative_base
+
+from baseplate import RequestContext
+from baseplate import ServerSpan
+from baseplate.clients.sqlalchemy import bulk_insert
+from baseplate.clients.sqlalchemy import engine_from_config
+from baseplate.clients.sqlalchemy import SQLAlchemySessionContextFactory
+
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = "rows"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+def main(rows: int = 1000, number: int = 5) -> None:
+    engine = engine_from_config({"database.url": "sqlite://"})
+    Base.metadata.create_all(bind=engine)
+    factory = SQLAlchemySessionContextFactory(engine, "db")
+    values = [{"name": f"row{i}"} for i in range(rows)]
+
+    def run(insert_rows):
+        def go():
+            span = ServerSpan("trace", None, "span", True, 0, "bench", RequestContext({}))
+            with span:
+                session = factory.make_object_for_context("db", span)
+                insert_rows(session)
+                session.rollback()
+
+        return go
+
+    def add_each(session):
+        for value in values:
+            session.add(Row(**value))
+            session.flush()
+
+    def add_all(session):
+        session.add_all([Row(**value) for value in values])
+        session.flush()
+
+    cases = [
+        ("add + flush per row", run(add_each)),
+        ("add_all + one flush", run(add_all)),
+        ("bulk_insert", run(lambda session: bulk_insert(session, Row, values))),
+    ]
+    for description, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"{description:24s} {best * 1e3:8.2f} ms per {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
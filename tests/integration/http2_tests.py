@@ -0,0 +1,169 @@
+import json
+import socket
+
+import gevent
+import h2.config
+import h2.connection
+import h2.events
+import pytest
+import requests
+
+from advocate.exceptions import UnacceptableAddressException
+
+from baseplate import Baseplate
+from baseplate.clients.http2 import ExternalHTTP2RequestsClient
+from baseplate.clients.http2 import InternalHTTP2RequestsClient
+
+from . import TestBaseplateObserver
+
+
+class H2Server:
+    """A cleartext HTTP/2 server that echoes each request's headers as JSON.
+
+    Responses are held back until ``batch`` requests are in flight on a
+    connection, which only works if the client multiplexes them.
+
+    """
+
+    def __init__(self, batch=1):
+        self.batch = batch
+        self.connections = 0
+        self.requests = []
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(16)
+        self.url = f"http://127.0.0.1:{self.listener.getsockname()[1]}/"
+
+    def serve_forever(self):
+        while True:
+            sock, _ = self.listener.accept()
+            self.connections += 1
+            gevent.spawn(self.handle, sock)
+
+    def handle(self, sock):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+
+        headers = {}
+        pending = []
+        while True:
+            data = sock.recv(65535)
+            if not data:
+                break
+
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    headers[event.stream_id] = {
+                        name.decode(): value.decode() for name, value in event.headers
+                    }
+                elif isinstance(event, h2.events.StreamEnded):
+                    self.requests.append(headers[event.stream_id])
+                    pending.append(event.stream_id)
+
+            if len(pending) >= self.batch:
+                for stream_id in pending:
+                    body = json.dumps(headers.pop(stream_id)).encode()
+                    conn.send_headers(
+                        stream_id,
+                        [
+                            (":status", "200"),
+                            ("content-type", "application/json"),
+                            ("content-length", str(len(body))),
+                        ],
+                    )
+                    conn.send_data(stream_id, body, end_stream=True)
+                pending = []
+            sock.sendall(conn.data_to_send())
+        sock.close()
+
+
+@pytest.fixture
+def h2_server(request):
+    server = H2Server(**getattr(request, "param", {}))
+    server_greenlet = gevent.spawn(server.serve_forever)
+    try:
+        yield server
+    finally:
+        server_greenlet.kill()
+        server.listener.close()
+
+
+def test_client_makes_client_span(h2_server):
+    baseplate = Baseplate()
+    baseplate.configure_context({"myclient": InternalHTTP2RequestsClient()})
+
+    observer = TestBaseplateObserver()
+    baseplate.register(observer)
+
+    with baseplate.server_context("test") as context:
+        response = context.myclient.get(h2_server.url)
+
+    assert response.status_code == 200
+    assert response.json()[":method"] == "GET"
+
+    client_span_observer = observer.children[0].children[0]
+    assert client_span_observer.span.name == "myclient.request"
+    assert client_span_observer.on_finish_called
+    assert client_span_observer.on_finish_exc_info is None
+    assert client_span_observer.tags["http.url"] == h2_server.url
+    assert client_span_observer.tags["http.status_code"] == 200
+
+
+def test_internal_client_sends_headers(h2_server):
+    baseplate = Baseplate()
+    baseplate.configure_context({"internal": InternalHTTP2RequestsClient()})
+
+    with baseplate.server_context("test") as context:
+        response = context.internal.post(h2_server.url, data=b"payload")
+
+        assert response.status_code == 200
+        assert h2_server.requests[0][":method"] == "POST"
+        assert h2_server.requests[0]["x-trace"] == str(context.span.trace_id)
+        assert h2_server.requests[0]["x-parent"] == str(context.span.id)
+
+
+def test_external_client_doesnt_send_headers(h2_server):
+    baseplate = Baseplate(
+        {"external.filter.ip_allowlist": "127.0.0.0/8", "external.filter.port_denylist": "0"}
+    )
+    baseplate.configure_context({"external": ExternalHTTP2RequestsClient()})
+
+    with baseplate.server_context("test") as context:
+        response = context.external.get(h2_server.url)
+
+    assert response.status_code == 200
+    assert "x-trace" not in h2_server.requests[0]
+
+
+def test_external_client_rejects_local_addresses(h2_server):
+    baseplate = Baseplate()
+    baseplate.configure_context({"external": ExternalHTTP2RequestsClient()})
+
+    with pytest.raises(UnacceptableAddressException):
+        with baseplate.server_context("test") as context:
+            context.external.get(h2_server.url)
+
+    assert h2_server.connections == 0
+
+
+@pytest.mark.parametrize("h2_server", [{"batch": 10}], indirect=True)
+def test_concurrent_requests_share_a_connection(h2_server):
+    baseplate = Baseplate()
+    baseplate.configure_context({"internal": InternalHTTP2RequestsClient()})
+
+    with baseplate.server_context("test") as context:
+        calls = [gevent.spawn(context.internal.get, h2_server.url) for _ in range(10)]
+        gevent.joinall(calls, timeout=5, raise_error=True)
+
+    assert [call.value.status_code for call in calls] == [200] * 10
+    assert h2_server.connections == 1
+
+
+def test_connection_error():
+    baseplate = Baseplate()
+    baseplate.configure_context({"internal": InternalHTTP2RequestsClient()})
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        with baseplate.server_context("test") as context:
+            context.internal.get("http://localhost:1/")
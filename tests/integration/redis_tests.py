@@ -1,12 +1,17 @@
 import contextlib
+import time
 import unittest
 
+from unittest import mock
+
 try:
     import redis
 except ImportError:
     raise unittest.SkipTest("redis-py is not installed")
 
 from baseplate.clients.redis import ACTIVE_REQUESTS
+from baseplate.clients.redis import ClientSideCache
+from baseplate.clients.redis import MonitoredRedisConnection
 from baseplate.clients.redis import REQUESTS_TOTAL
 from baseplate.clients.redis import LATENCY_SECONDS
 from baseplate.clients.redis import RedisClient
@@ -120,6 +125,52 @@ class RedisIntegrationTests(RedisIntegrationTestCase):
                 self.tearDown()
 
 
+class ClientSideCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.pool = redis.ConnectionPool(
+            host=redis_endpoint.address.host, port=redis_endpoint.address.port
+        )
+        self.cache = ClientSideCache(self.pool, prefixes=["csc:"])
+        self.cache._ensure_listener()
+        for _ in range(100):
+            if self.cache.connected:
+                break
+            time.sleep(0.01)
+        else:
+            self.fail("client-side cache did not connect")
+
+        self.client = MonitoredRedisConnection(
+            "redis", mock.MagicMock(), self.pool, client_side_cache=self.cache
+        )
+        self.writer = redis.Redis(connection_pool=self.pool)
+
+    def wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("condition never became true")
+
+    def test_invalidated_on_write(self):
+        self.writer.set("csc:key", "1")
+        self.assertEqual(self.client.get("csc:key"), b"1")
+        self.assertIn(("GET", b"csc:key"), self.cache.entries)
+
+        self.writer.set("csc:key", "2")
+        self.wait_for(lambda: ("GET", b"csc:key") not in self.cache.entries)
+        self.assertEqual(self.client.get("csc:key"), b"2")
+
+    def test_flushall_clears_cache(self):
+        self.writer.set("csc:key", "1")
+        self.client.get("csc:key")
+
+        self.writer.flushall()
+        self.wait_for(lambda: not self.cache.entries)
+
+    def tearDown(self):
+        self.writer.delete("csc:key")
+
+
 class RedisMessageQueueTests(unittest.TestCase):
     qname = "redisTestQueue"
 
@@ -9,6 +9,8 @@ except ImportError:
     raise unittest.SkipTest("sqlalchemy is not installed")
 
 from baseplate.clients.sqlalchemy import (
+    bulk_insert,
+    bulk_upsert,
     engine_from_config,
     SQLAlchemyEngineContextFactory,
     SQLAlchemySession,
@@ -83,6 +85,17 @@ class SQLAlchemyEngineTests(unittest.TestCase):
         self.assertIsNone(span_observer.on_finish_exc_info)
         span_observer.assert_tag("statement", "SELECT * FROM test;")
 
+    def test_bulk_insert(self):
+        with self.server_span:
+            bulk_insert(self.context.db, TestObject.__table__, [{"name": "a"}, {"name": "b"}])
+            count = self.context.db.execute("SELECT COUNT(*) FROM test;").scalar()
+
+        self.assertEqual(count, 2)
+        server_span_observer = self.baseplate_observer.children[0]
+        bulk_span_observer = server_span_observer.children[0]
+        bulk_span_observer.assert_tag("rows", 2)
+        self.assertEqual(len(bulk_span_observer.children), 1)
+
     def test_error_in_query(self):
         with self.server_span:
             with self.assertRaises(OperationalError):
@@ -131,6 +144,48 @@ class SQLAlchemySessionTests(unittest.TestCase):
         server_span_observer = self.baseplate_observer.get_only_child()
         self.assertEqual(len(server_span_observer.children), 0)
 
+    def test_bulk_insert(self):
+        rows = [{"id": i, "name": f"row{i}"} for i in range(5)]
+        with self.server_span:
+            inserted = bulk_insert(self.context.db, TestObject, rows, batch_size=2)
+            self.context.db.commit()
+            names = [obj.name for obj in self.context.db.query(TestObject).order_by(TestObject.id)]
+
+        self.assertEqual(inserted, 5)
+        self.assertEqual(names, [f"row{i}" for i in range(5)])
+
+        server_span_observer = self.baseplate_observer.get_only_child()
+        bulk_span_observer = server_span_observer.children[0]
+        self.assertEqual(bulk_span_observer.span.name, "db.bulk_insert")
+        bulk_span_observer.assert_tag("rows", 5)
+        bulk_span_observer.assert_tag("batches", 3)
+        self.assertEqual(len(bulk_span_observer.children), 3)
+        self.assertTrue(bulk_span_observer.on_finish_called)
+
+    def test_bulk_upsert(self):
+        with self.server_span:
+            bulk_insert(self.context.db, TestObject, [{"id": 1, "name": "old", "flag": True}])
+            bulk_upsert(
+                self.context.db,
+                TestObject,
+                [{"id": 1, "name": "new"}, {"id": 2, "name": "other"}],
+                index_elements=["id"],
+            )
+            self.context.db.commit()
+            rows = [
+                (obj.id, obj.name, obj.flag)
+                for obj in self.context.db.query(TestObject).order_by(TestObject.id)
+            ]
+
+        self.assertEqual(rows, [(1, "new", True), (2, "other", None)])
+
+    def test_bulk_insert_empty(self):
+        with self.server_span:
+            self.assertEqual(bulk_insert(self.context.db, TestObject, []), 0)
+
+        server_span_observer = self.baseplate_observer.get_only_child()
+        self.assertEqual(len(server_span_observer.children), 0)
+
 
 class SQLAlchemySessionConfigTests(unittest.TestCase):
     def test_simple_config(self):
@@ -1,7 +1,10 @@
+import threading
 import unittest
 
 from unittest import mock
 
+import gevent
+
 from prometheus_client import REGISTRY
 
 try:
@@ -11,6 +14,15 @@ try:
 except ImportError:
     raise unittest.SkipTest("cassandra-driver is not installed")
 
+from cassandra.cluster import EXEC_PROFILE_DEFAULT  # pylint: disable=no-name-in-module
+from cassandra.cluster import ExecutionProfile  # pylint: disable=no-name-in-module
+from cassandra.cluster import ResponseFuture  # pylint: disable=no-name-in-module
+from cassandra.policies import ConstantSpeculativeExecutionPolicy
+from cassandra.policies import DCAwareRoundRobinPolicy
+from cassandra.policies import HostDistance
+from cassandra.policies import RoundRobinPolicy
+from cassandra.policies import TokenAwarePolicy
+
 import baseplate
 import logging
 from baseplate.lib.config import ConfigurationError
@@ -18,12 +30,20 @@ from baseplate.clients.cassandra import (
     cluster_from_config,
     CassandraCallbackArgs,
     CassandraPrometheusLabels,
+    ADDITIONAL_ATTEMPTS_TOTAL,
+    CassandraContextFactory,
+    HOST_REQUEST_TIME,
     CassandraSessionAdapter,
+    PreparedStatementCache,
+    PREPARED_STATEMENT_CACHE_REQUESTS_TOTAL,
     REQUEST_TIME,
     REQUEST_ACTIVE,
     REQUEST_TOTAL,
+    wrap_future,
     _on_execute_complete,
     _on_execute_failed,
+    _host_latency,
+    _prometheus_children,
 )
 from baseplate.lib.secrets import SecretsStore
 
@@ -79,6 +99,71 @@ class ClusterFromConfigTests(unittest.TestCase):
         )
         self.assertIsNotNone(cluster.auth_provider)
 
+    def test_load_balancing_policy(self):
+        cluster = cluster_from_config(
+            {
+                "cassandra.contact_points": "127.0.0.1",
+                "cassandra.load_balancing_policy": "token_aware",
+                "cassandra.local_dc": "us-east-1",
+                "cassandra.used_hosts_per_remote_dc": "2",
+                "cassandra.speculative_execution.delay": "50 milliseconds",
+                "cassandra.speculative_execution.max_attempts": "2",
+            }
+        )
+        profile = cluster.profile_manager.default
+        self.assertIsInstance(profile.load_balancing_policy, TokenAwarePolicy)
+        child_policy = profile.load_balancing_policy._child_policy
+        self.assertIsInstance(child_policy, DCAwareRoundRobinPolicy)
+        self.assertEqual(child_policy.local_dc, "us-east-1")
+        self.assertEqual(child_policy.used_hosts_per_remote_dc, 2)
+        self.assertIsInstance(
+            profile.speculative_execution_policy, ConstantSpeculativeExecutionPolicy
+        )
+        self.assertEqual(profile.speculative_execution_policy.delay, 0.05)
+        self.assertEqual(profile.speculative_execution_policy.max_attempts, 2)
+
+    def test_round_robin(self):
+        cluster = cluster_from_config(
+            {
+                "cassandra.contact_points": "127.0.0.1",
+                "cassandra.load_balancing_policy": "round_robin",
+            }
+        )
+        self.assertIsInstance(
+            cluster.profile_manager.default.load_balancing_policy, RoundRobinPolicy
+        )
+
+    def test_explicit_default_profile_wins(self):
+        profile = ExecutionProfile()
+        cluster = cluster_from_config(
+            {
+                "cassandra.contact_points": "127.0.0.1",
+                "cassandra.load_balancing_policy": "round_robin",
+            },
+            execution_profiles={EXEC_PROFILE_DEFAULT: profile},
+        )
+        self.assertIs(cluster.profile_manager.default, profile)
+
+    def test_protocol_and_compression(self):
+        cluster = cluster_from_config(
+            {
+                "cassandra.contact_points": "127.0.0.1",
+                "cassandra.protocol_version": "2",
+                "cassandra.connections_per_host": "4",
+                "cassandra.compression": "lz4",
+            }
+        )
+        self.assertEqual(cluster.protocol_version, 2)
+        self.assertEqual(cluster.compression, "lz4")
+        self.assertEqual(cluster.get_core_connections_per_host(HostDistance.LOCAL), 4)
+        self.assertEqual(cluster.get_max_connections_per_host(HostDistance.LOCAL), 4)
+
+    def test_connections_per_host_needs_old_protocol(self):
+        with self.assertRaises(ConfigurationError):
+            cluster_from_config(
+                {"cassandra.contact_points": "127.0.0.1", "cassandra.connections_per_host": "4"}
+            )
+
 
 class CassandraSessionAdapterTests(unittest.TestCase):
     def setUp(self):
@@ -86,6 +171,7 @@ class CassandraSessionAdapterTests(unittest.TestCase):
         REQUEST_TIME.clear()
         REQUEST_ACTIVE.clear()
         REQUEST_TOTAL.clear()
+        _prometheus_children.cache_clear()
 
         self.session = mock.MagicMock()
         self.prepared_statements = {}
@@ -245,11 +331,11 @@ class CassandraTests(unittest.TestCase):
         REQUEST_TIME.clear()
         REQUEST_ACTIVE.clear()
         REQUEST_TOTAL.clear()
+        _prometheus_children.cache_clear()
 
     def test_prom__on_execute_complete(self):
         result = mock.MagicMock()
         span = mock.MagicMock()
-        event = mock.MagicMock()
         start_time = 1.0
 
         prom_labels_tuple = CassandraPrometheusLabels(
@@ -266,7 +352,6 @@ class CassandraTests(unittest.TestCase):
                 start_time=start_time,
                 prom_labels=prom_labels_tuple,
             ),
-            event,
         )
         prom_labels = prom_labels_tuple._asdict()
         prom_labels_w_success = {**prom_labels, **{"cassandra_success": "true"}}
@@ -291,7 +376,6 @@ class CassandraTests(unittest.TestCase):
     def test_prom__on_execute_failed(self):
         result = mock.MagicMock()
         span = mock.MagicMock()
-        event = mock.MagicMock()
         start_time = 1.0
 
         prom_labels_tuple = CassandraPrometheusLabels(
@@ -308,7 +392,6 @@ class CassandraTests(unittest.TestCase):
                 start_time=start_time,
                 prom_labels=prom_labels_tuple,
             ),
-            event,
         )
         prom_labels = prom_labels_tuple._asdict()
         prom_labels_w_success = {**prom_labels, **{"cassandra_success": "false"}}
@@ -329,3 +412,275 @@ class CassandraTests(unittest.TestCase):
             ),
             1,
         )
+
+
+def make_response_future():
+    future = ResponseFuture.__new__(ResponseFuture)
+    future._callback_lock = threading.Lock()
+    future._event = threading.Event()
+    future._callbacks = []
+    future._errbacks = []
+    future._metrics = None
+    future.attempted_hosts = []
+    return future
+
+
+class WrapFutureTests(unittest.TestCase):
+    def setUp(self):
+        self.future = make_response_future()
+        self.callback = mock.Mock()
+        self.errback = mock.Mock()
+        wrap_future(self.future, self.callback, "args", self.errback, "args")
+
+    def test_callback_from_event_loop(self):
+        self.future._set_final_result([])
+        self.callback.assert_called_once_with([], "args")
+        self.future.result()
+        self.assertEqual(self.callback.call_count, 1)
+        self.errback.assert_not_called()
+
+    def test_result_runs_callback_first(self):
+        # the result is visible to result() before the event loop thread has
+        # got around to running the callbacks
+        with self.future._callback_lock:
+            self.future._final_result = []
+        self.future._event.set()
+
+        rows = self.future.result()
+        self.callback.assert_called_once_with(rows, "args")
+
+        # the event loop thread catches up
+        for fn, args, kwargs in self.future._callbacks:
+            fn([], *args, **kwargs)
+        self.assertEqual(self.callback.call_count, 1)
+
+    def test_result_runs_errback_first(self):
+        exc = ValueError()
+        self.future._final_exception = exc
+        self.future._event.set()
+
+        with self.assertRaises(ValueError):
+            self.future.result()
+        self.errback.assert_called_once_with(exc, "args")
+
+        for fn, args, kwargs in self.future._errbacks:
+            fn(exc, *args, **kwargs)
+        self.assertEqual(self.errback.call_count, 1)
+        self.callback.assert_not_called()
+
+    def test_result_waits_for_callback_on_event_loop(self):
+        started = threading.Event()
+        unblock = threading.Event()
+        finished = []
+
+        def slow_callback(result, args):
+            started.set()
+            unblock.wait()
+            finished.append(result)
+
+        future = make_response_future()
+        wrap_future(future, slow_callback, "args", self.errback, "args")
+
+        # the event loop thread takes the token and is still in the callback
+        # when result() is called.
+        event_loop = threading.Thread(target=future._set_final_result, args=([],))
+        event_loop.start()
+        started.wait()
+
+        results = []
+        caller = threading.Thread(target=lambda: results.append(future.result()))
+        caller.start()
+        caller.join(timeout=0.05)
+        waited = caller.is_alive()
+
+        unblock.set()
+        caller.join()
+        event_loop.join()
+        self.assertTrue(waited)
+        self.assertEqual(finished, [[]])
+        self.assertEqual(results, [[]])
+
+
+class ExecuteConcurrentTests(unittest.TestCase):
+    def setUp(self):
+        REQUEST_TOTAL.clear()
+        HOST_REQUEST_TIME.clear()
+        ADDITIONAL_ATTEMPTS_TOTAL.clear()
+        _prometheus_children.cache_clear()
+        _host_latency.cache_clear()
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.futures = []
+        self.session = mock.MagicMock()
+        self.session.keyspace = "keyspace"
+        self.session.execute_async.side_effect = self.execute_async
+        self.server_span = mock.MagicMock(spec=baseplate.ServerSpan)
+        self.parent_span = self.server_span.make_child.return_value
+        self.adapter = CassandraSessionAdapter("test", self.server_span, self.session, {})
+
+        # complete statements in order just before a result is waited for
+        original_result = ResponseFuture.result
+
+        def result(future):
+            while self.futures and not future._event.is_set():
+                self.complete_next()
+            return original_result(future)
+
+        patcher = mock.patch.object(ResponseFuture, "result", result)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def execute_async(self, query, parameters=None, timeout=None, **kwargs):
+        future = make_response_future()
+        self.futures.append((future, parameters))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return future
+
+    def complete_next(self):
+        future, parameters = self.futures.pop(0)
+        self.in_flight -= 1
+        if parameters == ("fail",):
+            future._set_final_exception(ValueError(parameters))
+        else:
+            future._set_final_result(list(parameters))
+
+    def test_results_in_order_with_bounded_concurrency(self):
+        statements = (("SELECT %s", (i,)) for i in range(10))
+        results = list(self.adapter.execute_concurrent(statements, concurrency=3))
+
+        self.assertEqual([list(r.result_or_exc) for r in results], [[i] for i in range(10)])
+        self.assertTrue(all(r.success for r in results))
+        self.assertEqual(self.max_in_flight, 3)
+
+        self.parent_span.set_tag.assert_any_call("statements", 10)
+        self.parent_span.set_tag.assert_any_call("errors", 0)
+        self.parent_span.finish.assert_called_once_with(exc_info=None)
+
+    def test_child_spans_are_sampled(self):
+        statements = [("SELECT %s", (i,)) for i in range(10)]
+        list(self.adapter.execute_concurrent(statements, max_child_spans=2))
+        self.assertEqual(self.parent_span.make_child.call_count, 2)
+
+        labels = {
+            "cassandra_client_name": "test",
+            "cassandra_keyspace": "keyspace",
+            "cassandra_query_name": "",
+            "cassandra_cluster_name": "",
+            "cassandra_success": "true",
+        }
+        self.assertEqual(REGISTRY.get_sample_value("cassandra_client_requests_total", labels), 10)
+
+    def test_errors_yielded(self):
+        statements = [("SELECT %s", (1,)), ("SELECT %s", ("fail",)), ("SELECT %s", (3,))]
+        results = list(self.adapter.execute_concurrent(statements, raise_on_first_error=False))
+        self.assertEqual([r.success for r in results], [True, False, True])
+        self.assertIsInstance(results[1].result_or_exc, ValueError)
+        self.parent_span.set_tag.assert_any_call("errors", 1)
+
+    def test_host_metrics(self):
+        host = mock.Mock(endpoint="10.0.0.1:9042")
+
+        def execute_async(query, parameters=None, timeout=None, **kwargs):
+            future = make_response_future()
+            future.attempted_hosts = [mock.Mock(), host]
+            future.coordinator_host = host
+            future._set_final_result([])
+            return future
+
+        self.session.execute_async.side_effect = execute_async
+        self.adapter.execute("SELECT 1")
+
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "cassandra_client_host_latency_seconds_count",
+                {"cassandra_client_name": "test", "cassandra_host": "10.0.0.1:9042"},
+            ),
+            1,
+        )
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "cassandra_client_additional_attempts_total", {"cassandra_client_name": "test"}
+            ),
+            1,
+        )
+
+    def test_errors_raised(self):
+        statements = [("SELECT %s", (1,)), ("SELECT %s", ("fail",)), ("SELECT %s", (3,))]
+        results = self.adapter.execute_concurrent(statements)
+        self.assertTrue(next(results).success)
+        with self.assertRaises(ValueError):
+            next(results)
+        _, kwargs = self.parent_span.finish.call_args
+        self.assertIs(kwargs["exc_info"][0], ValueError)
+
+
+class PreparedStatementCacheTests(unittest.TestCase):
+    def setUp(self):
+        PREPARED_STATEMENT_CACHE_REQUESTS_TOTAL.clear()
+        self.cache = PreparedStatementCache(max_size=2, client_name="test")
+        self.prepare = mock.Mock(side_effect=lambda query: f"prepared {query}")
+
+    def test_lru(self):
+        self.assertEqual(self.cache.get("a", self.prepare), "prepared a")
+        self.cache.get("b", self.prepare)
+        self.cache.get("a", self.prepare)
+        self.cache.get("c", self.prepare)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertEqual(self.prepare.call_count, 3)
+
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "cassandra_client_prepared_statement_cache_requests_total",
+                {"cassandra_client_name": "test", "cassandra_cache_result": "hit"},
+            ),
+            1,
+        )
+
+    def test_concurrent_misses_are_single_flighted(self):
+        def slow_prepare(query):
+            gevent.sleep(0.01)
+            return self.prepare(query)
+
+        greenlets = [gevent.spawn(self.cache.get, "a", slow_prepare) for _ in range(5)]
+        gevent.joinall(greenlets, raise_error=True)
+        self.assertEqual({g.value for g in greenlets}, {"prepared a"})
+        self.prepare.assert_called_once_with("a")
+
+    def test_errors_are_not_cached(self):
+        self.prepare.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            self.cache.get("a", self.prepare)
+        self.prepare.side_effect = None
+        self.prepare.return_value = "prepared a"
+        self.assertEqual(self.cache.get("a", self.prepare), "prepared a")
+
+
+class CassandraContextFactoryTests(unittest.TestCase):
+    def test_warm_up(self):
+        session = mock.MagicMock()
+        factory = CassandraContextFactory(session, prometheus_client_name="test")
+        factory.warm_up(["SELECT a", "SELECT b"])
+        self.assertEqual(session.prepare.call_count, 2)
+
+        adapter = factory.make_object_for_context("cassandra", mock.MagicMock())
+        self.assertIs(adapter.prepare("SELECT a"), session.prepare.return_value)
+        self.assertEqual(session.prepare.call_count, 2)
+
+        host = mock.Mock(endpoint="10.0.0.1:9042")
+        session.get_pool_state.return_value = {host: {"open_count": 1, "in_flights": [3]}}
+        batch = mock.MagicMock()
+        factory.report_runtime_metrics(batch)
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "cassandra_client_host_in_flight_requests",
+                {"cassandra_client_name": "test", "cassandra_host": "10.0.0.1:9042"},
+            ),
+            3,
+        )
+        batch.gauge.assert_called_with("prepared_statements.size")
+        batch.gauge.return_value.replace.assert_called_with(2)
@@ -0,0 +1,92 @@
+import gzip
+
+from unittest import mock
+
+import httpcore
+import pytest
+import requests
+
+from requests import Request
+
+from baseplate.clients.http2 import http2_adapter_from_config
+from baseplate.clients.http2 import HTTP2Adapter
+
+
+class TestHTTP2AdapterFromConfig:
+    def test_defaults(self):
+        adapter = http2_adapter_from_config({}, "http.")
+        assert isinstance(adapter, HTTP2Adapter)
+        assert adapter.max_concurrent_streams == 100
+        assert adapter.pool._max_connections == 10
+        assert adapter.pool._keepalive_expiry is None
+        assert not adapter.pool._http1
+        assert adapter.pool._http2
+
+    def test_options(self):
+        adapter = http2_adapter_from_config(
+            {
+                "http.max_connections": "2",
+                "http.max_concurrent_streams": "50",
+                "http.keepalive_timeout": "30 seconds",
+                "http.max_retries": "3",
+                "http.allow_http1": "true",
+            },
+            "http.",
+        )
+        assert adapter.max_concurrent_streams == 50
+        assert adapter.pool._max_connections == 2
+        assert adapter.pool._keepalive_expiry == 30
+        assert adapter.pool._retries == 3
+        assert adapter.pool._http1
+
+
+class TestHTTP2Adapter:
+    def send(self, adapter, response=None, side_effect=None, **kwargs):
+        request = Request("GET", "http://example.com/").prepare()
+        with mock.patch.object(
+            adapter.pool, "request", return_value=response, side_effect=side_effect
+        ) as pool_request:
+            return adapter.send(request, **kwargs), pool_request
+
+    def test_builds_response(self):
+        buffered = httpcore.Response(
+            200,
+            headers=[(b"Content-Type", b"application/json"), (b"Content-Encoding", b"gzip")],
+            content=gzip.compress(b'{"hello": "world"}'),
+        )
+        buffered.read()
+        response, pool_request = self.send(HTTP2Adapter(), buffered, timeout=(1, 2))
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {"hello": "world"}
+        assert response.url == "http://example.com/"
+        assert pool_request.call_args[1]["extensions"] == {
+            "timeout": {"connect": 1, "read": 2, "write": 2, "pool": 1}
+        }
+
+    @pytest.mark.parametrize(
+        "error,expected",
+        [
+            (httpcore.ConnectTimeout("boom"), requests.exceptions.ConnectTimeout),
+            (httpcore.ReadTimeout("boom"), requests.exceptions.ReadTimeout),
+            (httpcore.ConnectError("boom"), requests.exceptions.ConnectionError),
+            (httpcore.RemoteProtocolError("boom"), requests.exceptions.ConnectionError),
+        ],
+    )
+    def test_maps_errors(self, error, expected):
+        adapter = HTTP2Adapter(max_concurrent_streams=1)
+        with pytest.raises(expected):
+            self.send(adapter, side_effect=error)
+        # the stream is released even though the request failed
+        assert adapter.streams.acquire(blocking=False)
+
+    def test_waits_for_stream(self):
+        adapter = HTTP2Adapter(max_concurrent_streams=1)
+        adapter.streams.acquire()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            self.send(adapter, timeout=0.01)
+
+    def test_rejects_per_request_verify(self):
+        with pytest.raises(ValueError):
+            self.send(HTTP2Adapter(), verify=False)
@@ -0,0 +1,158 @@
+from unittest import mock
+
+import confluent_kafka
+import pytest
+
+from prometheus_client import REGISTRY
+
+from baseplate.clients.kafka import KAFKA_PRODUCE_LATENCY
+from baseplate.clients.kafka import KAFKA_PRODUCED_TOTAL
+from baseplate.clients.kafka import KafkaProducerClient
+from baseplate.clients.kafka import KafkaProducerContextFactory
+from baseplate.clients.kafka import producer_from_config
+from baseplate.lib.config import ConfigurationError
+
+
+class FakeProducer:
+    """Records produced messages and reports them delivered when polled."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.pending = []
+        self.produced = []
+        self.polls = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def produce(self, topic, value=None, **kwargs):
+        self.produced.append((topic, value, kwargs))
+        self.pending.append((kwargs["on_delivery"], mock.Mock(topic=topic, value=value)))
+
+    def poll(self, timeout):
+        self.polls += 1
+        pending, self.pending = self.pending, []
+        for callback, message in pending:
+            callback(self.error, message)
+        return len(pending)
+
+
+@mock.patch("confluent_kafka.Producer")
+def test_producer_from_config(Producer):
+    producer_from_config(
+        {
+            "kafka.bootstrap_servers": "broker-1:9092,broker-2:9092",
+            "kafka.linger": "20 milliseconds",
+            "kafka.batch_size": "65536",
+            "kafka.compression_type": "zstd",
+            "kafka.acks": "all",
+        },
+        "kafka.",
+        kafka_config={"client.id": "test"},
+    )
+
+    Producer.assert_called_once_with(
+        {
+            "bootstrap.servers": "broker-1:9092,broker-2:9092",
+            "linger.ms": 20,
+            "batch.size": 65536,
+            "compression.type": "zstd",
+            "acks": "all",
+            "client.id": "test",
+        }
+    )
+
+
+@mock.patch("confluent_kafka.Producer")
+def test_producer_from_config_defaults(Producer):
+    producer_from_config({"kafka.bootstrap_servers": "broker:9092"}, "kafka.")
+    Producer.assert_called_once_with({"bootstrap.servers": "broker:9092", "linger.ms": 5})
+
+
+def test_producer_from_config_required():
+    with pytest.raises(ConfigurationError):
+        producer_from_config({}, "kafka.")
+
+
+class TestKafkaProducerClient:
+    def setup(self):
+        KAFKA_PRODUCE_LATENCY.clear()
+        KAFKA_PRODUCED_TOTAL.clear()
+
+    @pytest.fixture
+    def span(self):
+        yield mock.MagicMock()
+
+    @pytest.fixture
+    def producer(self):
+        yield FakeProducer()
+
+    @pytest.fixture
+    def client(self, span, producer):
+        yield KafkaProducerClient("kafka", span, producer, "kafka")
+
+    def test_produce(self, client, span, producer):
+        on_delivery = mock.Mock()
+        client.produce("topic", b"value", key=b"key", on_delivery=on_delivery)
+
+        span.make_child.assert_called_once_with("kafka.produce")
+        span.make_child.return_value.set_tag.assert_any_call("message_bus.destination", "topic")
+        assert producer.produced[0][:2] == ("topic", b"value")
+        assert producer.produced[0][2]["key"] == b"key"
+        on_delivery.assert_not_called()
+
+        producer.poll(0)
+
+        on_delivery.assert_called_once()
+        labels = {"kafka_client_name": "kafka", "kafka_topic": "topic", "kafka_success": "true"}
+        assert REGISTRY.get_sample_value(f"{KAFKA_PRODUCED_TOTAL._name}_total", labels) == 1
+        assert REGISTRY.get_sample_value(f"{KAFKA_PRODUCE_LATENCY._name}_count", labels) == 1
+
+    def test_delivery_failure(self, client, producer):
+        producer.error = confluent_kafka.KafkaError(confluent_kafka.KafkaError._MSG_TIMED_OUT)
+        client.produce("topic", b"value")
+        producer.poll(0)
+
+        labels = {"kafka_client_name": "kafka", "kafka_topic": "topic", "kafka_success": "false"}
+        assert REGISTRY.get_sample_value(f"{KAFKA_PRODUCED_TOTAL._name}_total", labels) == 1
+
+    def test_produce_buffer_full(self, client, producer):
+        producer.produce = mock.Mock(side_effect=BufferError)
+
+        with pytest.raises(BufferError):
+            client.produce("topic", b"value")
+
+        labels = {"kafka_client_name": "kafka", "kafka_topic": "topic", "kafka_success": "false"}
+        assert REGISTRY.get_sample_value(f"{KAFKA_PRODUCED_TOTAL._name}_total", labels) == 1
+
+    def test_flush(self, client, producer):
+        client.produce("topic", b"value")
+        assert client.flush(timeout=1) == 0
+        assert not producer.pending
+
+
+class TestKafkaProducerContextFactory:
+    def test_poller_serves_delivery_reports(self):
+        producer = FakeProducer()
+        factory = KafkaProducerContextFactory(producer, poll_interval=0.01)
+        client = factory.make_object_for_context("kafka", mock.MagicMock())
+        on_delivery = mock.Mock()
+
+        client.produce("topic", b"value", on_delivery=on_delivery)
+        for _ in range(100):
+            if on_delivery.called:
+                break
+            factory._poller.join(0.01)
+
+        on_delivery.assert_called_once()
+        assert factory.close(timeout=1) == 0
+        factory._poller.join(1)
+        assert not factory._poller.is_alive()
+
+    def test_poller_shared(self):
+        factory = KafkaProducerContextFactory(FakeProducer(), poll_interval=0.01)
+        factory.make_object_for_context("kafka", mock.MagicMock())
+        poller = factory._poller
+        factory.make_object_for_context("kafka", mock.MagicMock())
+        assert factory._poller is poller
+        factory.close(timeout=0)
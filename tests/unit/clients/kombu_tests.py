@@ -1,16 +1,27 @@
+import collections
+import socket
+
 from unittest import mock
 
 import pytest
 
+from kombu import Connection
+from kombu import Queue
+from kombu.pools import Producers
 from prometheus_client import REGISTRY
 
 from baseplate.clients.kombu import _KombuProducer
+from baseplate.clients.kombu import _PublisherConfirms
+from baseplate.clients.kombu import AMQP_BATCH_PROCESSING_TIME
+from baseplate.clients.kombu import AMQP_BATCH_SIZE
 from baseplate.clients.kombu import AMQP_PROCESSED_TOTAL
 from baseplate.clients.kombu import AMQP_PROCESSING_TIME
 from baseplate.clients.kombu import connection_from_config
 from baseplate.clients.kombu import exchange_from_config
 from baseplate.clients.kombu import KombuThriftSerializer
+from baseplate.clients.kombu import UnconfirmedPublishError
 from baseplate.lib.config import ConfigurationError
+from baseplate.testing.clients.kombu import InMemoryTransport
 from baseplate.testing.lib.secrets import FakeSecretsStore
 
 from ... import does_not_raise
@@ -134,6 +145,8 @@ class Test_KombuProducer:
     def setup(self):
         AMQP_PROCESSING_TIME.clear()
         AMQP_PROCESSED_TOTAL.clear()
+        AMQP_BATCH_PROCESSING_TIME.clear()
+        AMQP_BATCH_SIZE.clear()
 
     @pytest.fixture
     def app_config(self):
@@ -229,3 +242,122 @@ class Test_KombuProducer:
         assert (
             REGISTRY.get_sample_value(f"{AMQP_PROCESSED_TOTAL._name}_total", expected_labels) == 1
         )
+
+    @pytest.fixture
+    def channel(self, producer):
+        channel = mock.MagicMock()
+        channel.events = collections.defaultdict(set)
+        channel.basic_publish.side_effect = lambda *args, **kwargs: channel.published.append(args)
+        channel.published = []
+
+        def drain_events(timeout=None):
+            for callback in channel.events["basic_ack"]:
+                callback(len(channel.published), True)
+
+        channel.connection.drain_events.side_effect = drain_events
+        producer.connection.channel.return_value = channel
+        yield channel
+
+    def test_publish_many(self, kombu_producer, expected_labels, span, channel):
+        count = kombu_producer.publish_many(["a", "b", "c"], routing_key="rk")
+
+        assert count == 3
+        assert len(channel.published) == 3
+        channel.confirm_select.assert_called_once_with()
+        channel.connection.drain_events.assert_called_once()
+        channel.close.assert_called_once_with()
+
+        span.make_child.assert_called_once_with("name.publish_many")
+        child_span = span.make_child.return_value
+        child_span.set_tag.assert_any_call("message_bus.message_count", 3)
+        child_span.set_tag.assert_any_call("message_bus.destination", "rk")
+
+        expected_labels["amqp_success"] = "true"
+        assert REGISTRY.get_sample_value(f"{AMQP_BATCH_SIZE._name}_sum", expected_labels) == 3
+        assert (
+            REGISTRY.get_sample_value(f"{AMQP_BATCH_PROCESSING_TIME._name}_count", expected_labels)
+            == 1
+        )
+        assert (
+            REGISTRY.get_sample_value(f"{AMQP_PROCESSED_TOTAL._name}_total", expected_labels) == 3
+        )
+
+    def test_batch(self, kombu_producer, channel):
+        with kombu_producer.batch() as batch:
+            batch.publish("a", routing_key="one")
+            batch.publish("b", routing_key="two")
+            assert not channel.published
+
+        assert len(channel.published) == 2
+
+    def test_batch_not_published_on_error(self, kombu_producer, channel, producer_pool):
+        with pytest.raises(ValueError):
+            with kombu_producer.batch() as batch:
+                batch.publish("a")
+                raise ValueError
+
+        assert not channel.published
+        producer_pool.acquire.return_value.__enter__.return_value.connection.channel.assert_not_called()
+
+    def test_empty_batch(self, kombu_producer, channel):
+        assert kombu_producer.publish_many([]) == 0
+        channel.confirm_select.assert_not_called()
+
+    def test_publish_many_nacked(self, kombu_producer, expected_labels, channel):
+        def drain_events(timeout=None):
+            for callback in channel.events["basic_nack"]:
+                callback(2, False)
+
+        channel.connection.drain_events.side_effect = drain_events
+
+        with pytest.raises(UnconfirmedPublishError):
+            kombu_producer.publish_many(["a", "b", "c"])
+        channel.close.assert_called_once_with()
+
+        expected_labels["amqp_success"] = "false"
+        assert (
+            REGISTRY.get_sample_value(f"{AMQP_PROCESSED_TOTAL._name}_total", expected_labels) == 3
+        )
+
+    def test_publish_many_confirm_timeout(self, kombu_producer, channel):
+        channel.connection.drain_events.side_effect = socket.timeout
+
+        with pytest.raises(UnconfirmedPublishError):
+            kombu_producer.publish_many(["a", "b"], confirm_timeout=0.1)
+
+    def test_publish_many_without_confirms(self, exchange, span):
+        connection = Connection(transport=InMemoryTransport)
+        queue = Queue("q", exchange=exchange, routing_key="rk")
+        producers = Producers(limit=1)
+        kombu_producer = _KombuProducer("name", span, connection, exchange, producers)
+
+        # the pool publishes on its own copy of the connection
+        with producers[connection].acquire(block=True) as pooled_producer:
+            pooled_connection = pooled_producer.connection
+            queue(pooled_connection.default_channel).declare()
+
+        assert kombu_producer.publish_many(["a", "b"], routing_key="rk") == 2
+
+        with pooled_connection.SimpleQueue(queue) as simple_queue:
+            assert [simple_queue.get(timeout=1).payload for _ in range(2)] == ["a", "b"]
+        labels = {**kombu_producer.prom_labels, "amqp_success": "true"}
+        assert REGISTRY.get_sample_value(f"{AMQP_BATCH_SIZE._name}_sum", labels) == 2
+        assert REGISTRY.get_sample_value(f"{AMQP_PROCESSED_TOTAL._name}_total", labels) == 2
+
+
+class Test_PublisherConfirms:
+    @pytest.fixture
+    def confirms(self):
+        channel = mock.MagicMock()
+        channel.events = collections.defaultdict(set)
+        yield _PublisherConfirms(channel)
+
+    def test_out_of_order(self, confirms):
+        confirms._on_ack(3, False)
+        confirms._on_ack(1, False)
+        assert confirms.confirmed == 2
+        confirms._on_ack(2, True)
+        assert confirms.confirmed == 3
+        confirms._on_ack(5, False)
+        confirms._on_ack(4, True)
+        assert confirms.confirmed == 5
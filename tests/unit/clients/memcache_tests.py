@@ -1,5 +1,8 @@
 import builtins
+import importlib.util
+import json as json_module
 import unittest
+import zlib
 
 from unittest import mock
 
@@ -10,11 +13,20 @@ except ImportError:
 else:
     del pymemcache
 
+import gevent
+
+from gevent.threadpool import ThreadPool
 from prometheus_client import REGISTRY
+from pymemcache.client.rendezvous import RendezvousHash
 from baseplate.lib.config import ConfigurationError
 from baseplate.clients.memcache import pool_from_config
 from baseplate.clients.memcache import MonitoredMemcacheConnection
 from baseplate.clients.memcache import lib as memcache_lib
+from baseplate.clients.memcache import MemcacheContextFactory
+from baseplate.clients.memcache.sharding import KetamaHash
+from baseplate.clients.memcache.sharding import ShardedPooledClient
+from baseplate.lib.batching import GetBatcher
+from baseplate.lib.memo import RequestMemo
 
 
 class PrometheusInstrumentationTests(unittest.TestCase):
@@ -93,6 +105,119 @@ class PrometheusInstrumentationTests(unittest.TestCase):
         )
 
 
+class RequestMemoTests(unittest.TestCase):
+    def setUp(self):
+        self.pooled_client = mock.Mock()
+        self.pooled_client.server = "server"
+        self.memo = RequestMemo()
+        self.connection = MonitoredMemcacheConnection(
+            "cache", mock.MagicMock(), self.pooled_client, request_memo=self.memo
+        )
+
+    def test_get(self):
+        self.pooled_client.get.return_value = "value"
+        self.assertEqual(self.connection.get("key"), "value")
+        self.assertEqual(self.connection.get("key"), "value")
+        self.pooled_client.get.assert_called_once_with("key")
+        self.assertEqual(self.memo.hits, 1)
+
+        prom_labels = {"memcached_address": "server", "memcached_command": "get"}
+        self.assertEqual(
+            REGISTRY.get_sample_value("memcached_client_active_requests", prom_labels), 0
+        )
+
+    def test_get_many(self):
+        self.pooled_client.get.return_value = "a value"
+        self.connection.get("a")
+        self.pooled_client.get_many.return_value = {"b": "b value"}
+        self.assertEqual(
+            self.connection.get_many(["a", "b", "c"]), {"a": "a value", "b": "b value"}
+        )
+        self.pooled_client.get_many.assert_called_once_with(["b", "c"])
+
+        self.pooled_client.get_many.return_value = {}
+        self.assertEqual(self.connection.get_many(["b", "c"]), {"b": "b value"})
+        self.pooled_client.get_many.assert_called_with(["c"])
+
+    def test_writes_invalidate(self):
+        self.pooled_client.get.return_value = "value"
+        self.connection.get("a")
+        self.connection.get("b")
+        self.connection.set("a", "new value")
+        self.connection.get("a")
+        self.connection.get("b")
+        self.assertEqual(self.pooled_client.get.call_count, 3)
+
+        self.connection.delete_many(["a", "b"])
+        self.connection.get("a")
+        self.connection.get("b")
+        self.assertEqual(self.pooled_client.get.call_count, 5)
+
+        self.connection.flush_all()
+        self.connection.get("a")
+        self.assertEqual(self.pooled_client.get.call_count, 6)
+
+    def test_reads_during_writes_are_not_memoized(self):
+        def racing_read(key):
+            self.connection.set("a", "new value")
+            return "old value"
+
+        self.pooled_client.get.side_effect = racing_read
+        self.assertEqual(self.connection.get("a"), "old value")
+        self.pooled_client.get.side_effect = None
+        self.pooled_client.get.return_value = "new value"
+        self.assertEqual(self.connection.get("a"), "new value")
+
+        def racing_read_many(keys):
+            self.connection.delete("b")
+            return {"b": "old value"}
+
+        self.pooled_client.get_many.side_effect = racing_read_many
+        self.assertEqual(self.connection.get_many(["b"]), {"b": "old value"})
+        self.assertEqual(self.memo.get("cache", "b", read=("get", None)), (False, None))
+
+    def test_context_factory(self):
+        factory = MemcacheContextFactory(self.pooled_client)
+        span = mock.Mock()
+        span.context.request_memo = self.memo
+        self.assertIs(factory.make_object_for_context("cache", span).request_memo, self.memo)
+        self.assertIsNone(factory.make_object_for_context("cache", mock.MagicMock()).request_memo)
+
+
+class GetBatchingTests(unittest.TestCase):
+    def setUp(self):
+        self.pooled_client = mock.Mock()
+        self.pooled_client.server = "server"
+        self.pooled_client.get_many.return_value = {"a": "a value"}
+        self.span = mock.MagicMock()
+        self.connection = MonitoredMemcacheConnection(
+            "cache",
+            self.span,
+            self.pooled_client,
+            get_batcher=GetBatcher(self.pooled_client.get_many),
+        )
+
+    def test_concurrent_gets_share_a_get_many(self):
+        greenlets = [
+            gevent.spawn(self.connection.get, "a"),
+            gevent.spawn(self.connection.get, "b", default="default"),
+        ]
+        gevent.joinall(greenlets, raise_error=True)
+
+        self.assertEqual([g.value for g in greenlets], ["a value", "default"])
+        self.pooled_client.get_many.assert_called_once_with(["a", "b"])
+        self.pooled_client.get.assert_not_called()
+        span = self.span.make_child.return_value.__enter__.return_value
+        span.set_tag.assert_any_call("batch_size", 2)
+
+    def test_context_factory(self):
+        factory = MemcacheContextFactory(self.pooled_client, batch_gets=True)
+        connection = factory.make_object_for_context("cache", mock.MagicMock())
+        self.assertIsNotNone(connection.get_batcher)
+        self.assertIs(connection.get_batcher, factory.get_batcher)
+        self.assertIsNone(MemcacheContextFactory(self.pooled_client).get_batcher)
+
+
 class PoolFromConfigTests(unittest.TestCase):
     def test_empty_config(self):
         with self.assertRaises(ConfigurationError):
@@ -132,6 +257,35 @@ class PoolFromConfigTests(unittest.TestCase):
         )
         self.assertEqual(pool.no_delay, False)
 
+    def test_endpoints(self):
+        pool = pool_from_config(
+            {
+                "memcache.endpoints": "cache-1:11211, cache-2:11211",
+                "memcache.max_pool_size": "10",
+                "memcache.dead_timeout": "30 seconds",
+            }
+        )
+
+        self.assertIsInstance(pool, ShardedPooledClient)
+        self.assertIsInstance(pool.hasher, KetamaHash)
+        self.assertEqual(list(pool.clients), ["cache-1:11211", "cache-2:11211"])
+        self.assertEqual(pool.clients["cache-2:11211"].server, ("cache-2", 11211))
+        self.assertEqual(pool.clients["cache-2:11211"].client_pool.max_size, 10)
+        self.assertEqual(pool.dead_timeout, 30)
+        self.assertEqual(pool.retry_attempts, 2)
+
+    def test_endpoints_rendezvous(self):
+        pool = pool_from_config(
+            {"memcache.endpoints": "cache-1:11211,cache-2:11211", "memcache.hash": "rendezvous"}
+        )
+        self.assertIsInstance(pool.hasher, RendezvousHash)
+
+    def test_endpoint_and_endpoints(self):
+        with self.assertRaises(ConfigurationError):
+            pool_from_config(
+                {"memcache.endpoint": "cache-1:11211", "memcache.endpoints": "cache-2:11211"}
+            )
+
 
 class SerdeTests(unittest.TestCase):
     def test_serialize_str(self):
@@ -317,6 +471,110 @@ class SerdeTests(unittest.TestCase):
         self.assertEqual(value, expected_json_value)
 
 
+def installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+class CodecTests(unittest.TestCase):
+    VALUE = {"id": 1234, "title": "a title", "tags": ["x", "y"], "score": 1.5, "ok": True}
+
+    def assertRoundTrips(self, dump, load, expected_flags):
+        serialized, flags = dump("key", self.VALUE)
+        self.assertEqual(flags, expected_flags)
+        self.assertEqual(load("key", serialized, flags), self.VALUE)
+
+    def test_default_unchanged(self):
+        dump = memcache_lib.make_dump_and_compress_fn(min_compress_length=1, compress_level=6)
+        serialized, flags = dump("key", self.VALUE)
+        self.assertEqual(flags, memcache_lib.Flags.JSON | memcache_lib.Flags.ZLIB)
+        self.assertEqual(zlib.decompress(serialized).decode(), json_module.dumps(self.VALUE))
+
+    @unittest.skipUnless(installed("orjson"), "orjson is not installed")
+    def test_orjson(self):
+        dump = memcache_lib.make_dump_and_compress_fn(
+            min_compress_length=1, serializer=memcache_lib.orjson_serializer()
+        )
+        load = memcache_lib.make_decompress_and_load_fn(memcache_lib.orjson_serializer())
+        self.assertRoundTrips(dump, load, memcache_lib.Flags.JSON | memcache_lib.Flags.ZLIB)
+        # plain JSON either way, so old readers still work
+        self.assertRoundTrips(
+            dump,
+            memcache_lib.decompress_and_load,
+            memcache_lib.Flags.JSON | memcache_lib.Flags.ZLIB,
+        )
+
+    @unittest.skipUnless(installed("orjson"), "orjson is not installed")
+    def test_orjson_reads_old_values(self):
+        load = memcache_lib.make_decompress_and_load_fn(memcache_lib.orjson_serializer())
+        dump = memcache_lib.make_dump_and_compress_fn(min_compress_length=1)
+        self.assertRoundTrips(dump, load, memcache_lib.Flags.JSON | memcache_lib.Flags.ZLIB)
+
+        serialized, flags = dump("key", {"value": float("nan")})
+        self.assertEqual(list(load("key", serialized, flags)), ["value"])
+
+    @unittest.skipUnless(installed("msgpack"), "msgpack is not installed")
+    def test_msgpack(self):
+        dump = memcache_lib.make_dump_and_compress_fn(serializer=memcache_lib.msgpack_serializer())
+        self.assertRoundTrips(dump, memcache_lib.decompress_and_load, memcache_lib.Flags.MSGPACK)
+
+    @unittest.skipUnless(installed("zstandard"), "zstandard is not installed")
+    def test_zstd(self):
+        dump = memcache_lib.make_dump_and_compress_fn(
+            min_compress_length=1, compressor=memcache_lib.zstd_compressor()
+        )
+        self.assertRoundTrips(
+            dump,
+            memcache_lib.decompress_and_load,
+            memcache_lib.Flags.JSON | memcache_lib.Flags.ZSTD,
+        )
+
+    @unittest.skipUnless(installed("zstandard"), "zstandard is not installed")
+    def test_zstd_dictionary(self):
+        import zstandard
+
+        samples = [json_module.dumps({**self.VALUE, "id": i}).encode() for i in range(1000)]
+        dictionary = zstandard.train_dictionary(1024, samples).as_bytes()
+        compressor = memcache_lib.zstd_compressor(dictionary=dictionary)
+        dump = memcache_lib.make_dump_and_compress_fn(min_compress_length=1, compressor=compressor)
+        load = memcache_lib.make_decompress_and_load_fn(compressor)
+        self.assertRoundTrips(dump, load, memcache_lib.Flags.JSON | memcache_lib.Flags.ZSTD)
+
+    @unittest.skipUnless(installed("zstandard"), "zstandard is not installed")
+    def test_zstd_threads(self):
+        compressor = memcache_lib.zstd_compressor()
+        values = [str(i).encode() * 1000 for i in range(200)]
+        pool = ThreadPool(8)
+        try:
+            results = pool.map(lambda v: compressor.decompress(compressor.compress(v)), values)
+        finally:
+            pool.kill()
+        self.assertEqual(results, values)
+
+    @unittest.skipUnless(installed("lz4"), "lz4 is not installed")
+    def test_lz4(self):
+        dump = memcache_lib.make_dump_and_compress_fn(
+            min_compress_length=1, compressor=memcache_lib.lz4_compressor()
+        )
+        self.assertRoundTrips(
+            dump,
+            memcache_lib.decompress_and_load,
+            memcache_lib.Flags.JSON | memcache_lib.Flags.LZ4,
+        )
+
+    def test_unknown_compression(self):
+        load = memcache_lib.make_decompress_and_load_fn()
+        flags = memcache_lib.Flags.JSON | memcache_lib.Flags.ZSTD | memcache_lib.Flags.LZ4
+        self.assertIsNone(load("key", b"garbage", flags))
+
+    def test_custom_codec(self):
+        reverse = memcache_lib.Compressor(
+            memcache_lib.Flags.LZ4, compress=lambda d: d[::-1], decompress=lambda d: d[::-1]
+        )
+        dump = memcache_lib.make_dump_and_compress_fn(min_compress_length=1, compressor=reverse)
+        load = memcache_lib.make_decompress_and_load_fn(reverse)
+        self.assertRoundTrips(dump, load, memcache_lib.Flags.JSON | memcache_lib.Flags.LZ4)
+
+
 class R2CompatSerdeTests(unittest.TestCase):
     def test_serialize_str(self):
         pickle_no_compress = memcache_lib.make_pickle_and_compress_fn()
@@ -500,3 +758,163 @@ class R2CompatSerdeTests(unittest.TestCase):
         zlib.decompress.assert_called_with("nonsense")
         pickle.loads.assert_called_with(expected_zlib_value)
         self.assertEqual(value, expected_pickle_value)
+
+
+class KetamaHashTests(unittest.TestCase):
+    def test_empty(self):
+        self.assertIsNone(KetamaHash().get_node("key"))
+
+    def test_str_and_bytes_keys(self):
+        ring = KetamaHash(["a:11211", "b:11211", "c:11211"])
+        for i in range(100):
+            self.assertEqual(ring.get_node(f"key{i}"), ring.get_node(f"key{i}".encode()))
+
+    def test_distribution(self):
+        ring = KetamaHash(["a:11211", "b:11211", "c:11211"])
+        counts = {}
+        for i in range(3000):
+            node = ring.get_node(f"key{i}")
+            counts[node] = counts.get(node, 0) + 1
+        self.assertEqual(len(counts), 3)
+        self.assertTrue(all(count > 700 for count in counts.values()))
+
+    def test_removing_node_only_moves_its_keys(self):
+        ring = KetamaHash(["a:11211", "b:11211", "c:11211"])
+        before = {i: ring.get_node(f"key{i}") for i in range(1000)}
+        ring.remove_node("b:11211")
+        after = {i: ring.get_node(f"key{i}") for i in range(1000)}
+
+        for i, node in before.items():
+            if node != "b:11211":
+                self.assertEqual(after[i], node)
+        self.assertNotIn("b:11211", after.values())
+
+        ring.add_node("b:11211")
+        self.assertEqual(before, {i: ring.get_node(f"key{i}") for i in range(1000)})
+
+    def test_remove_unknown_node(self):
+        with self.assertRaises(ValueError):
+            KetamaHash().remove_node("a:11211")
+
+
+class FakeNode:
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+        self.down = False
+
+    def _check(self, method):
+        self.calls.append(method)
+        if self.down:
+            raise ConnectionRefusedError
+
+    def get(self, key, default=None):
+        self._check("get")
+        return self.data.get(key, default)
+
+    def get_many(self, keys):
+        self._check("get_many")
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_many(self, values, expire=0, noreply=None):
+        self._check("set_many")
+        self.data.update(values)
+        return True
+
+    def delete_many(self, keys, noreply=None):
+        self._check("delete_many")
+        for key in keys:
+            self.data.pop(key, None)
+        return True
+
+
+class ShardedPooledClientTests(unittest.TestCase):
+    def setUp(self):
+        self.client = ShardedPooledClient(
+            [("cache-1", 11211), ("cache-2", 11211), ("cache-3", 11211)],
+            retry_attempts=2,
+            dead_timeout=60,
+        )
+        self.data = {}
+        self.nodes = {name: FakeNode(self.data) for name in self.client.clients}
+        self.client.clients.update(self.nodes)
+        self.keys = [f"key{i}" for i in range(30)]
+
+    def test_server(self):
+        self.assertEqual(self.client.server, "cache-1:11211,cache-2:11211,cache-3:11211")
+
+    def test_get_routes_by_key(self):
+        node = self.client.node_for_key("key")
+        self.data["key"] = b"value"
+        self.assertEqual(self.client.get("key"), b"value")
+        self.assertEqual(self.nodes[node].calls, ["get"])
+
+    def test_many_fan_out_by_node(self):
+        self.assertTrue(self.client.set_many({key: key.encode() for key in self.keys}))
+        self.assertEqual(
+            self.client.get_many(self.keys + ["missing"]), {key: key.encode() for key in self.keys}
+        )
+        for node in self.nodes.values():
+            self.assertEqual(node.calls, ["set_many", "get_many"])
+
+        self.assertTrue(self.client.delete_many(self.keys))
+        self.assertEqual(self.data, {})
+
+    def test_many_single_node(self):
+        node = self.client.node_for_key("key")
+        with mock.patch("gevent.spawn") as spawn:
+            self.assertEqual(self.client.get_many(["key"]), {})
+        spawn.assert_not_called()
+        self.assertEqual(self.nodes[node].calls, ["get_many"])
+
+    def test_dead_node_ejected_and_retried(self):
+        node = self.client.node_for_key("key")
+        self.nodes[node].down = True
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionRefusedError):
+                self.client.get("key")
+
+        # the node is out of the ring now so the key moves elsewhere
+        self.assertNotEqual(self.client.node_for_key("key"), node)
+        self.assertIsNone(self.client.get("key"))
+
+        # and comes back once the dead timeout passes
+        self.nodes[node].down = False
+        with mock.patch("time.monotonic", return_value=self.client._dead_until[node]):
+            self.assertEqual(self.client.node_for_key("key"), node)
+        self.assertIsNone(self.client.get("key"))
+        self.assertEqual(self.client._failures, {})
+
+    def test_all_nodes_ejected(self):
+        for node in self.nodes.values():
+            node.down = True
+        for key in self.keys:
+            with self.assertRaises(ConnectionRefusedError):
+                self.client.get(key)
+        self.assertEqual(self.client.hasher.nodes, [])
+        self.assertIn(self.client.node_for_key("key"), self.nodes)
+
+    def test_runtime_metrics_sum_pools(self):
+        client = ShardedPooledClient([("cache-1", 11211), ("cache-2", 11211)], max_pool_size=5)
+        factory = MemcacheContextFactory(client, "cache")
+        batch = mock.Mock()
+        factory.report_memcache_runtime_metrics(batch)
+        batch.gauge.assert_any_call("pool.size")
+        batch.gauge.return_value.replace.assert_any_call(10)
+
+    def test_prewarm_connects_each_pool(self):
+        client = ShardedPooledClient([("cache-1", 11211), ("cache-2", 11211)], max_pool_size=2)
+        factory = MemcacheContextFactory(client, "cache")
+        pools = [pooled_client.client_pool for pooled_client in client.clients.values()]
+        for pool in pools:
+            pool.get = mock.Mock(side_effect=lambda: mock.Mock())
+            pool.release = mock.Mock()
+
+        factory.prewarm(5)
+
+        for pool in pools:
+            self.assertEqual(pool.get.call_count, 2)
+            self.assertEqual(pool.release.call_count, 2)
+            for call in pool.release.call_args_list:
+                call[0][0].version.assert_called_once_with()
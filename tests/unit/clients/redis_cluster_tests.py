@@ -1,20 +1,28 @@
 import os
+import random
+import time
 import unittest
 
+from datetime import timedelta
 from unittest import mock
 
 import fakeredis
 import pytest
+import rediscluster
 
 from prometheus_client import REGISTRY
+from redis.exceptions import ConnectionError
 from rediscluster.exceptions import RedisClusterException
 
 from baseplate.clients.redis_cluster import ACTIVE_REQUESTS
 from baseplate.clients.redis_cluster import cluster_pool_from_config
+from baseplate.clients.redis_cluster import ClusterRedisContextFactory
 from baseplate.clients.redis_cluster import HotKeyTracker
+from baseplate.clients.redis_cluster import KEYS_PER_NODE
 from baseplate.clients.redis_cluster import LATENCY_SECONDS
 from baseplate.clients.redis_cluster import MonitoredRedisClusterConnection
 from baseplate.clients.redis_cluster import REQUESTS_TOTAL
+from baseplate.clients.redis_cluster import SpaceSavingCounter
 
 
 class DummyConnection(object):
@@ -110,6 +118,20 @@ class TestMonitoredRedisConnection:
             "redis_context_name", span, connection_pool, redis_client_name="test_client"
         )
 
+    def test_direct_connections_share_tracker(self, span, connection_pool):
+        first = MonitoredRedisClusterConnection("redis", span, connection_pool)
+        second = MonitoredRedisClusterConnection("redis", span, connection_pool)
+        other = MonitoredRedisClusterConnection("other", span, connection_pool)
+        assert first.hot_key_tracker is second.hot_key_tracker
+        assert other.hot_key_tracker is not first.hot_key_tracker
+
+    def test_shared_tracker(self, span, connection_pool):
+        tracker = mock.Mock(spec=HotKeyTracker)
+        connection = MonitoredRedisClusterConnection(
+            "redis", span, connection_pool, hot_key_tracker=tracker
+        )
+        assert connection.hot_key_tracker is tracker
+
     # NOTE: a successful execute_command() call is difficult to mock
     def test_execute_command_exc_redis_err(
         self, monitored_redis_connection, expected_labels, app_config
@@ -167,6 +189,177 @@ class TestMonitoredRedisConnection:
                 ), "Should have 0 (and not None) active requests"
 
 
+class TestClusterRedisContextFactory:
+    @pytest.fixture
+    def connection_pool(self):
+        return cluster_pool_from_config(
+            app_config={"redis.url": "redis://localhost:1234/0"},
+            prefix="redis.",
+            init_slot_cache=False,
+            startup_nodes=[{"host": "127.0.0.1", "port": 7000}],
+            connection_class=DummyConnection,
+        )
+
+    @pytest.fixture
+    def factory(self, connection_pool):
+        return ClusterRedisContextFactory(connection_pool, redis_client_name="test_client")
+
+    def test_shares_client_state(self, factory, connection_pool):
+        span = mock.MagicMock()
+        with mock.patch.object(MonitoredRedisClusterConnection, "__init__") as init:
+            first = factory.make_object_for_context("redis", span)
+            second = factory.make_object_for_context("other", mock.MagicMock())
+        init.assert_not_called()
+
+        assert isinstance(first, MonitoredRedisClusterConnection)
+        assert first.context_name == "redis"
+        assert first.server_span is span
+        assert first.redis_client_name == "test_client"
+        assert second.context_name == "other"
+        assert first.connection_pool is second.connection_pool is connection_pool
+        assert first.response_callbacks is factory.redis_client.response_callbacks
+        assert first.hot_key_tracker is second.hot_key_tracker is factory.hot_key_tracker
+        assert first.read_from_replicas
+
+    def test_commands_instrumented(self, factory):
+        span = mock.MagicMock()
+        connection = factory.make_object_for_context("redis", span)
+
+        with pytest.raises(RedisClusterException):
+            connection.get("foo")
+        span.make_child.assert_called_once_with("redis.GET")
+
+    def test_auto_pipeline(self, connection_pool):
+        factory = ClusterRedisContextFactory(connection_pool, auto_pipeline=True)
+        span = mock.MagicMock()
+        connection = factory.make_object_for_context("redis", span)
+        assert connection.auto_pipeliner is factory.auto_pipeliner
+        assert factory.auto_pipeliner.redis_client is factory.redis_client
+
+        with mock.patch.object(
+            factory.auto_pipeliner, "execute_command", return_value="bar"
+        ) as execute_command:
+            assert connection.get("foo") == "bar"
+            connection.keys()
+
+        execute_command.assert_called_once_with("GET", "foo")
+        span.make_child.assert_any_call("redis.GET")
+
+
+class FakeClusterPipeline:
+    """Answers MGET/MSET/DEL from a dict shared by every fake node."""
+
+    def __init__(self, data, calls):
+        self.data = data
+        self.calls = calls
+        self.commands = []
+
+    def execute_command(self, *args):
+        self.commands.append(args)
+
+    def execute(self):
+        self.calls.append(self.commands)
+        results = []
+        for command, *args in self.commands:
+            if command == "MGET":
+                results.append([self.data.get(key) for key in args])
+            elif command == "MSET":
+                self.data.update(zip(args[::2], args[1::2]))
+                results.append(True)
+            elif command == "DEL":
+                results.append(sum(self.data.pop(key, None) is not None for key in args))
+        return results
+
+
+class TestMultiKeyHelpers:
+    # three fake nodes, keys are placed by their first letter
+    SLOTS = {"a": 1, "b": 2, "c": 3, "d": 3}
+    NODES = {1: "node-1", 2: "node-2", 3: "node-2"}
+
+    def setup(self):
+        KEYS_PER_NODE.clear()
+
+    @pytest.fixture
+    def data(self):
+        return {}
+
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    @pytest.fixture
+    def span(self):
+        return mock.MagicMock()
+
+    @pytest.fixture
+    def connection(self, span, data, calls):
+        connection_pool = cluster_pool_from_config(
+            app_config={"redis.url": "redis://localhost:1234/0"},
+            prefix="redis.",
+            init_slot_cache=False,
+            startup_nodes=[{"host": "127.0.0.1", "port": 7000}],
+            connection_class=DummyConnection,
+        )
+        connection_pool.nodes.keyslot = lambda key: self.SLOTS[key[0]]
+        connection_pool.get_master_node_by_slot = lambda slot: {"name": self.NODES[slot]}
+        factory = ClusterRedisContextFactory(connection_pool, redis_client_name="test_client")
+
+        with mock.patch.object(
+            rediscluster.client.RedisCluster,
+            "pipeline",
+            side_effect=lambda **kwargs: FakeClusterPipeline(data, calls),
+        ):
+            yield factory.make_object_for_context("redis", span)
+
+    def test_mget_many(self, connection, data, calls, span):
+        data.update({"a1": b"1", "b1": b"2", "c1": b"3"})
+
+        keys = ["c1", "a1", "d1", "b1", "a2"]
+        assert connection.mget_many(keys) == [b"3", b"1", None, b"2", None]
+
+        # one pipeline per node with one MGET per slot
+        assert sorted(calls) == [
+            [("MGET", "a1", "a2")],
+            [("MGET", "c1", "d1"), ("MGET", "b1")],
+        ]
+        span.make_child.assert_called_with("redis.mget_many")
+        assert span.make_child.call_count == 2
+        span.make_child.return_value.__enter__.return_value.set_tag.assert_any_call(
+            "redis.node", "node-1"
+        )
+        labels = {"redis_command": "mget_many", "redis_client_name": "test_client"}
+        assert REGISTRY.get_sample_value(f"{KEYS_PER_NODE._name}_count", labels) == 2
+        assert REGISTRY.get_sample_value(f"{KEYS_PER_NODE._name}_sum", labels) == 5
+
+    def test_mset_many(self, connection, data, calls):
+        assert connection.mset_many({"a1": b"1", "b1": b"2", "d1": b"3"})
+        assert data == {"a1": b"1", "b1": b"2", "d1": b"3"}
+        assert len(calls) == 2
+
+    def test_delete_many(self, connection, data):
+        data.update({"a1": b"1", "b1": b"2", "c1": b"3"})
+        assert connection.delete_many(["a1", "b1", "d1"]) == 2
+        assert data == {"c1": b"3"}
+
+    def test_single_node(self, connection, data, calls):
+        data.update({"a1": b"1"})
+        with mock.patch("gevent.spawn") as spawn:
+            assert connection.mget_many(["a1", "a2"]) == [b"1", None]
+        spawn.assert_not_called()
+        assert calls == [[("MGET", "a1", "a2")]]
+
+    def test_empty(self, connection, calls):
+        assert connection.mget_many([]) == []
+        assert connection.mset_many({})
+        assert connection.delete_many([]) == 0
+        assert not calls
+
+    def test_node_error(self, connection):
+        with mock.patch.object(FakeClusterPipeline, "execute", side_effect=ConnectionError):
+            with pytest.raises(ConnectionError):
+                connection.mget_many(["a1", "b1"])
+
+
 class HotKeyTrackerTests(unittest.TestCase):
     def setUp(self):
         self.rc = fakeredis.FakeStrictRedis()
@@ -174,6 +367,7 @@ class HotKeyTrackerTests(unittest.TestCase):
     def test_increment_reads_once(self):
         tracker = HotKeyTracker(self.rc, 1, 1)
         tracker.increment_keys_read_counter(["foo"], ignore_errors=False)
+        tracker.flush(ignore_errors=False)
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
                 "baseplate-hot-key-tracker-reads", "-inf", "+inf", withscores=True
@@ -187,6 +381,7 @@ class HotKeyTrackerTests(unittest.TestCase):
             tracker.increment_keys_read_counter(["foo"], ignore_errors=False)
 
         tracker.increment_keys_read_counter(["bar"], ignore_errors=False)
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -199,6 +394,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 0, 0)
         for _ in range(5):
             tracker.maybe_track_key_usage(["GET", "foo"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -211,6 +407,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 1, 1)
         for _ in range(5):
             tracker.maybe_track_key_usage(["GET", "foo"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -223,6 +420,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 1, 1)
         for _ in range(5):
             tracker.maybe_track_key_usage(["SET", "foo", "bar"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -235,6 +433,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 0, 0)
         for _ in range(5):
             tracker.maybe_track_key_usage(["SET", "foo", "bar"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -247,6 +446,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 1, 1)
 
         tracker.maybe_track_key_usage(["DEL", "foo", "bar"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -259,6 +459,7 @@ class HotKeyTrackerTests(unittest.TestCase):
         tracker = HotKeyTracker(self.rc, 1, 1)
 
         tracker.maybe_track_key_usage(["MSET", "foo", "bar", "baz", "wednesday"])
+        tracker.flush(ignore_errors=False)
 
         self.assertEqual(
             tracker.redis_client.zrangebyscore(
@@ -266,3 +467,98 @@ class HotKeyTrackerTests(unittest.TestCase):
             ),
             [(b"baz", float(1)), (b"foo", float(1))],
         )
+
+    def test_counts_aggregated_locally(self):
+        tracker = HotKeyTracker(self.rc, 1, 1)
+        with mock.patch.object(self.rc, "pipeline") as pipeline:
+            for _ in range(5):
+                tracker.maybe_track_key_usage(["GET", "foo"])
+            tracker.maybe_track_key_usage(["GET", "bar"])
+        pipeline.assert_not_called()
+
+        self.assertEqual(tracker.top_keys(tracker.reads_sorted_set_name), [("foo", 5), ("bar", 1)])
+
+        tracker.flush(ignore_errors=False)
+
+        self.assertEqual(tracker.top_keys(tracker.reads_sorted_set_name), [])
+        self.assertEqual(
+            self.rc.ttl("baseplate-hot-key-tracker-reads") > 0,
+            True,
+        )
+
+    def test_flush_errors(self):
+        tracker = HotKeyTracker(self.rc, 1, 1)
+        tracker.increment_keys_read_counter(["foo"])
+        with mock.patch.object(self.rc, "pipeline", side_effect=ConnectionError):
+            tracker.flush()
+            tracker.increment_keys_read_counter(["foo"])
+            with self.assertRaises(ConnectionError):
+                tracker.flush(ignore_errors=False)
+
+    def test_flushes_in_background(self):
+        tracker = HotKeyTracker(self.rc, 1, 1, flush_interval=timedelta(milliseconds=10))
+        tracker.increment_keys_read_counter(["foo"])
+
+        for _ in range(100):
+            if self.rc.exists("baseplate-hot-key-tracker-reads"):
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(
+            tracker.redis_client.zrangebyscore(
+                "baseplate-hot-key-tracker-reads", "-inf", "+inf", withscores=True
+            ),
+            [(b"foo", float(1))],
+        )
+
+    def test_flushes_when_stopped(self):
+        tracker = HotKeyTracker(self.rc, 1, 1, flush_interval=timedelta(hours=1))
+        tracker.increment_keys_read_counter(["foo"])
+        tracker.stopped.set()
+        tracker.flusher.join()
+        self.assertTrue(self.rc.exists("baseplate-hot-key-tracker-reads"))
+
+    def test_stop(self):
+        tracker = HotKeyTracker(self.rc, 1, 1, flush_interval=timedelta(milliseconds=10))
+        tracker.increment_keys_read_counter(["foo"])
+        tracker.stop()
+        self.assertFalse(tracker.flusher.is_alive())
+        self.assertTrue(self.rc.exists("baseplate-hot-key-tracker-reads"))
+
+
+class SpaceSavingCounterTests(unittest.TestCase):
+    def test_counts_exactly_under_capacity(self):
+        counter = SpaceSavingCounter(3)
+        for key in ["a", "b", "a", "c", "a", "b"]:
+            counter.add(key)
+        self.assertEqual(counter.most_common(), [("a", 3), ("b", 2), ("c", 1)])
+
+    def test_evicts_coldest(self):
+        counter = SpaceSavingCounter(2)
+        for key in ["a", "a", "a", "b", "c"]:
+            counter.add(key)
+
+        self.assertEqual(len(counter), 2)
+        # c replaced b and inherited its count
+        self.assertEqual(counter.most_common(), [("a", 3), ("c", 2)])
+        self.assertEqual(counter.most_common(1), [("a", 3)])
+
+    def test_matches_exhaustive_eviction(self):
+        rng = random.Random(1234)
+        counter = SpaceSavingCounter(10)
+        expected = {}
+        for _ in range(5000):
+            key = str(int(rng.paretovariate(1.2)))
+            count = rng.randint(1, 3)
+            if key in expected:
+                expected[key] += count
+            elif len(expected) < 10:
+                expected[key] = count
+            else:
+                coldest_count = min(expected.values())
+                coldest = min(k for k, c in expected.items() if c == coldest_count)
+                del expected[coldest]
+                expected[key] = coldest_count + count
+            counter.add(key, count)
+            self.assertEqual(counter.counts, expected)
+        self.assertLessEqual(len(counter._heap), 20)
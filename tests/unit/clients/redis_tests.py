@@ -3,6 +3,8 @@ import unittest
 
 from unittest import mock
 
+import fakeredis
+import gevent
 import pytest
 
 from prometheus_client import REGISTRY
@@ -14,13 +16,22 @@ except ImportError:
 else:
     del redis
 from redis.exceptions import ConnectionError
+from redis.exceptions import ResponseError
 
 from baseplate.lib.config import ConfigurationError
 from baseplate.clients.redis import pool_from_config
+from baseplate.clients.redis import AutoPipeliner
+from baseplate.clients.redis import CLIENT_SIDE_CACHE_REQUESTS_TOTAL
+from baseplate.clients.redis import ClientSideCache
+from baseplate.clients.redis import InstrumentedBlockingConnectionPool
 from baseplate.clients.redis import ACTIVE_REQUESTS
 from baseplate.clients.redis import REQUESTS_TOTAL
 from baseplate.clients.redis import LATENCY_SECONDS
+from baseplate.clients.redis import make_get_batcher
 from baseplate.clients.redis import MonitoredRedisConnection
+from baseplate.clients.redis import RedisContextFactory
+from baseplate.lib.memo import RequestMemo
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 
 
 class DummyConnection:
@@ -212,6 +223,394 @@ class TestMonitoredRedisConnection:
                 ), "Should have 0 (and not None) active requests"
 
 
+class TestAutoPipeliner:
+    def setup(self):
+        REQUESTS_TOTAL.clear()
+
+    @pytest.fixture
+    def redis_client(self):
+        client = fakeredis.FakeStrictRedis()
+        with mock.patch.object(client, "pipeline", wraps=client.pipeline):
+            yield client
+
+    @pytest.fixture
+    def auto_pipeliner(self, redis_client):
+        yield AutoPipeliner(redis_client)
+
+    @pytest.fixture
+    def connection(self, redis_client, auto_pipeliner):
+        yield MonitoredRedisConnection(
+            "redis",
+            mock.MagicMock(),
+            redis_client.connection_pool,
+            redis_client_name="test_client",
+            auto_pipeliner=auto_pipeliner,
+        )
+
+    def test_concurrent_commands_share_pipeline(self, connection, redis_client):
+        redis_client.set("foo", "1")
+        redis_client.set("bar", "2")
+
+        greenlets = [
+            gevent.spawn(connection.get, "foo"),
+            gevent.spawn(connection.get, "bar"),
+            gevent.spawn(connection.incr, "baz"),
+        ]
+        gevent.joinall(greenlets, raise_error=True)
+
+        assert [g.value for g in greenlets] == [b"1", b"2", 1]
+        redis_client.pipeline.assert_called_once_with(transaction=False)
+
+        labels = {
+            "redis_client_name": "test_client",
+            "redis_type": "standalone",
+            "redis_command": "get",
+            "redis_database": "0",
+            "redis_success": "true",
+        }
+        assert REGISTRY.get_sample_value(f"{REQUESTS_TOTAL._name}_total", labels) == 2
+        assert connection.server_span.make_child.call_count == 3
+
+    def test_errors_are_per_command(self, connection, redis_client):
+        redis_client.set("foo", "not a number")
+
+        ok = gevent.spawn(connection.set, "bar", "1")
+        bad = gevent.spawn(connection.incr, "foo")
+        gevent.joinall([ok, bad])
+
+        assert ok.value is True
+        assert isinstance(bad.exception, ResponseError)
+
+    def test_pipeline_failure_fails_every_command(self, connection, redis_client):
+        redis_client.pipeline.side_effect = ConnectionError
+
+        greenlets = [gevent.spawn(connection.get, "foo"), gevent.spawn(connection.get, "bar")]
+        gevent.joinall(greenlets)
+
+        assert all(isinstance(g.exception, ConnectionError) for g in greenlets)
+
+    def test_other_commands_bypass(self, connection, auto_pipeliner):
+        with mock.patch.object(auto_pipeliner, "execute_command") as execute_command:
+            with mock.patch("redis.StrictRedis.execute_command") as direct:
+                connection.blpop("queue", timeout=1)
+        execute_command.assert_not_called()
+        direct.assert_called_once()
+
+    def test_multi_key_exists_bypasses(self, connection, auto_pipeliner):
+        with mock.patch.object(auto_pipeliner, "execute_command") as execute_command:
+            connection.exists("a", "b")
+            execute_command.assert_not_called()
+            connection.exists("a")
+            execute_command.assert_called_once_with("EXISTS", "a")
+
+    def test_max_batch_size(self, redis_client):
+        auto_pipeliner = AutoPipeliner(redis_client, max_batch_size=2)
+        greenlets = [gevent.spawn(auto_pipeliner.execute_command, "GET", "foo") for _ in range(5)]
+        gevent.joinall(greenlets, raise_error=True)
+        assert redis_client.pipeline.call_count == 3
+
+
+class TestGetBatching:
+    @pytest.fixture
+    def redis_client(self):
+        client = fakeredis.FakeStrictRedis()
+        with mock.patch.object(client, "mget", wraps=client.mget):
+            yield client
+
+    @pytest.fixture
+    def server_span(self):
+        yield mock.MagicMock()
+
+    @pytest.fixture
+    def connection(self, redis_client, server_span):
+        yield MonitoredRedisConnection(
+            "redis",
+            server_span,
+            redis_client.connection_pool,
+            get_batcher=make_get_batcher(redis_client),
+        )
+
+    def test_concurrent_gets_share_an_mget(self, connection, redis_client, server_span):
+        redis_client.set("a", "1")
+        redis_client.set("b", "2")
+        greenlets = [gevent.spawn(connection.get, key) for key in ["a", "b", "c"]]
+        gevent.joinall(greenlets, raise_error=True)
+
+        assert [g.value for g in greenlets] == [b"1", b"2", None]
+        redis_client.mget.assert_called_once_with(["a", "b", "c"])
+        span = server_span.make_child.return_value.__enter__.return_value
+        span.set_tag.assert_any_call("batch_size", 3)
+        assert server_span.make_child.call_count == 3
+
+    def test_other_commands_are_not_batched(self, connection, redis_client):
+        connection.set("a", "1")
+        assert connection.get("a") == b"1"
+        assert connection.mget("a", "b") == [b"1", None]
+        assert redis_client.mget.call_count == 1
+
+    def test_context_factory(self, redis_client):
+        factory = RedisContextFactory(redis_client.connection_pool, batch_gets=True)
+        connection = factory.make_object_for_context("redis", mock.MagicMock())
+        assert connection.get_batcher is factory.get_batcher is not None
+
+
+class TestRequestMemo:
+    @pytest.fixture
+    def redis_client(self):
+        yield fakeredis.FakeStrictRedis()
+
+    @pytest.fixture
+    def memo(self):
+        yield RequestMemo()
+
+    @pytest.fixture
+    def connection(self, redis_client, memo):
+        connection = MonitoredRedisConnection(
+            "redis", mock.MagicMock(), redis_client.connection_pool, request_memo=memo
+        )
+        with mock.patch.object(
+            connection, "_execute_command", wraps=connection._execute_command
+        ) as execute:
+            connection.execute = execute
+            yield connection
+
+    def test_reads_are_memoized(self, connection, redis_client, memo):
+        redis_client.set("a", "1")
+        redis_client.hset("h", "f", "2")
+        assert connection.get("a") == b"1"
+        assert connection.get("a") == b"1"
+        assert connection.hgetall("h") == {b"f": b"2"}
+        assert connection.hgetall("h") == {b"f": b"2"}
+        assert connection.execute.call_count == 2
+        assert memo.hits == 2
+
+    def test_writes_invalidate(self, connection, redis_client):
+        redis_client.set("a", "1")
+        connection.get("a")
+        connection.set("a", "2")
+        assert connection.get("a") == b"2"
+        assert connection.execute.call_count == 3
+
+    def test_pipelines_invalidate(self, connection, redis_client):
+        redis_client.set("a", "1")
+        connection.get("a")
+        with connection.pipeline("test") as pipe:
+            pipe.set("a", "2")
+            pipe.execute()
+        assert connection.get("a") == b"2"
+
+    def test_mget_is_memoized(self, connection, redis_client):
+        redis_client.set("a", "1")
+        connection.get("a")
+        assert connection.mget("a", "b") == [b"1", None]
+        assert connection.mget("a", "b") == [b"1", None]
+        assert connection.get("a") == b"1"
+        assert connection.execute.call_count == 2
+
+    def test_reads_during_writes_are_not_memoized(self, connection, redis_client, memo):
+        def racing_read():
+            connection.set("a", "2")
+            return b"1"
+
+        assert memo.call("redis", "a", racing_read, read=(("GET", "a"), ())) == b"1"
+        assert connection.get("a") == b"2"
+
+    def test_reads_during_pipelines_are_not_memoized(self, connection, redis_client, memo):
+        def racing_read():
+            with connection.pipeline("test") as pipe:
+                pipe.set("a", "2")
+                pipe.execute()
+            return b"1"
+
+        assert memo.call("redis", "a", racing_read, read=(("GET", "a"), ())) == b"1"
+        assert connection.get("a") == b"2"
+
+    def test_context_factory(self, redis_client, memo):
+        factory = RedisContextFactory(redis_client.connection_pool)
+        span = mock.Mock()
+        span.context.request_memo = memo
+        assert factory.make_object_for_context("redis", span).request_memo is memo
+        assert factory.make_object_for_context("redis", mock.MagicMock()).request_memo is None
+
+
+IDLE = object()
+
+
+class ScriptedConnection:
+    """A connection that replies to the invalidation handshake then a script.
+
+    ``IDLE`` in the script is a read timeout with nothing to read.
+
+    """
+
+    def __init__(self, script):
+        self.sent = []
+        self.responses = list(script)
+
+    def send_command(self, *args):
+        self.sent.append(args)
+
+    def can_read(self, timeout=0):
+        if self.responses[0] is IDLE:
+            self.responses.pop(0)
+            return False
+        return True
+
+    def read_response(self):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def disconnect(self):
+        pass
+
+
+class TestClientSideCache:
+    def setup(self):
+        CLIENT_SIDE_CACHE_REQUESTS_TOTAL.clear()
+
+    @pytest.fixture
+    def cache(self):
+        pool = pool_from_config({"redis.url": "redis://localhost:1234/0"})
+        cache = ClientSideCache(pool, max_size=2, redis_client_name="test", prefixes=["cached:"])
+        cache.listener = mock.Mock()
+        cache.connected = True
+        yield cache
+
+    @pytest.fixture
+    def execute(self):
+        values = {b"cached:a": b"1", b"cached:b": b"2", b"other": b"3"}
+
+        def execute(command, *keys, **kwargs):
+            keys = [key.encode() if isinstance(key, str) else key for key in keys]
+            if command == "MGET":
+                return [values.get(key) for key in keys]
+            return values.get(keys[0])
+
+        yield mock.Mock(side_effect=execute)
+
+    def hits(self, result):
+        return REGISTRY.get_sample_value(
+            f"{CLIENT_SIDE_CACHE_REQUESTS_TOTAL._name}_total",
+            {"redis_client_name": "test", "redis_cache_result": result},
+        )
+
+    def test_get(self, cache, execute):
+        assert cache.execute_command(execute, "GET", "cached:a") == b"1"
+        assert cache.execute_command(execute, "GET", "cached:a") == b"1"
+        assert execute.call_count == 1
+        assert self.hits("hit") == 1
+        assert self.hits("miss") == 1
+
+    def test_uncached_prefix(self, cache, execute):
+        cache.execute_command(execute, "GET", "other")
+        cache.execute_command(execute, "GET", "other")
+        assert execute.call_count == 2
+
+    def test_invalidate(self, cache, execute):
+        cache.execute_command(execute, "GET", "cached:a")
+        cache.invalidate([b"cached:a"])
+        cache.execute_command(execute, "GET", "cached:a")
+        assert execute.call_count == 2
+
+        cache.invalidate(None)
+        assert not cache.entries
+
+    def test_invalidated_while_reading(self, cache, execute):
+        def racing_execute(*args):
+            cache.invalidate([b"cached:a"])
+            return b"stale"
+
+        cache.execute_command(racing_execute, "GET", "cached:a")
+        assert not cache.entries
+
+    def test_bypassed_while_disconnected(self, cache, execute):
+        cache.connected = False
+        cache.execute_command(execute, "GET", "cached:a")
+        cache.execute_command(execute, "GET", "cached:a")
+        assert execute.call_count == 2
+
+    def test_lru_and_ttl(self, cache, execute):
+        cache.execute_command(execute, "GET", "cached:a")
+        cache.execute_command(execute, "GET", "cached:b")
+        cache.execute_command(execute, "HGETALL", "cached:a")
+        assert list(cache.entries) == [("GET", b"cached:b"), ("HGETALL", b"cached:a")]
+
+        cache.entries[("GET", b"cached:b")] = (0, b"2")
+        cache.execute_command(execute, "GET", "cached:b")
+        assert execute.call_count == 4
+
+    def test_mget(self, cache, execute):
+        cache.execute_command(execute, "GET", "cached:a")
+        result = cache.execute_command(execute, "MGET", "cached:a", "cached:b", "other", "cached:b")
+
+        assert result == [b"1", b"2", b"3", b"2"]
+        execute.assert_called_with("MGET", b"cached:b", b"other")
+        assert cache.execute_command(execute, "MGET", "cached:a", "cached:b") == [b"1", b"2"]
+        assert execute.call_count == 2
+
+    def test_hgetall_returns_copies(self, cache):
+        execute = mock.Mock(return_value={b"field": b"value"})
+        cache.execute_command(execute, "HGETALL", "cached:h")["field"] = "mutated"
+        assert cache.execute_command(execute, "HGETALL", "cached:h") == {b"field": b"value"}
+
+    def test_listen(self, cache):
+        listener = ScriptedConnection(
+            [7, ["subscribe", "__redis__:invalidate", 1]]
+            + [["message", "__redis__:invalidate", [b"cached:a"]], ConnectionError()]
+        )
+        tracker = ScriptedConnection([b"OK"])
+        connection_class = mock.Mock(side_effect=[listener, tracker])
+        cache.connection_pool.connection_class = connection_class
+        cache.entries[("GET", b"cached:a")] = (float("inf"), b"1")
+
+        with pytest.raises(ConnectionError):
+            cache._listen()
+
+        assert connection_class.call_args_list[0][1]["socket_timeout"] == 30
+        assert listener.sent == [("CLIENT", "ID"), ("SUBSCRIBE", "__redis__:invalidate")]
+        assert tracker.sent == [
+            ("CLIENT", "TRACKING", "on", "REDIRECT", 7, "BCAST", "PREFIX", b"cached:")
+        ]
+        assert not cache.entries
+        assert not cache.connected
+
+    def test_listen_checks_idle_connections(self, cache):
+        listener = ScriptedConnection(
+            [7, ["subscribe", "__redis__:invalidate", 1]] + [IDLE, ["pong", ""], IDLE, IDLE]
+        )
+        tracker = ScriptedConnection([b"OK", b"PONG", b"PONG"])
+        cache.connection_pool.connection_class = mock.Mock(side_effect=[listener, tracker])
+
+        # the second PING to the listener is never answered
+        with pytest.raises(ConnectionError):
+            cache._listen()
+
+        assert listener.sent[2:] == [("PING",), ("PING",)]
+        assert tracker.sent[1:] == [("PING",), ("PING",)]
+        assert not cache.connected
+
+    def test_listen_fails_when_tracker_is_closed(self, cache):
+        listener = ScriptedConnection([7, ["subscribe", "__redis__:invalidate", 1], IDLE])
+        tracker = ScriptedConnection([b"OK", ConnectionError()])
+        cache.connection_pool.connection_class = mock.Mock(side_effect=[listener, tracker])
+
+        with pytest.raises(ConnectionError):
+            cache._listen()
+
+        assert tracker.sent[1:] == [("PING",)]
+        assert not cache.connected
+
+    def test_connection_integration(self, cache):
+        connection = MonitoredRedisConnection(
+            "redis", mock.MagicMock(), cache.connection_pool, client_side_cache=cache
+        )
+        cache.entries[("GET", b"cached:a")] = (float("inf"), b"1")
+        assert connection.get("cached:a") == b"1"
+        connection.server_span.make_child.assert_not_called()
+
+
 class TestPoolFromConfig:
     def test_empty_config(self):
         with pytest.raises(ConfigurationError):
@@ -243,3 +642,59 @@ class TestPoolFromConfig:
 
     def test_alternate_prefix(self):
         pool_from_config({"noodle.url": "redis://localhost:1234/0"}, prefix="noodle.")
+
+
+class SocketConnection(DummyConnection):
+    connects = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sock = None
+
+    def connect(self):
+        if not self._sock:
+            SocketConnection.connects += 1
+            self._sock = object()
+
+
+class TestInstrumentedBlockingConnectionPool:
+    @pytest.fixture
+    def pool(self):
+        SocketConnection.connects = 0
+        pool = InstrumentedBlockingConnectionPool(
+            max_connections=2, timeout=0.01, connection_class=SocketConnection
+        )
+        pool.instrumentation = mock.Mock(spec=PoolInstrumentation)
+        pool.instrumentation.connecting.return_value = mock.MagicMock()
+        yield pool
+
+    def test_pool_from_config(self):
+        pool = pool_from_config({"redis.url": "redis://localhost:1234/0"})
+        assert isinstance(pool, InstrumentedBlockingConnectionPool)
+
+        RedisContextFactory(pool, name="cache")
+        assert pool.instrumentation.client_name == "cache"
+
+    def test_checkout(self, pool):
+        connection = pool.get_connection("GET")
+        pool.release(connection)
+        pool.release(pool.get_connection("GET"))
+
+        assert pool.instrumentation.checkout_waited.call_count == 2
+        assert pool.instrumentation.connecting.call_count == 1
+        assert SocketConnection.connects == 1
+
+    def test_checkout_timeout(self, pool):
+        pool.get_connection("GET")
+        pool.get_connection("GET")
+
+        with pytest.raises(ConnectionError):
+            pool.get_connection("GET")
+        assert pool.instrumentation.checkout_timed_out.call_count == 1
+
+    def test_prewarm(self, pool):
+        factory = RedisContextFactory(pool)
+        factory.prewarm(5)
+
+        assert SocketConnection.connects == 2
+        assert pool.pool.qsize() == 2
@@ -6,12 +6,18 @@ import pytest
 from prometheus_client import REGISTRY
 from requests import Request
 from requests import Response
-from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from baseplate.clients.requests import _IdleTimeoutHTTPConnectionPool
+from baseplate.clients.requests import _IsolatedSession
 from baseplate.clients.requests import ACTIVE_REQUESTS
 from baseplate.clients.requests import BaseplateSession
+from baseplate.clients.requests import http_adapter_from_config
+from baseplate.clients.requests import KeepAliveHTTPAdapter
 from baseplate.clients.requests import LATENCY_SECONDS
 from baseplate.clients.requests import REQUESTS_TOTAL
+from baseplate.clients.requests import RequestsContextFactory
 from baseplate.lib.prometheus_metrics import getHTTPSuccessLabel
 
 
@@ -82,8 +88,8 @@ class TestBaseplateSessionProm:
             status_code = response.status_code
             http_success = getHTTPSuccessLabel(status_code)
 
-        with mock.patch("baseplate.clients.requests.Session", spec=Session) as session:
-            session().send.return_value = response
+        with mock.patch.object(baseplate_session.session, "send") as send:
+            send.return_value = response
             with expectation:
                 baseplate_session.send(req.prepare())
 
@@ -107,3 +113,95 @@ class TestBaseplateSessionProm:
             )
             == 1
         )
+
+
+class TestIsolatedSession:
+    def test_discards_cookies(self):
+        session = _IsolatedSession(HTTPAdapter())
+        session.cookies.set("name", "value")
+        assert len(session.cookies) == 0
+
+    def test_mounts_adapter(self):
+        adapter = HTTPAdapter()
+        session = _IsolatedSession(adapter)
+        assert session.get_adapter("http://example.com/") is adapter
+        assert session.get_adapter("https://example.com/") is adapter
+
+    def test_context_factory_shares_session(self):
+        factory = RequestsContextFactory(HTTPAdapter(), BaseplateSession)
+        first = factory.make_object_for_context("http", mock.MagicMock())
+        second = factory.make_object_for_context("http", mock.MagicMock())
+        assert first.session is second.session is factory.session
+
+
+class TestHTTPAdapterFromConfig:
+    def test_defaults(self):
+        adapter = http_adapter_from_config({}, "http.")
+        assert isinstance(adapter, KeepAliveHTTPAdapter)
+        assert adapter.keepalive_timeout is None
+        assert adapter.max_retries.total == 0
+
+    def test_pool_and_keepalive(self):
+        adapter = http_adapter_from_config(
+            {
+                "http.pool_maxsize": "4",
+                "http.pool_block": "true",
+                "http.keepalive_timeout": "30 seconds",
+            },
+            "http.",
+        )
+        assert adapter._pool_maxsize == 4
+        assert adapter._pool_block
+        assert adapter.keepalive_timeout == 30
+        assert adapter.poolmanager.idle_timeout == 30
+
+    def test_retries(self):
+        adapter = http_adapter_from_config(
+            {
+                "http.max_retries": "3",
+                "http.retry_statuses": "502, 503",
+                "http.retry_backoff": "100 milliseconds",
+            },
+            "http.",
+        )
+        assert isinstance(adapter.max_retries, Retry)
+        assert adapter.max_retries.total == 3
+        assert adapter.max_retries.status_forcelist == [502, 503]
+        assert adapter.max_retries.backoff_factor == 0.1
+        assert not adapter.max_retries.raise_on_status
+
+
+@mock.patch("urllib3.connectionpool.is_connection_dropped", return_value=False)
+class TestIdleTimeoutConnectionPool:
+    def make_pool(self, idle_timeout):
+        pool = _IdleTimeoutHTTPConnectionPool("example.com", maxsize=1, validator=mock.Mock())
+        pool.idle_timeout = idle_timeout
+        pool.pool.get(block=False)  # make room for the connection under test
+        return pool
+
+    def test_reuses_fresh_connection(self, is_connection_dropped):
+        pool = self.make_pool(idle_timeout=30)
+        conn = mock.Mock()
+        with mock.patch("time.monotonic", return_value=100):
+            pool._put_conn(conn)
+        with mock.patch("time.monotonic", return_value=110):
+            assert pool._get_conn() is conn
+        conn.close.assert_not_called()
+
+    def test_reconnects_idle_connection(self, is_connection_dropped):
+        pool = self.make_pool(idle_timeout=30)
+        conn = mock.Mock()
+        with mock.patch("time.monotonic", return_value=100):
+            pool._put_conn(conn)
+        with mock.patch("time.monotonic", return_value=131):
+            assert pool._get_conn() is conn
+        conn.close.assert_called_once_with()
+
+    def test_no_timeout(self, is_connection_dropped):
+        pool = self.make_pool(idle_timeout=None)
+        conn = mock.Mock()
+        with mock.patch("time.monotonic", return_value=100):
+            pool._put_conn(conn)
+        with mock.patch("time.monotonic", return_value=10000):
+            assert pool._get_conn() is conn
+        conn.close.assert_not_called()
@@ -16,7 +16,9 @@ from baseplate.clients.thrift import _build_thrift_proxy_method
 from baseplate.clients.thrift import ACTIVE_REQUESTS
 from baseplate.clients.thrift import REQUEST_LATENCY
 from baseplate.clients.thrift import REQUESTS_TOTAL
+from baseplate.clients.thrift import ThriftClient
 from baseplate.clients.thrift import ThriftContextFactory
+from baseplate.lib.memo import RequestMemo
 from baseplate.thrift import BaseplateServiceV2
 from baseplate.thrift.ttypes import Error
 from baseplate.thrift.ttypes import ErrorCode
@@ -249,3 +251,62 @@ class TestThriftContextFactory:
         )
         assert REGISTRY.get_sample_value("thrift_client_pool_max_size", prom_labels) == 4
         assert REGISTRY.get_sample_value("thrift_client_pool_active_connections", prom_labels) == 8
+
+    def test_pool_instrumentation_named_for_config_key(self):
+        parser = ThriftClient(BaseplateServiceV2.Client)
+        context_factory = parser.parse("example_service", {"example_service.endpoint": "h:9090"})
+        assert context_factory.pool.instrumentation.client_name == "example_service"
+
+
+class TestRequestMemo:
+    @pytest.fixture
+    def client_cls(self):
+        class Iface:
+            calls = []
+
+            def __init__(self, prot):
+                pass
+
+            def get(self, key):
+                self.calls.append(("get", key))
+                return key.upper()
+
+            def put(self, key):
+                self.calls.append(("put", key))
+
+        yield Iface
+
+    @pytest.fixture
+    def memo(self):
+        yield RequestMemo()
+
+    @pytest.fixture
+    def client(self, client_cls, memo):
+        pool = mock.MagicMock(timeout=None)
+        context_factory = ThriftContextFactory(pool, client_cls, memoized_methods=["get"])
+        span = mock.MagicMock()
+        span.context.request_memo = memo
+        yield context_factory.make_object_for_context("service", span)
+
+    def test_reads_are_memoized(self, client, client_cls, memo):
+        assert client.get("a") == "A"
+        assert client.get("a") == "A"
+        assert client.get(key="a") == "A"
+        assert client_cls.calls == [("get", "a"), ("get", "a")]
+        assert memo.hits == 1
+
+    def test_other_methods_invalidate(self, client, client_cls):
+        client.get("a")
+        client.put("a")
+        client.get("a")
+        assert client_cls.calls == [("get", "a"), ("put", "a"), ("get", "a")]
+
+    def test_retrying_keeps_memo(self, client, client_cls):
+        client.get("a")
+        with client.retrying(attempts=2) as retrying_client:
+            retrying_client.get("a")
+        assert client_cls.calls == [("get", "a")]
+
+    def test_unknown_method(self, client_cls):
+        with pytest.raises(ValueError):
+            ThriftContextFactory(mock.MagicMock(), client_cls, memoized_methods=["nope"])
@@ -122,6 +122,21 @@ class BaseplateTests(unittest.TestCase):
         self.assertTrue(context.complex.true)
         self.assertEqual("bar", context.complex.nested.foo)
 
+    def test_prewarm_clients(self):
+        warm_factory = mock.Mock(spec=ContextFactory)
+        nested_factory = mock.Mock(spec=ContextFactory)
+        broken_factory = mock.Mock(spec=ContextFactory)
+        broken_factory.prewarm.side_effect = Exception("oops")
+
+        baseplate = Baseplate()
+        baseplate.add_to_context("broken", broken_factory)
+        baseplate.add_to_context("warm", warm_factory)
+        baseplate.add_to_context("nested", {"factory": nested_factory, "value": 42})
+        baseplate.prewarm_clients(3)
+
+        warm_factory.prewarm.assert_called_once_with(3)
+        nested_factory.prewarm.assert_called_once_with(3)
+
 
 class SpanTests(unittest.TestCase):
     def test_events(self):
@@ -1,3 +1,4 @@
+import datetime
 import socket
 import time
 
@@ -13,7 +14,9 @@ from prometheus_client import REGISTRY
 from baseplate import Baseplate
 from baseplate import RequestContext
 from baseplate import ServerSpan
+from baseplate.frameworks.queue_consumer.kombu import _AckBatcher
 from baseplate.frameworks.queue_consumer.kombu import AMQP_ACTIVE_MESSAGES
+from baseplate.frameworks.queue_consumer.kombu import AMQP_DELAYED_TOTAL
 from baseplate.frameworks.queue_consumer.kombu import AMQP_PROCESSED_TOTAL
 from baseplate.frameworks.queue_consumer.kombu import AMQP_PROCESSING_TIME
 from baseplate.frameworks.queue_consumer.kombu import AMQP_REJECTED_REASON_RETRIES
@@ -28,6 +31,7 @@ from baseplate.frameworks.queue_consumer.kombu import KombuQueueConsumerFactory
 from baseplate.frameworks.queue_consumer.kombu import RetryMode
 from baseplate.lib.errors import RecoverableException
 from baseplate.lib.errors import UnrecoverableException
+from baseplate.testing.clients.kombu import InMemoryTransport
 
 from .... import does_not_raise
 
@@ -66,6 +70,7 @@ class TestKombuMessageHandler:
         AMQP_REPUBLISHED_TOTAL.clear()
         AMQP_REJECTED_TOTAL.clear()
         AMQP_ACTIVE_MESSAGES.clear()
+        AMQP_DELAYED_TOTAL.clear()
 
     @pytest.fixture
     def message(self, connection):
@@ -445,6 +450,239 @@ class TestKombuMessageHandler:
                 # we need to assert that not only the end result is 0, but that we increased and then decreased to that value
                 assert mock_manager.mock_calls == [mock.call.inc(), mock.call.dec()]
 
+    @pytest.mark.parametrize(
+        "attempt,delay_ms",
+        [(None, 1000), (1, 2000), (3, 8000), (10, 60000)],
+    )
+    def test_errors_with_delayed_republish(self, attempt, delay_ms, baseplate, name, message):
+        def handler_fn(ctx, body, msg):
+            raise ValueError()
+
+        prom_labels = AmqpConsumerPrometheusLabels(
+            amqp_address="hostname:port",
+            amqp_virtual_host="/",
+            amqp_exchange_name="exchange",
+            amqp_routing_key="routing-key",
+        )
+        handler = KombuMessageHandler(
+            baseplate,
+            name,
+            handler_fn,
+            retry_mode=RetryMode.DELAYED_REPUBLISH,
+            retry_limit=20,
+            retry_max_delay=datetime.timedelta(minutes=1),
+        )
+        if attempt:
+            message.headers["x-retry-count"] = attempt
+
+        with mock.patch.object(kombu.Queue, "declare") as declare:
+            handler.handle(message)
+            declare.assert_called_once()
+
+        message.ack.assert_called_once()
+        message.requeue.assert_not_called()
+        assert message.channel.basic_publish.call_args == mock.call(
+            message.channel.prepare_message.return_value,
+            f"exchange.delay.{delay_ms}",
+            "routing-key",
+        )
+        assert (
+            REGISTRY.get_sample_value(
+                f"{AMQP_DELAYED_TOTAL._name}_total",
+                {**prom_labels._asdict(), "amqp_retry_delay_seconds": str(delay_ms / 1000)},
+            )
+            == 1
+        )
+
+    def test_delay_queues_declared_once_per_channel(self, baseplate, name):
+        handler = KombuMessageHandler(
+            baseplate, name, mock.Mock(), retry_mode=RetryMode.DELAYED_REPUBLISH
+        )
+        channel = mock.Mock()
+        with mock.patch.object(kombu.Queue, "declare") as declare:
+            assert handler._get_delay_exchange(channel, "exchange", 0) == (
+                "exchange.delay.1000",
+                1000,
+            )
+            assert handler._get_delay_exchange(channel, "exchange", 0) == (
+                "exchange.delay.1000",
+                1000,
+            )
+            assert declare.call_count == 1
+            handler._get_delay_exchange(channel, "exchange", 1)
+            assert declare.call_count == 2
+            handler._get_delay_exchange(mock.Mock(), "exchange", 1)
+            assert declare.call_count == 3
+
+    def test_delayed_republish_round_trip(self, baseplate, name):
+        retried = []
+
+        def handler_fn(ctx, body, msg):
+            retried.append(msg.headers.get("x-retry-count"))
+            raise ValueError()
+
+        handler = KombuMessageHandler(
+            baseplate,
+            name,
+            handler_fn,
+            retry_mode=RetryMode.DELAYED_REPUBLISH,
+            retry_limit=2,
+            retry_delay=datetime.timedelta(milliseconds=10),
+        )
+        exchange = kombu.Exchange("delayed_retry_exchange", type="direct")
+        queue = kombu.Queue("delayed_retry_q", exchange=exchange, routing_key="rk")
+        with kombu.Connection(transport=InMemoryTransport) as connection:
+            channel = connection.default_channel
+            queue = queue.bind(channel)
+            queue.declare()
+            kombu.Producer(channel, exchange=exchange).publish({"foo": "bar"}, routing_key="rk")
+
+            handler.handle(queue.get())
+            # the retry is waiting in the delay queue until its TTL passes
+            assert queue.get() is None
+            time.sleep(0.015)
+            message = queue.get()
+            assert message.delivery_info["routing_key"] == "rk"
+            handler.handle(message)
+            time.sleep(0.025)
+            handler.handle(queue.get())
+            # the retry limit was reached, so there's no more retries
+            time.sleep(0.05)
+            assert queue.get() is None
+
+        assert retried == [None, 1, 2]
+
+    def test_in_memory_transport_is_per_connection(self):
+        exchange = kombu.Exchange("isolated_exchange", type="direct")
+        queue = kombu.Queue("isolated_q", exchange=exchange, routing_key="rk")
+        with kombu.Connection(transport=InMemoryTransport) as connection:
+            bound = queue.bind(connection.default_channel)
+            bound.declare()
+            kombu.Producer(connection.default_channel, exchange=exchange).publish(
+                {"foo": "bar"}, routing_key="rk"
+            )
+            assert bound.get() is not None
+            kombu.Producer(connection.default_channel, exchange=exchange).publish(
+                {"foo": "bar"}, routing_key="rk"
+            )
+
+        with kombu.Connection(transport=InMemoryTransport) as connection:
+            bound = queue.bind(connection.default_channel)
+            bound.declare()
+            assert bound.get() is None
+
+    def test_batched_ack(self, baseplate, name, message):
+        ack_batcher = mock.Mock(spec=_AckBatcher)
+        handler = KombuMessageHandler(baseplate, name, mock.Mock(), ack_batcher=ack_batcher)
+        handler.handle(message)
+        message.ack.assert_not_called()
+        ack_batcher.ack.assert_called_once_with(message)
+        ack_batcher.settle.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "err,expectation,flushed",
+        [
+            (ValueError(), does_not_raise(), False),
+            (FatalMessageHandlerError(), pytest.raises(FatalMessageHandlerError), True),
+        ],
+    )
+    def test_batched_ack_errors(self, err, expectation, flushed, baseplate, name, message):
+        def handler_fn(ctx, body, msg):
+            raise err
+
+        ack_batcher = mock.Mock(spec=_AckBatcher)
+        handler = KombuMessageHandler(
+            baseplate, name, handler_fn, retry_mode=RetryMode.REPUBLISH, ack_batcher=ack_batcher
+        )
+        with expectation:
+            handler.handle(message)
+        message.ack.assert_called_once()
+        message.channel.basic_publish.assert_called_once()
+        ack_batcher.ack.assert_not_called()
+        ack_batcher.settle.assert_called_once_with(message)
+        assert ack_batcher.flush.called == flushed
+
+    def test_batched_ack_ttl(self, baseplate, name, message):
+        ack_batcher = mock.Mock(spec=_AckBatcher)
+        handler = KombuMessageHandler(baseplate, name, mock.Mock(), ack_batcher=ack_batcher)
+        message.headers["x-ttl"] = int(time.time()) - 60
+        handler.handle(message)
+        message.reject.assert_called_once()
+        ack_batcher.settle.assert_called_once_with(message)
+
+
+class TestAckBatcher:
+    @pytest.fixture
+    def channel(self):
+        return mock.Mock()
+
+    @pytest.fixture
+    def make_message(self, channel):
+        def _make_message(delivery_tag, channel=channel):
+            return mock.Mock(spec=kombu.Message, channel=channel, delivery_tag=delivery_tag)
+
+        return _make_message
+
+    @pytest.fixture
+    def batcher(self):
+        return _AckBatcher(batch_size=3, interval=datetime.timedelta(seconds=60))
+
+    def test_acks_contiguous_prefix(self, batcher, make_message):
+        messages = [make_message(tag) for tag in range(1, 6)]
+        for message in messages:
+            batcher.track(message)
+
+        batcher.ack(messages[0])
+        batcher.ack(messages[2])
+        batcher.ack(messages[3])
+        # 3 messages are waiting, but 2 is still in flight so only 1 can be acked
+        messages[0].ack.assert_called_once_with(multiple=True)
+        for message in messages[1:]:
+            message.ack.assert_not_called()
+
+        batcher.ack(messages[1])
+        batcher.flush()
+        messages[3].ack.assert_called_once_with(multiple=True)
+        messages[4].ack.assert_not_called()
+
+    def test_settled_messages_are_skipped(self, batcher, make_message):
+        messages = [make_message(tag) for tag in range(1, 4)]
+        for message in messages:
+            batcher.track(message)
+
+        batcher.ack(messages[0])
+        batcher.ack(messages[1])
+        batcher.settle(messages[2])
+        batcher.flush()
+        # the rejected message is no longer outstanding, so it can't be used
+        # as the tag for a multiple ack.
+        messages[1].ack.assert_called_once_with(multiple=True)
+        messages[2].ack.assert_not_called()
+        assert not batcher.delivered
+
+    def test_flush_if_due(self, batcher, make_message):
+        message = make_message(1)
+        batcher.track(message)
+        batcher.ack(message)
+        batcher.flush_if_due()
+        message.ack.assert_not_called()
+
+        batcher.interval = 0
+        batcher.flush_if_due()
+        message.ack.assert_called_once_with(multiple=True)
+
+    def test_new_channel_resets(self, batcher, make_message):
+        old_message = make_message(1)
+        batcher.track(old_message)
+
+        new_message = make_message(1, channel=mock.Mock())
+        batcher.track(new_message)
+        batcher.ack(old_message)
+        batcher.ack(new_message)
+        batcher.flush()
+        old_message.ack.assert_not_called()
+        new_message.ack.assert_called_once_with(multiple=True)
+
 
 @pytest.fixture
 def connection():
@@ -526,6 +764,25 @@ class TestQueueConsumerFactory:
         assert handler.name == factory.name
         assert handler.handler_fn == factory.handler_fn
         assert handler.error_handler_fn == factory.error_handler_fn
+        assert handler.ack_batcher is None
+
+    def test_ack_batching(self, baseplate, exchange, connection, name, routing_keys):
+        factory = KombuQueueConsumerFactory.new(
+            baseplate=baseplate,
+            exchange=exchange,
+            connection=connection,
+            queue_name=name,
+            routing_keys=routing_keys,
+            handler_fn=mock.Mock(),
+            prefetch_count=100,
+            ack_batch_size=20,
+        )
+        pump = factory.build_pump_worker(Queue(maxsize=10))
+        handler = factory.build_message_handler()
+        assert pump.prefetch_count == 100
+        assert isinstance(pump.ack_batcher, _AckBatcher)
+        assert handler.ack_batcher is pump.ack_batcher
+        assert handler.ack_batcher.batch_size == 20
 
     @pytest.mark.parametrize("health_check_fn", [None, lambda req: True])
     def test_build_health_checker(self, health_check_fn, make_queue_consumer_factory):
@@ -556,3 +813,37 @@ class TestKombuConsumerWorker:
     def test_stop(self, consumer_worker):
         consumer_worker.stop()
         assert consumer_worker.should_stop is True
+
+    @pytest.mark.parametrize(
+        "prefetch_count,prefetch_size,qos",
+        [(None, None, None), (10, None, mock.call(prefetch_size=0, prefetch_count=10))],
+    )
+    def test_get_consumers_qos(self, prefetch_count, prefetch_size, qos, connection, queues):
+        consumer_worker = KombuConsumerWorker(
+            connection,
+            queues,
+            Queue(maxsize=10),
+            prefetch_count=prefetch_count,
+            prefetch_size=prefetch_size,
+        )
+        Consumer = mock.Mock()
+        consumers = consumer_worker.get_consumers(Consumer, mock.Mock())
+        assert consumers == [Consumer.return_value]
+        if qos:
+            assert Consumer.return_value.qos.call_args == qos
+        else:
+            Consumer.return_value.qos.assert_not_called()
+
+    def test_ack_batcher(self, connection, queues):
+        ack_batcher = mock.Mock(spec=_AckBatcher)
+        work_queue = Queue(maxsize=10)
+        consumer_worker = KombuConsumerWorker(
+            connection, queues, work_queue, ack_batcher=ack_batcher
+        )
+        message = mock.Mock()
+        consumer_worker._on_message(message)
+        ack_batcher.track.assert_called_once_with(message)
+        assert work_queue.get_nowait() == message
+
+        consumer_worker.on_iteration()
+        ack_batcher.flush_if_due.assert_called_once()
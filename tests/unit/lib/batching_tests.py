@@ -0,0 +1,62 @@
+import unittest
+
+from datetime import timedelta
+from unittest import mock
+
+import gevent
+
+from baseplate.lib.batching import GetBatcher
+
+
+class GetBatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.get_many = mock.Mock(side_effect=lambda keys: {k: k.upper() for k in keys if k != "x"})
+        self.batch_sizes = mock.Mock()
+        self.batcher = GetBatcher(self.get_many, batch_sizes=self.batch_sizes)
+
+    def test_concurrent_gets_are_batched(self):
+        greenlets = [gevent.spawn(self.batcher.get, key) for key in ["a", "b", "a", "x"]]
+        gevent.joinall(greenlets, raise_error=True)
+        reads = [g.value for g in greenlets]
+
+        self.get_many.assert_called_once_with(["a", "b", "x"])
+        self.batch_sizes.observe.assert_called_once_with(3)
+        self.assertEqual(
+            [(read.found, read.value) for read in reads],
+            [(True, "A"), (True, "B"), (True, "A"), (False, None)],
+        )
+        self.assertEqual({read.batch_id for read in reads}, {0})
+        self.assertEqual({read.batch_size for read in reads}, {3})
+
+    def test_sequential_gets_are_separate_batches(self):
+        self.assertEqual(self.batcher.get("a").batch_id, 0)
+        self.assertEqual(self.batcher.get("a").batch_id, 1)
+        self.assertEqual(self.get_many.call_count, 2)
+
+    def test_max_batch_size(self):
+        batcher = GetBatcher(self.get_many, max_batch_size=2)
+        greenlets = [gevent.spawn(batcher.get, key) for key in "abcde"]
+        gevent.joinall(greenlets, raise_error=True)
+        self.assertEqual(
+            self.get_many.call_args_list,
+            [mock.call(["a", "b"]), mock.call(["c", "d"]), mock.call(["e"])],
+        )
+        self.assertEqual([g.value.value for g in greenlets], list("ABCDE"))
+
+    def test_window(self):
+        batcher = GetBatcher(self.get_many, window=timedelta(milliseconds=10))
+        first = gevent.spawn(batcher.get, "a")
+        gevent.sleep(0.001)
+        second = gevent.spawn(batcher.get, "b")
+        gevent.joinall([first, second], raise_error=True)
+        self.get_many.assert_called_once_with(["a", "b"])
+
+    def test_errors_are_raised_to_every_caller(self):
+        self.get_many.side_effect = ValueError
+        greenlets = [gevent.spawn(self.batcher.get, key) for key in "ab"]
+        gevent.joinall(greenlets)
+        for greenlet in greenlets:
+            self.assertIsInstance(greenlet.exception, ValueError)
+        self.get_many.side_effect = None
+        self.get_many.return_value = {"a": 1}
+        self.assertEqual(self.batcher.get("a").value, 1)
@@ -0,0 +1,301 @@
+import time
+import unittest
+
+from unittest import mock
+
+import gevent
+
+from prometheus_client import REGISTRY
+from pymemcache.client.base import PooledClient
+from redis import StrictRedis
+
+from baseplate.clients.redis import MonitoredRedisConnection
+from baseplate.lib.cache import Cache
+from baseplate.lib.cache import CacheContextFactory
+from baseplate.lib.cache.backends import CacheBackend
+from baseplate.lib.cache.backends import CacheBackendContextFactory
+from baseplate.lib.cache.backends.memcache import MemcacheCacheBackend
+from baseplate.lib.cache.backends.memcache import MemcacheCacheBackendContextFactory
+from baseplate.lib.cache.backends.redis import DELETE_IF_EQUAL_SCRIPT
+from baseplate.lib.cache.backends.redis import RedisCacheBackend
+from baseplate.lib.cache.backends.redis import RedisCacheBackendContextFactory
+from baseplate.lib.cache.cache import _HEADER
+from baseplate.lib.cache.cache import CACHE_RECOMPUTES_TOTAL
+from baseplate.lib.cache.cache import CACHE_REQUESTS_TOTAL
+
+
+class DictCacheBackend(CacheBackend):
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self.fail = False
+
+    def get_many(self, keys):
+        if self.fail:
+            raise ConnectionError
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_many(self, values, ttl):
+        self.data.update(values)
+
+    def add(self, key, value, ttl):
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class Compute:
+    def __init__(self, duration=0):
+        self.calls = []
+        self.duration = duration
+
+    def __call__(self, keys):
+        self.calls.append(keys)
+        gevent.sleep(self.duration)
+        return {key: f"value of {key}" for key in keys}
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        CACHE_REQUESTS_TOTAL.clear()
+        CACHE_RECOMPUTES_TOTAL.clear()
+        self.backend = DictCacheBackend()
+        self.cache = Cache(self.backend, ttl=60, name="test", beta=0)
+        self.compute = Compute()
+
+    def store(self, key, value, expires_in, delta=0.0):
+        header = _HEADER.pack(time.time() + expires_in, delta)
+        self.backend.data[key] = header + self.cache.serializer(value)
+
+    def requests(self, result):
+        return REGISTRY.get_sample_value(
+            "cache_requests_total", {"cache_name": "test", "cache_result": result}
+        )
+
+    def recomputes(self, mode):
+        return REGISTRY.get_sample_value(
+            "cache_recomputes_total",
+            {"cache_name": "test", "cache_mode": mode, "cache_success": "true"},
+        )
+
+    def test_miss_then_hit(self):
+        compute = mock.Mock(return_value={"a": 1})
+        self.assertEqual(self.cache.get("a", lambda: 1), 1)
+        self.assertEqual(self.cache.get("a", compute), 1)
+        compute.assert_not_called()
+        self.assertEqual(self.requests("miss"), 1)
+        self.assertEqual(self.requests("hit"), 1)
+        self.assertEqual(self.recomputes("sync"), 1)
+        self.assertNotIn("a:lock", self.backend.data)
+
+    def test_get_many_batches_misses(self):
+        self.store("b", "cached b", expires_in=60)
+        values = self.cache.get_many(["a", "b", "c", "a"], self.compute)
+        self.assertEqual(values, {"a": "value of a", "b": "cached b", "c": "value of c"})
+        self.assertEqual(self.compute.calls, [["a", "c"]])
+
+    def test_keys_left_out_are_not_cached(self):
+        self.assertEqual(self.cache.get_many(["a"], lambda keys: {}), {})
+        self.assertNotIn("a", self.backend.data)
+
+    def test_waits_for_lock_holder(self):
+        self.backend.data["a:lock"] = b"1"
+        self.cache.poll_interval = 0.01
+
+        def other_worker():
+            gevent.sleep(0.02)
+            self.store("a", "from other worker", expires_in=60)
+
+        gevent.spawn(other_worker)
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "from other worker"})
+        self.assertEqual(self.compute.calls, [])
+
+    def test_computes_after_lock_timeout(self):
+        self.backend.data["a:lock"] = b"1"
+        self.cache.poll_interval = 0.01
+        self.cache.lock_timeout = 0.03
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "value of a"})
+        self.assertEqual(self.compute.calls, [["a"]])
+        # the lock wasn't ours to release
+        self.assertIn("a:lock", self.backend.data)
+
+    def test_single_recompute_under_concurrency(self):
+        compute = Compute(duration=0.02)
+        self.cache.poll_interval = 0.005
+        greenlets = [gevent.spawn(self.cache.get_many, ["a"], compute) for _ in range(10)]
+        gevent.joinall(greenlets, raise_error=True)
+        self.assertEqual([g.value for g in greenlets], [{"a": "value of a"}] * 10)
+        self.assertEqual(len(compute.calls), 1)
+
+    def test_serves_stale_while_revalidating(self):
+        self.store("a", "stale", expires_in=-1)
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "stale"})
+        self.assertEqual(self.requests("stale"), 1)
+
+        gevent.sleep(0.01)
+        self.assertEqual(self.compute.calls, [["a"]])
+        self.assertEqual(self.recomputes("background"), 1)
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "value of a"})
+
+    def test_stale_refresh_is_locked(self):
+        self.store("a", "stale", expires_in=-1)
+        self.backend.data["a:lock"] = b"1"
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "stale"})
+        gevent.sleep(0.01)
+        self.assertEqual(self.compute.calls, [])
+
+    def test_early_refresh(self):
+        self.cache.beta = 1.0
+        # a slow value close to expiry is almost certainly refreshed early
+        self.store("slow", "cached", expires_in=1, delta=1000)
+        self.store("fast", "cached", expires_in=1000, delta=0.001)
+        values = self.cache.get_many(["slow", "fast"], self.compute)
+        self.assertEqual(values, {"slow": "cached", "fast": "cached"})
+        gevent.sleep(0.01)
+        self.assertEqual(self.compute.calls, [["slow"]])
+
+    def test_background_errors_are_logged(self):
+        self.store("a", "stale", expires_in=-1)
+        compute = mock.Mock(side_effect=ValueError)
+        self.assertEqual(self.cache.get_many(["a"], compute), {"a": "stale"})
+        gevent.sleep(0.01)
+        compute.assert_called_once_with(["a"])
+        self.assertNotIn("a:lock", self.backend.data)
+
+    def test_sync_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            self.cache.get_many(["a"], mock.Mock(side_effect=ValueError))
+        self.assertNotIn("a:lock", self.backend.data)
+
+    def test_backend_failure_computes(self):
+        self.backend.fail = True
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "value of a"})
+        self.assertEqual(self.backend.data, {})
+
+    def test_unreadable_value_is_a_miss(self):
+        self.backend.data["a"] = b"garbage"
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "value of a"})
+
+    def test_lock_taken_over_is_not_released(self):
+        def compute(keys):
+            # our lock expired while computing and someone else took it
+            self.backend.data["a:lock"] = b"someone else"
+            return {"a": 1}
+
+        self.assertEqual(self.cache.get_many(["a"], compute), {"a": 1})
+        self.assertEqual(self.backend.data["a:lock"], b"someone else")
+
+    def test_background_recompute_uses_background_backend(self):
+        background_backend = mock.Mock(wraps=DictCacheBackend(self.backend.data))
+        self.cache.background_backend = background_backend
+        self.store("a", "stale", expires_in=-1)
+        self.assertEqual(self.cache.get_many(["a"], self.compute), {"a": "stale"})
+
+        gevent.sleep(0.01)
+        background_backend.set_many.assert_called_once()
+        background_backend.delete_if_equal.assert_called_once()
+        self.assertNotIn("a:lock", self.backend.data)
+
+    def test_delete(self):
+        self.cache.get("a", lambda: 1)
+        self.cache.delete("a")
+        self.assertEqual(self.cache.get("a", lambda: 2), 2)
+
+
+class CacheContextFactoryTests(unittest.TestCase):
+    def test_make_object_for_context(self):
+        backend_factory = mock.Mock(spec=CacheContextFactory)
+        backend_factory.make_object_for_context.return_value = DictCacheBackend()
+        factory = CacheContextFactory(backend_factory, ttl=30, stale_ttl=60)
+        cache = factory.make_object_for_context("users", mock.Mock())
+        self.assertEqual(cache.name, "users")
+        self.assertEqual(cache.ttl, 30)
+        self.assertEqual(cache.stale_ttl, 60)
+
+    def test_background_backend(self):
+        backend_factory = mock.Mock(spec=CacheBackendContextFactory)
+        backend_factory.make_object_for_context.return_value = DictCacheBackend()
+        background_backend = DictCacheBackend()
+        backend_factory.make_background_backend.return_value = background_backend
+        factory = CacheContextFactory(backend_factory, ttl=30)
+        cache = factory.make_object_for_context("users", mock.Mock())
+        self.assertIs(cache.background_backend, background_backend)
+        backend_factory.make_background_backend.assert_called_once_with()
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            CacheContextFactory(DictCacheBackend(), ttl=30)
+        with self.assertRaises(ValueError):
+            CacheContextFactory(mock.Mock(spec=CacheContextFactory), ttl=0)
+
+
+class MemcacheCacheBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.memcache = mock.create_autospec(PooledClient)
+        self.backend = MemcacheCacheBackend(self.memcache, prefix="p:")
+
+    def test_get_many(self):
+        self.memcache.get_many.return_value = {"p:a": b"1"}
+        self.assertEqual(self.backend.get_many(["a", "b"]), {"a": b"1"})
+        self.memcache.get_many.assert_called_once_with(["p:a", "p:b"])
+
+    def test_set_many(self):
+        self.backend.set_many({"a": b"1"}, ttl=10)
+        self.memcache.set_many.assert_called_once_with({"p:a": b"1"}, expire=10)
+
+    def test_background_backend(self):
+        pool = mock.create_autospec(PooledClient)
+        backend = MemcacheCacheBackendContextFactory(pool).make_background_backend()
+        self.assertIs(backend.memcache, pool)
+
+    def test_delete_if_equal(self):
+        self.memcache.get_many.return_value = {"p:a": b"token"}
+        self.backend.delete_if_equal("a", b"other")
+        self.memcache.delete.assert_not_called()
+        self.backend.delete_if_equal("a", b"token")
+        self.memcache.delete.assert_called_once_with("p:a")
+
+    def test_add(self):
+        self.memcache.add.return_value = True
+        self.assertTrue(self.backend.add("a", b"1", ttl=10))
+        self.memcache.add.assert_called_once_with("p:a", b"1", expire=10, noreply=False)
+
+
+class RedisCacheBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.redis = mock.create_autospec(StrictRedis)
+        self.backend = RedisCacheBackend(self.redis, prefix="p:")
+
+    def test_get_many(self):
+        self.redis.mget.return_value = [b"1", None]
+        self.assertEqual(self.backend.get_many(["a", "b"]), {"a": b"1"})
+        self.redis.mget.assert_called_once_with(["p:a", "p:b"])
+
+    def test_set_many(self):
+        self.backend.set_many({"a": b"1"}, ttl=10)
+        pipe = self.redis.pipeline.return_value.__enter__.return_value
+        pipe.set.assert_called_once_with("p:a", b"1", ex=10)
+        pipe.execute.assert_called_once_with()
+
+    def test_add(self):
+        self.redis.set.return_value = None
+        self.assertFalse(self.backend.add("a", b"1", ttl=10))
+        self.redis.set.assert_called_once_with("p:a", b"1", ex=10, nx=True)
+
+    def test_delete_if_equal(self):
+        self.backend.delete_if_equal("a", b"token")
+        self.redis.eval.assert_called_once_with(DELETE_IF_EQUAL_SCRIPT, 1, "p:a", b"token")
+
+    def test_background_backend(self):
+        pool = mock.Mock()
+        backend = RedisCacheBackendContextFactory(pool).make_background_backend()
+        self.assertIsInstance(backend.redis, StrictRedis)
+        self.assertNotIsInstance(backend.redis, MonitoredRedisConnection)
+        self.assertIs(backend.redis.connection_pool, pool)
+
+        with mock.patch.object(backend.redis, "pipeline") as pipeline:
+            backend.set_many({"a": b"1"}, ttl=10)
+        pipeline.assert_called_once_with(transaction=False)
@@ -0,0 +1,135 @@
+import unittest
+
+from unittest import mock
+
+import gevent
+
+from baseplate import RequestContext
+from baseplate import ServerSpan
+from baseplate.lib.memo import get_request_memo
+from baseplate.lib.memo import RequestMemo
+from baseplate.observers.memo import RequestMemoBaseplateObserver
+from baseplate.thrift.ttypes import IsHealthyProbe
+from baseplate.thrift.ttypes import IsHealthyRequest
+
+
+class RequestMemoTests(unittest.TestCase):
+    def setUp(self):
+        self.span = mock.Mock()
+        self.memo = RequestMemo(self.span)
+
+    def test_call_memoizes(self):
+        func = mock.Mock(return_value="value")
+        self.assertEqual(self.memo.call("ns", "key", func), "value")
+        self.assertEqual(self.memo.call("ns", "key", func), "value")
+        func.assert_called_once_with()
+        self.span.incr_tag.assert_called_once_with("request_memo.hits")
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 1))
+
+    def test_reads_are_distinguished(self):
+        self.memo.call("ns", "key", lambda: 1, read="a")
+        self.assertEqual(self.memo.call("ns", "key", lambda: 2, read="b"), 2)
+        self.assertEqual(self.memo.call("other", "key", lambda: 3, read="a"), 3)
+
+    def test_concurrent_calls_are_deduplicated(self):
+        func = mock.Mock(side_effect=lambda: gevent.sleep(0.01) or "value")
+        greenlets = [gevent.spawn(self.memo.call, "ns", "key", func) for _ in range(5)]
+        gevent.joinall(greenlets, raise_error=True)
+        self.assertEqual([g.value for g in greenlets], ["value"] * 5)
+        func.assert_called_once_with()
+
+    def test_errors_are_not_memoized(self):
+        with self.assertRaises(ValueError):
+            self.memo.call("ns", "key", mock.Mock(side_effect=ValueError))
+        self.assertEqual(self.memo.call("ns", "key", lambda: "value"), "value")
+
+    def test_concurrent_callers_see_errors(self):
+        def fail():
+            gevent.sleep(0.01)
+            raise ValueError
+
+        first = gevent.spawn(self.memo.call, "ns", "key", fail)
+        gevent.sleep(0)
+        second = gevent.spawn(self.memo.call, "ns", "key", mock.Mock())
+        gevent.joinall([first, second])
+        self.assertIsInstance(first.exception, ValueError)
+        self.assertIsInstance(second.exception, ValueError)
+
+    def test_results_are_copied(self):
+        self.memo.call("ns", "key", lambda: {"a": 1})["a"] = 2
+        self.assertEqual(self.memo.call("ns", "key", mock.Mock()), {"a": 1})
+
+    def test_nested_results_are_copied(self):
+        self.memo.call("ns", "key", lambda: {"a": [1]})["a"].append(2)
+        self.assertEqual(self.memo.call("ns", "key", mock.Mock()), {"a": [1]})
+
+    def test_thrift_results_are_copied(self):
+        def read():
+            return IsHealthyRequest(probe=IsHealthyProbe.READINESS)
+
+        self.memo.call("ns", "key", read).probe = IsHealthyProbe.LIVENESS
+        self.assertEqual(self.memo.call("ns", "key", mock.Mock()), read())
+
+    def test_get_and_set(self):
+        self.assertEqual(self.memo.get("ns", "key"), (False, None))
+        self.memo.set("ns", "key", "value")
+        self.assertEqual(self.memo.get("ns", "key"), (True, "value"))
+
+    def test_invalidate(self):
+        self.memo.set("ns", "a", 1)
+        self.memo.set("ns", "b", 2)
+        self.memo.invalidate("ns", "a")
+        self.assertEqual(self.memo.get("ns", "a"), (False, None))
+        self.assertEqual(self.memo.get("ns", "b"), (True, 2))
+        self.memo.invalidate("ns")
+        self.assertEqual(self.memo.get("ns", "b"), (False, None))
+
+    def test_set_after_invalidate(self):
+        version = self.memo.version
+        self.memo.invalidate("ns", "key")
+        self.memo.set("ns", "key", "stale", version=version)
+        self.assertEqual(self.memo.get("ns", "key"), (False, None))
+        self.memo.set("ns", "key", "value", version=self.memo.version)
+        self.assertEqual(self.memo.get("ns", "key"), (True, "value"))
+
+    def test_unhashable_reads_are_not_memoized(self):
+        func = mock.Mock(return_value="value")
+        self.memo.call("ns", "key", func, read=([1],))
+        self.memo.call("ns", "key", func, read=([1],))
+        self.assertEqual(func.call_count, 2)
+
+    def test_closed(self):
+        self.memo.set("ns", "key", "value")
+        self.memo.close()
+        func = mock.Mock(return_value="new")
+        self.assertEqual(self.memo.get("ns", "key"), (False, None))
+        self.assertEqual(self.memo.call("ns", "key", func), "new")
+        self.assertEqual(self.memo.call("ns", "key", func), "new")
+        self.assertEqual(func.call_count, 2)
+
+
+class GetRequestMemoTests(unittest.TestCase):
+    def test_not_enabled(self):
+        self.assertIsNone(get_request_memo(None))
+        self.assertIsNone(get_request_memo(mock.MagicMock()))
+
+    def test_enabled(self):
+        span = mock.Mock()
+        span.context.request_memo = RequestMemo()
+        self.assertIs(get_request_memo(span), span.context.request_memo)
+
+
+class ObserverTests(unittest.TestCase):
+    def test_memo_lifecycle(self):
+        context = RequestContext({})
+        span = ServerSpan("trace", "parent", "span", None, 0, "name", context)
+        RequestMemoBaseplateObserver().on_server_span_created(context, span)
+
+        memo = context.request_memo
+        memo.set("ns", "key", "value")
+        self.assertEqual(memo.get("ns", "key"), (True, "value"))
+
+        span.start()
+        span.finish()
+        self.assertTrue(memo.closed)
+        self.assertEqual(memo.get("ns", "key"), (False, None))
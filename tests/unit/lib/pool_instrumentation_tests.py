@@ -0,0 +1,61 @@
+import unittest
+
+from prometheus_client import REGISTRY
+
+from baseplate.lib.pool_instrumentation import CHECKOUT_TIMEOUTS_TOTAL
+from baseplate.lib.pool_instrumentation import CHECKOUT_WAIT_TIME
+from baseplate.lib.pool_instrumentation import CONNECT_TIME
+from baseplate.lib.pool_instrumentation import CONNECTIONS_CLOSED_TOTAL
+from baseplate.lib.pool_instrumentation import CONNECTIONS_OPENED_TOTAL
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
+
+
+LABELS = {"client_pool_type": "test", "client_pool_name": "pool"}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {**LABELS, **labels})
+
+
+class PoolInstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        for metric in (
+            CHECKOUT_WAIT_TIME,
+            CHECKOUT_TIMEOUTS_TOTAL,
+            CONNECT_TIME,
+            CONNECTIONS_OPENED_TOTAL,
+            CONNECTIONS_CLOSED_TOTAL,
+        ):
+            metric.clear()
+        self.instrumentation = PoolInstrumentation("test", "pool")
+
+    def test_checkout(self):
+        self.instrumentation.checkout_waited(0.01)
+        self.instrumentation.checkout_timed_out(1.0)
+
+        self.assertEqual(sample("client_pool_checkout_wait_seconds_count"), 2)
+        self.assertEqual(sample("client_pool_checkout_timeouts_total"), 1)
+
+    def test_connect(self):
+        with self.instrumentation.connecting():
+            pass
+
+        self.assertEqual(
+            sample("client_pool_connect_latency_seconds_count", client_pool_success="true"), 1
+        )
+        self.assertEqual(sample("client_pool_connections_opened_total"), 1)
+
+    def test_connect_failed(self):
+        with self.assertRaises(OSError):
+            with self.instrumentation.connecting():
+                raise OSError
+
+        self.assertEqual(
+            sample("client_pool_connect_latency_seconds_count", client_pool_success="false"), 1
+        )
+        self.assertEqual(sample("client_pool_connections_opened_total"), 0)
+
+    def test_closed(self):
+        self.instrumentation.connection_closed()
+
+        self.assertEqual(sample("client_pool_connections_closed_total"), 1)
@@ -13,6 +13,7 @@ from thrift.transport import TTransport
 
 from baseplate.lib import config
 from baseplate.lib import thrift_pool
+from baseplate.lib.pool_instrumentation import PoolInstrumentation
 from baseplate.observers.timeout import ServerTimeout
 
 
@@ -317,3 +318,59 @@ class ThriftConnectionPoolTests(unittest.TestCase):
                 pass
 
         self.assertEqual(0, pool.checkedout)
+
+
+class ThriftConnectionPoolInstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = mock.Mock(spec=PoolInstrumentation)
+        self.instrumentation.connecting.return_value = mock.MagicMock()
+        self.pool = thrift_pool.ThriftConnectionPool(
+            EXAMPLE_ENDPOINT, size=2, instrumentation=self.instrumentation
+        )
+
+    def test_checkout_wait(self):
+        self.pool._get_from_pool()
+
+        self.assertEqual(self.instrumentation.checkout_waited.call_count, 1)
+
+    def test_checkout_timeout(self):
+        self.pool.pool = mock.Mock(spec=queue.Queue)
+        self.pool.pool.get.side_effect = queue.Empty
+
+        with self.assertRaises(TTransport.TTransportException):
+            self.pool._get_from_pool()
+
+        self.assertEqual(self.instrumentation.checkout_timed_out.call_count, 1)
+
+    @mock.patch("baseplate.lib.thrift_pool._make_transport")
+    def test_connect_and_close(self, mock_make_transport):
+        trans = mock.Mock(spec=TSocket.TSocket)
+        trans.protocol_id = THeaderTransport.THeaderSubprotocolID.BINARY
+        mock_make_transport.return_value = trans
+
+        with self.assertRaises(TTransport.TTransportException):
+            with self.pool.connection():
+                raise TTransport.TTransportException
+
+        self.assertEqual(self.instrumentation.connecting.call_count, 1)
+        self.assertEqual(self.instrumentation.connection_closed.call_count, 1)
+
+    @mock.patch("baseplate.lib.thrift_pool._make_transport")
+    def test_prewarm(self, mock_make_transport):
+        mock_make_transport.side_effect = lambda endpoint: mock.Mock(spec=TSocket.TSocket)
+
+        warmed = self.pool.prewarm(5)
+
+        self.assertEqual(warmed, 2)
+        self.assertEqual(mock_make_transport.call_count, 2)
+        self.assertEqual(self.pool.checkedout, 0)
+        self.assertTrue(all(prot is not None for prot in self.pool.pool.queue))
+
+    @mock.patch("baseplate.lib.thrift_pool._make_transport")
+    def test_prewarm_connect_failure(self, mock_make_transport):
+        trans = mock.Mock(spec=TSocket.TSocket)
+        trans.open.side_effect = TTransport.TTransportException
+        mock_make_transport.return_value = trans
+
+        self.assertEqual(self.pool.prewarm(2), 0)
+        self.assertEqual(self.pool.checkedout, 0)
@@ -9,14 +9,18 @@ from queue import Queue
 from threading import Thread
 from unittest import mock
 
+import gevent
 import pytest
 import webtest
 
 from gevent.server import StreamServer
 
+from baseplate import Baseplate
 from baseplate.observers.timeout import ServerTimeout
 from baseplate.server.queue_consumer import HealthcheckApp
 from baseplate.server.queue_consumer import MessageHandler
+from baseplate.server.queue_consumer import ProcessPoolHandler
+from baseplate.server.queue_consumer import ProcessPoolWorkerError
 from baseplate.server.queue_consumer import PumpWorker
 from baseplate.server.queue_consumer import QueueConsumer
 from baseplate.server.queue_consumer import QueueConsumerFactory
@@ -239,6 +243,83 @@ class TestQueueConsumerServer:
         server._terminate.assert_called_once()
 
 
+def process_handler(context, data):
+    if data == "raise":
+        raise ValueError("oops")
+    if data == "unpicklable":
+        raise ValueError(lambda: None)
+    if data == "exit":
+        os._exit(1)
+    if data == "slow":
+        time.sleep(0.5)
+    return {
+        "pid": os.getpid(),
+        "trace_id": context.span.trace_id,
+        "parent_id": context.span.parent_id,
+        "data": data,
+    }
+
+
+class TestProcessPoolHandler:
+    @pytest.fixture
+    def baseplate(self):
+        return Baseplate()
+
+    @pytest.fixture
+    def pool(self, baseplate):
+        pool = ProcessPoolHandler(baseplate, "test", process_handler, processes=2)
+        yield pool
+        pool.stop()
+
+    def test_runs_in_worker_process(self, baseplate, pool):
+        with baseplate.server_context("parent") as context:
+            result = pool(context, "hello", mock.Mock())
+
+        assert result["data"] == "hello"
+        assert result["pid"] != os.getpid()
+        assert result["pid"] in [worker.process.pid for worker in pool.workers]
+
+    def test_trace_context_propagated(self, baseplate, pool):
+        with baseplate.server_context("parent") as context:
+            result = pool(context, "hello")
+            assert result["trace_id"] == context.span.trace_id
+            assert result["parent_id"] == context.span.id
+
+    def test_exception_reraised(self, baseplate, pool):
+        with baseplate.server_context("parent") as context:
+            with pytest.raises(ValueError):
+                pool(context, "raise")
+            with pytest.raises(ProcessPoolWorkerError):
+                pool(context, "unpicklable")
+            assert pool(context, "still works")["data"] == "still works"
+
+    def test_worker_death(self, baseplate, pool):
+        assert pool.health_check({})
+        pids = {worker.process.pid for worker in pool.workers}
+        with baseplate.server_context("parent") as context:
+            with pytest.raises(ProcessPoolWorkerError):
+                pool(context, "exit")
+            # the dead worker was replaced, so every worker still works.
+            for _ in range(4):
+                assert pool(context, "hello")["data"] == "hello"
+        assert pool.health_check({})
+        (replacement,) = [w for w in pool.workers if w.process.pid not in pids]
+        # replacements aren't forked from the handler's thread
+        assert replacement.process._start_method == "forkserver"
+
+    def test_interrupted_call(self, baseplate):
+        pool = ProcessPoolHandler(baseplate, "test", process_handler, processes=1)
+        try:
+            with baseplate.server_context("parent") as context:
+                with pytest.raises(gevent.Timeout):
+                    with gevent.Timeout(0.1):
+                        pool(context, "slow")
+                # the busy worker's response must not be given to the next call.
+                assert pool(context, "fast")["data"] == "fast"
+        finally:
+            pool.stop()
+
+
 def test_healthcheck():
     healthcheck_app = HealthcheckApp()
     test_app = webtest.TestApp(healthcheck_app)